@@ -0,0 +1,145 @@
+"""
+In-process autoscaling of consumer worker threads.
+
+Every ``AUTOSCALE_INTERVAL`` seconds the autoscaler reads the incoming backlog
+and consumer count from the queue probe, the mean processing latency from the
+metrics registry and the process CPU usage, and adds or removes one worker:
+
+- scale up when the backlog per consumer exceeds ``AUTOSCALE_SCALE_UP_BACKLOG``,
+  or messages are waiting and the mean latency exceeds ``AUTOSCALE_TARGET_LATENCY``,
+  unless the process already uses ``AUTOSCALE_MAX_CPU`` cores
+- scale down when the backlog per consumer has stayed below
+  ``AUTOSCALE_SCALE_DOWN_BACKLOG`` for ``AUTOSCALE_STABLE_SAMPLES`` evaluations
+
+The gap between the two thresholds and the consecutive-sample requirement give
+hysteresis; no decision is taken within ``AUTOSCALE_COOLDOWN`` seconds of the
+previous one. Backlog is divided by the broker's consumer count, so autoscalers
+in several processes or pods share the load instead of each reacting to the
+whole queue.
+"""
+import os
+import threading
+import time
+from typing import Callable, List, Optional
+from config import settings
+from configure_logging import get_logger
+from metrics import metrics
+
+logging = get_logger(__name__)
+
+LATENCY_METRIC = "consumer.message.latency"
+
+
+class CpuSampler:
+    """Process CPU usage, in cores, between consecutive samples."""
+
+    def __init__(self):
+        self._last = self._read()
+
+    @staticmethod
+    def _read():
+        times = os.times()
+        return times.user + times.system, time.monotonic()
+
+    def sample(self) -> float:
+        cpu, wall = self._read()
+        last_cpu, last_wall = self._last
+        self._last = (cpu, wall)
+        elapsed = wall - last_wall
+        return (cpu - last_cpu) / elapsed if elapsed > 0 else 0.0
+
+
+class Autoscaler:
+    """Adds and removes consumer workers within bounds based on backlog, latency and CPU."""
+
+    def __init__(self, start_worker: Callable[[], object], stop_worker: Callable[[object], None], probe=None,
+                 min_workers: int = None, max_workers: int = None, interval: float = None,
+                 cooldown: float = None):
+        """
+        :param start_worker: callable starting a worker and returning a handle to it
+        :param stop_worker: callable gracefully stopping the worker behind a handle
+        :param probe: QueueProbe providing backlog and consumer counts
+        """
+        self.start_worker = start_worker
+        self.stop_worker = stop_worker
+        self.probe = probe
+        self.min_workers = min_workers or settings.AUTOSCALE_MIN_WORKERS
+        self.max_workers = max_workers or settings.AUTOSCALE_MAX_WORKERS
+        self.interval = interval or settings.AUTOSCALE_INTERVAL
+        self.cooldown = cooldown if cooldown is not None else settings.AUTOSCALE_COOLDOWN
+        self.workers: List[object] = []
+        self._cpu = CpuSampler()
+        self._last_latency = metrics.timing(LATENCY_METRIC)
+        self._last_scaled_at = float("-inf")
+        self._quiet_samples = 0
+
+    def decide(self, backlog: int, consumers: int, latency: Optional[float], cpu: float) -> int:
+        """
+        Scaling decision for one evaluation.
+        :param backlog: int messages waiting in the incoming queues
+        :param consumers: int consumers attached to those queues, across all processes
+        :param latency: float mean processing latency since the last evaluation, None if idle
+        :param cpu: float process CPU usage in cores
+        :return: int +1 to add a worker, -1 to remove one, 0 to hold
+        """
+        workers = len(self.workers)
+        per_consumer = backlog / max(consumers, 1)
+        if per_consumer <= settings.AUTOSCALE_SCALE_DOWN_BACKLOG:
+            self._quiet_samples += 1
+        else:
+            self._quiet_samples = 0
+        if time.monotonic() - self._last_scaled_at < self.cooldown:
+            return 0
+
+        slow = backlog > 0 and latency is not None and latency > settings.AUTOSCALE_TARGET_LATENCY
+        if (per_consumer > settings.AUTOSCALE_SCALE_UP_BACKLOG or slow) and workers < self.max_workers:
+            if cpu >= settings.AUTOSCALE_MAX_CPU:
+                logging.info("Backlog growing but CPU saturated, not adding workers", cpu=round(cpu, 2))
+                return 0
+            return 1
+        if self._quiet_samples >= settings.AUTOSCALE_STABLE_SAMPLES and workers > self.min_workers:
+            return -1
+        return 0
+
+    def step(self) -> int:
+        """
+        Evaluate once and apply the decision.
+        :return: int change in worker count
+        """
+        sample = self.probe.last_sample if self.probe is not None else {}
+        if not sample or (self.probe is not None and not self.probe.is_fresh()):
+            logging.debug("No fresh queue sample, holding worker count", workers=len(self.workers))
+            return 0
+        latency = self._interval_latency()
+        cpu = self._cpu.sample()
+        delta = self.decide(sample["backlog"], sample["consumers"], latency, cpu)
+        if delta > 0:
+            self.workers.append(self.start_worker())
+        elif delta < 0:
+            self.stop_worker(self.workers.pop())
+            self._quiet_samples = 0
+        if delta:
+            self._last_scaled_at = time.monotonic()
+            metrics.increment("autoscaler.scale_up" if delta > 0 else "autoscaler.scale_down")
+            logging.info("Autoscaler changed worker count", workers=len(self.workers), backlog=sample["backlog"],
+                         consumers=sample["consumers"], latency=latency, cpu=round(cpu, 2))
+        metrics.set_gauge("autoscaler.workers", len(self.workers))
+        return delta
+
+    def run(self, stop_event: threading.Event):
+        """Start ``min_workers`` workers, then evaluate every ``interval`` seconds until stopped."""
+        while len(self.workers) < self.min_workers:
+            self.workers.append(self.start_worker())
+        metrics.set_gauge("autoscaler.workers", len(self.workers))
+        while not stop_event.wait(self.interval):
+            try:
+                self.step()
+            except Exception:
+                logging.error("Autoscaler evaluation failed", exc_info=True)
+
+    def _interval_latency(self) -> Optional[float]:
+        current = metrics.timing(LATENCY_METRIC)
+        count = current["count"] - self._last_latency["count"]
+        total = current["total"] - self._last_latency["total"]
+        self._last_latency = current
+        return total / count if count > 0 else None
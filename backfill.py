@@ -0,0 +1,206 @@
+"""
+Rescore existing comments with the current scorer.
+
+Streams the comments collection in ``_id`` order, scores batches on a process
+pool and writes the new scores back with unordered ``bulk_write``. Progress is
+checkpointed after every written batch, so an interrupted run resumes where it
+stopped. A token bucket caps the document rate to protect live traffic.
+
+Usage:
+    python backfill.py [--batch-size N] [--workers N] [--rate DOCS_PER_SEC]
+                       [--checkpoint PATH] [--filter JSON] [--reset]
+"""
+import argparse
+import os
+import time
+from collections import deque
+from concurrent.futures import Executor, ProcessPoolExecutor
+from datetime import datetime, UTC
+from typing import Callable, Dict, List
+from bson import json_util
+from pymongo import UpdateOne
+from config import settings
+from configure_logging import configure_logging, get_logger
+from constants import CollectionName
+from database.connection import mongo_connection
+from database.cursor import iter_batches
+from database.schema import set_fields, storage_projection, storage_query
+from database.score_history import score_history
+from metrics import metrics
+from models import expand_document
+from ratelimit import TokenBucket
+from scoring.factory import get_scorer
+from scoring.normalization import normalizer
+
+logging = get_logger(__name__)
+
+
+def score_texts(texts: List[str]) -> List[float]:
+    """Normalize and score a batch of texts with this process's scorer. Runs in pool workers."""
+    return get_scorer().score_batch(normalizer.normalize_batch(texts))
+
+
+def warm_up_worker():
+    get_scorer().warm_up()
+
+
+class Checkpoint:
+    """Resume point of a backfill, written atomically after every batch."""
+
+    def __init__(self, path: str):
+        self.path = path
+        self.last_id = None
+        self.processed = 0
+        self.updated = 0
+
+    def load(self) -> "Checkpoint":
+        if os.path.exists(self.path):
+            with open(self.path, "r", encoding="utf-8") as fh:
+                state = json_util.loads(fh.read())
+            self.last_id = state.get("last_id")
+            self.processed = state.get("processed", 0)
+            self.updated = state.get("updated", 0)
+        return self
+
+    def save(self):
+        state = {"last_id": self.last_id, "processed": self.processed, "updated": self.updated,
+                 "saved_at": datetime.now(UTC)}
+        tmp_path = self.path + ".tmp"
+        with open(tmp_path, "w", encoding="utf-8") as fh:
+            fh.write(json_util.dumps(state))
+            fh.flush()
+            os.fsync(fh.fileno())
+        os.replace(tmp_path, self.path)
+
+    def reset(self):
+        if os.path.exists(self.path):
+            os.remove(self.path)
+        self.last_id = None
+        self.processed = 0
+        self.updated = 0
+
+
+class Backfill:
+    """Batched, resumable, rate-limited rescoring of the comments collection."""
+
+    def __init__(self, collection, executor: Executor, checkpoint: Checkpoint, batch_size: int = None,
+                 rate: float = None, query: Dict = None, max_in_flight: int = None,
+                 score_fn: Callable[[List[str]], List[float]] = score_texts, progress_interval: float = 10.0):
+        """
+        :param collection: pymongo collection of comments
+        :param executor: pool scoring the batches
+        :param checkpoint: Checkpoint to resume from and update
+        :param batch_size: int documents per batch
+        :param rate: float maximum documents per second, 0 for unlimited
+        :param query: dict filter selecting the comments to rescore
+        :param max_in_flight: int batches scored concurrently
+        :param score_fn: callable scoring a list of texts, must be picklable for process pools
+        """
+        self.collection = collection
+        self.executor = executor
+        self.checkpoint = checkpoint
+        self.batch_size = batch_size or settings.BACKFILL_BATCH_SIZE
+        self.limiter = TokenBucket(settings.BACKFILL_RATE_LIMIT if rate is None else rate,
+                                   capacity=self.batch_size)
+        self.query = query or {}
+        self.max_in_flight = max_in_flight or settings.BACKFILL_WORKERS * 2
+        self.score_fn = score_fn
+        self.progress_interval = progress_interval
+        self._started = None
+        self._processed_at_start = 0
+        self._last_report = 0.0
+        self.total = None
+
+    def run(self) -> Checkpoint:
+        """
+        Rescore every matching comment after the checkpoint.
+        :return: Checkpoint final state
+        """
+        query = storage_query(self.query)
+        remaining_query = dict(query)
+        if self.checkpoint.last_id is not None:
+            remaining_query["_id"] = {"$gt": self.checkpoint.last_id}
+            logging.info("Resuming backfill", last_id=str(self.checkpoint.last_id),
+                         processed=self.checkpoint.processed)
+        self.total = self.collection.count_documents(remaining_query)
+        logging.info("Backfill started", documents=self.total, batch_size=self.batch_size)
+        self._started = self._last_report = time.monotonic()
+        self._processed_at_start = self.checkpoint.processed
+
+        # Batches are scored concurrently but written and checkpointed in cursor order,
+        # so the checkpoint never skips past a batch that has not been written yet
+        in_flight = deque()
+        batches = iter_batches(self.collection, self.batch_size, query=query,
+                               projection=storage_projection(("id", "user_id", "content")),
+                               start_after=self.checkpoint.last_id)
+        for batch in batches:
+            self.limiter.acquire(len(batch))
+            docs = [expand_document(doc) for doc in batch]
+            ids = [doc["_id"] for doc in docs]
+            texts = [doc.get("content") or "" for doc in docs]
+            owners = [(doc.get("id"), doc.get("user_id")) for doc in docs]
+            in_flight.append((ids, owners, self.executor.submit(self.score_fn, texts)))
+            if len(in_flight) >= self.max_in_flight:
+                self._write(*in_flight.popleft())
+        while in_flight:
+            self._write(*in_flight.popleft())
+        self._report(final=True)
+        return self.checkpoint
+
+    def _write(self, ids: List, owners: List, future):
+        scores = future.result()
+        rescored_at = datetime.now(UTC)
+        requests = [UpdateOne({"_id": _id}, set_fields({"score": score, "rescored_at": rescored_at}))
+                    for _id, score in zip(ids, scores)]
+        result = self.collection.bulk_write(requests, ordered=False)
+        score_history.record_many(((comment_id, user_id, score) for (comment_id, user_id), score
+                                   in zip(owners, scores)), "backfill", rescored_at)
+        self.checkpoint.last_id = ids[-1]
+        self.checkpoint.processed += len(ids)
+        self.checkpoint.updated += result.modified_count
+        self.checkpoint.save()
+        metrics.increment("backfill.processed", len(ids))
+        self._report()
+
+    def _report(self, final: bool = False):
+        now = time.monotonic()
+        if not final and now - self._last_report < self.progress_interval:
+            return
+        self._last_report = now
+        done = self.checkpoint.processed - self._processed_at_start
+        elapsed = now - self._started
+        rate = done / elapsed if elapsed > 0 else 0.0
+        remaining = max((self.total or 0) - done, 0)
+        eta = remaining / rate if rate > 0 else None
+        metrics.set_gauge("backfill.docs_per_second", rate)
+        logging.info("Backfill finished" if final else "Backfill progress", processed=self.checkpoint.processed,
+                     updated=self.checkpoint.updated, remaining=remaining, docs_per_second=round(rate, 1),
+                     eta_seconds=round(eta) if eta is not None else None)
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--batch-size", type=int, default=settings.BACKFILL_BATCH_SIZE)
+    parser.add_argument("--workers", type=int, default=settings.BACKFILL_WORKERS, help="scoring processes")
+    parser.add_argument("--rate", type=float, default=settings.BACKFILL_RATE_LIMIT,
+                        help="maximum documents per second, 0 for unlimited")
+    parser.add_argument("--checkpoint", default=settings.BACKFILL_CHECKPOINT_FILE)
+    parser.add_argument("--filter", default="{}", help="extended JSON filter selecting comments to rescore")
+    parser.add_argument("--reset", action="store_true", help="ignore the checkpoint and start over")
+    args = parser.parse_args()
+
+    if settings.LOGGING_PATH:
+        os.makedirs(settings.LOGGING_PATH, exist_ok=True)
+    configure_logging(settings)
+    checkpoint = Checkpoint(args.checkpoint)
+    if args.reset:
+        checkpoint.reset()
+    checkpoint.load()
+    collection = mongo_connection.get_collection(CollectionName.COMMENTS)
+    with ProcessPoolExecutor(max_workers=args.workers, initializer=warm_up_worker) as executor:
+        Backfill(collection, executor, checkpoint, batch_size=args.batch_size, rate=args.rate,
+                 query=json_util.loads(args.filter), max_in_flight=args.workers * 2).run()
+
+
+if __name__ == '__main__':
+    main()
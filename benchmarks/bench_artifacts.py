@@ -0,0 +1,68 @@
+"""
+Per-process memory and time-to-first-score of the lexicon scorer across forked
+workers, comparing a per-process compiled lexicon with a shared memory-mapped one.
+
+Usage:
+    python benchmarks/bench_artifacts.py [--terms N] [--workers N]
+"""
+import argparse
+import multiprocessing
+import os
+import random
+import string
+import sys
+import tempfile
+import time
+
+sys.path.insert(0, os.path.abspath(os.path.join(os.path.dirname(__file__), '..')))
+
+from scoring.artifacts import process_memory  # noqa: E402
+from scoring.lexicon import LexiconAutomaton, LexiconScorer, load_lexicon  # noqa: E402
+
+
+def worker(mode: str, path: str, results):
+    start = time.perf_counter()
+    if mode == "compiled":
+        scorer = LexiconScorer(load_lexicon(path))
+    else:
+        scorer = LexiconScorer.from_file(path)
+        scorer.warm_up()
+    scorer.score("time to first score")
+    results.put((mode, time.perf_counter() - start, process_memory()))
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--terms", type=int, default=50000, help="lexicon size")
+    parser.add_argument("--workers", type=int, default=4, help="number of forked workers per mode")
+    args = parser.parse_args()
+    rng = random.Random(42)
+
+    with tempfile.TemporaryDirectory() as tmp_dir:
+        lexicon_path = os.path.join(tmp_dir, "lexicon.tsv")
+        automaton_path = os.path.join(tmp_dir, "lexicon.ac")
+        with open(lexicon_path, "w", encoding="utf-8") as fh:
+            for _ in range(args.terms):
+                word = ''.join(rng.choice(string.ascii_lowercase) for _ in range(rng.randint(3, 12)))
+                fh.write(f"{word}\t{rng.uniform(10, 90):.1f}\n")
+        LexiconAutomaton.compile(load_lexicon(lexicon_path)).save(automaton_path)
+        print(f"artifact size: {os.path.getsize(automaton_path) / 1024:,.0f} KiB")
+
+        context = multiprocessing.get_context("fork")
+        for mode, path in (("compiled", lexicon_path), ("mapped", automaton_path)):
+            results = context.Queue()
+            processes = [context.Process(target=worker, args=(mode, path, results)) for _ in range(args.workers)]
+            for process in processes:
+                process.start()
+            reports = [results.get() for _ in processes]
+            for process in processes:
+                process.join()
+            ttfs = sum(report[1] for report in reports) / len(reports)
+            private = sum(report[2].get("private", 0) for report in reports) / len(reports)
+            shared = sum(report[2].get("shared", 0) for report in reports) / len(reports)
+            print(f"{mode:<9} time-to-first-score {ttfs * 1000:>8.1f} ms   "
+                  f"private {private / 1024:>7.1f} MiB   shared {shared / 1024:>7.1f} MiB   per worker")
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,76 @@
+"""
+Language routing benchmark: language identification cost per text, and scoring a
+mixed-language stream through the router in batches (one ``score_batch`` call per
+language) against routing text by text.
+
+Each language gets a lexicon scorer built from its sample words; ``--budget-mb``
+below the size of all of them shows the cost of LRU eviction and reloading.
+
+Usage:
+    python benchmarks/bench_language.py [--texts N] [--batch-size N] [--budget-mb MB]
+"""
+import argparse
+import os
+import random
+import sys
+import time
+
+sys.path.insert(0, os.path.abspath(os.path.join(os.path.dirname(__file__), '..')))
+
+from metrics import metrics  # noqa: E402
+from scoring.language import identify_language  # noqa: E402
+from scoring.lexicon import LexiconScorer  # noqa: E402
+from scoring.normalization import normalize_text  # noqa: E402
+from scoring.routing import LanguageRouter  # noqa: E402
+
+SAMPLES = {
+    "en": "you are the worst person on this forum and nobody likes you",
+    "fr": "tu es vraiment le pire de tous et personne ne veut de toi ici",
+    "de": "du bist der schlimmste mensch hier und ich mag dich nicht",
+    "ru": "ты худший человек на этом форуме и тебя никто не любит",
+    "ar": "أنت أسوأ شخص في هذا المنتدى ولا أحد يحبك",
+    "ja": "あなたはこのフォーラムで最悪の人です",
+    "ko": "너는 이 포럼에서 최악의 사람이야",
+}
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--texts", type=int, default=20000)
+    parser.add_argument("--batch-size", type=int, default=64)
+    parser.add_argument("--budget-mb", type=float, default=256.0)
+    args = parser.parse_args()
+    rng = random.Random(42)
+
+    texts = []
+    for _ in range(args.texts):
+        language = rng.choice(list(SAMPLES))
+        words = SAMPLES[language].split()
+        rng.shuffle(words)
+        texts.append(normalize_text(' '.join(words)))
+
+    start = time.perf_counter()
+    for text in texts:
+        identify_language(text)
+    print(f"identify_language        {(time.perf_counter() - start) / len(texts) * 1e6:8.1f} us/text")
+
+    lexicons = {language: {word: 30.0 for word in normalize_text(sample).split()[:3]}
+                for language, sample in SAMPLES.items()}
+    for mode in ("per-text", "batched"):
+        metrics.reset()
+        router = LanguageRouter(LexiconScorer({}), sources={language: language for language in lexicons},
+                                memory_budget=args.budget_mb, loader=lambda source: LexiconScorer(lexicons[source]))
+        start = time.perf_counter()
+        if mode == "batched":
+            for offset in range(0, len(texts), args.batch_size):
+                router.score_batch(texts[offset:offset + args.batch_size])
+        else:
+            for text in texts:
+                router.score(text)
+        elapsed = time.perf_counter() - start
+        print(f"{mode:<24} {elapsed / len(texts) * 1e6:8.1f} us/text  loads {metrics.counter('scoring.language.loads')}"
+              f"  evictions {metrics.counter('scoring.language.evictions')}")
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,53 @@
+"""
+Lexicon matching benchmark: naive ``in`` checks and regex alternation versus the
+Aho-Corasick automaton.
+
+Usage:
+    python benchmarks/bench_lexicon.py [--terms N] [--texts N]
+"""
+import argparse
+import os
+import random
+import re
+import string
+import sys
+import time
+
+sys.path.insert(0, os.path.abspath(os.path.join(os.path.dirname(__file__), '..')))
+
+from scoring.lexicon import LexiconAutomaton  # noqa: E402
+
+
+def random_word(rng: random.Random) -> str:
+    return ''.join(rng.choice(string.ascii_lowercase) for _ in range(rng.randint(3, 10)))
+
+
+def run(label: str, func, texts):
+    start = time.perf_counter()
+    for text in texts:
+        func(text)
+    elapsed = time.perf_counter() - start
+    print(f"{label:<24} {len(texts) / elapsed:>10,.0f} texts/s")
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--terms", type=int, default=20000, help="lexicon size")
+    parser.add_argument("--texts", type=int, default=200, help="number of ~500 character texts")
+    args = parser.parse_args()
+    rng = random.Random(42)
+    terms = {random_word(rng): 50.0 for _ in range(args.terms)}
+    texts = [' '.join(random_word(rng) for _ in range(80)) for _ in range(args.texts)]
+
+    start = time.perf_counter()
+    automaton = LexiconAutomaton.compile(terms)
+    print(f"compiled {len(terms)} terms in {time.perf_counter() - start:.2f}s")
+    alternation = re.compile(r"\b(?:" + "|".join(map(re.escape, sorted(terms, key=len, reverse=True))) + r")\b")
+
+    run("naive `in` per term", lambda text: sum(1 for term in terms if term in text), texts[:max(len(texts) // 10, 1)])
+    run("regex alternation", lambda text: len(alternation.findall(text)), texts)
+    run("aho-corasick", automaton.match, texts)
+
+
+if __name__ == '__main__':
+    main()
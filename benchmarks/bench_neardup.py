@@ -0,0 +1,91 @@
+"""
+Near-duplicate index benchmark: fingerprint and lookup cost against the cost of
+scoring, plus how many campaign variants are matched and how many unrelated
+texts are wrongly matched at each distance threshold.
+
+Variants are made like spam campaigns make them: case changes, repeated
+punctuation, a swapped or inserted word, leetspeak.
+
+Usage:
+    python benchmarks/bench_neardup.py [--index-size N] [--texts N] [--distances 2,3,4,6]
+"""
+import argparse
+import os
+import random
+import string
+import sys
+import time
+
+sys.path.insert(0, os.path.abspath(os.path.join(os.path.dirname(__file__), '..')))
+
+from scoring.lexicon import LexiconScorer  # noqa: E402
+from scoring.neardup import NearDuplicateIndex  # noqa: E402
+from scoring.normalization import normalize_text  # noqa: E402
+
+FILLER = ["go", "away", "nobody", "likes", "you", "this", "forum", "is", "for", "real", "people", "not", "idiots",
+          "like", "your", "kind", "seriously", "just", "leave", "everyone", "here", "thinks", "same"]
+LEET = str.maketrans({"e": "3", "o": "0", "i": "1", "a": "4"})
+
+
+def random_text(rng: random.Random, words: int) -> str:
+    return ' '.join(rng.choice(FILLER + [''.join(rng.choice(string.ascii_lowercase) for _ in range(6))])
+                    for _ in range(words))
+
+
+def variant(text: str, rng: random.Random) -> str:
+    words = text.split()
+    edit = rng.randrange(4)
+    if edit == 0:
+        words[rng.randrange(len(words))] = rng.choice(FILLER)
+    elif edit == 1:
+        words.insert(rng.randrange(len(words)), rng.choice(FILLER))
+    elif edit == 2:
+        words[rng.randrange(len(words))] = words[rng.randrange(len(words))].translate(LEET)
+    text = ' '.join(words)
+    return (text.upper() if rng.random() < 0.3 else text) + rng.choice(["", "!!", " !!!", "..."])
+
+
+def per_text_us(func, items) -> float:
+    start = time.perf_counter()
+    for item in items:
+        func(item)
+    return (time.perf_counter() - start) / len(items) * 1e6
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--index-size", type=int, default=50000, help="texts indexed before measuring")
+    parser.add_argument("--texts", type=int, default=2000, help="variants and unrelated texts looked up")
+    parser.add_argument("--words", type=int, default=25, help="words per text")
+    parser.add_argument("--distances", default="2,3,4,6")
+    args = parser.parse_args()
+    rng = random.Random(42)
+
+    originals = [normalize_text(random_text(rng, args.words)) for _ in range(args.index_size)]
+    variants = [normalize_text(variant(rng.choice(originals[:args.texts]), rng)) for _ in range(args.texts)]
+    unrelated = [normalize_text(random_text(rng, args.words)) for _ in range(args.texts)]
+
+    lexicon = LexiconScorer({word: 40.0 for word in FILLER[-8:]})
+    print(f"lexicon scorer           {per_text_us(lexicon.score, unrelated):>10.1f} us/text")
+    print("simulated scorer             2-15 s/text")
+
+    for distance in (int(value) for value in args.distances.split(",")):
+        index = NearDuplicateIndex(max_size=args.index_size, max_distance=distance, min_length=0)
+        start = time.perf_counter()
+        fingerprints = [index.fingerprint(text) for text in originals]
+        fingerprint_us = (time.perf_counter() - start) / len(originals) * 1e6
+        for fingerprint in fingerprints:
+            index.add(fingerprint, 50.0)
+        variant_prints = [index.fingerprint(text) for text in variants]
+        unrelated_prints = [index.fingerprint(text) for text in unrelated]
+        hit_us = per_text_us(index.lookup, variant_prints)
+        miss_us = per_text_us(index.lookup, unrelated_prints)
+        matched = sum(1 for fingerprint in variant_prints if index.lookup(fingerprint) is not None)
+        false_matches = sum(1 for fingerprint in unrelated_prints if index.lookup(fingerprint) is not None)
+        print(f"distance {distance:<2} fingerprint {fingerprint_us:7.1f} us  lookup {hit_us:6.1f}/{miss_us:6.1f} us "
+              f"(variant/unrelated)  variants matched {matched / len(variants):6.1%}  "
+              f"unrelated matched {false_matches / len(unrelated):6.2%}")
+
+
+if __name__ == '__main__':
+    main()
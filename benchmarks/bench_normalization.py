@@ -0,0 +1,65 @@
+"""
+Throughput benchmark for the text normalization stage.
+
+Usage:
+    python benchmarks/bench_normalization.py [--count N]
+
+Reports texts/s and MB/s for short comments and 10 KB texts, both cold
+(every text distinct, cache bypassed) and warm (repeated inputs served from cache).
+"""
+import argparse
+import os
+import random
+import string
+import sys
+import time
+
+sys.path.insert(0, os.path.abspath(os.path.join(os.path.dirname(__file__), '..')))
+
+from scoring.normalization import TextNormalizer, normalize_text  # noqa: E402
+
+OBFUSCATIONS = ["1d10t", "stuuuupid", "\u0455tu\u0440id", "f\u200bool", "\uff44\uff55\uff4d\uff42", "l0s3r", "$h1t",
+                "z\u0337a\u0337l\u0337g\u0337o\u0337"]
+
+
+def make_text(size: int, rng: random.Random) -> str:
+    words = []
+    length = 0
+    while length < size:
+        if rng.random() < 0.2:
+            word = rng.choice(OBFUSCATIONS)
+        else:
+            word = ''.join(rng.choice(string.ascii_letters) for _ in range(rng.randint(2, 9)))
+        words.append(word)
+        length += len(word) + 1
+    return ' '.join(words)[:size]
+
+
+def run(label: str, func, texts):
+    total_bytes = sum(len(text.encode("utf-8")) for text in texts)
+    start = time.perf_counter()
+    func(texts)
+    elapsed = time.perf_counter() - start
+    print(f"{label:<32} {len(texts) / elapsed:>12,.0f} texts/s {total_bytes / elapsed / 1e6:>10.2f} MB/s")
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--count", type=int, default=20000, help="number of short comments")
+    args = parser.parse_args()
+    rng = random.Random(42)
+
+    cases = {
+        "short comments (~80 B)": [make_text(80, rng) for _ in range(args.count)],
+        "long texts (10 KB)": [make_text(10 * 1024, rng) for _ in range(max(args.count // 100, 10))],
+    }
+    for name, texts in cases.items():
+        print(f"\n{name}: {len(texts)} texts")
+        run("  uncached, per text", lambda batch: [normalize_text(text) for text in batch], texts)
+        normalizer = TextNormalizer(cache_size=len(texts), enabled=True)
+        run("  batch, cold cache", normalizer.normalize_batch, texts)
+        run("  batch, warm cache", normalizer.normalize_batch, texts)
+
+
+if __name__ == '__main__':
+    main()
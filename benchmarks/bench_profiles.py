@@ -0,0 +1,94 @@
+"""
+Throughput of each throughput profile against live MongoDB and RabbitMQ servers:
+acknowledged single-document writes per second and published messages per second.
+
+Uses the connection settings from ``.env``. Writes go to a scratch collection and
+messages to a scratch queue per profile; both are dropped afterwards.
+
+Usage:
+    python benchmarks/bench_profiles.py [--messages N] [--threads N] [--profiles durable,balanced]
+"""
+import argparse
+import json
+import os
+import sys
+import time
+from concurrent.futures import ThreadPoolExecutor
+
+import pika
+from pymongo import MongoClient
+
+sys.path.insert(0, os.path.abspath(os.path.join(os.path.dirname(__file__), '..')))
+
+from config import settings  # noqa: E402
+from profiles import PROFILES, Profile, mongo_client_options, queue_arguments  # noqa: E402
+
+
+def mongo_uri() -> str:
+    if settings.MONGODB_MODE == "atlas":
+        return f"mongodb+srv://{settings.MONGODB_USER}:{settings.MONGODB_PASSWORD}@{settings.MONGODB_HOST}/?retryWrites=true"
+    return (f"mongodb://{settings.MONGODB_USER}:{settings.MONGODB_PASSWORD}@{settings.MONGODB_HOST}:"
+            f"{settings.MONGODB_PORT}/{settings.MONGODB_DB_NAME}?authSource=admin")
+
+
+def bench_mongo(profile: Profile, documents: list, threads: int) -> float:
+    client = MongoClient(mongo_uri(), **mongo_client_options(profile))
+    collection = client[settings.MONGODB_DB_NAME][f"bench_profile_{profile.name.replace('-', '_')}"]
+    collection.drop()
+    try:
+        start = time.perf_counter()
+        with ThreadPoolExecutor(max_workers=threads) as executor:
+            list(executor.map(lambda doc: collection.insert_one(dict(doc)), documents))
+        return len(documents) / (time.perf_counter() - start)
+    finally:
+        collection.drop()
+        client.close()
+
+
+def bench_amqp(profile: Profile, bodies: list) -> float:
+    parameters = pika.URLParameters(f"amqp://{settings.RABBITMQ_USERNAME}:{settings.RABBITMQ_PASSWORD}@"
+                                    f"{settings.RABBITMQ_HOST}:{settings.RABBITMQ_PORT}")
+    connection = pika.BlockingConnection(parameters)
+    channel = connection.channel()
+    queue_name = f"q.bench.profile.{profile.name}"
+    channel.queue_delete(queue=queue_name)
+    channel.queue_declare(queue=queue_name, durable=True, arguments=queue_arguments(profile))
+    if profile.publisher_confirms:
+        channel.confirm_delivery()
+    properties = pika.BasicProperties(delivery_mode=profile.delivery_mode)
+    try:
+        start = time.perf_counter()
+        for body in bodies:
+            channel.basic_publish(exchange="", routing_key=queue_name, body=body, properties=properties)
+        # Without confirms the publishes are only buffered; a round trip makes sure the broker has them all
+        channel.queue_declare(queue=queue_name, passive=True)
+        return len(bodies) / (time.perf_counter() - start)
+    finally:
+        channel.queue_delete(queue=queue_name)
+        connection.close()
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--messages", type=int, default=5000, help="writes and publishes per profile")
+    parser.add_argument("--threads", type=int, default=8, help="concurrent MongoDB writers")
+    parser.add_argument("--profiles", default=",".join(PROFILES), help="comma separated profile names")
+    parser.add_argument("--skip-mongo", action="store_true")
+    parser.add_argument("--skip-amqp", action="store_true")
+    args = parser.parse_args()
+    documents = [{"user_id": f"u_{i % 100}", "content": "lorem ipsum " * 20, "score": 42.0}
+                 for i in range(args.messages)]
+    bodies = [json.dumps(doc) for doc in documents]
+
+    for name in args.profiles.split(","):
+        profile = PROFILES[name]
+        line = f"{name:<16}"
+        if not args.skip_mongo:
+            line += f" mongo {bench_mongo(profile, documents, args.threads):>10,.0f} writes/s"
+        if not args.skip_amqp:
+            line += f"   amqp {bench_amqp(profile, bodies):>10,.0f} msgs/s"
+        print(line)
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,113 @@
+"""
+Load test for the HTTP scoring endpoint: latency percentiles and throughput
+at several concurrency levels.
+
+Without ``--url`` a server is started in-process with a stand-in scorer whose
+cost is ``--batch-overhead-ms`` per call plus ``--item-ms`` per text, the shape
+that makes micro-batching pay off; compare with ``--max-batch-size 1``. With
+``--url`` an already running server (``python scoring_server.py``) is tested.
+
+Usage:
+    python benchmarks/bench_scoring_http.py [--url http://127.0.0.1:8081] [--concurrency 1,8,32,128]
+        [--requests N] [--deadline-ms MS] [--max-batch-size N] [--max-wait-ms MS]
+"""
+import argparse
+import http.client
+import json
+import os
+import random
+import string
+import sys
+import time
+from concurrent.futures import ThreadPoolExecutor
+from urllib.parse import urlparse
+
+sys.path.insert(0, os.path.abspath(os.path.join(os.path.dirname(__file__), '..')))
+
+from metrics import metrics  # noqa: E402
+from scoring_server import MicroBatcher, ScoringServer  # noqa: E402
+
+
+def stand_in_scorer(batch_overhead: float, item_cost: float):
+    def score_batch(texts):
+        time.sleep(batch_overhead + item_cost * len(texts))
+        return [float(len(text) % 101) for text in texts]
+    return score_batch
+
+
+def percentile(values, fraction: float) -> float:
+    ordered = sorted(values)
+    return ordered[min(int(fraction * len(ordered)), len(ordered) - 1)]
+
+
+def post(host: str, port: int, body: bytes):
+    connection = http.client.HTTPConnection(host, port, timeout=30)
+    try:
+        start = time.perf_counter()
+        connection.request("POST", "/score", body=body, headers={"Content-Type": "application/json"})
+        response = connection.getresponse()
+        response.read()
+        return response.status, time.perf_counter() - start
+    finally:
+        connection.close()
+
+
+def run_level(host: str, port: int, concurrency: int, total: int, deadline_ms: float):
+    rng = random.Random(concurrency)
+    bodies = [json.dumps({"text": ''.join(rng.choice(string.ascii_letters + " ") for _ in range(rng.randint(20, 200))),
+                          "deadline_ms": deadline_ms}).encode("utf-8") for _ in range(total)]
+    start = time.perf_counter()
+    with ThreadPoolExecutor(max_workers=concurrency) as executor:
+        results = list(executor.map(lambda body: post(host, port, body), bodies))
+    elapsed = time.perf_counter() - start
+    latencies = [latency * 1000 for status, latency in results if status == 200]
+    statuses = {}
+    for status, _ in results:
+        statuses[status] = statuses.get(status, 0) + 1
+    return {
+        "concurrency": concurrency,
+        "requests_per_second": round(total / elapsed, 1),
+        "p50_ms": round(percentile(latencies, 0.50), 2) if latencies else None,
+        "p95_ms": round(percentile(latencies, 0.95), 2) if latencies else None,
+        "p99_ms": round(percentile(latencies, 0.99), 2) if latencies else None,
+        "statuses": statuses,
+    }
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--url", help="running scoring server; an in-process one is started when omitted")
+    parser.add_argument("--concurrency", default="1,8,32,128")
+    parser.add_argument("--requests", type=int, default=2000, help="requests per concurrency level")
+    parser.add_argument("--deadline-ms", type=float, default=1000.0)
+    parser.add_argument("--max-batch-size", type=int, default=32)
+    parser.add_argument("--max-wait-ms", type=float, default=5.0)
+    parser.add_argument("--batch-overhead-ms", type=float, default=5.0)
+    parser.add_argument("--item-ms", type=float, default=0.2)
+    args = parser.parse_args()
+
+    server = None
+    if args.url:
+        parsed = urlparse(args.url)
+        host, port = parsed.hostname, parsed.port or 80
+    else:
+        batcher = MicroBatcher(stand_in_scorer(args.batch_overhead_ms / 1000, args.item_ms / 1000),
+                               max_batch_size=args.max_batch_size, max_wait=args.max_wait_ms / 1000,
+                               max_pending=10000)
+        server = ScoringServer(batcher, host="127.0.0.1", port=0)
+        host, port = "127.0.0.1", server.start()
+    try:
+        for level in (int(value) for value in args.concurrency.split(",")):
+            metrics.reset()
+            result = run_level(host, port, level, args.requests, args.deadline_ms)
+            if server:
+                batches = metrics.counter("scoring_http.batches")
+                result["mean_batch_size"] = round(metrics.counter("scoring_http.scored") / batches, 1) if batches else None
+            print(json.dumps(result))
+    finally:
+        if server:
+            server.stop()
+
+
+if __name__ == '__main__':
+    main()
@@ -1,6 +1,23 @@
+import json
 from pydantic import model_validator, field_validator
 from pydantic_settings import BaseSettings
-from typing import Optional
+from typing import Dict, Literal, Optional
+
+# Settings a scorer is built from: changing one at runtime loads a new scorer, and a
+# shadow candidate may override them (SCORER_SHADOW_SETTINGS)
+SCORER_SETTINGS = (
+    "SCORING_CHUNK_SIZE",
+    "SCORING_CHUNK_OVERLAP",
+    "SCORING_CHUNK_REDUCER",
+    "SCORING_EARLY_EXIT",
+    "SCORING_LEXICON_PATH",
+    "SCORING_CASCADE_ENABLED",
+    "SCORING_CASCADE_LOW",
+    "SCORING_CASCADE_HIGH",
+    "SCORING_LANGUAGE_ROUTING",
+    "SCORING_LANGUAGE_SCORERS",
+    "SCORING_LANGUAGE_MEMORY_BUDGET_MB",
+)
 
 
 class Settings(BaseSettings):
@@ -15,13 +32,44 @@ class Settings(BaseSettings):
     RABBITMQ_BLOCKED_CONNECTION_TIMEOUT: int = 30
     RABBITMQ_PREFETCH_COUNT: int = 1
     RABBITMQ_MAX_RETRIES: int = 5
-    RABBITMQ_PAUSE: int = 5
     # RabbitMQ Consumer for incoming messages
     RABBITMQ_CONSUMER_QUEUE: str = ""
     RABBITMQ_CONSUMER_EXCHANGE: str = ""
     RABBITMQ_CONSUMER_ROUTING_KEY: str = ""
     RABBITMQ_CONSUMER_EXCHANGE_TYPE: str = ""
     RABBITMQ_START_CONSUMING: bool = False
+    CONSUMER_PROCESSES: int = 1
+    CONSUMER_CONCURRENCY: int = 1
+    CONSUMER_MAX_PENDING_PER_KEY: int = 16
+    CONSUMER_DRAIN_TIMEOUT: float = 30.0
+    # Per-user rate limiting (0 disables) and weighted fair scheduling across users
+    USER_RATE_LIMIT: float = 0.0
+    USER_RATE_LIMIT_BURST: float = 20.0
+    USER_RATE_LIMIT_MAX_USERS: int = 100000
+    USER_RATE_LIMIT_ACTION: Literal["defer", "cheap"] = "defer"
+    CONSUMER_USER_WEIGHTS: Dict[str, float] = {}
+    CONSUMER_DEFERRED_WEIGHT: float = 0.1
+    # Autoscaling of consumer worker threads
+    AUTOSCALE_ENABLED: bool = False
+    AUTOSCALE_MIN_WORKERS: int = 1
+    AUTOSCALE_MAX_WORKERS: int = 8
+    AUTOSCALE_INTERVAL: float = 15.0
+    AUTOSCALE_COOLDOWN: float = 60.0
+    AUTOSCALE_SCALE_UP_BACKLOG: int = 100
+    AUTOSCALE_SCALE_DOWN_BACKLOG: int = 10
+    AUTOSCALE_TARGET_LATENCY: float = 5.0
+    AUTOSCALE_MAX_CPU: float = 0.9
+    AUTOSCALE_STABLE_SAMPLES: int = 3
+    # RabbitMQ sharding by user_id (0 disables sharding)
+    RABBITMQ_SHARD_COUNT: int = 0
+    RABBITMQ_SHARD_EXCHANGE: str = "ex.toxicity.service.shards"
+    RABBITMQ_SHARD_INDEX: int = -1
+    # Queue probe and health endpoint
+    HEALTH_ENABLED: bool = False
+    HEALTH_HOST: str = "127.0.0.1"
+    HEALTH_PORT: int = 8080
+    PROBE_INTERVAL: float = 10.0
+    PROBE_PEEK_OLDEST: bool = False
     # RabbitMQ PUBLISHER for outgoing messages
     RABBITMQ_PUBLISHER_EXCHANGE: str = ""
     RABBITMQ_PUBLISHER_EXCHANGE_TYPE: str = ""
@@ -31,8 +79,13 @@ class Settings(BaseSettings):
     SAMPLE_MESSAGES_COUNT: int = 10
     RABBITMQ_REQUEUE_ON_FAIL: bool = True
     LOG_LEVEL: str = "INFO"
+    # Runtime-tunable overrides, reloaded on change or SIGHUP
+    RUNTIME_CONFIG_FILE: str = "runtime.env"
+    RUNTIME_CONFIG_POLL_INTERVAL: float = 2.0
     LOGGING_PATH: str = "./logs"
     LOGGING_FILE: str = "app.log"
+    # Durability/throughput trade-off for MongoDB writes and RabbitMQ messages (see profiles.py)
+    THROUGHPUT_PROFILE: Literal["durable", "balanced", "max-throughput"] = "balanced"
     # MONGODB Settings
     MONGODB_USER: str = ""
     MONGODB_MODE: str = "local"
@@ -40,6 +93,86 @@ class Settings(BaseSettings):
     MONGODB_DB_NAME: str = "toxicity_score"
     MONGODB_HOST: str = "localhost"
     MONGODB_PORT: int = 27017
+    # Match comments stored in the legacy (pre compact schema) layout too, until migrated
+    COMMENT_LEGACY_READS: bool = True
+    SCHEMA_MIGRATION_BATCH_SIZE: int = 1000
+    SCHEMA_MIGRATION_RATE_LIMIT: float = 0.0
+    # Audit log Settings
+    AUDIT_LOG_ENABLED: bool = True
+    AUDIT_LOG_BATCH_SIZE: int = 100
+    AUDIT_LOG_FLUSH_INTERVAL: float = 1.0
+    AUDIT_LOG_MAX_BUFFER: int = 10000
+    AUDIT_LOG_TTL_SECONDS: int = 90 * 24 * 3600
+    AUDIT_LOG_CAPPED_SIZE_BYTES: int = 0
+    AUDIT_LOG_FALLBACK_FILE: str = "audit_log.ndjson"
+    # Score history (time-series collection)
+    SCORE_HISTORY_ENABLED: bool = True
+    SCORE_HISTORY_BATCH_SIZE: int = 500
+    SCORE_HISTORY_FLUSH_INTERVAL: float = 1.0
+    SCORE_HISTORY_MAX_BUFFER: int = 50000
+    SCORE_HISTORY_GRANULARITY: Literal["seconds", "minutes", "hours"] = "hours"
+    SCORE_HISTORY_TTL_SECONDS: int = 0
+    # MongoDB circuit breaker and local spool
+    MONGO_BREAKER_FAILURE_THRESHOLD: int = 5
+    MONGO_BREAKER_RESET_TIMEOUT: float = 30.0
+    SPOOL_ENABLED: bool = True
+    SPOOL_DIR: str = "./spool"
+    SPOOL_FILE: str = "comments.ndjson"
+    SPOOL_REPLAY_BATCH_SIZE: int = 500
+    SPOOL_REPLAY_INTERVAL: float = 5.0
+    # Backfill (bulk rescoring) Settings
+    BACKFILL_BATCH_SIZE: int = 500
+    BACKFILL_WORKERS: int = 4
+    BACKFILL_RATE_LIMIT: float = 0.0
+    BACKFILL_CHECKPOINT_FILE: str = "backfill.checkpoint.json"
+    # Offline (NDJSON file/stdin) pipeline runs
+    OFFLINE_BATCH_SIZE: int = 256
+    OFFLINE_WORKERS: int = 4
+    # Export Settings
+    EXPORT_CHUNK_SIZE: int = 5000
+    # Scoring Settings
+    NORMALIZATION_ENABLED: bool = True
+    NORMALIZATION_CACHE_SIZE: int = 10000
+    # Longer texts are normalized without the cache
+    NORMALIZATION_CACHE_MAX_LENGTH: int = 4096
+    SCORE_CACHE_SIZE: int = 10000
+    # Near-duplicate score reuse (0 disables the index)
+    NEARDUP_INDEX_SIZE: int = 0
+    NEARDUP_MAX_DISTANCE: int = 3
+    NEARDUP_MIN_LENGTH: int = 64
+    NEARDUP_SHINGLE_SIZE: int = 4
+    SCORING_POOL_SIZE: int = 4
+    SCORING_CHUNK_SIZE: int = 2000
+    SCORING_CHUNK_OVERLAP: int = 200
+    SCORING_CHUNK_REDUCER: Literal["max", "mean"] = "max"
+    SCORING_EARLY_EXIT: bool = False
+    SCORING_TOXICITY_THRESHOLD: float = 80.0
+    SCORING_MAX_BODY_BYTES: int = 1024 * 1024
+    SCORING_LEXICON_PATH: str = ""
+    SCORING_LEXICON_DEFAULT_WEIGHT: float = 50.0
+    SCORING_CASCADE_ENABLED: bool = False
+    SCORING_CASCADE_LOW: float = 0.0
+    SCORING_CASCADE_HIGH: float = 90.0
+    # Language-aware routing: language code → lexicon (or compiled .ac) of that language's scorer
+    SCORING_LANGUAGE_ROUTING: bool = False
+    SCORING_LANGUAGE_SCORERS: Dict[str, str] = {}
+    SCORING_LANGUAGE_MEMORY_BUDGET_MB: float = 256.0
+    # Scorer versions: the active version is stamped on results; a shadow candidate
+    # (SCORER_SETTINGS overrides) scores a sample of traffic for comparison only
+    SCORER_VERSION: str = "1"
+    SCORER_SHADOW_VERSION: str = ""
+    SCORER_SHADOW_SETTINGS: Dict[str, str] = {}
+    SCORER_SHADOW_SAMPLE_RATE: float = 0.01
+    SCORER_SHADOW_MAX_PENDING: int = 100
+    # Synchronous HTTP scoring endpoint (micro-batched)
+    SCORING_HTTP_ENABLED: bool = False
+    SCORING_HTTP_HOST: str = "127.0.0.1"
+    SCORING_HTTP_PORT: int = 8081
+    SCORING_HTTP_MAX_BATCH_SIZE: int = 32
+    SCORING_HTTP_MAX_WAIT_MS: float = 5.0
+    SCORING_HTTP_DEADLINE_MS: float = 1000.0
+    SCORING_HTTP_MAX_PENDING: int = 1024
+    SCORING_HTTP_WORKERS: int = 1
 
     class Config:
         env_file = ".env"
@@ -58,6 +191,63 @@ class Settings(BaseSettings):
                 raise ValueError("RABBITMQ_PASSWORD is required when RabbitMQ is enabled")
         return self
 
+    @model_validator(mode='after')
+    def validate_sharding_config(self):
+        """Validate RabbitMQ sharding configuration."""
+        if self.RABBITMQ_SHARD_COUNT < 0:
+            raise ValueError("RABBITMQ_SHARD_COUNT must not be negative")
+        if self.RABBITMQ_SHARD_COUNT and self.RABBITMQ_SHARD_INDEX >= self.RABBITMQ_SHARD_COUNT:
+            raise ValueError("RABBITMQ_SHARD_INDEX must be lower than RABBITMQ_SHARD_COUNT")
+        return self
+
+    def validate_consumer_layout(self):
+        """
+        Validate how consumer processes map onto queues: each shard queue, and the
+        deferred queue paired with it, needs exactly one consumer process, since
+        competing consumers would break per-user ordering and an unconsumed shard would
+        never drain. Checked when consumers
+        start rather than on load, as publishers and the CLIs consume nothing.
+        :raises ValueError: when a shard queue would get no consumer process or several, or
+            processes would share a deferred queue
+        """
+        if not self.RABBITMQ_SHARD_COUNT:
+            if self.USER_RATE_LIMIT and self.USER_RATE_LIMIT_ACTION == "defer" and self.CONSUMER_PROCESSES > 1:
+                # Processes would share q.incoming_texts.deferred and apply one comment's deferrals concurrently
+                raise ValueError("USER_RATE_LIMIT_ACTION 'defer' needs RABBITMQ_SHARD_COUNT when CONSUMER_PROCESSES > 1")
+            return
+        if self.RABBITMQ_SHARD_INDEX >= 0 and self.CONSUMER_PROCESSES != 1:
+            raise ValueError("RABBITMQ_SHARD_INDEX pins every consumer process to one shard: CONSUMER_PROCESSES must be 1")
+        if self.RABBITMQ_SHARD_INDEX < 0 and self.CONSUMER_PROCESSES != self.RABBITMQ_SHARD_COUNT:
+            # Consumer processes are pinned to shard <process index>
+            raise ValueError("Without RABBITMQ_SHARD_INDEX, CONSUMER_PROCESSES must equal RABBITMQ_SHARD_COUNT")
+
+    @model_validator(mode='after')
+    def validate_fairness_config(self):
+        """Validate per-user rate limiting and scheduling weights."""
+        if self.USER_RATE_LIMIT < 0:
+            raise ValueError("USER_RATE_LIMIT must not be negative")
+        if self.USER_RATE_LIMIT and self.USER_RATE_LIMIT_BURST < 1:
+            raise ValueError("USER_RATE_LIMIT_BURST must be at least 1")
+        if self.USER_RATE_LIMIT and self.USER_RATE_LIMIT_ACTION == "cheap" and not self.SCORING_LEXICON_PATH:
+            raise ValueError("SCORING_LEXICON_PATH is required when USER_RATE_LIMIT_ACTION is 'cheap'")
+        if self.CONSUMER_DEFERRED_WEIGHT <= 0 or any(weight <= 0 for weight in self.CONSUMER_USER_WEIGHTS.values()):
+            raise ValueError("CONSUMER_DEFERRED_WEIGHT and CONSUMER_USER_WEIGHTS must be positive")
+        return self
+
+    @model_validator(mode='after')
+    def validate_autoscale_config(self):
+        """Validate consumer autoscaling configuration."""
+        if not self.AUTOSCALE_ENABLED:
+            return self
+        if not 1 <= self.AUTOSCALE_MIN_WORKERS <= self.AUTOSCALE_MAX_WORKERS:
+            raise ValueError("AUTOSCALE_MIN_WORKERS must be between 1 and AUTOSCALE_MAX_WORKERS")
+        if self.AUTOSCALE_SCALE_DOWN_BACKLOG >= self.AUTOSCALE_SCALE_UP_BACKLOG:
+            raise ValueError("AUTOSCALE_SCALE_DOWN_BACKLOG must be lower than AUTOSCALE_SCALE_UP_BACKLOG")
+        if self.RABBITMQ_SHARD_COUNT:
+            # Extra workers would become competing consumers on a shard queue and break per-user ordering
+            raise ValueError("AUTOSCALE_ENABLED cannot be combined with RABBITMQ_SHARD_COUNT")
+        return self
+
     @model_validator(mode='after')
     def validate_mongodb_config(self):
         """Validate MongoDB configuration."""
@@ -67,5 +257,66 @@ class Settings(BaseSettings):
             raise ValueError("MONGODB_USER is required for Atlas mode")
         return self
 
+    @model_validator(mode='after')
+    def validate_audit_log_config(self):
+        """Validate audit log buffering configuration."""
+        if self.AUDIT_LOG_BATCH_SIZE < 1:
+            raise ValueError("AUDIT_LOG_BATCH_SIZE must be at least 1")
+        if self.AUDIT_LOG_MAX_BUFFER < self.AUDIT_LOG_BATCH_SIZE:
+            raise ValueError("AUDIT_LOG_MAX_BUFFER must be greater than or equal to AUDIT_LOG_BATCH_SIZE")
+        if self.SCORE_HISTORY_BATCH_SIZE < 1:
+            raise ValueError("SCORE_HISTORY_BATCH_SIZE must be at least 1")
+        if self.SCORE_HISTORY_MAX_BUFFER < self.SCORE_HISTORY_BATCH_SIZE:
+            raise ValueError("SCORE_HISTORY_MAX_BUFFER must be greater than or equal to SCORE_HISTORY_BATCH_SIZE")
+        return self
+
+    @model_validator(mode='after')
+    def validate_scoring_config(self):
+        """Validate scoring pool and chunking configuration."""
+        if self.SCORING_POOL_SIZE < 1:
+            raise ValueError("SCORING_POOL_SIZE must be at least 1")
+        if self.SCORING_CHUNK_SIZE > 0 and not 0 <= self.SCORING_CHUNK_OVERLAP < self.SCORING_CHUNK_SIZE:
+            raise ValueError("SCORING_CHUNK_OVERLAP must be between 0 and SCORING_CHUNK_SIZE")
+        if not 0 <= self.NEARDUP_MAX_DISTANCE < 32:
+            raise ValueError("NEARDUP_MAX_DISTANCE must be between 0 and 31")
+        if self.NEARDUP_SHINGLE_SIZE < 1:
+            raise ValueError("NEARDUP_SHINGLE_SIZE must be at least 1")
+        if self.SCORING_HTTP_MAX_BATCH_SIZE < 1 or self.SCORING_HTTP_WORKERS < 1:
+            raise ValueError("SCORING_HTTP_MAX_BATCH_SIZE and SCORING_HTTP_WORKERS must be at least 1")
+        if self.SCORING_LANGUAGE_ROUTING and not self.SCORING_LANGUAGE_SCORERS:
+            raise ValueError("SCORING_LANGUAGE_SCORERS is required when SCORING_LANGUAGE_ROUTING is set")
+        if self.SCORING_LANGUAGE_MEMORY_BUDGET_MB <= 0:
+            raise ValueError("SCORING_LANGUAGE_MEMORY_BUDGET_MB must be positive")
+        if not self.SCORER_VERSION:
+            raise ValueError("SCORER_VERSION must not be empty")
+        unknown = set(self.SCORER_SHADOW_SETTINGS) - set(SCORER_SETTINGS)
+        if unknown:
+            raise ValueError(f"SCORER_SHADOW_SETTINGS can only override {', '.join(SCORER_SETTINGS)}")
+        if not 0 <= self.SCORER_SHADOW_SAMPLE_RATE <= 1:
+            raise ValueError("SCORER_SHADOW_SAMPLE_RATE must be between 0 and 1")
+        if self.SCORING_CASCADE_ENABLED:
+            if not self.SCORING_LEXICON_PATH:
+                raise ValueError("SCORING_LEXICON_PATH is required when SCORING_CASCADE_ENABLED is set")
+            if self.SCORING_CASCADE_LOW >= self.SCORING_CASCADE_HIGH:
+                raise ValueError("SCORING_CASCADE_LOW must be lower than SCORING_CASCADE_HIGH")
+        return self
+
 
 settings = Settings()
+
+
+def parse_setting(name: str, value: str):
+    """
+    Decode a setting given as text (override files), as the environment source does:
+    dict and list settings are JSON. Undecodable values are returned as they are for
+    validation to reject.
+    :param name: str setting name
+    :param value: str raw value
+    :return: decoded value
+    """
+    if isinstance(value, str) and isinstance(getattr(settings, name, None), (dict, list)):
+        try:
+            return json.loads(value)
+        except ValueError:
+            return value
+    return value
@@ -24,14 +24,26 @@ class CollectionName:
     COMMENTS = "comments"
     MESSAGES = "messages"
     AUDIT_LOG = "audit_log"
+    SCORE_HISTORY = "score_history"
 
 
 class QueueName:
     """RabbitMQ queue names - can be overridden by config."""
     INCOMING_TEXTS = "q.incoming_texts"
+    INCOMING_TEXTS_SHARD = "q.incoming_texts.shard.{index}"
+    # Messages of users over USER_RATE_LIMIT, consumed at a low scheduling weight; shard
+    # queues get their own, "<shard queue>.deferred"
+    DEFERRED_TEXTS = "q.incoming_texts.deferred"
     PROCESSED_TEXTS = "q.processed_texts"
 
 
+class ThroughputProfile:
+    """Durability/throughput trade-offs selectable with THROUGHPUT_PROFILE."""
+    DURABLE = "durable"
+    BALANCED = "balanced"
+    MAX_THROUGHPUT = "max-throughput"
+
+
 class ExchangeType:
     """RabbitMQ exchange types."""
     DIRECT = "direct"
@@ -0,0 +1,164 @@
+import atexit
+import json
+import os
+import threading
+from collections import deque
+from datetime import datetime, UTC
+from pymongo.errors import BulkWriteError
+from config import settings
+from configure_logging import get_logger
+from constants import CollectionName
+from database.connection import mongo_connection
+
+logging = get_logger(__name__)
+
+
+class AuditLogWriter:
+    """
+    Append-only audit trail for comment operations.
+
+    Entries are buffered in memory and written to the audit log collection in
+    batches with an unordered ``insert_many``, so recording an entry never waits
+    on MongoDB. The buffer is bounded: when it is full the oldest entries are
+    spilled to a local append-only file instead of growing without limit.
+    """
+
+    def __init__(self, connection=None, batch_size: int = None, flush_interval: float = None,
+                 max_buffer: int = None, fallback_path: str = None):
+        self.connection = connection or mongo_connection
+        self.batch_size = batch_size or settings.AUDIT_LOG_BATCH_SIZE
+        self.flush_interval = flush_interval or settings.AUDIT_LOG_FLUSH_INTERVAL
+        self.max_buffer = max_buffer or settings.AUDIT_LOG_MAX_BUFFER
+        self.fallback_path = fallback_path or os.path.join(settings.LOGGING_PATH, settings.AUDIT_LOG_FALLBACK_FILE)
+        self.collection = None
+        self._buffer = deque()
+        self._lock = threading.Lock()
+        self._flush_lock = threading.Lock()
+        self._wakeup = threading.Event()
+        self._stopped = threading.Event()
+        self._thread = None
+
+    def record(self, operation: str, comment_id: str, user_id: str = None, **details):
+        """
+        Buffer an audit entry. Never blocks on MongoDB.
+        :param operation: str operation type ("create", "update", "delete")
+        :param comment_id: str Comment ID
+        :param user_id: str author of the comment, if known
+        :param details: extra fields stored with the entry
+        """
+        if not settings.AUDIT_LOG_ENABLED:
+            return
+        entry = {
+            "operation": operation,
+            "comment_id": comment_id,
+            "user_id": user_id,
+            "details": details,
+            "logged_at": datetime.now(UTC),
+        }
+        overflow = []
+        with self._lock:
+            self._buffer.append(entry)
+            while len(self._buffer) > self.max_buffer:
+                overflow.append(self._buffer.popleft())
+            pending = len(self._buffer)
+        if overflow:
+            logging.warning("Audit log buffer full, spilling oldest entries to file", count=len(overflow))
+            self._write_fallback(overflow)
+        self._ensure_started()
+        if pending >= self.batch_size:
+            self._wakeup.set()
+
+    def flush(self) -> int:
+        """
+        Write all buffered entries to MongoDB, falling back to the local file on failure.
+        :return: int number of entries flushed
+        """
+        with self._flush_lock:
+            with self._lock:
+                batch = list(self._buffer)
+                self._buffer.clear()
+            if not batch:
+                return 0
+            try:
+                self._get_collection().insert_many(batch, ordered=False)
+                logging.debug("Audit log entries flushed", count=len(batch))
+            except BulkWriteError as e:
+                failed = [batch[error["index"]] for error in e.details.get("writeErrors", [])]
+                logging.error("Some audit log entries were rejected, writing them to fallback file",
+                              count=len(failed))
+                self._write_fallback(failed)
+            except Exception:
+                logging.error("Failed to flush audit log to MongoDB, writing to fallback file",
+                              count=len(batch), exc_info=True)
+                self._write_fallback(batch)
+            return len(batch)
+
+    def close(self):
+        """Stop the background flusher and flush whatever is still buffered."""
+        self._stopped.set()
+        self._wakeup.set()
+        if self._thread and self._thread.is_alive():
+            self._thread.join(timeout=self.flush_interval * 2)
+        self.flush()
+
+    def _ensure_started(self):
+        if self._thread is not None:
+            return
+        with self._lock:
+            if self._thread is not None:
+                return
+            self._thread = threading.Thread(target=self._run, name="AuditLogFlusher", daemon=True)
+            self._thread.start()
+            atexit.register(self.close)
+
+    def _run(self):
+        while not self._stopped.is_set():
+            self._wakeup.wait(timeout=self.flush_interval)
+            self._wakeup.clear()
+            if self._stopped.is_set():
+                break
+            try:
+                self.flush()
+            except Exception:
+                logging.error("Unexpected error in audit log flusher", exc_info=True)
+
+    def _get_collection(self):
+        if self.collection is None:
+            self.collection = self._prepare_collection()
+        return self.collection
+
+    def _prepare_collection(self):
+        """Create the audit collection as capped, or with a TTL index on ``logged_at``."""
+        db = self.connection.db
+        if settings.AUDIT_LOG_CAPPED_SIZE_BYTES > 0:
+            if CollectionName.AUDIT_LOG not in self.connection.list_collections():
+                try:
+                    db.create_collection(CollectionName.AUDIT_LOG, capped=True,
+                                         size=settings.AUDIT_LOG_CAPPED_SIZE_BYTES)
+                    logging.debug("Created capped audit log collection")
+                except Exception:
+                    logging.debug("Capped collection creation skipped (may already exist)", exc_info=True)
+            return db[CollectionName.AUDIT_LOG]
+        collection = db[CollectionName.AUDIT_LOG]
+        try:
+            collection.create_index("logged_at", expireAfterSeconds=settings.AUDIT_LOG_TTL_SECONDS)
+            logging.debug("Created TTL index on audit log 'logged_at' field")
+        except Exception:
+            logging.debug("TTL index creation skipped (may already exist)", exc_info=True)
+        return collection
+
+    def _write_fallback(self, entries):
+        try:
+            directory = os.path.dirname(self.fallback_path)
+            if directory:
+                os.makedirs(directory, exist_ok=True)
+            with open(self.fallback_path, "a", encoding="utf-8") as fh:
+                for entry in entries:
+                    entry.pop("_id", None)
+                    fh.write(json.dumps(entry, default=str) + "\n")
+        except Exception:
+            logging.error("Failed to write audit entries to fallback file", path=self.fallback_path,
+                          count=len(entries), exc_info=True)
+
+
+audit_log = AuditLogWriter()
@@ -1,6 +1,7 @@
 from pymongo import MongoClient
 from config import settings
 from configure_logging import get_logger
+from profiles import active_profile, mongo_client_options
 
 logging = get_logger(__name__)
 
@@ -18,7 +19,9 @@ class MongoDBConnection:
         try:
             logging.info("Connecting to MongoDB server...")
             uri = self.build_uri()
-            self.client = MongoClient(uri)
+            profile = active_profile()
+            self.client = MongoClient(uri, **mongo_client_options(profile))
+            logging.info("Using throughput profile", profile=profile.name)
             self.db = self.client[self.db_name]
             logging.info("Connected to MongoDB server successfully.")
         except Exception as e:
@@ -42,9 +45,10 @@ class MongoDBConnection:
 
 
     def build_uri(self):
+        # Write concern, pool sizes and compression come from the throughput profile, not the URI
         uri = f"mongodb://{settings.MONGODB_USER}:{settings.MONGODB_PASSWORD}@{settings.MONGODB_HOST}:{settings.MONGODB_PORT}/{settings.MONGODB_DB_NAME}?authSource=admin"
         if settings.MONGODB_MODE == "atlas":
-            uri = f"mongodb+srv://{settings.MONGODB_USER}:{settings.MONGODB_PASS}@{settings.MONGODB_HOST}/{self.db_name}?retryWrites=true&w=majority"
+            uri = f"mongodb+srv://{settings.MONGODB_USER}:{settings.MONGODB_PASS}@{settings.MONGODB_HOST}/{self.db_name}?retryWrites=true"
 
         return uri
 
@@ -0,0 +1,36 @@
+from typing import Dict, Iterator, List
+from pymongo import ASCENDING
+
+
+def iter_batches(collection, batch_size: int, query: Dict = None, projection: Dict = None,
+                 start_after=None, end_at=None) -> Iterator[List[Dict]]:
+    """
+    Stream a collection in ``_id`` order, one batch per query.
+
+    Each batch is fetched with ``_id > last seen _id``, sorted and limited, so the
+    cost of a batch does not grow with how far into the collection it is (unlike
+    ``skip``) and a scan can be resumed from any ``_id``.
+    :param collection: pymongo collection
+    :param batch_size: int documents per batch
+    :param query: dict additional filter
+    :param projection: dict fields to return; ``_id`` is always included
+    :param start_after: resume after this ``_id`` (exclusive)
+    :param end_at: stop at this ``_id`` (inclusive)
+    :return: iterator of document lists
+    """
+    query = dict(query or {})
+    last_id = start_after
+    while True:
+        id_range = {}
+        if last_id is not None:
+            id_range["$gt"] = last_id
+        if end_at is not None:
+            id_range["$lte"] = end_at
+        batch_query = {**query, "_id": id_range} if id_range else query
+        batch = list(collection.find(batch_query, projection).sort("_id", ASCENDING).limit(batch_size))
+        if not batch:
+            return
+        yield batch
+        if len(batch) < batch_size:
+            return
+        last_id = batch[-1]["_id"]
@@ -0,0 +1,136 @@
+"""
+Storage schema helpers for the comments collection and the online migration
+from the verbose version 1 documents to compact version 2 documents (see
+``models.FIELD_NAMES``).
+
+While ``COMMENT_LEGACY_READS`` is set, lookups and updates match both schemas,
+so the service keeps working on a partially migrated collection. Turn it off
+once the migrator reports nothing left to convert.
+"""
+import time
+from typing import Dict, Iterable, List, Union
+from pymongo import ReplaceOne
+from config import settings
+from configure_logging import get_logger
+from database.cursor import iter_batches
+from metrics import metrics
+from models import FIELD_NAMES, compact_document, expand_document
+from ratelimit import TokenBucket
+
+logging = get_logger(__name__)
+
+VERSION_FIELD = FIELD_NAMES["schema_version"]
+LEGACY_QUERY = {VERSION_FIELD: {"$exists": False}}
+
+
+def storage_name(name: str) -> str:
+    return FIELD_NAMES.get(name, name)
+
+
+def storage_query(query: Dict) -> Dict:
+    """
+    Translate a filter on model field names to the stored field names.
+    :param query: dict MongoDB filter using model field names at the top level
+    :return: dict filter matching current documents, and legacy ones while legacy reads are enabled
+    """
+    if not query:
+        return {}
+    compact = {storage_name(name): condition for name, condition in query.items()}
+    if not settings.COMMENT_LEGACY_READS:
+        return compact
+    return {"$or": [compact, {**query, **LEGACY_QUERY}]}
+
+
+def storage_projection(fields: Iterable[str]) -> Dict:
+    """
+    Projection fetching model fields from documents of any schema version.
+    :param fields: iterable of model field names
+    :return: dict MongoDB projection, always including the schema version
+    """
+    projection = {VERSION_FIELD: 1}
+    for name in fields:
+        projection[storage_name(name)] = 1
+        if settings.COMMENT_LEGACY_READS:
+            projection[name] = 1
+    return projection
+
+
+def comment_filter(comment_id: str) -> Dict:
+    return storage_query({"id": comment_id})
+
+
+def set_fields(values: Dict) -> Union[Dict, List[Dict]]:
+    """
+    Update setting model fields on a comment, under the names of the schema it is stored in.
+    :param values: dict of model field names to new values
+    :return: update document, or an update pipeline while legacy reads are enabled
+    """
+    if not settings.COMMENT_LEGACY_READS:
+        return {"$set": {storage_name(name): value for name, value in values.items()}}
+    # One round trip for either schema: the pipeline checks the version field per document
+    is_current = {"$ifNull": [f"${VERSION_FIELD}", False]}
+    stage = {}
+    for name, value in values.items():
+        stage[storage_name(name)] = {"$cond": [is_current, {"$literal": value}, "$$REMOVE"]}
+        stage[name] = {"$cond": [is_current, "$$REMOVE", {"$literal": value}]}
+    return [{"$set": stage}]
+
+
+def ensure_indexes(collection):
+    """
+    Create the unique comment ID index for both schemas. Each one is partial on its
+    own field, since a plain unique index would reject the second document lacking it.
+    """
+    legacy_index = collection.index_information().get("id_1")
+    if legacy_index and "partialFilterExpression" not in legacy_index:
+        collection.drop_index("id_1")
+        logging.info("Replaced the legacy unique index on 'id' with a partial one")
+    for name in ("id", storage_name("id")):
+        collection.create_index(name, unique=True, name=f"{name}_1",
+                                partialFilterExpression={name: {"$exists": True}})
+
+
+class SchemaMigrator:
+    """
+    Converts legacy comment documents to the current schema, online.
+
+    Legacy documents are streamed in ``_id`` order and replaced in unordered
+    ``bulk_write`` batches. Each replacement only applies if the document still
+    has the score that was read, so a concurrent update is never overwritten;
+    such documents are skipped and picked up by the next run.
+    """
+
+    def __init__(self, collection, batch_size: int = None, rate: float = None):
+        """
+        :param collection: pymongo collection of comments
+        :param batch_size: int documents per batch
+        :param rate: float maximum documents per second, 0 for unlimited
+        """
+        self.collection = collection
+        self.batch_size = batch_size or settings.SCHEMA_MIGRATION_BATCH_SIZE
+        self.limiter = TokenBucket(settings.SCHEMA_MIGRATION_RATE_LIMIT if rate is None else rate,
+                                   capacity=self.batch_size)
+        self.migrated = 0
+        self.skipped = 0
+
+    def run(self) -> Dict:
+        """
+        Migrate every legacy document.
+        :return: dict with the number of migrated and skipped documents
+        """
+        ensure_indexes(self.collection)
+        started = time.monotonic()
+        for batch in iter_batches(self.collection, self.batch_size, query=LEGACY_QUERY):
+            self.limiter.acquire(len(batch))
+            requests = [ReplaceOne({"_id": doc["_id"], **LEGACY_QUERY, "score": doc.get("score")},
+                                   compact_document(expand_document(doc)))
+                        for doc in batch]
+            result = self.collection.bulk_write(requests, ordered=False)
+            self.migrated += result.modified_count
+            self.skipped += len(requests) - result.matched_count
+            metrics.increment("schema_migration.migrated", result.modified_count)
+            logging.info("Schema migration progress", migrated=self.migrated, skipped=self.skipped,
+                         last_id=str(batch[-1]["_id"]))
+        logging.info("Schema migration finished", migrated=self.migrated, skipped=self.skipped,
+                     seconds=round(time.monotonic() - started, 1))
+        return {"migrated": self.migrated, "skipped": self.skipped}
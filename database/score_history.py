@@ -0,0 +1,197 @@
+import atexit
+import threading
+from collections import deque
+from datetime import datetime, UTC
+from typing import Dict, Iterable, List, Tuple
+from pymongo.errors import BulkWriteError, CollectionInvalid
+from config import settings
+from configure_logging import get_logger
+from constants import CollectionName
+from database.connection import mongo_connection
+from metrics import metrics
+
+logging = get_logger(__name__)
+
+
+class ScoreHistory:
+    """
+    Append-only history of every score given to a comment.
+
+    Scoring events are stored in a MongoDB time-series collection (``scored_at`` as
+    time field, ``user_id`` as meta field), which groups each user's events into
+    column-compressed buckets. Events are buffered and written in batches with an
+    unordered ``insert_many`` by a background thread. History is best effort: when
+    the buffer is full or MongoDB rejects a batch, events are dropped and counted.
+    """
+
+    def __init__(self, connection=None, batch_size: int = None, flush_interval: float = None,
+                 max_buffer: int = None):
+        self.connection = connection or mongo_connection
+        self.batch_size = batch_size or settings.SCORE_HISTORY_BATCH_SIZE
+        self.flush_interval = flush_interval or settings.SCORE_HISTORY_FLUSH_INTERVAL
+        self.max_buffer = max_buffer or settings.SCORE_HISTORY_MAX_BUFFER
+        self.collection = None
+        self._buffer = deque()
+        self._lock = threading.Lock()
+        self._flush_lock = threading.Lock()
+        self._wakeup = threading.Event()
+        self._stopped = threading.Event()
+        self._thread = None
+
+    def record(self, comment_id: str, user_id: str, score: float, source: str, scored_at: datetime = None):
+        """
+        Buffer a scoring event. Never blocks on MongoDB.
+        :param comment_id: str Comment ID
+        :param user_id: str author of the comment
+        :param score: float score given
+        :param source: str what produced the score ("create", "update", "backfill")
+        :param scored_at: datetime of the scoring, now by default
+        """
+        self.record_many([(comment_id, user_id, score)], source, scored_at)
+
+    def record_many(self, events: Iterable[Tuple[str, str, float]], source: str, scored_at: datetime = None):
+        """
+        Buffer several scoring events sharing a source and time.
+        :param events: iterable of (comment_id, user_id, score)
+        :param source: str what produced the scores
+        :param scored_at: datetime of the scoring, now by default
+        """
+        if not settings.SCORE_HISTORY_ENABLED:
+            return
+        scored_at = scored_at or datetime.now(UTC)
+        entries = [{"scored_at": scored_at, "user_id": user_id, "comment_id": comment_id,
+                    "score": score, "source": source}
+                   for comment_id, user_id, score in events]
+        dropped = 0
+        with self._lock:
+            self._buffer.extend(entries)
+            while len(self._buffer) > self.max_buffer:
+                self._buffer.popleft()
+                dropped += 1
+            pending = len(self._buffer)
+        if dropped:
+            metrics.increment("score_history.dropped", dropped)
+            logging.warning("Score history buffer full, dropped oldest events", count=dropped)
+        self._ensure_started()
+        if pending >= self.batch_size:
+            self._wakeup.set()
+
+    def flush(self) -> int:
+        """
+        Write all buffered events to MongoDB.
+        :return: int number of events written
+        """
+        with self._flush_lock:
+            with self._lock:
+                batch = list(self._buffer)
+                self._buffer.clear()
+            if not batch:
+                return 0
+            try:
+                self._get_collection().insert_many(batch, ordered=False)
+                written = len(batch)
+            except BulkWriteError as e:
+                written = len(batch) - len(e.details.get("writeErrors", []))
+                logging.error("Some score history events were rejected", count=len(batch) - written)
+            except Exception:
+                written = 0
+                logging.error("Failed to write score history to MongoDB", count=len(batch), exc_info=True)
+            metrics.increment("score_history.written", written)
+            if written < len(batch):
+                metrics.increment("score_history.dropped", len(batch) - written)
+            return written
+
+    def close(self):
+        """Stop the background flusher and flush whatever is still buffered."""
+        self._stopped.set()
+        self._wakeup.set()
+        if self._thread and self._thread.is_alive():
+            self._thread.join(timeout=self.flush_interval * 2)
+        self.flush()
+
+    def trend(self, comment_id: str, since: datetime = None, until: datetime = None) -> List[Dict]:
+        """
+        Scores of a comment over time, oldest first.
+        :param comment_id: str Comment ID
+        :param since: datetime lower bound (inclusive)
+        :param until: datetime upper bound (exclusive)
+        :return: list of {"scored_at", "score", "source"}
+        """
+        query = {"comment_id": comment_id, **self._time_range(since, until)}
+        cursor = self._get_collection().find(query, {"_id": 0, "scored_at": 1, "score": 1, "source": 1})
+        return list(cursor.sort("scored_at", 1))
+
+    def hourly_averages(self, user_id: str, since: datetime = None, until: datetime = None) -> List[Dict]:
+        """
+        Mean, maximum and count of a user's scores per hour, oldest first.
+        :param user_id: str user ID
+        :param since: datetime lower bound (inclusive)
+        :param until: datetime upper bound (exclusive)
+        :return: list of {"hour", "average", "max", "count"}
+        """
+        pipeline = [
+            # Matching on the meta field and time range lets MongoDB skip whole buckets
+            {"$match": {"user_id": user_id, **self._time_range(since, until)}},
+            {"$group": {
+                "_id": {"$dateTrunc": {"date": "$scored_at", "unit": "hour"}},
+                "average": {"$avg": "$score"},
+                "max": {"$max": "$score"},
+                "count": {"$sum": 1},
+            }},
+            {"$sort": {"_id": 1}},
+            {"$project": {"_id": 0, "hour": "$_id", "average": 1, "max": 1, "count": 1}},
+        ]
+        return list(self._get_collection().aggregate(pipeline))
+
+    @staticmethod
+    def _time_range(since: datetime = None, until: datetime = None) -> Dict:
+        bounds = {key: value for key, value in (("$gte", since), ("$lt", until)) if value}
+        return {"scored_at": bounds} if bounds else {}
+
+    def _ensure_started(self):
+        if self._thread is not None:
+            return
+        with self._lock:
+            if self._thread is not None:
+                return
+            self._thread = threading.Thread(target=self._run, name="ScoreHistoryFlusher", daemon=True)
+            self._thread.start()
+            atexit.register(self.close)
+
+    def _run(self):
+        while not self._stopped.is_set():
+            self._wakeup.wait(timeout=self.flush_interval)
+            self._wakeup.clear()
+            if self._stopped.is_set():
+                break
+            try:
+                self.flush()
+            except Exception:
+                logging.error("Unexpected error in score history flusher", exc_info=True)
+
+    def _get_collection(self):
+        if self.collection is None:
+            self.collection = self._prepare_collection()
+        return self.collection
+
+    def _prepare_collection(self):
+        """Create the time-series collection and the index used by ``trend``."""
+        db = self.connection.db
+        options = {"timeseries": {"timeField": "scored_at", "metaField": "user_id",
+                                  "granularity": settings.SCORE_HISTORY_GRANULARITY}}
+        if settings.SCORE_HISTORY_TTL_SECONDS > 0:
+            options["expireAfterSeconds"] = settings.SCORE_HISTORY_TTL_SECONDS
+        try:
+            db.create_collection(CollectionName.SCORE_HISTORY, **options)
+            logging.debug("Created score history time-series collection")
+        except CollectionInvalid:
+            logging.debug("Score history collection already exists")
+        collection = db[CollectionName.SCORE_HISTORY]
+        try:
+            collection.create_index([("comment_id", 1), ("scored_at", 1)])
+        except Exception:
+            logging.debug("Score history index creation skipped", exc_info=True)
+        return collection
+
+
+score_history = ScoreHistory()
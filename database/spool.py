@@ -0,0 +1,445 @@
+import fcntl
+import os
+import re
+import threading
+import time
+from bson import json_util
+from pymongo import DeleteOne, UpdateOne
+from pymongo.errors import BulkWriteError, ConnectionFailure, ExecutionTimeout, WTimeoutError
+from config import settings
+from configure_logging import get_logger
+from constants import CollectionName, OperationType
+from database.connection import mongo_connection
+from database.schema import comment_filter, set_fields
+from metrics import metrics
+
+logging = get_logger(__name__)
+
+# Errors meaning MongoDB is unreachable or overloaded, as opposed to a bad request
+MONGO_UNAVAILABLE = (ConnectionFailure, ExecutionTimeout, WTimeoutError)
+
+
+class CircuitBreaker:
+    """
+    Classic three-state circuit breaker.
+
+    ``closed``: calls go through and consecutive failures are counted.
+    ``open``: after ``failure_threshold`` consecutive failures calls are refused
+    for ``reset_timeout`` seconds.
+    ``half_open``: after the timeout a single probe call is let through; its
+    outcome closes or re-opens the breaker.
+    """
+
+    CLOSED = "closed"
+    OPEN = "open"
+    HALF_OPEN = "half_open"
+
+    def __init__(self, failure_threshold: int = None, reset_timeout: float = None, name: str = "mongodb"):
+        self.failure_threshold = failure_threshold or settings.MONGO_BREAKER_FAILURE_THRESHOLD
+        self.reset_timeout = reset_timeout or settings.MONGO_BREAKER_RESET_TIMEOUT
+        self.name = name
+        self._state = self.CLOSED
+        self._failures = 0
+        self._opened_at = 0.0
+        self._probing = False
+        self._lock = threading.Lock()
+
+    @property
+    def state(self) -> str:
+        with self._lock:
+            return self._state
+
+    def allow(self) -> bool:
+        """
+        Whether a call may go through. In half-open state only one probe is allowed at a time.
+        :return: bool
+        """
+        with self._lock:
+            if self._state == self.CLOSED:
+                return True
+            if self._state == self.OPEN and time.monotonic() - self._opened_at >= self.reset_timeout:
+                self._set_state(self.HALF_OPEN)
+            if self._state == self.HALF_OPEN and not self._probing:
+                self._probing = True
+                return True
+            return False
+
+    def record_success(self):
+        with self._lock:
+            self._failures = 0
+            self._probing = False
+            if self._state != self.CLOSED:
+                self._set_state(self.CLOSED)
+
+    def record_failure(self):
+        with self._lock:
+            self._failures += 1
+            self._probing = False
+            if self._state == self.HALF_OPEN or self._failures >= self.failure_threshold:
+                self._opened_at = time.monotonic()
+                if self._state != self.OPEN:
+                    self._set_state(self.OPEN)
+
+    def release_probe(self):
+        """
+        End a probe whose call failed for a reason that says nothing about availability
+        (a rejected write, a bad document): the state is unchanged and the next call probes again.
+        """
+        with self._lock:
+            self._probing = False
+
+    def _set_state(self, state: str):
+        logging.warning("Circuit breaker state changed", breaker=self.name, previous=self._state, state=state)
+        self._state = state
+        metrics.increment(f"breaker.{self.name}.{state}")
+
+
+class DiskSpool:
+    """
+    Append-only NDJSON spool of comment writes that could not reach MongoDB.
+
+    Every append is fsynced before it returns, so an acked message is never lost,
+    but concurrent appends share fsyncs (group commit): a writer whose line was
+    already covered by another thread's fsync returns without syncing again.
+    Entries are encoded with ``bson.json_util`` so dates survive the round trip.
+
+    Each process spools to its own file, ``<path>.<pid>``, so no process appends to a
+    file another one is rotating or removing, and each one's pending count covers only
+    what it spooled. A process holds an exclusive ``flock`` on ``<path>.<pid>.lock``
+    while it uses its file; the files of processes that are gone are adopted by the
+    next process to attach, ahead of anything it spools itself.
+    """
+
+    def __init__(self, path: str = None):
+        self.base_path = path or os.path.join(settings.SPOOL_DIR, settings.SPOOL_FILE)
+        self._lock = threading.Lock()
+        self._sync_lock = threading.Lock()
+        self._replay_lock = threading.Lock()
+        self._pid = None
+        self._path = None
+        self._lock_fh = None
+        self._fh = None
+        self._written = 0
+        self._synced = 0
+        self._pending = 0
+
+    @property
+    def path(self) -> str:
+        """Spool file of the current process."""
+        self._attach()
+        return self._path
+
+    @property
+    def replay_path(self) -> str:
+        return self.path + ".replay"
+
+    @property
+    def pending(self) -> int:
+        """Number of spooled entries not yet replayed."""
+        self._attach()
+        return self._pending
+
+    def append(self, entry: dict):
+        """
+        Durably append an entry to the spool.
+        :param entry: dict spooled write, see ``to_write_model``
+        """
+        line = json_util.dumps(entry) + "\n"
+        self._attach()
+        with self._lock:
+            fh = self._open()
+            fh.write(line)
+            fh.flush()
+            self._written += 1
+            sequence = self._written
+            self._pending += 1
+        self._sync(sequence)
+        metrics.increment("spool.appended")
+        metrics.set_gauge("spool.pending", self._pending)
+
+    def replay(self, apply, batch_size: int = None) -> int:
+        """
+        Drain spooled entries, oldest first, through ``apply``.
+
+        The live file is rotated aside before it is read, so appends continue while
+        a replay is running. If ``apply`` raises, the entries it had not yet
+        accepted are kept for the next attempt and the error propagates.
+        :param apply: callable taking a list of entries
+        :param batch_size: int entries per ``apply`` call
+        :return: int number of entries replayed
+        """
+        batch_size = batch_size or settings.SPOOL_REPLAY_BATCH_SIZE
+        replayed = 0
+        self._attach()
+        with self._replay_lock:
+            while True:
+                if not os.path.exists(self.replay_path):
+                    if not self._rotate():
+                        break
+                with open(self.replay_path, "r", encoding="utf-8") as fh:
+                    entries = [json_util.loads(line) for line in fh if line.strip()]
+                for start in range(0, len(entries), batch_size):
+                    try:
+                        apply(entries[start:start + batch_size])
+                    except Exception:
+                        self._rewrite_replay_file(entries[start:])
+                        raise
+                    done = len(entries[start:start + batch_size])
+                    replayed += done
+                    with self._lock:
+                        self._pending -= done
+                    metrics.increment("spool.replayed", done)
+                    metrics.set_gauge("spool.pending", self._pending)
+                os.remove(self.replay_path)
+        return replayed
+
+    def close(self):
+        """Close the spool file and release its lock; the next use attaches again."""
+        with self._lock:
+            if self._fh:
+                self._fh.close()
+                self._fh = None
+            if self._lock_fh and self._pid == os.getpid():
+                self._lock_fh.close()
+            self._lock_fh = None
+            self._pid = None
+
+    def _attach(self):
+        """
+        Bind the spool to the current process: lock its own file, adopt the files of
+        processes that are gone, and count what is pending. A child forked after the
+        spool was created attaches to a file of its own on first use.
+        """
+        pid = os.getpid()
+        if self._pid == pid:
+            return
+        with self._lock:
+            if self._pid == pid:
+                return
+            # Handles inherited across a fork belong to the parent: dropped, not closed or unlocked
+            self._fh = None
+            self._lock_fh = None
+            self._written = self._synced = 0
+            self._path = f"{self.base_path}.{pid}"
+            # Without a spool directory nothing was ever spooled: the first append creates it and locks
+            adopted = self._adopt_orphans() if os.path.isdir(os.path.dirname(self.base_path) or ".") else 0
+            self._pending = self._count_lines(self._path) + self._count_lines(self._path + ".replay")
+            self._pid = pid
+        if adopted:
+            logging.warning("Adopted spool files left by stopped processes", path=self._path, count=adopted)
+            metrics.increment("spool.adopted", adopted)
+        metrics.set_gauge("spool.pending", self._pending)
+
+    def _adopt_orphans(self) -> int:
+        """
+        Lock this process's spool file and move the entries of spool files whose process
+        is gone into it. Runs under a directory-wide lock, so two starting processes never
+        adopt the same file.
+        :return: int number of entries adopted
+        """
+        directory = os.path.dirname(self.base_path) or "."
+        prefix = os.path.basename(self.base_path)
+        own = os.path.basename(self._path)
+        adopted = 0
+        with open(self.base_path + ".adopt.lock", "a") as adopt_lock:
+            fcntl.flock(adopt_lock, fcntl.LOCK_EX)
+            # Taken under the directory lock, so no process ever sees this lock file unheld
+            self._lock_fh = open(self._path + ".lock", "a")
+            try:
+                fcntl.flock(self._lock_fh, fcntl.LOCK_EX | fcntl.LOCK_NB)
+            except BlockingIOError:
+                # Only another spool on the same path in this very process can hold it
+                logging.warning("Spool file already locked in this process", path=self._path)
+            # The single shared file of earlier releases has no lock of its own
+            orphans = [(self.base_path, None)]
+            for name in sorted(os.listdir(directory)):
+                if re.fullmatch(re.escape(prefix) + r"\.\d+\.lock", name) and name != own + ".lock":
+                    orphans.append((os.path.join(directory, name[:-len(".lock")]), os.path.join(directory, name)))
+            for path, lock_path in orphans:
+                lock_fh = None
+                if lock_path is not None:
+                    lock_fh = open(lock_path, "a")
+                    try:
+                        fcntl.flock(lock_fh, fcntl.LOCK_EX | fcntl.LOCK_NB)
+                    except BlockingIOError:
+                        # Its process is still running and replays the file itself
+                        lock_fh.close()
+                        continue
+                try:
+                    adopted += self._adopt(path)
+                finally:
+                    if lock_fh is not None:
+                        os.remove(lock_path)
+                        lock_fh.close()
+        return adopted
+
+    def _adopt(self, path: str) -> int:
+        # The rotated-aside file is older than the live one
+        sources = [path + ".replay", path]
+        lines = []
+        for source in sources:
+            if os.path.exists(source):
+                with open(source, "r", encoding="utf-8") as fh:
+                    lines.extend(line for line in fh if line.strip())
+        if lines:
+            with open(self._path, "a", encoding="utf-8") as fh:
+                fh.writelines(lines)
+                fh.flush()
+                os.fsync(fh.fileno())
+        for source in sources + [path + ".replay.tmp"]:
+            if os.path.exists(source):
+                os.remove(source)
+        return len(lines)
+
+    def _open(self):
+        if self._fh is None:
+            if self._lock_fh is None:
+                directory = os.path.dirname(self.base_path)
+                if directory:
+                    os.makedirs(directory, exist_ok=True)
+                self._pending += self._adopt_orphans()
+            self._fh = open(self._path, "a", encoding="utf-8")
+        return self._fh
+
+    def _sync(self, sequence: int):
+        with self._sync_lock:
+            if self._synced >= sequence:
+                return
+            with self._lock:
+                target = self._written
+                fd = self._fh.fileno()
+            os.fsync(fd)
+            self._synced = target
+
+    def _rotate(self) -> bool:
+        """Move the live spool file aside for replay. Returns False when there is nothing to replay."""
+        with self._sync_lock, self._lock:
+            if not os.path.exists(self._path) or os.path.getsize(self._path) == 0:
+                return False
+            if self._fh:
+                os.fsync(self._fh.fileno())
+                self._fh.close()
+                self._fh = None
+                self._synced = self._written
+            os.replace(self._path, self._path + ".replay")
+            return True
+
+    def _rewrite_replay_file(self, entries):
+        tmp_path = self.replay_path + ".tmp"
+        with open(tmp_path, "w", encoding="utf-8") as fh:
+            for entry in entries:
+                fh.write(json_util.dumps(entry) + "\n")
+            fh.flush()
+            os.fsync(fh.fileno())
+        os.replace(tmp_path, self.replay_path)
+
+    @staticmethod
+    def _count_lines(path: str) -> int:
+        if not os.path.exists(path):
+            return 0
+        with open(path, "r", encoding="utf-8") as fh:
+            return sum(1 for line in fh if line.strip())
+
+
+def to_write_model(entry: dict):
+    """
+    Build the idempotent bulk write operation for a spooled entry. Creates become
+    upserts so replaying an entry twice (e.g. after a crash mid-replay) is harmless.
+    :param entry: dict with ``op`` and ``id``, plus ``document`` for creates or ``score`` for updates
+    :return: pymongo write model
+    """
+    op = entry["op"]
+    if op == OperationType.CREATE:
+        return UpdateOne(comment_filter(entry["id"]), {"$setOnInsert": entry["document"]}, upsert=True)
+    if op == OperationType.UPDATE:
+        return UpdateOne(comment_filter(entry["id"]), set_fields({"score": entry["score"]}))
+    if op == OperationType.DELETE:
+        return DeleteOne(comment_filter(entry["id"]))
+    raise ValueError(f"Unknown spooled operation: {op}")
+
+
+class SpoolReplayer:
+    """
+    Background thread that replays the spool into MongoDB with ordered ``bulk_write``
+    batches once the circuit breaker lets calls through again. Ordered writes keep a
+    comment's create, update and delete in spool order.
+    """
+
+    def __init__(self, spool: DiskSpool, breaker: CircuitBreaker, connection=None, interval: float = None):
+        self.spool = spool
+        self.breaker = breaker
+        self.connection = connection or mongo_connection
+        self.interval = interval or settings.SPOOL_REPLAY_INTERVAL
+        self._lock = threading.Lock()
+        self._thread = None
+        self._pid = None
+
+    def ensure_started(self):
+        # A forked child does not inherit the parent's thread: it starts its own
+        if self._pid == os.getpid():
+            return
+        with self._lock:
+            if self._pid == os.getpid():
+                return
+            self._thread = threading.Thread(target=self._run, name="SpoolReplayer", daemon=True)
+            self._thread.start()
+            self._pid = os.getpid()
+
+    def replay_once(self) -> int:
+        """
+        Replay the spool if the breaker allows it.
+        :return: int number of entries replayed
+        """
+        if not self.spool.pending or not self.breaker.allow():
+            return 0
+        try:
+            replayed = self.spool.replay(self._apply)
+        except MONGO_UNAVAILABLE:
+            self.breaker.record_failure()
+            logging.warning("Spool replay interrupted, MongoDB still unavailable", pending=self.spool.pending)
+            return 0
+        except Exception:
+            self.breaker.record_failure()
+            logging.error("Spool replay failed", pending=self.spool.pending, exc_info=True)
+            return 0
+        self.breaker.record_success()
+        if replayed:
+            logging.info("Spool replayed into MongoDB", count=replayed)
+        return replayed
+
+    def _run(self):
+        while True:
+            time.sleep(self.interval)
+            self.replay_once()
+
+    def _apply(self, entries):
+        collection = self.connection.get_collection(CollectionName.COMMENTS)
+        requests = [to_write_model(entry) for entry in entries]
+        start = 0
+        while start < len(requests):
+            try:
+                collection.bulk_write(requests[start:], ordered=True)
+                return
+            except BulkWriteError as e:
+                # An ordered bulk stops at the first rejected write: skip it and resume after it
+                error = e.details["writeErrors"][0]
+                index = start + error["index"]
+                logging.error("Spooled write rejected by MongoDB, dropping it", entry=entries[index],
+                              error=error.get("errmsg"))
+                metrics.increment("spool.rejected")
+                start = index + 1
+
+
+mongo_breaker = CircuitBreaker()
+comment_spool = DiskSpool()
+spool_replayer = SpoolReplayer(comment_spool, mongo_breaker)
+
+
+def resume_spool():
+    """
+    Attach the spool to the calling process and, when it holds entries left by a
+    previous run, replay them as soon as MongoDB is reachable. Called once by each
+    consumer process rather than at import, so the parent never adopts spool files.
+    """
+    if comment_spool.pending:
+        spool_replayer.ensure_started()
@@ -0,0 +1,276 @@
+"""
+Stream comments and their scores to NDJSON, CSV or Parquet.
+
+Filters run server side and only the requested fields are fetched. Documents
+are read in ``_id``-range batches and written batch by batch (one Parquet row
+group per batch), so memory use does not depend on the size of the result.
+With ``--partitions N`` the ``_id`` range is split into N parts exported in
+parallel processes, each to its own file in the output directory.
+
+Usage:
+    python export.py OUTPUT [--format ndjson|csv|parquet] [--fields id,user_id,score,created_at]
+                     [--since ISO] [--until ISO] [--min-score X] [--max-score X]
+                     [--users u1,u2 | --users @users.txt] [--chunk-size N] [--partitions N]
+"""
+import argparse
+import csv
+import json
+import multiprocessing
+import os
+from concurrent.futures import ProcessPoolExecutor
+from datetime import datetime, UTC
+from typing import Dict, Iterable, List, Optional, Tuple
+from bson import ObjectId
+from config import settings
+from configure_logging import configure_logging, get_logger
+from constants import CollectionName
+from database.connection import mongo_connection
+from database.cursor import iter_batches
+from database.schema import storage_projection, storage_query
+from models import expand_document
+
+try:
+    import pyarrow
+    import pyarrow.parquet
+except ImportError:
+    pyarrow = None
+
+logging = get_logger(__name__)
+
+DEFAULT_FIELDS = ("id", "user_id", "score", "created_at")
+EXTENSIONS = {"ndjson": "ndjson", "csv": "csv", "parquet": "parquet"}
+
+
+def build_query(since: datetime = None, until: datetime = None, min_score: float = None,
+                max_score: float = None, users: Iterable[str] = None) -> Dict:
+    """
+    Build the server-side filter for an export.
+    :param since: datetime lower bound on ``created_at`` (inclusive)
+    :param until: datetime upper bound on ``created_at`` (exclusive)
+    :param min_score: float lower bound on ``score`` (inclusive)
+    :param max_score: float upper bound on ``score`` (inclusive)
+    :param users: iterable of user IDs
+    :return: dict MongoDB query
+    """
+    query = {}
+    if since or until:
+        query["created_at"] = {key: value for key, value in (("$gte", since), ("$lt", until)) if value}
+    if min_score is not None or max_score is not None:
+        query["score"] = {key: value for key, value in (("$gte", min_score), ("$lte", max_score))
+                          if value is not None}
+    if users:
+        query["user_id"] = {"$in": list(users)}
+    return query
+
+
+def to_row(doc: Dict, fields: Iterable[str]) -> Dict:
+    doc = expand_document(doc)
+    row = {}
+    for field in fields:
+        value = doc.get(field)
+        row[field] = str(value) if isinstance(value, ObjectId) else value
+    return row
+
+
+class NdjsonWriter:
+
+    def __init__(self, path: str, fields: List[str]):
+        self.fields = fields
+        self._fh = open(path, "w", encoding="utf-8")
+
+    def write_batch(self, docs: List[Dict]):
+        self._fh.writelines(json.dumps(to_row(doc, self.fields), default=_isoformat) + "\n" for doc in docs)
+
+    def close(self):
+        self._fh.close()
+
+
+class CsvWriter:
+
+    def __init__(self, path: str, fields: List[str]):
+        self.fields = fields
+        self._fh = open(path, "w", encoding="utf-8", newline="")
+        self._writer = csv.DictWriter(self._fh, fieldnames=fields)
+        self._writer.writeheader()
+
+    def write_batch(self, docs: List[Dict]):
+        self._writer.writerows({field: _isoformat(value) if isinstance(value, datetime) else value
+                                for field, value in to_row(doc, self.fields).items()} for doc in docs)
+
+    def close(self):
+        self._fh.close()
+
+
+# Parquet column types of the comment fields; any other field is exported as a string
+FLOAT_FIELDS = ("score",)
+DATETIME_FIELDS = ("timestamp", "created_at", "updated_at", "deleted_at")
+
+
+class ParquetWriter:
+    """
+    Writes each batch as one row group, with a schema declared up front from the
+    exported fields, so a field that is null throughout the first batch, or stored
+    as a string by legacy documents (``timestamp``), keeps its type in every row group.
+    """
+
+    def __init__(self, path: str, fields: List[str]):
+        if pyarrow is None:
+            raise RuntimeError("Parquet export requires pyarrow: pip install pyarrow")
+        self.path = path
+        self.fields = fields
+        self._schema = pyarrow.schema([(field, self._column_type(field)) for field in fields])
+        self._writer = pyarrow.parquet.ParquetWriter(self.path, self._schema)
+
+    @staticmethod
+    def _column_type(field: str):
+        if field in FLOAT_FIELDS:
+            return pyarrow.float64()
+        if field in DATETIME_FIELDS:
+            return pyarrow.timestamp("us", tz="UTC")
+        return pyarrow.string()
+
+    def _value(self, field: str, value):
+        if value is None:
+            return None
+        if field in FLOAT_FIELDS:
+            return float(value)
+        if field in DATETIME_FIELDS:
+            # Legacy documents store the message timestamp as an ISO string; naive values are UTC
+            if isinstance(value, str):
+                try:
+                    value = datetime.fromisoformat(value)
+                except ValueError:
+                    return None
+            return value if value.tzinfo else value.replace(tzinfo=UTC)
+        return value if isinstance(value, str) else _isoformat(value)
+
+    def write_batch(self, docs: List[Dict]):
+        rows = [{field: self._value(field, value) for field, value in to_row(doc, self.fields).items()}
+                for doc in docs]
+        self._writer.write_table(pyarrow.Table.from_pylist(rows, schema=self._schema))
+
+    def close(self):
+        # Nothing matched: the file is still valid and empty, with the declared schema
+        self._writer.close()
+
+
+WRITERS = {"ndjson": NdjsonWriter, "csv": CsvWriter, "parquet": ParquetWriter}
+
+
+def _isoformat(value):
+    if isinstance(value, datetime):
+        return value.isoformat()
+    return str(value)
+
+
+def export_range(path: str, fmt: str, query: Dict, fields: List[str], chunk_size: int,
+                 start_after=None, end_at=None, collection=None) -> int:
+    """
+    Export one ``_id`` range to a file.
+    :param path: str output file
+    :param fmt: str "ndjson", "csv" or "parquet"
+    :param query: dict server-side filter
+    :param fields: list of fields to export
+    :param chunk_size: int documents per batch (and per Parquet row group)
+    :param start_after: ``_id`` lower bound (exclusive)
+    :param end_at: ``_id`` upper bound (inclusive)
+    :return: int number of exported documents
+    """
+    collection = collection if collection is not None else mongo_connection.get_collection(CollectionName.COMMENTS)
+    projection = storage_projection(fields)
+    projection["_id"] = 1
+    writer = WRITERS[fmt](path, fields)
+    exported = 0
+    try:
+        for batch in iter_batches(collection, chunk_size, query=storage_query(query), projection=projection,
+                                  start_after=start_after, end_at=end_at):
+            writer.write_batch(batch)
+            exported += len(batch)
+    finally:
+        writer.close()
+    logging.info("Exported range", path=path, documents=exported)
+    return exported
+
+
+def partition_bounds(collection, query: Dict, partitions: int,
+                     samples_per_partition: int = 32) -> List[Tuple[Optional[object], Optional[object]]]:
+    """
+    Split the matching ``_id`` range into roughly equal parts using a random sample of IDs.
+    :return: list of (start_after, end_at) pairs covering the whole range
+    """
+    if partitions <= 1:
+        return [(None, None)]
+    sampled = collection.aggregate([
+        {"$match": storage_query(query)},
+        {"$sample": {"size": partitions * samples_per_partition}},
+        {"$project": {"_id": 1}},
+    ])
+    ids = sorted(doc["_id"] for doc in sampled)
+    if not ids:
+        return [(None, None)]
+    cuts = sorted(set(ids[len(ids) * index // partitions] for index in range(1, partitions)))
+    bounds = [None] + cuts + [None]
+    return list(zip(bounds[:-1], bounds[1:]))
+
+
+def export(output: str, fmt: str, query: Dict, fields: List[str], chunk_size: int = None,
+           partitions: int = 1) -> int:
+    """
+    Export matching comments to ``output``, a file, or a directory of part files when partitioned.
+    :return: int number of exported documents
+    """
+    chunk_size = chunk_size or settings.EXPORT_CHUNK_SIZE
+    if partitions <= 1:
+        return export_range(output, fmt, query, fields, chunk_size)
+    collection = mongo_connection.get_collection(CollectionName.COMMENTS)
+    bounds = partition_bounds(collection, query, partitions)
+    os.makedirs(output, exist_ok=True)
+    # Spawned workers open their own MongoDB connections instead of inheriting the parent's
+    context = multiprocessing.get_context("spawn")
+    with ProcessPoolExecutor(max_workers=len(bounds), mp_context=context) as executor:
+        futures = [
+            executor.submit(export_range, os.path.join(output, f"part-{index:05d}.{EXTENSIONS[fmt]}"), fmt,
+                            query, fields, chunk_size, start_after, end_at)
+            for index, (start_after, end_at) in enumerate(bounds)
+        ]
+        return sum(future.result() for future in futures)
+
+
+def _parse_datetime(value: str) -> datetime:
+    parsed = datetime.fromisoformat(value)
+    return parsed if parsed.tzinfo else parsed.replace(tzinfo=UTC)
+
+
+def _parse_users(value: str) -> List[str]:
+    if value.startswith("@"):
+        with open(value[1:], "r", encoding="utf-8") as fh:
+            return [line.strip() for line in fh if line.strip()]
+    return [user for user in value.split(",") if user]
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("output", help="output file, or directory when --partitions > 1")
+    parser.add_argument("--format", choices=sorted(WRITERS), default="ndjson")
+    parser.add_argument("--fields", default=",".join(DEFAULT_FIELDS), help="comma separated fields to export")
+    parser.add_argument("--since", type=_parse_datetime, help="created_at lower bound (inclusive)")
+    parser.add_argument("--until", type=_parse_datetime, help="created_at upper bound (exclusive)")
+    parser.add_argument("--min-score", type=float)
+    parser.add_argument("--max-score", type=float)
+    parser.add_argument("--users", type=_parse_users, help="comma separated user IDs, or @file with one per line")
+    parser.add_argument("--chunk-size", type=int, default=settings.EXPORT_CHUNK_SIZE,
+                        help="documents per batch and per Parquet row group")
+    parser.add_argument("--partitions", type=int, default=1, help="parallel _id range partitions")
+    args = parser.parse_args()
+
+    if settings.LOGGING_PATH:
+        os.makedirs(settings.LOGGING_PATH, exist_ok=True)
+    configure_logging(settings)
+    query = build_query(args.since, args.until, args.min_score, args.max_score, args.users)
+    fields = [field for field in args.fields.split(",") if field]
+    exported = export(args.output, args.format, query, fields, args.chunk_size, args.partitions)
+    logging.info("Export finished", output=args.output, documents=exported)
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,108 @@
+"""
+Health, readiness and lag endpoints for orchestrators and autoscalers.
+
+Served from a small threaded HTTP server on a local port:
+
+- ``/healthz``: liveness, 200 while the process is serving requests
+- ``/readyz``: readiness, 200 when every registered check passes, 503 otherwise
+- ``/lag``: JSON queue depth and consumer lag summary from the queue probe
+- ``/metrics``: JSON snapshot of the in-process metrics registry
+"""
+import json
+import threading
+from http import HTTPStatus
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from typing import Callable, Dict
+from config import settings
+from configure_logging import get_logger
+from metrics import metrics
+
+logging = get_logger(__name__)
+
+
+class HealthServer:
+    """Threaded HTTP server exposing health, readiness, lag and metrics as JSON."""
+
+    def __init__(self, probe=None, host: str = None, port: int = None):
+        self.probe = probe
+        self.host = host if host is not None else settings.HEALTH_HOST
+        self.port = port if port is not None else settings.HEALTH_PORT
+        self.checks: Dict[str, Callable[[], bool]] = {}
+        self._server = None
+        self._thread = None
+        if probe is not None:
+            self.add_check("queue_probe", probe.is_fresh)
+
+    def add_check(self, name: str, check: Callable[[], bool]):
+        """
+        Register a readiness check.
+        :param name: str name reported by ``/readyz``
+        :param check: callable returning True when ready
+        """
+        self.checks[name] = check
+
+    def readiness(self) -> Dict[str, bool]:
+        results = {}
+        for name, check in self.checks.items():
+            try:
+                results[name] = bool(check())
+            except Exception:
+                logging.warning("Readiness check failed", check=name, exc_info=True)
+                results[name] = False
+        return results
+
+    def lag(self) -> Dict:
+        if self.probe is None or not self.probe.last_sample:
+            return {"available": False}
+        return {"available": True, "fresh": self.probe.is_fresh(), **self.probe.last_sample}
+
+    def start(self):
+        """Start serving in a daemon thread. Returns the bound port."""
+        self._server = ThreadingHTTPServer((self.host, self.port), self._handler())
+        self._server.daemon_threads = True
+        self._thread = threading.Thread(target=self._server.serve_forever, name="HealthServer", daemon=True)
+        self._thread.start()
+        self.port = self._server.server_address[1]
+        logging.info("Health server listening", host=self.host, port=self.port)
+        return self.port
+
+    def stop(self):
+        if self._server:
+            self._server.shutdown()
+            self._server.server_close()
+            self._server = None
+
+    def _handler(self):
+        server = self
+
+        class Handler(BaseHTTPRequestHandler):
+
+            def do_GET(self):
+                path = self.path.split("?", 1)[0]
+                if path == "/healthz":
+                    self._reply(HTTPStatus.OK, {"status": "ok"})
+                elif path == "/readyz":
+                    checks = server.readiness()
+                    ready = all(checks.values())
+                    self._reply(HTTPStatus.OK if ready else HTTPStatus.SERVICE_UNAVAILABLE,
+                                {"status": "ready" if ready else "not ready", "checks": checks})
+                elif path == "/lag":
+                    self._reply(HTTPStatus.OK, server.lag())
+                elif path == "/metrics":
+                    self._reply(HTTPStatus.OK, metrics.snapshot())
+                else:
+                    self._reply(HTTPStatus.NOT_FOUND, {"error": "not found"})
+
+            def _reply(self, status: HTTPStatus, payload: Dict):
+                body = json.dumps(payload, default=str).encode("utf-8")
+                self.send_response(status)
+                self.send_header("Content-Type", "application/json")
+                self.send_header("Content-Length", str(len(body)))
+                self.end_headers()
+                self.wfile.write(body)
+
+            def log_message(self, format, *args):
+                # Scrapes are frequent; keep them out of the application log
+                pass
+
+        return Handler
@@ -7,10 +7,18 @@ import string
 from dotenv import load_dotenv
 from rabbitmq.consumers.message_consumer import BasicMessageConsumer
 from rabbitmq.publishers.message_publisher import BasicMessagePublisher
+import signal
 import threading
 from multiprocessing import Process, Event
 from configure_logging import get_logger
 from constants import ExchangeType, QueueName
+from scoring.factory import warm_up_scorer
+from rabbitmq.probe import QueueProbe
+from database.spool import mongo_breaker, resume_spool, CircuitBreaker
+from health import HealthServer
+from scoring_server import ScoringServer
+from autoscaler import Autoscaler
+from runtime_config import runtime_config
 
 logging = get_logger(__name__)
 basedir = os.path.abspath(os.path.dirname(__file__))
@@ -23,35 +31,87 @@ if settings.LOGGING_PATH and not os.path.exists(settings.LOGGING_PATH):
 configure_logging(settings)
 
 
-def start_rabbitmq_consumer():
-    consumer = BasicMessageConsumer()
-    # Declare exchange and queue based on settings
-    consumer.declare_exchange(
-        exchange_name=settings.RABBITMQ_CONSUMER_EXCHANGE,
-        exchange_type=ExchangeType.TOPIC
-    )
+def consumer_shard_index(worker_index: int = 0) -> int:
+    """Shard a consumer is pinned to: RABBITMQ_SHARD_INDEX if set, else its worker index."""
+    if settings.RABBITMQ_SHARD_INDEX >= 0:
+        return settings.RABBITMQ_SHARD_INDEX
+    return worker_index % settings.RABBITMQ_SHARD_COUNT
 
-    consumer.bind_queue(
-        queue_name=QueueName.INCOMING_TEXTS,
-        exchange_name=settings.RABBITMQ_CONSUMER_EXCHANGE,
-        routing_key=settings.RABBITMQ_CONSUMER_ROUTING_KEY
-    )
 
-    consumer.start_consuming(queue_name=QueueName.INCOMING_TEXTS)
+def install_stop_handlers(stop_event):
+    """Turn SIGTERM and SIGINT into a graceful stop request by setting the shared stop event."""
+    def request_stop(signum, frame):
+        logging.info("Received stop signal, draining", signal=signal.Signals(signum).name)
+        stop_event.set()
 
-    consumer.close()
+    signal.signal(signal.SIGTERM, request_stop)
+    signal.signal(signal.SIGINT, request_stop)
+
+
+def start_rabbitmq_consumer(worker_index: int = 0, stop_event=None, consumer=None):
+    # Load and fault in scoring artifacts before taking the first delivery
+    warm_up_scorer()
+    consumer = consumer or BasicMessageConsumer()
+    if settings.RABBITMQ_SHARD_COUNT:
+        shard_queues = consumer.bind_shard_queues(
+            exchange_name=settings.RABBITMQ_SHARD_EXCHANGE,
+            shard_count=settings.RABBITMQ_SHARD_COUNT
+        )
+        queue_name = shard_queues[consumer_shard_index(worker_index)]
+        logging.info("Consumer pinned to shard queue", queue=queue_name)
+    else:
+        # Declare exchange and queue based on settings
+        consumer.declare_exchange(
+            exchange_name=settings.RABBITMQ_CONSUMER_EXCHANGE,
+            exchange_type=ExchangeType.TOPIC
+        )
+
+        consumer.bind_queue(
+            queue_name=QueueName.INCOMING_TEXTS,
+            exchange_name=settings.RABBITMQ_CONSUMER_EXCHANGE,
+            routing_key=settings.RABBITMQ_CONSUMER_ROUTING_KEY
+        )
+        queue_name = QueueName.INCOMING_TEXTS
+
+    # Returns once the stop event is set and in-flight deliveries are drained
+    consumer.start_consuming(queue_name=queue_name, stop_event=stop_event)
+
+def start_queue_probe(stop_event=None):
+    """Start a queue probe sampling in a background thread."""
+    probe = QueueProbe()
+    threading.Thread(target=probe.run, args=(stop_event,), name="QueueProbe", daemon=True).start()
+    return probe
+
+def start_health_server(probe):
+    """Start the health/readiness/lag HTTP server in a background thread."""
+    server = HealthServer(probe=probe)
+    server.add_check("mongodb", lambda: mongo_breaker.state != CircuitBreaker.OPEN)
+    server.start()
+    return server
+
+def start_scoring_server():
+    """Start the micro-batched HTTP scoring endpoint, sharing this process's scorer and score cache."""
+    server = ScoringServer()
+    server.start()
+    return server
 
 def start_rabbitmq_publisher():
      publisher = BasicMessagePublisher()
-     publisher.declare_exchange(
-        exchange_name=settings.RABBITMQ_CONSUMER_EXCHANGE,
-        exchange_type=ExchangeType.TOPIC
-     )
-     publisher.bind_queue(
-        queue_name=QueueName.INCOMING_TEXTS,
-        exchange_name=settings.RABBITMQ_CONSUMER_EXCHANGE,
-        routing_key=settings.RABBITMQ_CONSUMER_ROUTING_KEY
-     )
+     if settings.RABBITMQ_SHARD_COUNT:
+        publisher.bind_shard_queues(
+            exchange_name=settings.RABBITMQ_SHARD_EXCHANGE,
+            shard_count=settings.RABBITMQ_SHARD_COUNT
+        )
+     else:
+        publisher.declare_exchange(
+            exchange_name=settings.RABBITMQ_CONSUMER_EXCHANGE,
+            exchange_type=ExchangeType.TOPIC
+        )
+        publisher.bind_queue(
+            queue_name=QueueName.INCOMING_TEXTS,
+            exchange_name=settings.RABBITMQ_CONSUMER_EXCHANGE,
+            routing_key=settings.RABBITMQ_CONSUMER_ROUTING_KEY
+        )
 
      # Publish a number of sample messages
      sample_messages_count = settings.SAMPLE_MESSAGES_COUNT
@@ -66,6 +126,13 @@ def start_rabbitmq_publisher():
          } for i in range(sample_messages_count)
     ]
      for msg in messages:
+        if settings.RABBITMQ_SHARD_COUNT:
+            publisher.publish_sharded(
+                exchange_name=settings.RABBITMQ_SHARD_EXCHANGE,
+                body=msg,
+                shard_count=settings.RABBITMQ_SHARD_COUNT
+            )
+            continue
         routing_key = f"{settings.RABBITMQ_CONSUMER_ROUTING_KEY}.{msg.get('id')}.{msg.get('type')}"
         publisher.publish(
             exchange_name=settings.RABBITMQ_CONSUMER_EXCHANGE,
@@ -75,9 +142,25 @@ def start_rabbitmq_publisher():
 
      publisher.close()
 
-def run_consumer(event, *args, **kwargs):
-
-    logging.info("Starting RabbitMQ Consumer Process")
+def run_consumer(event, worker_index=0, *args, **kwargs):
+
+    logging.info("Starting RabbitMQ Consumer Process", worker_index=worker_index)
+    install_stop_handlers(event)
+    # Runtime-tunable settings are re-read when the override file changes or on SIGHUP
+    signal.signal(signal.SIGHUP, lambda signum, frame: runtime_config.request_reload())
+    runtime_config.start()
+    resume_spool()
+    probe = None
+    if settings.AUTOSCALE_ENABLED or (settings.HEALTH_ENABLED and worker_index == 0):
+        probe = start_queue_probe(event)
+    if settings.HEALTH_ENABLED and worker_index == 0:
+        # One health server per pod, in the first consumer process so /metrics shows its workers
+        start_health_server(probe)
+    if settings.SCORING_HTTP_ENABLED and worker_index == 0:
+        start_scoring_server()
+    if settings.AUTOSCALE_ENABLED:
+        run_autoscaled_consumers(event, worker_index, probe)
+        return
     consumers = [
         start_rabbitmq_consumer
     ]
@@ -85,10 +168,29 @@ def run_consumer(event, *args, **kwargs):
     threads = []
 
     for consumer in consumers:
-        thread = threading.Thread(target=consumer)
+        thread = threading.Thread(target=consumer, args=(worker_index, event))
+        thread.start()
+        threads.append(thread)
+
+    for thread in threads:
+        thread.join()
+
+def run_autoscaled_consumers(event, worker_index, probe):
+    """Run consumer threads whose number follows the backlog, between the autoscaler's bounds."""
+    threads = []
+
+    def start_worker():
+        consumer = BasicMessageConsumer()
+        thread = threading.Thread(target=start_rabbitmq_consumer, args=(worker_index, event, consumer))
         thread.start()
         threads.append(thread)
+        return consumer
 
+    def stop_worker(consumer):
+        # Drains in-flight deliveries before the thread exits
+        consumer.request_stop()
+
+    Autoscaler(start_worker, stop_worker, probe=probe).run(event)
     for thread in threads:
         thread.join()
 
@@ -111,16 +213,34 @@ def run_publisher(event, *args, **kwargs):
 
 
 if __name__ == '__main__':
-    started_event = Event()
+    # Shared stop event: set on SIGTERM/SIGINT so every consumer process drains before exiting
+    stop_event = Event()
+    install_stop_handlers(stop_event)
+    # Children inherit SIGHUP ignored, so a reload cannot kill a process that has no handler:
+    # the publisher never installs one, and a consumer only does once run_consumer starts
+    signal.signal(signal.SIGHUP, signal.SIG_IGN)
     process_list = []
+    consumer_processes = []
     if settings.RABBITMQ_START_CONSUMING:
-        process_list.append(Process(target=run_consumer, args=(started_event,), name="RabbitMQ Consumer Process"))
+        settings.validate_consumer_layout()
+        for index in range(settings.CONSUMER_PROCESSES):
+            consumer_processes.append(Process(target=run_consumer, args=(stop_event, index),
+                                              name=f"RabbitMQ Consumer Process {index + 1}"))
+        process_list.extend(consumer_processes)
     if settings.PUBLISH_SAMPLE_MESSAGES:
-        process_list.append(Process(target=run_publisher, args=(started_event,), name="RabbitMQ Publisher Process"))
+        process_list.append(Process(target=run_publisher, args=(stop_event,), name="RabbitMQ Publisher Process"))
 
     for proc in process_list:
         proc.start()
         print(f"Process name: {proc.name}, PID: {proc.pid}")
 
+    def forward_reload(signum, frame):
+        # Each consumer process reloads its own settings
+        for proc in consumer_processes:
+            if proc.is_alive():
+                os.kill(proc.pid, signal.SIGHUP)
+
+    signal.signal(signal.SIGHUP, forward_reload)
+
     for proc in process_list:
         proc.join()
\ No newline at end of file
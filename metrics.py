@@ -0,0 +1,79 @@
+"""
+Lightweight in-process metrics registry.
+Counters, gauges and timing summaries are kept in memory and exposed as a
+JSON-friendly snapshot for logs and the health endpoint.
+"""
+import threading
+import time
+from contextlib import contextmanager
+from typing import Dict, Any
+
+
+class MetricsRegistry:
+    """Thread-safe registry of counters, gauges and timing summaries."""
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self._counters: Dict[str, float] = {}
+        self._gauges: Dict[str, float] = {}
+        self._timings: Dict[str, Dict[str, float]] = {}
+
+    def increment(self, name: str, value: float = 1):
+        with self._lock:
+            self._counters[name] = self._counters.get(name, 0) + value
+
+    def set_gauge(self, name: str, value: float):
+        with self._lock:
+            self._gauges[name] = value
+
+    def observe(self, name: str, seconds: float):
+        """
+        Record a duration in the timing summary ``name``.
+        :param name: str metric name
+        :param seconds: float duration in seconds
+        """
+        with self._lock:
+            timing = self._timings.setdefault(name, {"count": 0, "total": 0.0, "max": 0.0})
+            timing["count"] += 1
+            timing["total"] += seconds
+            timing["max"] = max(timing["max"], seconds)
+
+    @contextmanager
+    def timer(self, name: str):
+        start = time.perf_counter()
+        try:
+            yield
+        finally:
+            self.observe(name, time.perf_counter() - start)
+
+    def counter(self, name: str) -> float:
+        with self._lock:
+            return self._counters.get(name, 0)
+
+    def gauge(self, name: str, default: float = None) -> float:
+        with self._lock:
+            return self._gauges.get(name, default)
+
+    def timing(self, name: str) -> Dict[str, float]:
+        with self._lock:
+            timing = dict(self._timings.get(name, {"count": 0, "total": 0.0, "max": 0.0}))
+        timing["mean"] = timing["total"] / timing["count"] if timing["count"] else 0.0
+        return timing
+
+    def snapshot(self) -> Dict[str, Any]:
+        with self._lock:
+            timings = {name: dict(values) for name, values in self._timings.items()}
+            snapshot = {"counters": dict(self._counters), "gauges": dict(self._gauges)}
+        for values in timings.values():
+            values["mean"] = values["total"] / values["count"] if values["count"] else 0.0
+        snapshot["timings"] = timings
+        return snapshot
+
+    def reset(self):
+        with self._lock:
+            self._counters.clear()
+            self._gauges.clear()
+            self._timings.clear()
+
+
+metrics = MetricsRegistry()
@@ -0,0 +1,38 @@
+"""
+Convert comments stored in the legacy verbose schema to the compact schema.
+
+Runs online next to the consumers: legacy documents are converted in batches,
+and a document updated while its batch is in flight is skipped rather than
+overwritten (run again to pick it up). Once a run reports nothing migrated and
+nothing skipped, set ``COMMENT_LEGACY_READS=False``.
+
+Usage:
+    python migrate_schema.py [--batch-size N] [--rate DOCS_PER_SEC]
+"""
+import argparse
+import os
+from config import settings
+from configure_logging import configure_logging, get_logger
+from constants import CollectionName
+from database.connection import mongo_connection
+from database.schema import SchemaMigrator
+
+logging = get_logger(__name__)
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--batch-size", type=int, default=settings.SCHEMA_MIGRATION_BATCH_SIZE)
+    parser.add_argument("--rate", type=float, default=settings.SCHEMA_MIGRATION_RATE_LIMIT,
+                        help="maximum documents per second, 0 for unlimited")
+    args = parser.parse_args()
+
+    if settings.LOGGING_PATH:
+        os.makedirs(settings.LOGGING_PATH, exist_ok=True)
+    configure_logging(settings)
+    collection = mongo_connection.get_collection(CollectionName.COMMENTS)
+    SchemaMigrator(collection, batch_size=args.batch_size, rate=args.rate).run()
+
+
+if __name__ == '__main__':
+    main()
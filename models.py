@@ -1,7 +1,66 @@
 from pydantic import BaseModel, Field
 from datetime import datetime, UTC
+from typing import Dict
 import uuid
 
+# Storage schema of comment documents. Version 1 (no version field) spelled every
+# field out and stored ``timestamp`` as a string and unset dates as nulls;
+# version 2 uses the short names below, native dates, and omits nulls.
+SCHEMA_VERSION = 2
+FIELD_NAMES = {
+    "id": "i",
+    "user_id": "u",
+    "content": "c",
+    "timestamp": "t",
+    "score": "s",
+    "created_at": "ca",
+    "updated_at": "ua",
+    "deleted_at": "da",
+    "rescored_at": "ra",
+    "schema_version": "v",
+}
+MODEL_NAMES = {short: name for name, short in FIELD_NAMES.items()}
+
+
+def _parse_timestamp(value):
+    if not isinstance(value, str):
+        return value
+    try:
+        parsed = datetime.fromisoformat(value)
+    except ValueError:
+        return value
+    return parsed if parsed.tzinfo else parsed.replace(tzinfo=UTC)
+
+
+def compact_document(fields: Dict) -> Dict:
+    """
+    Convert comment fields named as in the model to a current-schema document.
+    Unknown fields (``_id``...) are kept as they are.
+    :param fields: dict of model field names to values
+    :return: dict storage document
+    """
+    document = {}
+    for name, value in fields.items():
+        if value is None or name == "schema_version":
+            continue
+        if name == "timestamp":
+            value = _parse_timestamp(value)
+        document[FIELD_NAMES.get(name, name)] = value
+    document[FIELD_NAMES["schema_version"]] = SCHEMA_VERSION
+    return document
+
+
+def expand_document(document: Dict) -> Dict:
+    """
+    Convert a stored comment document of any schema version to model field names.
+    :param document: dict storage document
+    :return: dict of model field names to values, without the schema version
+    """
+    if FIELD_NAMES["schema_version"] not in document:
+        return dict(document)
+    return {MODEL_NAMES.get(key, key): value for key, value in document.items()
+            if key != FIELD_NAMES["schema_version"]}
+
 
 class Comment(BaseModel):
     id: str = Field(...)
@@ -13,6 +72,22 @@ class Comment(BaseModel):
     deleted_at: datetime | None = None
     updated_at: datetime | None = None
 
+    def to_document(self) -> Dict:
+        """Return the comment as a current-schema storage document."""
+        return compact_document(self.model_dump())
+
+    @classmethod
+    def from_document(cls, document: Dict) -> "Comment":
+        """
+        Build a comment from a stored document of any schema version.
+        :param document: dict storage document
+        :return: Comment
+        """
+        fields = expand_document(document)
+        if isinstance(fields.get("timestamp"), datetime):
+            fields["timestamp"] = fields["timestamp"].isoformat()
+        return cls(**{name: value for name, value in fields.items() if name in cls.model_fields})
+
 
 class Message(BaseModel):
     id: str = Field(alias="_id", default_factory=lambda: str(uuid.uuid4()))
@@ -20,3 +95,5 @@ class Message(BaseModel):
     status: str = Field(...)
     message_id: str = Field(...)
     processed_at: str = Field(default_factory=lambda: datetime.now(UTC).isoformat())
+    # Scorer version that produced the score, None when nothing was scored
+    scorer_version: str | None = None
@@ -0,0 +1,178 @@
+"""
+Run the message pipeline over NDJSON files or stdin, without RabbitMQ.
+
+Each input line is a message body as it would arrive from the broker. Lines
+go through the same decode → validate → score → persist stages as the
+consumer (``pipeline.py``); results are written to an NDJSON file instead of
+being published. Messages are processed in batches on a worker pool and
+scored with one ``score_batch`` call per batch. Batches are routed to workers
+by comment ID, so operations on one comment are persisted in input order.
+Use ``--dry-run`` for backtests that must not touch MongoDB.
+
+Usage:
+    python offline.py [INPUT ... | -] [--output results.ndjson] [--batch-size N] [--workers N] [--dry-run]
+"""
+import argparse
+import json
+import os
+import sys
+import threading
+import time
+from typing import Dict, Iterable, Iterator, List, Tuple
+from config import settings
+from configure_logging import configure_logging, get_logger
+from database.audit import audit_log
+from database.score_history import score_history
+from metrics import metrics
+from pipeline import Outcome, process_batch
+from rabbitmq.consumers.scheduler import KeyedScheduler
+from rabbitmq.sharding import shard_for
+
+logging = get_logger(__name__)
+
+Line = Tuple[str, int, str]
+
+
+def read_lines(paths: Iterable[str]) -> Iterator[Line]:
+    """
+    Yield the non-empty lines of the inputs, ``-`` being stdin.
+    :return: iterator of (source, line number, text)
+    """
+    for path in paths:
+        fh = sys.stdin if path == "-" else open(path, "r", encoding="utf-8")
+        try:
+            for number, text in enumerate(fh, start=1):
+                text = text.strip()
+                if text:
+                    yield path, number, text
+        finally:
+            if fh is not sys.stdin:
+                fh.close()
+
+
+def comment_key(text: str) -> str:
+    try:
+        key = json.loads(text).get("id")
+    except (ValueError, AttributeError):
+        key = None
+    return str(key) if key is not None else text
+
+
+class ResultWriter:
+    """Thread-safe NDJSON writer for pipeline results."""
+
+    def __init__(self, path: str):
+        self.path = path
+        self._fh = sys.stdout if path == "-" else open(path, "w", encoding="utf-8")
+        self._lock = threading.Lock()
+
+    def write(self, lines: List[Line], outcomes: List[Outcome]):
+        rows = []
+        for (source, number, _), outcome in zip(lines, outcomes):
+            message = outcome.message
+            rows.append(json.dumps({
+                "source": source,
+                "line": number,
+                "id": message.message_id if message else None,
+                "type": message.type if message else None,
+                "status": "processed" if outcome.processed else "failed",
+                "score": outcome.score,
+            }) + "\n")
+        with self._lock:
+            self._fh.writelines(rows)
+
+    def close(self):
+        if self._fh is not sys.stdout:
+            self._fh.close()
+        else:
+            self._fh.flush()
+
+
+class OfflineRunner:
+    """Feeds batches of input lines through the pipeline on a keyed worker pool."""
+
+    def __init__(self, writer: ResultWriter, workers: int = None, batch_size: int = None, dry_run: bool = False):
+        """
+        :param writer: ResultWriter receiving one row per input line
+        :param workers: int batches processed in parallel
+        :param batch_size: int lines per batch
+        :param dry_run: bool score without persisting
+        """
+        self.writer = writer
+        self.workers = workers or settings.OFFLINE_WORKERS
+        self.batch_size = batch_size or settings.OFFLINE_BATCH_SIZE
+        self.dry_run = dry_run
+        # Each worker lane is a scheduler key: a lane's batches run one after another
+        self.scheduler = KeyedScheduler(workers=self.workers, max_pending_per_key=sys.maxsize)
+        # Bounds the batches read ahead of the workers
+        self._slots = threading.BoundedSemaphore(self.workers * 2)
+        self.counts: Dict[str, int] = {"processed": 0, "failed": 0}
+        self._counts_lock = threading.Lock()
+
+    def run(self, lines: Iterable[Line]) -> Dict[str, int]:
+        """
+        Process every line and wait for the results to be written.
+        :return: dict of processed and failed message counts
+        """
+        started = time.monotonic()
+        lanes: List[List[Line]] = [[] for _ in range(self.workers)]
+        for line in lines:
+            lane = shard_for(comment_key(line[2]), self.workers)
+            lanes[lane].append(line)
+            if len(lanes[lane]) >= self.batch_size:
+                self._submit(lane, lanes[lane])
+                lanes[lane] = []
+        for lane, batch in enumerate(lanes):
+            if batch:
+                self._submit(lane, batch)
+        self.scheduler.wait_idle()
+        self.scheduler.shutdown()
+        elapsed = time.monotonic() - started
+        total = self.counts["processed"] + self.counts["failed"]
+        logging.info("Offline run finished", seconds=round(elapsed, 2),
+                     messages_per_second=round(total / elapsed, 1) if elapsed > 0 else None, **self.counts)
+        return self.counts
+
+    def _submit(self, lane: int, batch: List[Line]):
+        self._slots.acquire()
+        self.scheduler.submit(lane, self._process, batch)
+
+    def _process(self, batch: List[Line]):
+        try:
+            outcomes = process_batch([text for _, _, text in batch], dry_run=self.dry_run)
+            self.writer.write(batch, outcomes)
+            processed = sum(1 for outcome in outcomes if outcome.processed)
+            with self._counts_lock:
+                self.counts["processed"] += processed
+                self.counts["failed"] += len(batch) - processed
+            metrics.increment("offline.processed", processed)
+            metrics.increment("offline.failed", len(batch) - processed)
+        finally:
+            self._slots.release()
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("inputs", nargs="*", default=["-"], help="NDJSON files, - for stdin")
+    parser.add_argument("--output", default="results.ndjson", help="NDJSON results file, - for stdout")
+    parser.add_argument("--batch-size", type=int, default=settings.OFFLINE_BATCH_SIZE)
+    parser.add_argument("--workers", type=int, default=settings.OFFLINE_WORKERS)
+    parser.add_argument("--dry-run", action="store_true", help="score only, do not write to MongoDB")
+    args = parser.parse_args()
+
+    if settings.LOGGING_PATH:
+        os.makedirs(settings.LOGGING_PATH, exist_ok=True)
+    configure_logging(settings)
+    writer = ResultWriter(args.output)
+    try:
+        OfflineRunner(writer, workers=args.workers, batch_size=args.batch_size,
+                      dry_run=args.dry_run).run(read_lines(args.inputs))
+    finally:
+        writer.close()
+        if not args.dry_run:
+            audit_log.flush()
+            score_history.flush()
+
+
+if __name__ == '__main__':
+    main()
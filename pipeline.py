@@ -0,0 +1,239 @@
+"""
+Message processing stages shared by every transport:
+decode → validate → score → persist, producing the result message to publish.
+
+Transports only move bytes and results: the RabbitMQ consumer acks/nacks
+deliveries and publishes results to the broker, the offline runner
+(``offline.py``) reads NDJSON files or stdin and writes results to a file.
+"""
+import json
+import time
+from typing import List, NamedTuple, Optional, Tuple
+from config import settings
+from configure_logging import get_logger
+from models import Comment, Message
+from scoring.artifacts import report_first_score
+from scoring.base import Scorer
+from scoring.cache import score_cache
+from scoring.factory import scorers
+from scoring.neardup import near_duplicates
+from scoring.normalization import normalizer
+from service import CommentService
+
+logging = get_logger(__name__)
+
+
+class Outcome(NamedTuple):
+    """Result of running one message through the pipeline."""
+    # Result to publish, None when nothing should be published
+    message: Optional[Message]
+    # True when the message was processed and can be acknowledged
+    processed: bool
+    # Whether an unprocessed message should be retried
+    requeue: bool = False
+    score: Optional[float] = None
+
+
+class InvalidMessage(ValueError):
+    """The body cannot be decoded or is too large; retrying would not help."""
+
+
+def failed_message() -> Message:
+    return Message(message_id="unknown", status="failed", type="unknown")
+
+
+def decode(body) -> dict:
+    """
+    Decode a message body.
+    :param body: bytes or str JSON object
+    :return: dict message
+    :raises InvalidMessage: when the body exceeds the size cap or is not a JSON object
+    """
+    if len(body) > settings.SCORING_MAX_BODY_BYTES:
+        # Reject oversized bodies before paying for decoding and scoring
+        raise InvalidMessage(f"Message body of {len(body)} bytes exceeds {settings.SCORING_MAX_BODY_BYTES}")
+    try:
+        decoded = json.loads(body)
+    except ValueError as e:
+        raise InvalidMessage("Message body is not valid JSON") from e
+    if not isinstance(decoded, dict):
+        raise InvalidMessage("Message body is not a JSON object")
+    return decoded
+
+
+def validate(json_body: dict) -> Tuple[Comment, str]:
+    """
+    Build the comment and operation carried by a decoded message.
+    :param json_body: dict decoded message
+    :return: tuple of Comment and lower-cased operation
+    :raises pydantic.ValidationError: when required fields are missing or invalid
+    """
+    comment = Comment(
+        id=json_body.get("id"),
+        content=json_body.get("text"),
+        user_id=json_body.get("user_id"),
+        timestamp=json_body.get("timestamp"),
+        score=json_body.get("score", 0)
+    )
+    return comment, json_body.get("type", "create").lower()
+
+
+def score(text: str, scorer: Scorer = None) -> float:
+    """
+    Score a text, reusing the score of any text with the same normalized form.
+    :param text: str raw text
+    :param scorer: Scorer to use instead of the process-wide one; its scores bypass the cache
+    :return: float score
+    """
+    return score_versioned(text, scorer)[0]
+
+
+def score_versioned(text: str, scorer: Scorer = None) -> Tuple[float, str]:
+    """
+    Score a text like ``score``, also returning the scorer version that produced the score.
+    :param text: str raw text
+    :param scorer: Scorer to use instead of the process-wide one; its scores are stamped with its name
+    :return: tuple of float score and str version
+    """
+    normalized = normalizer.normalize(text)
+    if scorer is not None:
+        return scorer.score(normalized), scorer.name
+    version, active = scorers.current()
+    cached = score_cache.get(normalized)
+    if cached is not None:
+        logging.debug("Score served from cache")
+        return cached, version
+    fingerprint = near_duplicates.fingerprint(normalized)
+    value = near_duplicates.lookup(fingerprint)
+    fresh = value is None
+    if fresh:
+        start = time.perf_counter()
+        value = active.score(normalized)
+        scorers.observe([normalized], [value], version, time.perf_counter() - start)
+        report_first_score()
+    # A swap clears the caches: scores of the replaced version must not refill them
+    if scorers.is_active(active):
+        if fresh:
+            near_duplicates.add(fingerprint, value)
+        score_cache.put(normalized, value)
+    return value, version
+
+
+def score_many(texts: List[str]) -> List[float]:
+    """
+    Score several texts, with one ``score_batch`` call for those not in the cache
+    and without a near duplicate.
+    :param texts: list of raw texts
+    :return: list of float scores in input order
+    """
+    return score_many_versioned(texts)[0]
+
+
+def score_many_versioned(texts: List[str]) -> Tuple[List[float], str]:
+    """
+    Score several texts like ``score_many``, also returning the scorer version that produced the scores.
+    :param texts: list of raw texts
+    :return: tuple of list of float scores in input order and str version
+    """
+    version, active = scorers.current()
+    normalized = normalizer.normalize_batch(texts)
+    scores = [score_cache.get(text) for text in normalized]
+    missing = sorted({text for text, value in zip(normalized, scores) if value is None})
+    if missing:
+        fresh = {}
+        fingerprints = {}
+        for text in missing:
+            fingerprints[text] = near_duplicates.fingerprint(text)
+            value = near_duplicates.lookup(fingerprints[text])
+            if value is not None:
+                fresh[text] = value
+        unscored = [text for text in missing if text not in fresh]
+        if unscored:
+            start = time.perf_counter()
+            unscored_scores = active.score_batch(unscored)
+            scorers.observe(unscored, unscored_scores, version, time.perf_counter() - start)
+            current = scorers.is_active(active)
+            for text, value in zip(unscored, unscored_scores):
+                fresh[text] = value
+                if current:
+                    near_duplicates.add(fingerprints[text], value)
+            report_first_score()
+        if scorers.is_active(active):
+            for text, value in fresh.items():
+                score_cache.put(text, value)
+        scores = [fresh[text] if value is None else value for text, value in zip(normalized, scores)]
+    return scores, version
+
+
+def persist(comment: Comment, ops: str, value: float, dry_run: bool = False):
+    """
+    Apply the operation to the comments collection.
+    :return: the service result, truthy on success; True when ``dry_run`` is set
+    """
+    if dry_run:
+        return True
+    logging.info("Processing message", message_id=comment.id, operation=ops)
+    return CommentService().process_ops(comment, ops, value)
+
+
+def _finish(comment: Comment, ops: str, value: float, version: str, dry_run: bool) -> Outcome:
+    result = persist(comment, ops, value, dry_run)
+    message = Message(message_id=comment.id, status="processed", type=ops, scorer_version=version)
+    if result:
+        return Outcome(message, processed=True, score=value)
+    return Outcome(message, processed=False, requeue=settings.RABBITMQ_REQUEUE_ON_FAIL, score=value)
+
+
+def process(body, dry_run: bool = False, scorer: Scorer = None) -> Outcome:
+    """
+    Run one message body through every stage.
+    :param body: bytes or str message body
+    :param dry_run: bool score without persisting
+    :param scorer: Scorer to use instead of the process-wide one
+    :return: Outcome
+    """
+    try:
+        comment, ops = validate(decode(body))
+        return _finish(comment, ops, *score_versioned(comment.content, scorer), dry_run)
+    except InvalidMessage:
+        logging.warning("Rejecting invalid message", size=len(body), exc_info=True)
+        return Outcome(failed_message(), processed=False)
+    except Exception:
+        logging.error("Failed to process message.", exc_info=True)
+        return Outcome(None, processed=False, requeue=settings.RABBITMQ_REQUEUE_ON_FAIL)
+
+
+def process_batch(bodies: List, dry_run: bool = False) -> List[Outcome]:
+    """
+    Run several message bodies through every stage, scoring them together.
+    Operations are persisted in input order.
+    :param bodies: list of bytes or str message bodies
+    :param dry_run: bool score without persisting
+    :return: list of Outcome in input order
+    """
+    outcomes: List[Optional[Outcome]] = [None] * len(bodies)
+    valid = []
+    for index, body in enumerate(bodies):
+        try:
+            valid.append((index, *validate(decode(body))))
+        except InvalidMessage:
+            logging.warning("Rejecting invalid message", size=len(body), exc_info=True)
+            outcomes[index] = Outcome(failed_message(), processed=False)
+        except Exception:
+            logging.error("Failed to validate message.", exc_info=True)
+            outcomes[index] = Outcome(None, processed=False, requeue=settings.RABBITMQ_REQUEUE_ON_FAIL)
+    try:
+        scores, version = score_many_versioned([comment.content for _, comment, _ in valid])
+    except Exception:
+        logging.error("Failed to score batch.", size=len(valid), exc_info=True)
+        scores, version = [None] * len(valid), None
+    for (index, comment, ops), value in zip(valid, scores):
+        if value is None:
+            outcomes[index] = Outcome(None, processed=False, requeue=settings.RABBITMQ_REQUEUE_ON_FAIL)
+            continue
+        try:
+            outcomes[index] = _finish(comment, ops, value, version, dry_run)
+        except Exception:
+            logging.error("Failed to process message.", message_id=comment.id, exc_info=True)
+            outcomes[index] = Outcome(None, processed=False, requeue=settings.RABBITMQ_REQUEUE_ON_FAIL)
+    return outcomes
@@ -0,0 +1,89 @@
+"""
+Throughput profiles: named trade-offs between durability and throughput.
+
+A profile fixes, in one place, how hard the service works to not lose data:
+the MongoDB write concern, journaling, connection pool sizes and wire
+compression, and on the AMQP side the delivery mode of published messages,
+the queue type and whether publisher confirms are used. Select one with
+``THROUGHPUT_PROFILE``.
+"""
+from typing import Dict, NamedTuple, Optional, Tuple, Union
+from pika.delivery_mode import DeliveryMode
+from config import settings
+from constants import ThroughputProfile
+
+
+class Profile(NamedTuple):
+    name: str
+    # MongoDB
+    write_concern: Union[int, str]
+    journal: bool
+    write_timeout_ms: Optional[int]
+    max_pool_size: int
+    min_pool_size: int
+    compressors: Tuple[str, ...]
+    zlib_level: int
+    # RabbitMQ
+    delivery_mode: DeliveryMode
+    queue_type: str
+    publisher_confirms: bool
+
+
+PROFILES = {
+    # Nothing acknowledged is lost: majority-acknowledged journaled writes, replicated
+    # quorum queues, persistent messages and a broker confirm for every publish
+    ThroughputProfile.DURABLE: Profile(
+        name=ThroughputProfile.DURABLE, write_concern="majority", journal=True, write_timeout_ms=5000,
+        max_pool_size=50, min_pool_size=5, compressors=("zlib",), zlib_level=6,
+        delivery_mode=DeliveryMode.Persistent, queue_type="quorum", publisher_confirms=True,
+    ),
+    # Survives a process or broker restart, but not the loss of the primary or a disk
+    ThroughputProfile.BALANCED: Profile(
+        name=ThroughputProfile.BALANCED, write_concern=1, journal=True, write_timeout_ms=None,
+        max_pool_size=100, min_pool_size=5, compressors=("zlib",), zlib_level=1,
+        delivery_mode=DeliveryMode.Persistent, queue_type="classic", publisher_confirms=False,
+    ),
+    # Acknowledged but unjournaled writes and transient messages; scores can be recomputed
+    ThroughputProfile.MAX_THROUGHPUT: Profile(
+        name=ThroughputProfile.MAX_THROUGHPUT, write_concern=1, journal=False, write_timeout_ms=None,
+        max_pool_size=200, min_pool_size=10, compressors=(), zlib_level=1,
+        delivery_mode=DeliveryMode.Transient, queue_type="classic", publisher_confirms=False,
+    ),
+}
+
+
+def active_profile() -> Profile:
+    """Return the profile selected by ``THROUGHPUT_PROFILE``."""
+    return PROFILES[settings.THROUGHPUT_PROFILE]
+
+
+def mongo_client_options(profile: Profile = None) -> Dict:
+    """
+    Keyword arguments for ``MongoClient`` implementing a profile.
+    :param profile: Profile, the active one by default
+    :return: dict of MongoClient options
+    """
+    profile = profile or active_profile()
+    options = {
+        "w": profile.write_concern,
+        "journal": profile.journal,
+        "maxPoolSize": profile.max_pool_size,
+        "minPoolSize": profile.min_pool_size,
+    }
+    if profile.write_timeout_ms:
+        options["wTimeoutMS"] = profile.write_timeout_ms
+    if profile.compressors:
+        options["compressors"] = ",".join(profile.compressors)
+        if "zlib" in profile.compressors:
+            options["zlibCompressionLevel"] = profile.zlib_level
+    return options
+
+
+def queue_arguments(profile: Profile = None) -> Dict:
+    """
+    ``queue_declare`` arguments implementing a profile.
+    :param profile: Profile, the active one by default
+    :return: dict of queue arguments
+    """
+    profile = profile or active_profile()
+    return {"x-queue-type": profile.queue_type}
@@ -1,11 +1,23 @@
+import time
 import pika
 from config import settings
 from configure_logging import get_logger
+from constants import ExchangeType
+from metrics import metrics
+from profiles import active_profile, queue_arguments
+from rabbitmq.sharding import shard_queue_name, shard_routing_key
+from retry import backoff_delay
 
 logging = get_logger(__name__)
 
 class RabbitMQConnection:
 
+    # Exchanges and queue bindings declared so far, replayed after a reconnect
+    _topology = ()
+    _lost_at = None
+    # Failed reconnect attempts since the connection was lost, across rounds of RABBITMQ_MAX_RETRIES
+    _reconnect_attempts = 0
+
     def __init__(self):
         pika_url = f"amqp://{settings.RABBITMQ_USERNAME}:{settings.RABBITMQ_PASSWORD}@{settings.RABBITMQ_HOST}:{settings.RABBITMQ_PORT}"
         self.parameters = pika.URLParameters(pika_url)
@@ -15,38 +27,124 @@ class RabbitMQConnection:
         self.channel = None
         self._connect()
 
-    def _connect(self):
+    def _connect(self) -> bool:
         try:
             logging.info("Connecting to RabbitMQ server...")
             self.connection = pika.BlockingConnection(self.parameters)
-            self.channel = self.connection.channel()
+            self._open_channel()
             logging.info("Connected to RabbitMQ server successfully.")
+            return True
         except Exception as e:
             logging.error(f"Failed to connect to RabbitMQ server", exc_info=True)
+            return False
 
 
     def ensure_connection(self):
-        if not self.connection or self.connection.is_closed:
-            logging.info("RabbitMQ Connection lost. Reconnecting to RabbitMQ server...")
-            self._connect()
+        """
+        Make sure a usable channel is available. A closed channel on a healthy connection
+        is simply reopened; a lost connection is re-established with backoff and the
+        recorded topology is declared again.
+        """
+        if self.connection and self.connection.is_open:
+            if not self.channel or self.channel.is_closed:
+                logging.info("RabbitMQ channel closed, reopening it on the existing connection")
+                self._open_channel()
+                metrics.increment("rabbitmq.channel_reopens")
+            return
+        self._reconnect()
+
+    def _open_channel(self):
+        """Open a channel, in confirm mode when the throughput profile asks for publisher confirms."""
+        self.channel = self.connection.channel()
+        if active_profile().publisher_confirms:
+            self.channel.confirm_delivery()
+
+    def _reconnect(self):
+        """
+        Reconnect with exponential backoff and full jitter (``RetryConfig``), so workers that
+        lost the broker together do not come back together. The backoff keeps growing across
+        rounds, up to ``RetryConfig.MAX_DELAY``, until a reconnect succeeds.
+        :raises pika.exceptions.AMQPConnectionError: after RABBITMQ_MAX_RETRIES failed attempts
+        """
+        if self._lost_at is None:
+            self._lost_at = time.monotonic()
+            self._reconnect_attempts = 0
+        logging.info("RabbitMQ Connection lost. Reconnecting to RabbitMQ server...")
+        for _ in range(settings.RABBITMQ_MAX_RETRIES):
+            delay = backoff_delay(self._reconnect_attempts)
+            logging.info("Waiting before reconnect attempt", attempt=self._reconnect_attempts + 1,
+                         delay=round(delay, 2))
+            self._sleep(delay)
+            self._reconnect_attempts += 1
+            if self._connect():
+                downtime = time.monotonic() - self._lost_at
+                attempts, self._reconnect_attempts = self._reconnect_attempts, 0
+                self._lost_at = None
+                metrics.increment("rabbitmq.reconnects")
+                metrics.observe("rabbitmq.downtime", downtime)
+                logging.info("Reconnected to RabbitMQ", attempts=attempts, downtime=round(downtime, 3))
+                self._redeclare_topology()
+                return
+            metrics.increment("rabbitmq.reconnect_failures")
+        raise pika.exceptions.AMQPConnectionError(
+            f"Could not reconnect to RabbitMQ after {settings.RABBITMQ_MAX_RETRIES} attempts")
+
+    def _redeclare_topology(self):
+        """Declare recorded exchanges and bindings again, in case the broker lost them."""
+        if not self._topology:
+            return
+        for kind, arguments in self._topology:
+            if kind == "exchange":
+                self.channel.exchange_declare(**arguments)
+            else:
+                self.channel.queue_declare(queue=arguments["queue"], durable=True, arguments=queue_arguments())
+                self.channel.queue_bind(**arguments)
+        metrics.increment("rabbitmq.topology_redeclared")
+        logging.info("Re-declared RabbitMQ topology", declarations=len(self._topology))
+
+    def _remember(self, kind, **arguments):
+        if (kind, arguments) not in self._topology:
+            self._topology = self._topology + ((kind, arguments),)
+
+    @staticmethod
+    def _sleep(seconds):
+        time.sleep(seconds)
 
     def declare_exchange(self, exchange_name, exchange_type='direct', durable=True):
         self.ensure_connection()
         self.channel.exchange_declare(exchange=exchange_name, exchange_type=exchange_type, durable=durable)
+        self._remember("exchange", exchange=exchange_name, exchange_type=exchange_type, durable=durable)
         logging.info(f"Declared exchange: {exchange_name}")
 
     def bind_queue(self, queue_name, exchange_name, routing_key):
         try:
             logging.info(f"Binding queue {queue_name} to exchange {exchange_name} with routing key {routing_key}")
             self.ensure_connection()
-            self.channel.queue_declare(queue=queue_name, durable=True)
+            self.channel.queue_declare(queue=queue_name, durable=True, arguments=queue_arguments())
             self.channel.queue_bind(queue=queue_name, exchange=exchange_name, routing_key=routing_key)
+            self._remember("binding", queue=queue_name, exchange=exchange_name, routing_key=routing_key)
             logging.info(f"Bound queue {queue_name} to exchange {exchange_name} with routing key {routing_key}")
 
         except Exception as e:
             logging.error(f"Failed to bind queue {queue_name} to exchange {exchange_name}", exc_info=True)
 
 
+    def bind_shard_queues(self, exchange_name, shard_count):
+        """
+        Declare the sharded topology: a direct exchange and one queue per shard,
+        bound with the shard index as routing key.
+        :param exchange_name: str shard exchange name
+        :param shard_count: int number of shards
+        :return: list of shard queue names
+        """
+        self.declare_exchange(exchange_name, exchange_type=ExchangeType.DIRECT)
+        queue_names = []
+        for index in range(shard_count):
+            queue_name = shard_queue_name(index)
+            self.bind_queue(queue_name=queue_name, exchange_name=exchange_name, routing_key=shard_routing_key(index))
+            queue_names.append(queue_name)
+        return queue_names
+
     def delete_queue(self, queue_name):
         try:
             logging.info(f"Deleting queue: {queue_name}")
@@ -4,87 +4,399 @@ from pika import BasicProperties
 from config import settings
 import time
 import json
-from models import Comment, Message
-from utils import simulate_scoring, publish_result, to_dict
-from service import CommentService
+import threading
+from collections import OrderedDict
+from functools import partial
+from typing import Hashable, Optional, Tuple
+import pipeline
+from utils import publish_result
+from constants import QueueName
+from profiles import active_profile, queue_arguments
+from ratelimit import UserRateLimiter
+from rabbitmq.consumers.scheduler import KeyedScheduler
+from rabbitmq.probe import delivery_ages, message_age
+from scoring.factory import get_fallback_scorer
+from database.audit import audit_log
+from database.score_history import score_history
+from metrics import metrics
+from retry import backoff_delay
+from runtime_config import runtime_config
 from configure_logging import get_logger
 
 logging = get_logger(__name__)
 
+# Scheduling group of deliveries from the deferred queue; a tuple never collides with a user ID
+DEFERRED_GROUP = ("deferred",)
+
+
+class DeferredKeys:
+    """
+    Comment IDs with deliveries in the deferred queue, counted per ID and shared by
+    every consumer of the process. While an ID has deferred deliveries in flight its
+    later deliveries are deferred too, behind them, so a deferred create is never
+    overtaken by an update admitted in the meantime. Each queue has its own deferred
+    queue (``deferred_queue_name``) consumed by the same process, so deferrals come
+    back to the process that counted them. The table is capped at
+    ``USER_RATE_LIMIT_MAX_USERS`` IDs, least recently deferred dropped first.
+    """
+
+    def __init__(self, max_keys: int = None):
+        self.max_keys = max_keys or settings.USER_RATE_LIMIT_MAX_USERS
+        self._lock = threading.Lock()
+        self._counts: "OrderedDict[str, int]" = OrderedDict()
+
+    def __contains__(self, key: str) -> bool:
+        with self._lock:
+            return key in self._counts
+
+    def add(self, key: str):
+        with self._lock:
+            self._counts[key] = self._counts.get(key, 0) + 1
+            self._counts.move_to_end(key)
+            while len(self._counts) > self.max_keys:
+                self._counts.popitem(last=False)
+
+    def discard(self, key: str):
+        """Count one deferred delivery of ``key`` as back from the deferred queue."""
+        with self._lock:
+            count = self._counts.get(key)
+            if count is None:
+                return
+            if count > 1:
+                self._counts[key] = count - 1
+            else:
+                del self._counts[key]
+
+
+deferred_keys = DeferredKeys()
+
+
+def deferred_queue_name(queue_name: str) -> str:
+    """
+    Deferred queue paired with a queue. Every shard queue gets its own, so deliveries
+    deferred by a shard's consumer are consumed by that consumer and nobody else.
+    :param queue_name: str queue the deliveries are consumed from
+    :return: str deferred queue name, ``q.incoming_texts.deferred`` without sharding
+    """
+    return f"{queue_name}.deferred"
+
+
+class ThreadSafeChannel:
+    """
+    Channel proxy handed to worker threads. Pika channels are not thread-safe, so
+    acks and nacks are marshalled onto the connection's I/O thread.
+    """
+
+    def __init__(self, channel):
+        self._channel = channel
+
+    def _call(self, method, **kwargs):
+        try:
+            self._channel.connection.add_callback_threadsafe(partial(method, **kwargs))
+        except Exception:
+            logging.error("Failed to schedule channel operation, delivery will be redelivered", exc_info=True)
+
+    def basic_ack(self, delivery_tag, multiple=False):
+        self._call(self._channel.basic_ack, delivery_tag=delivery_tag, multiple=multiple)
+
+    def basic_nack(self, delivery_tag, multiple=False, requeue=True):
+        self._call(self._channel.basic_nack, delivery_tag=delivery_tag, multiple=multiple, requeue=requeue)
+
 
 class BasicMessageConsumer(RabbitMQConnection):
+    rate_limiter = None
+    deferred_queue = QueueName.DEFERRED_TEXTS
+
+    def __init__(self):
+        self.scheduler = None
+        self._stopping = threading.Event()
+        if settings.USER_RATE_LIMIT > 0:
+            self.rate_limiter = UserRateLimiter()
+        super().__init__()
 
-    def start_consuming(self, queue_name):
+    def start_consuming(self, queue_name, stop_event=None):
+        """
+        Consume from a queue until a stop is requested, then drain.
+        :param queue_name: str queue to consume from
+        :param stop_event: optional Event; setting it requests a graceful stop
+        """
+        if settings.CONSUMER_CONCURRENCY > 1 and self.scheduler is None:
+            self.scheduler = KeyedScheduler(
+                workers=settings.CONSUMER_CONCURRENCY,
+                max_pending_per_key=settings.CONSUMER_MAX_PENDING_PER_KEY,
+                weight_for=self.group_weight
+            )
+        runtime_config.register(("RABBITMQ_PREFETCH_COUNT", "CONSUMER_MAX_PENDING_PER_KEY"),
+                                self.apply_runtime_settings)
+        if stop_event is not None:
+            threading.Thread(target=self._watch_stop_event, args=(stop_event,),
+                             name="ConsumerStopWatcher", daemon=True).start()
 
-        while True:
+        failures = 0
+        while not self._stopping.is_set():
             try:
                 self.ensure_connection()
                 logging.info("Starting message consumption...")
                 channel = self.channel
-                channel.basic_qos(prefetch_count=settings.RABBITMQ_PREFETCH_COUNT)
-                channel.basic_consume(
+                channel.basic_qos(prefetch_count=self.prefetch_count())
+                consumer_tags = [channel.basic_consume(
                     queue=queue_name,
-                    on_message_callback=self.on_message,
+                    on_message_callback=partial(self.dispatch, queue_name=queue_name),
                     auto_ack=False
-                )
-                channel.start_consuming()
+                )]
+                if self.defers:
+                    self.deferred_queue = deferred_queue_name(queue_name)
+                    channel.queue_declare(queue=self.deferred_queue, durable=True, arguments=queue_arguments())
+                    consumer_tags.append(channel.basic_consume(
+                        queue=self.deferred_queue,
+                        on_message_callback=partial(self.dispatch, deferred=True),
+                        auto_ack=False
+                    ))
+                failures = 0
+                # Pump the connection ourselves rather than channel.start_consuming(),
+                # so a stop request is noticed within a second from any thread
+                while not self._stopping.is_set():
+                    self.connection.process_data_events(time_limit=1)
+                for consumer_tag in consumer_tags:
+                    channel.basic_cancel(consumer_tag)
+                logging.info("Stopped consuming, no new deliveries will be accepted", queue=queue_name)
             except pika.exceptions.AMQPConnectionError:
+                # ensure_connection backs off between reconnect attempts
                 logging.error("Connection to RabbitMQ lost. Reconnecting...", exc_info=True)
-                time.sleep(settings.RABBITMQ_PAUSE)
                 continue
             except pika.exceptions.ChannelClosedByBroker:
+                # The connection is still up: only the channel is reopened, after a short backoff
                 logging.error("Channel closed by broker. Re-establishing channel...", exc_info=True)
-                time.sleep(settings.RABBITMQ_PAUSE)
+                self._sleep(backoff_delay(failures))
+                failures += 1
                 continue
             except Exception:
                 logging.error("An unexpected error occurred during message consumption.", exc_info=True)
-                time.sleep(settings.RABBITMQ_PAUSE)
+                self._sleep(backoff_delay(failures))
+                failures += 1
                 continue
 
+        self.drain()
+
+    @property
+    def defers(self) -> bool:
+        """Whether deliveries of users over their rate limit go to the deferred queue."""
+        return self.rate_limiter is not None and settings.USER_RATE_LIMIT_ACTION == "defer"
+
+    @staticmethod
+    def group_weight(group: Hashable) -> float:
+        """Scheduling weight of a user, or of the deferred queue."""
+        if group == DEFERRED_GROUP:
+            return settings.CONSUMER_DEFERRED_WEIGHT
+        return settings.CONSUMER_USER_WEIGHTS.get(group, 1.0)
+
+    def prefetch_count(self) -> int:
+        """Prefetch window: RABBITMQ_PREFETCH_COUNT, raised to keep every scheduler worker busy."""
+        if self.scheduler:
+            return max(settings.RABBITMQ_PREFETCH_COUNT, settings.CONSUMER_CONCURRENCY)
+        return settings.RABBITMQ_PREFETCH_COUNT
+
+    def apply_runtime_settings(self, changes: dict):
+        """
+        Apply reloaded consumer settings. ``basic_qos`` is issued on the connection's own
+        thread, since the reload happens on the runtime config watcher thread.
+        :param changes: dict of changed setting names to new values
+        """
+        if "CONSUMER_MAX_PENDING_PER_KEY" in changes and self.scheduler:
+            self.scheduler.max_pending_per_key = changes["CONSUMER_MAX_PENDING_PER_KEY"]
+        if "RABBITMQ_PREFETCH_COUNT" in changes and self.connection and self.connection.is_open:
+            prefetch_count = self.prefetch_count()
+            self.connection.add_callback_threadsafe(partial(self.channel.basic_qos, prefetch_count=prefetch_count))
+            logging.info("Updated consumer prefetch", prefetch_count=prefetch_count)
+
+    def request_stop(self):
+        """Ask the consume loop to stop taking deliveries and drain. Safe to call from any thread."""
+        if not self._stopping.is_set():
+            logging.info("Graceful stop requested")
+            self._stopping.set()
+
+    def _sleep(self, seconds):
+        # Backoff waits end early when a stop is requested
+        self._stopping.wait(seconds)
+
+    def _watch_stop_event(self, stop_event):
+        stop_event.wait()
+        self.request_stop()
+
+    def drain(self, timeout: float = None) -> dict:
+        """
+        Finish in-flight deliveries, flush buffered writes, send pending acks and close
+        the connection. Deliveries still running when the deadline passes are abandoned
+        and will be redelivered by the broker.
+        :param timeout: float seconds to wait for in-flight work, defaults to CONSUMER_DRAIN_TIMEOUT
+        :return: dict drain duration in seconds and number of abandoned deliveries
+        """
+        timeout = settings.CONSUMER_DRAIN_TIMEOUT if timeout is None else timeout
+        runtime_config.unregister(self.apply_runtime_settings)
+        started = time.monotonic()
+        deadline = started + timeout
+        abandoned = 0
+        if self.scheduler:
+            # Keep pumping the connection so acks queued by workers go out while we wait
+            while self.scheduler.pending and time.monotonic() < deadline:
+                self._process_events(min(0.1, max(deadline - time.monotonic(), 0)))
+            abandoned = self.scheduler.pending
+            self.scheduler.shutdown(wait=False)
+        try:
+            audit_log.flush()
+            score_history.flush()
+        except Exception:
+            logging.error("Failed to flush audit log or score history during drain", exc_info=True)
+        self._process_events(0)
+        try:
+            self.close()
+        except Exception:
+            logging.error("Failed to close RabbitMQ connection during drain", exc_info=True)
+
+        duration = time.monotonic() - started
+        metrics.set_gauge("consumer.drain.seconds", duration)
+        metrics.set_gauge("consumer.drain.abandoned", abandoned)
+        if abandoned:
+            logging.warning("Consumer drain deadline exceeded, abandoning in-flight deliveries",
+                            abandoned=abandoned, duration=round(duration, 3))
+        else:
+            logging.info("Consumer drained", abandoned=0, duration=round(duration, 3))
+        return {"duration": duration, "abandoned": abandoned}
+
+    def _process_events(self, time_limit: float):
+        try:
+            if self.connection and self.connection.is_open:
+                self.connection.process_data_events(time_limit=time_limit)
+                return
+        except Exception:
+            logging.error("Failed to process connection events during drain", exc_info=True)
+        time.sleep(time_limit)
+
     @staticmethod
-    def on_message(ch, method, properties: BasicProperties, body):
-        logging.info(f"Received message", body=body, properties=properties, routing_key=method.routing_key)
-        json_body = to_dict(body)
+    def delivery_keys(body, method) -> Tuple[str, Optional[str]]:
+        """
+        Ordering key and user of a delivery.
+        :return: tuple of the comment ID (the delivery tag when the body cannot be decoded) and user ID
+        """
         try:
-            comment = Comment(
-                id=json_body.get("id"),
-                content=json_body.get("text"),
-                user_id=json_body.get("user_id"),
-                timestamp=json_body.get("timestamp"),
-                score=json_body.get("score", 0)
-            )
-            ops = json_body.get("type", "create").lower()
-            score = simulate_scoring().get('score')
-            message_result = Message(
-                message_id=comment.id,
-                status="processed",
-                type=ops,
-            )
+            decoded = json.loads(body)
+            key, user_id = decoded.get("id"), decoded.get("user_id")
+        except (ValueError, AttributeError):
+            key = user_id = None
+        key = key if key is not None else f"delivery:{method.delivery_tag}"
+        return key, str(user_id) if user_id is not None else None
 
-            comment_service = CommentService()
-            # Process the message (placeholder for actual processing logic)
-            logging.info(f"Processing message", message=json_body)
-            result = comment_service.process_ops(comment, ops, score)
-            publish_result(message_result)
-            # Acknowledge the message after successful processing
-            if result:
-                ch.basic_ack(delivery_tag=method.delivery_tag)
-                logging.info("Message acknowledged.")
+    @classmethod
+    def ordering_key(cls, body, method) -> str:
+        """Comment ID of a delivery, or its delivery tag when the body cannot be decoded."""
+        return cls.delivery_keys(body, method)[0]
+
+    def dispatch(self, ch, method, properties: BasicProperties, body, deferred: bool = False,
+                 queue_name: str = None):
+        """
+        Admit a delivery and hand it to the keyed scheduler: deliveries for different
+        comments are processed in parallel, deliveries for the same comment in arrival
+        order, and workers are shared fairly between users. Without a scheduler the
+        delivery is processed right away.
+
+        Deliveries of users over ``USER_RATE_LIMIT`` are moved to the deferred queue or
+        scored with the fallback scorer, depending on ``USER_RATE_LIMIT_ACTION``. Deliveries
+        for a comment that still has deferred deliveries in flight are deferred behind them.
+        :param deferred: bool the delivery comes from the deferred queue and is not rate limited again
+        :param queue_name: str queue the delivery comes from, whose oldest message age it updates
+        """
+        if queue_name is not None:
+            age = message_age(body, properties)
+            if age is not None:
+                delivery_ages.record(queue_name, age)
+        key, user_id = self.delivery_keys(body, method)
+        cheap = False
+        if deferred:
+            self.record_deferral_delay(properties)
+        elif self.defers and key in deferred_keys:
+            # Overtaking a deferred delivery of the same comment would reorder its operations
+            if self.defer(ch, method, properties, body):
+                deferred_keys.add(key)
+            return
+        elif self.rate_limiter and user_id is not None and not self.rate_limiter.try_acquire(user_id):
+            if self.defers:
+                if self.defer(ch, method, properties, body):
+                    deferred_keys.add(key)
                 return
-            ch.basic_nack(delivery_tag=method.delivery_tag, requeue=settings.RABBITMQ_REQUEUE_ON_FAIL)
-            logging.warning("Message processing failed, message not acknowledged.")
-        except json.JSONDecodeError:
-            logging.error("Failed to decode message body as JSON.", exc_info=True)
-            ch.basic_nack(delivery_tag=method.delivery_tag, requeue=settings.RABBITMQ_REQUEUE_ON_FAIL)
-            # Create a minimal message result for failed JSON
-            try:
-                message_result = Message(message_id="unknown", status="failed", type="unknown")
-                publish_result(message_result)
-            except Exception as publish_error:
-                logging.error("Failed to publish error message for invalid JSON", exc_info=True)
-        except Exception as e:
-            logging.error("Failed to process message.", exc_info=True)
-            ch.basic_nack(delivery_tag=method.delivery_tag, requeue=settings.RABBITMQ_REQUEUE_ON_FAIL)
+            cheap = True
+            metrics.increment("fairness.cheap_scored")
+        if not self.scheduler:
+            if deferred:
+                deferred_keys.discard(key)
+            self.process_delivery(ch, method, properties, body, cheap)
+            return
+        group = DEFERRED_GROUP if deferred else user_id
+        if not self.scheduler.submit(key, self.process_delivery, ThreadSafeChannel(ch), method, properties, body,
+                                     cheap, group=group):
+            logging.warning("Too many pending deliveries for key, requeueing", key=key)
+            ch.basic_nack(delivery_tag=method.delivery_tag, requeue=True)
+        elif deferred:
+            # Later deliveries of the comment now queue behind this one in the scheduler
+            deferred_keys.discard(key)
 
+    def defer(self, ch, method, properties: BasicProperties, body) -> bool:
+        """
+        Republish a delivery to the deferred queue of the queue being consumed and ack the
+        original. Runs on the connection's thread, like every consumer callback.
+        :return: bool whether the delivery was deferred, False when it was requeued instead
+        """
+        headers = dict(getattr(properties, "headers", None) or {})
+        headers["x-deferred-at"] = time.time()
+        deferred_properties = BasicProperties(
+            content_type=getattr(properties, "content_type", None),
+            timestamp=getattr(properties, "timestamp", None),
+            headers=headers,
+            delivery_mode=active_profile().delivery_mode.value
+        )
+        try:
+            ch.basic_publish(exchange="", routing_key=self.deferred_queue, body=body,
+                             properties=deferred_properties)
+        except Exception:
+            logging.error("Failed to defer delivery, requeueing", exc_info=True)
+            ch.basic_nack(delivery_tag=method.delivery_tag, requeue=True)
+            return False
+        ch.basic_ack(delivery_tag=method.delivery_tag)
+        metrics.increment("fairness.deferred")
+        return True
+
+    @staticmethod
+    def record_deferral_delay(properties: BasicProperties):
+        """Record how long a deferred delivery spent in the deferred queue."""
+        deferred_at = (getattr(properties, "headers", None) or {}).get("x-deferred-at")
+        if isinstance(deferred_at, (int, float)):
+            metrics.observe("fairness.deferral_delay", max(time.time() - deferred_at, 0.0))
+
+    @classmethod
+    def process_delivery(cls, ch, method, properties: BasicProperties, body, cheap: bool = False):
+        """Handle a delivery, recording its processing latency."""
+        with metrics.timer("consumer.message.latency"):
+            cls.on_message(ch, method, properties, body, cheap)
+
+    @staticmethod
+    def on_message(ch, method, properties: BasicProperties, body, cheap: bool = False):
+        """
+        Run a delivery through the processing pipeline, publish its result and ack or nack it.
+        A delivery whose result the broker did not accept is requeued rather than acked.
+        :param cheap: bool score with the fallback scorer instead of the full one
+        """
+        logging.info("Received message", size=len(body), properties=properties, routing_key=method.routing_key)
+        outcome = pipeline.process(body, scorer=get_fallback_scorer() if cheap else None)
+        if outcome.message is not None and not publish_result(outcome.message):
+            # Acking would lose the result: the delivery is redelivered and its result published again
+            ch.basic_nack(delivery_tag=method.delivery_tag, requeue=True)
+            metrics.increment("consumer.publish_failures")
+            logging.warning("Result not published, message requeued.")
+            return
+        if outcome.processed:
+            ch.basic_ack(delivery_tag=method.delivery_tag)
+            logging.info("Message acknowledged.")
+            return
+        ch.basic_nack(delivery_tag=method.delivery_tag, requeue=outcome.requeue)
+        logging.warning("Message processing failed, message not acknowledged.", requeue=outcome.requeue)
 
 consumer = BasicMessageConsumer()
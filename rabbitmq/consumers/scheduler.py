@@ -0,0 +1,166 @@
+import heapq
+import itertools
+import threading
+import time
+from collections import deque
+from concurrent.futures import ThreadPoolExecutor
+from functools import partial
+from typing import Any, Callable, Dict, Hashable, Optional
+from configure_logging import get_logger
+from metrics import metrics
+
+logging = get_logger(__name__)
+
+
+class WeightedFairQueue:
+    """
+    Items queued per group and popped in weighted fair order (stride scheduling):
+    each pop advances the group's virtual time by ``1 / weight``, and the group with
+    the lowest virtual time goes next. A group that becomes active again starts at
+    the current virtual time, so idle time is not banked as credit.
+
+    Not thread-safe; the owner serializes access.
+    """
+
+    def __init__(self, weight_for: Callable[[Hashable], float] = None):
+        """
+        :param weight_for: callable returning a group's weight, 1 for every group by default
+        """
+        self.weight_for = weight_for or (lambda group: 1.0)
+        self._queues: Dict[Hashable, deque] = {}
+        # One (virtual time, sequence, group) entry per non-empty group
+        self._heap = []
+        self._sequence = itertools.count()
+        self._virtual_time = 0.0
+
+    def push(self, group: Hashable, item: Any):
+        queue = self._queues.get(group)
+        if queue is None:
+            self._queues[group] = deque([item])
+            heapq.heappush(self._heap, (self._virtual_time, next(self._sequence), group))
+        else:
+            queue.append(item)
+
+    def pop(self) -> Any:
+        """
+        :return: the next item in weighted fair order
+        :raises IndexError: when empty
+        """
+        virtual_time, _, group = heapq.heappop(self._heap)
+        self._virtual_time = virtual_time
+        queue = self._queues[group]
+        item = queue.popleft()
+        if queue:
+            heapq.heappush(self._heap, (virtual_time + 1.0 / self.weight_for(group), next(self._sequence), group))
+        else:
+            del self._queues[group]
+        return item
+
+    @property
+    def groups(self) -> int:
+        """Number of groups with queued items."""
+        return len(self._queues)
+
+    def __len__(self) -> int:
+        return sum(len(queue) for queue in self._queues.values())
+
+
+class KeyedScheduler:
+    """
+    Runs tasks on a worker pool while keeping tasks that share a key in arrival order.
+
+    Tasks with different keys run in parallel. A task whose key is already running is
+    parked in that key's queue and only becomes runnable once the previous task
+    finishes, so a key never runs on two workers at once. Per-key queues are
+    bounded; ``submit`` returns False instead of queueing past the bound.
+
+    Runnable tasks are handed to workers in weighted fair order across their
+    ``group`` (the user of a delivery), so a group with many runnable tasks cannot
+    take every worker while other groups wait.
+    """
+
+    def __init__(self, workers: int, max_pending_per_key: int, weight_for: Callable[[Hashable], float] = None):
+        """
+        :param workers: int worker threads
+        :param max_pending_per_key: int tasks parked per key before ``submit`` refuses more
+        :param weight_for: callable returning a group's scheduling weight, 1 for every group by default
+        """
+        self.workers = workers
+        self.max_pending_per_key = max_pending_per_key
+        self._executor = ThreadPoolExecutor(max_workers=workers, thread_name_prefix="consumer-worker")
+        self._queues: Dict[Hashable, deque] = {}
+        self._ready = WeightedFairQueue(weight_for)
+        self._pending = 0
+        self._lock = threading.Lock()
+        self._idle = threading.Condition(self._lock)
+
+    def submit(self, key: Hashable, fn: Callable, *args: Any, group: Optional[Hashable] = None) -> bool:
+        """
+        Schedule ``fn(*args)`` behind any earlier task with the same key.
+        :param key: ordering key
+        :param fn: callable to run
+        :param group: fairness group the task is accounted to
+        :return: bool False if the key's queue is full and the task was not scheduled
+        """
+        task = (partial(fn, *args), time.monotonic(), group)
+        with self._lock:
+            queue = self._queues.get(key)
+            if queue is None:
+                self._queues[key] = deque()
+                self._pending += 1
+                self._make_ready(key, task)
+            elif len(queue) >= self.max_pending_per_key:
+                metrics.increment("consumer.scheduler.rejected")
+                return False
+            else:
+                queue.append(task)
+                self._pending += 1
+                metrics.increment("consumer.scheduler.contended")
+                if len(queue) > metrics.gauge("consumer.scheduler.max_key_depth", 0):
+                    metrics.set_gauge("consumer.scheduler.max_key_depth", len(queue))
+            metrics.set_gauge("consumer.scheduler.active_keys", len(self._queues))
+        return True
+
+    def _make_ready(self, key: Hashable, task):
+        # Called with the lock held. Each worker job runs whichever runnable task is
+        # fairest when it starts, not the task that made it runnable.
+        self._ready.push(task[2], (key, task))
+        metrics.set_gauge("consumer.scheduler.ready_groups", self._ready.groups)
+        self._executor.submit(self._run_next)
+
+    def _run_next(self):
+        with self._lock:
+            key, (fn, enqueued_at, group) = self._ready.pop()
+        metrics.observe("consumer.scheduler.queue_wait", time.monotonic() - enqueued_at)
+        try:
+            fn()
+        except Exception:
+            logging.error("Scheduled task failed", key=key, group=group, exc_info=True)
+        with self._lock:
+            self._pending -= 1
+            queue = self._queues[key]
+            if not queue:
+                del self._queues[key]
+                metrics.set_gauge("consumer.scheduler.active_keys", len(self._queues))
+                if not self._pending:
+                    self._idle.notify_all()
+                return
+            self._make_ready(key, queue.popleft())
+
+    @property
+    def pending(self) -> int:
+        """Number of tasks queued or running."""
+        with self._lock:
+            return self._pending
+
+    def wait_idle(self, timeout: float = None) -> bool:
+        """
+        Wait until every scheduled task has finished.
+        :param timeout: float seconds to wait, None waits forever
+        :return: bool True if idle, False on timeout
+        """
+        with self._lock:
+            return self._idle.wait_for(lambda: self._pending == 0, timeout=timeout)
+
+    def shutdown(self, wait: bool = True):
+        self._executor.shutdown(wait=wait, cancel_futures=not wait)
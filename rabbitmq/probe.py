@@ -0,0 +1,176 @@
+import json
+import threading
+import time
+from datetime import datetime, UTC
+from typing import Dict, List, Optional
+import pika.exceptions
+from config import settings
+from configure_logging import get_logger
+from constants import QueueName
+from metrics import metrics
+from rabbitmq.connection import RabbitMQConnection
+from rabbitmq.sharding import shard_queue_name
+
+logging = get_logger(__name__)
+
+
+def incoming_queues() -> List[str]:
+    """Queues holding unprocessed texts: every shard queue when sharding is on, else INCOMING_TEXTS."""
+    if settings.RABBITMQ_SHARD_COUNT:
+        return [shard_queue_name(index) for index in range(settings.RABBITMQ_SHARD_COUNT)]
+    return [QueueName.INCOMING_TEXTS]
+
+
+def message_age(body: bytes, properties, now: datetime = None) -> Optional[float]:
+    """
+    Age of a message in seconds, from its ``timestamp`` field, or the AMQP timestamp
+    property when the body has none. Naive timestamps are taken as UTC.
+    :return: float seconds, or None when the message carries no usable timestamp
+    """
+    now = now or datetime.now(UTC)
+    try:
+        timestamp = datetime.fromisoformat(json.loads(body)["timestamp"])
+        if timestamp.tzinfo is None:
+            timestamp = timestamp.replace(tzinfo=UTC)
+        return max((now - timestamp).total_seconds(), 0.0)
+    except (ValueError, KeyError, TypeError, AttributeError):
+        pass
+    if properties is not None and getattr(properties, "timestamp", None):
+        return max(now.timestamp() - properties.timestamp, 0.0)
+    return None
+
+
+class DeliveryAges:
+    """
+    Age of the last message consumers of this process received from each queue.
+
+    Queues deliver oldest first, so the message just delivered was the head of its
+    queue: its age, plus the time elapsed since it was delivered, bounds the age of
+    the oldest message still queued, without touching the queue itself.
+    """
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        # queue name → (age in seconds when delivered, monotonic delivery time)
+        self._last: Dict[str, tuple] = {}
+
+    def record(self, queue_name: str, age: float):
+        with self._lock:
+            self._last[queue_name] = (age, time.monotonic())
+
+    def oldest(self, queue_name: str) -> Optional[float]:
+        """
+        :return: float estimated age in seconds of the oldest message of a queue, or None
+            when no consumer of this process received one from it
+        """
+        with self._lock:
+            entry = self._last.get(queue_name)
+        if entry is None:
+            return None
+        age, delivered_at = entry
+        return age + time.monotonic() - delivered_at
+
+
+class QueueProbe(RabbitMQConnection):
+    """
+    Periodically samples queue depth, consumer count and the age of the oldest
+    unprocessed message. Depth and consumer counts come from a passive
+    ``queue_declare``, which never creates or modifies a queue.
+
+    The age of the oldest message is estimated from the messages this process's
+    consumers receive (``delivery_ages``). With ``PROBE_PEEK_OLDEST`` the head
+    message is peeked instead, with ``basic_get`` and a reject with requeue: it
+    comes back marked redelivered, may be delivered after messages for the same
+    comment that were behind it, and on quorum queues counts as a delivery
+    attempt against ``x-delivery-limit``.
+    """
+
+    def __init__(self):
+        self.last_sample: Dict = {}
+        self.last_sample_at: float = 0.0
+        super().__init__()
+
+    def queue_stats(self, queue_name: str, peek_oldest: bool = False) -> Dict:
+        """
+        Read the depth and consumer count of a queue, and optionally the age of its oldest message.
+        :param queue_name: str queue name
+        :param peek_oldest: bool peek the head message for its age
+        :return: dict with messages, consumers and oldest_age_seconds
+        """
+        self.ensure_connection()
+        declared = self.channel.queue_declare(queue=queue_name, passive=True)
+        stats = {
+            "messages": declared.method.message_count,
+            "consumers": declared.method.consumer_count,
+            "oldest_age_seconds": None,
+        }
+        if peek_oldest and stats["messages"]:
+            method, properties, body = self.channel.basic_get(queue=queue_name, auto_ack=False)
+            if method is not None:
+                self.channel.basic_reject(delivery_tag=method.delivery_tag, requeue=True)
+                stats["oldest_age_seconds"] = message_age(body, properties)
+        return stats
+
+    def sample(self) -> Dict:
+        """
+        Sample every monitored queue and publish the results as gauges.
+        :return: dict lag summary
+        """
+        queues = {}
+        for queue_name in incoming_queues():
+            stats = self._safe_stats(queue_name, peek_oldest=settings.PROBE_PEEK_OLDEST)
+            if stats and stats["messages"] and not settings.PROBE_PEEK_OLDEST:
+                stats["oldest_age_seconds"] = delivery_ages.oldest(queue_name)
+            queues[queue_name] = stats
+        queues[QueueName.PROCESSED_TEXTS] = self._safe_stats(QueueName.PROCESSED_TEXTS)
+
+        incoming = [queues[name] for name in incoming_queues() if queues[name]]
+        ages = [stats["oldest_age_seconds"] for stats in incoming if stats["oldest_age_seconds"] is not None]
+        summary = {
+            "queues": queues,
+            "backlog": sum(stats["messages"] for stats in incoming),
+            "consumers": sum(stats["consumers"] for stats in incoming),
+            "oldest_age_seconds": max(ages) if ages else None,
+            "sampled_at": datetime.now(UTC).isoformat(),
+        }
+        for queue_name, stats in queues.items():
+            if stats:
+                metrics.set_gauge(f"queue.{queue_name}.messages", stats["messages"])
+                metrics.set_gauge(f"queue.{queue_name}.consumers", stats["consumers"])
+        metrics.set_gauge("queue.backlog", summary["backlog"])
+        metrics.set_gauge("queue.oldest_age_seconds", summary["oldest_age_seconds"] or 0.0)
+        self.last_sample = summary
+        self.last_sample_at = time.monotonic()
+        return summary
+
+    def is_fresh(self, max_age: float = None) -> bool:
+        """Whether the last successful sample is recent enough to be trusted."""
+        max_age = max_age if max_age is not None else settings.PROBE_INTERVAL * 3
+        return bool(self.last_sample_at) and time.monotonic() - self.last_sample_at <= max_age
+
+    def run(self, stop_event: threading.Event = None, interval: float = None):
+        """
+        Sample every ``interval`` seconds until ``stop_event`` is set.
+        :param stop_event: optional Event ending the loop
+        :param interval: float seconds between samples, defaults to PROBE_INTERVAL
+        """
+        interval = interval or settings.PROBE_INTERVAL
+        stop_event = stop_event or threading.Event()
+        while not stop_event.is_set():
+            try:
+                self.sample()
+            except Exception:
+                logging.error("Queue probe failed", exc_info=True)
+            stop_event.wait(interval)
+        self.close()
+
+    def _safe_stats(self, queue_name: str, peek_oldest: bool = False) -> Optional[Dict]:
+        try:
+            return self.queue_stats(queue_name, peek_oldest=peek_oldest)
+        except pika.exceptions.ChannelClosedByBroker:
+            # Passive declare of a missing queue closes the channel; it is reopened on the next call
+            logging.warning("Queue not found while probing", queue=queue_name)
+            return None
+
+
+delivery_ages = DeliveryAges()
@@ -1,14 +1,25 @@
 from configure_logging import get_logger
 import pika
 import json
+from profiles import active_profile
 from rabbitmq.connection import RabbitMQConnection
+from rabbitmq.sharding import shard_for, shard_routing_key
 logging = get_logger(__name__)
 
 
 class BasicMessagePublisher(RabbitMQConnection):
-    def publish(self, exchange_name, routing_key, body, properties: pika.BasicProperties=None):
+    def publish(self, exchange_name, routing_key, body, properties: pika.BasicProperties=None) -> bool:
+        """
+        Publish a JSON message.
+        :return: bool whether the message was published, and confirmed on a confirm-mode channel
+        """
         try:
             self.ensure_connection()
+            if properties is None:
+                properties = pika.BasicProperties()
+            if properties.delivery_mode is None:
+                properties.delivery_mode = active_profile().delivery_mode.value
+            # On a confirm-mode channel this blocks until the broker confirms, and raises if it nacks
             self.channel.basic_publish(
                 exchange=exchange_name,
                 routing_key=routing_key,
@@ -17,7 +28,22 @@ class BasicMessagePublisher(RabbitMQConnection):
             )
             self.channel.basic_qos(prefetch_count=1)
             logging.info("RabbitMQ message published", exchange=exchange_name, routing_key=routing_key, body=body)
+            return True
         except Exception as e:
             logging.error("Failed to publish message to RabbitMQ", exc_info=True)
+            return False
+
+    def publish_sharded(self, exchange_name, body, shard_count, properties: pika.BasicProperties=None):
+        """
+        Publish a message to the shard owning its ``user_id``.
+        :param exchange_name: str shard exchange name
+        :param body: dict message body with a ``user_id`` field
+        :param shard_count: int number of shards
+        :param properties: optional pika.BasicProperties
+        :return: int shard index the message was routed to
+        """
+        shard = shard_for(body.get("user_id", ""), shard_count)
+        self.publish(exchange_name, shard_routing_key(shard), body, properties)
+        return shard
 
 publisher = BasicMessagePublisher()
\ No newline at end of file
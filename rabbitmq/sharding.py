@@ -0,0 +1,45 @@
+"""
+Client-side consistent hashing of messages onto shard queues.
+
+Jump consistent hash (Lamping & Veach) maps a key to one of N buckets so that
+growing from N to N+1 shards moves only about 1/(N+1) of the keys, all of them
+onto the new shard, and never reshuffles keys between existing shards.
+"""
+import hashlib
+from constants import QueueName
+
+
+def jump_consistent_hash(key: int, buckets: int) -> int:
+    """
+    Map a 64-bit key to a bucket in ``[0, buckets)``.
+    :param key: int 64-bit key
+    :param buckets: int number of buckets
+    :return: int bucket index
+    """
+    if buckets < 1:
+        raise ValueError("buckets must be at least 1")
+    bucket, candidate = -1, 0
+    while candidate < buckets:
+        bucket = candidate
+        key = (key * 2862933555777941757 + 1) & 0xFFFFFFFFFFFFFFFF
+        candidate = int((bucket + 1) * ((1 << 31) / ((key >> 33) + 1)))
+    return bucket
+
+
+def shard_for(user_id: str, shard_count: int) -> int:
+    """
+    Pick the shard of a user. Stable across processes and restarts.
+    :param user_id: str user ID
+    :param shard_count: int number of shards
+    :return: int shard index
+    """
+    digest = hashlib.blake2b(str(user_id).encode("utf-8"), digest_size=8).digest()
+    return jump_consistent_hash(int.from_bytes(digest, "big"), shard_count)
+
+
+def shard_queue_name(index: int) -> str:
+    return QueueName.INCOMING_TEXTS_SHARD.format(index=index)
+
+
+def shard_routing_key(index: int) -> str:
+    return str(index)
@@ -0,0 +1,109 @@
+import threading
+import time
+from collections import OrderedDict
+from config import settings
+from metrics import metrics
+
+
+class TokenBucket:
+    """
+    Thread-safe token bucket rate limiter.
+    Tokens refill continuously at ``rate`` per second up to ``capacity``; ``acquire``
+    blocks until enough tokens are available. A rate of 0 or less disables limiting.
+    """
+
+    def __init__(self, rate: float, capacity: float = None):
+        self.rate = rate
+        self.capacity = capacity if capacity is not None else max(rate, 1)
+        self._tokens = self.capacity
+        self._updated = time.monotonic()
+        self._lock = threading.Lock()
+
+    def _refill(self, now: float):
+        self._tokens = min(self.capacity, self._tokens + (now - self._updated) * self.rate)
+        self._updated = now
+
+    def try_acquire(self, tokens: float = 1) -> bool:
+        """
+        Take tokens if they are available right now.
+        :param tokens: float number of tokens
+        :return: bool True if the tokens were taken
+        """
+        if self.rate <= 0:
+            return True
+        with self._lock:
+            self._refill(time.monotonic())
+            if self._tokens >= tokens:
+                self._tokens -= tokens
+                return True
+            return False
+
+    def acquire(self, tokens: float = 1) -> float:
+        """
+        Block until ``tokens`` are available and take them. Requests larger than the
+        capacity are allowed and leave the bucket in debt, so they wait proportionally.
+        :param tokens: float number of tokens
+        :return: float seconds spent waiting
+        """
+        if self.rate <= 0:
+            return 0.0
+        with self._lock:
+            self._refill(time.monotonic())
+            self._tokens -= tokens
+            wait = -self._tokens / self.rate if self._tokens < 0 else 0.0
+        if wait:
+            time.sleep(wait)
+        return wait
+
+
+class UserRateLimiter:
+    """
+    Token bucket per user, in a table bounded by LRU: the least recently seen user's
+    bucket is evicted past ``max_users``, and a user seen again starts with a full bucket.
+    Keeps track of the users currently over their limit for the fairness metrics.
+    """
+
+    def __init__(self, rate: float = None, burst: float = None, max_users: int = None):
+        """
+        :param rate: float messages per second per user
+        :param burst: float messages a user may send at once before being limited
+        :param max_users: int buckets kept in memory
+        """
+        self.rate = settings.USER_RATE_LIMIT if rate is None else rate
+        self.burst = settings.USER_RATE_LIMIT_BURST if burst is None else burst
+        self.max_users = max_users or settings.USER_RATE_LIMIT_MAX_USERS
+        self._buckets: "OrderedDict[str, TokenBucket]" = OrderedDict()
+        self._throttled = set()
+        self._lock = threading.Lock()
+
+    def try_acquire(self, user_id: str) -> bool:
+        """
+        Take one token from the user's bucket.
+        :param user_id: str user the message belongs to
+        :return: bool False when the user is over their limit
+        """
+        with self._lock:
+            bucket = self._buckets.get(user_id)
+            if bucket is None:
+                bucket = self._buckets[user_id] = TokenBucket(self.rate, capacity=self.burst)
+                if len(self._buckets) > self.max_users:
+                    evicted, _ = self._buckets.popitem(last=False)
+                    self._throttled.discard(evicted)
+            else:
+                self._buckets.move_to_end(user_id)
+            allowed = bucket.try_acquire()
+            if allowed:
+                self._throttled.discard(user_id)
+            else:
+                self._throttled.add(user_id)
+            metrics.set_gauge("fairness.throttled_users", len(self._throttled))
+            metrics.set_gauge("fairness.tracked_users", len(self._buckets))
+        if not allowed:
+            metrics.increment("fairness.throttled")
+        return allowed
+
+    @property
+    def throttled_users(self) -> int:
+        """Number of users whose last message was over their limit."""
+        with self._lock:
+            return len(self._throttled)
@@ -0,0 +1,18 @@
+import random
+from constants import RetryConfig
+
+
+def backoff_delay(attempt: int, initial: float = RetryConfig.INITIAL_DELAY, maximum: float = RetryConfig.MAX_DELAY,
+                  base: float = RetryConfig.EXPONENTIAL_BASE) -> float:
+    """
+    Exponential backoff with full jitter: a uniform delay between zero and
+    ``initial * base ** attempt``, capped at ``maximum``. Spreading the delay over
+    the whole range keeps many clients that failed together from retrying together.
+    :param attempt: int zero-based retry attempt
+    :param initial: float delay ceiling for the first retry, in seconds
+    :param maximum: float upper bound for any delay, in seconds
+    :param base: float growth factor per attempt
+    :return: float seconds to wait
+    """
+    ceiling = min(maximum, initial * base ** min(attempt, 64))
+    return random.uniform(0, ceiling)
@@ -0,0 +1,204 @@
+"""
+Hot-reloadable performance settings.
+
+A subset of ``config.Settings`` can be changed without a restart. Overrides are
+read from ``RUNTIME_CONFIG_FILE`` (``KEY=VALUE`` lines, like ``.env``) whenever
+the file changes or the process receives SIGHUP. The merged settings are
+validated by ``Settings`` as a whole before anything is applied; an invalid
+file is logged and ignored. Each accepted change is written to the live
+``settings`` object, logged, and pushed to the components that registered an
+applier for it (consumer prefetch, scoring pool, caches, scorer versions, log level...).
+"""
+import logging as std_logging
+import os
+import threading
+from typing import Callable, Dict, Iterable, List, Tuple
+from dotenv import dotenv_values
+from pydantic import ValidationError
+from config import SCORER_SETTINGS, parse_setting, settings, Settings
+from configure_logging import get_logger
+from database.audit import audit_log
+from scoring.cache import score_cache
+from scoring.factory import scorer_settings, scorers
+from scoring.neardup import near_duplicates
+from scoring.normalization import normalizer
+from scoring.pool import resize_scoring_pool
+
+logging = get_logger(__name__)
+
+RUNTIME_TUNABLE = (
+    "RABBITMQ_PREFETCH_COUNT",
+    "CONSUMER_MAX_PENDING_PER_KEY",
+    "CONSUMER_DRAIN_TIMEOUT",
+    "AUDIT_LOG_BATCH_SIZE",
+    "AUDIT_LOG_FLUSH_INTERVAL",
+    "SPOOL_REPLAY_BATCH_SIZE",
+    "SCORING_POOL_SIZE",
+    "SCORE_CACHE_SIZE",
+    "NEARDUP_INDEX_SIZE",
+    "NEARDUP_MAX_DISTANCE",
+    "NORMALIZATION_CACHE_SIZE",
+    "LOG_LEVEL",
+    "AUTOSCALE_SCALE_UP_BACKLOG",
+    "AUTOSCALE_SCALE_DOWN_BACKLOG",
+    "AUTOSCALE_TARGET_LATENCY",
+    "AUTOSCALE_MAX_CPU",
+    "AUTOSCALE_STABLE_SAMPLES",
+    "SCORER_VERSION",
+    "SCORER_SHADOW_VERSION",
+    "SCORER_SHADOW_SETTINGS",
+    "SCORER_SHADOW_SAMPLE_RATE",
+) + SCORER_SETTINGS
+
+Applier = Callable[[Dict[str, object]], None]
+
+
+class RuntimeConfig:
+    """Watches the runtime override file and applies validated changes to the live settings."""
+
+    def __init__(self, path: str = None, poll_interval: float = None):
+        self.path = path if path is not None else settings.RUNTIME_CONFIG_FILE
+        self.poll_interval = poll_interval or settings.RUNTIME_CONFIG_POLL_INTERVAL
+        self._appliers: List[Tuple[Tuple[str, ...], Applier]] = []
+        self._lock = threading.Lock()
+        self._reload_requested = threading.Event()
+        self._mtime = None
+        self._thread = None
+
+    def register(self, keys: Iterable[str], applier: Applier):
+        """
+        Call ``applier`` with the changed values whenever one of ``keys`` changes.
+        :param keys: iterable of setting names from RUNTIME_TUNABLE
+        :param applier: callable taking a dict of changed setting names to new values
+        """
+        keys = tuple(keys)
+        unknown = set(keys) - set(RUNTIME_TUNABLE)
+        if unknown:
+            raise ValueError(f"Settings are not runtime tunable: {', '.join(sorted(unknown))}")
+        with self._lock:
+            self._appliers.append((keys, applier))
+
+    def unregister(self, applier: Applier):
+        with self._lock:
+            self._appliers = [(keys, fn) for keys, fn in self._appliers if fn != applier]
+
+    def read_overrides(self) -> Dict[str, str]:
+        if not self.path or not os.path.exists(self.path):
+            return {}
+        return {key: value for key, value in dotenv_values(self.path).items() if value is not None}
+
+    def reload(self) -> Dict[str, object]:
+        """
+        Re-read the override file, validate, and apply what changed.
+        :return: dict of applied setting names to new values, empty if nothing changed or the file is invalid
+        """
+        overrides = self.read_overrides()
+        ignored = sorted(set(overrides) - set(RUNTIME_TUNABLE))
+        if ignored:
+            logging.warning("Ignoring settings that need a restart", settings=ignored, path=self.path)
+        tunable = {key: parse_setting(key, value) for key, value in overrides.items() if key in RUNTIME_TUNABLE}
+        try:
+            candidate = Settings(**{**settings.model_dump(), **tunable})
+        except ValidationError as e:
+            logging.error("Rejected runtime settings, keeping current values", path=self.path,
+                          errors=e.errors(include_url=False))
+            return {}
+
+        changes = {}
+        for key in RUNTIME_TUNABLE:
+            old, new = getattr(settings, key), getattr(candidate, key)
+            if old != new:
+                setattr(settings, key, new)
+                changes[key] = new
+                logging.info("Runtime setting changed", setting=key, old=old, new=new)
+        if changes:
+            self._apply(changes)
+        return changes
+
+    def request_reload(self):
+        """Ask the watcher thread to reload now. Safe to call from a signal handler."""
+        self._reload_requested.set()
+
+    def start(self):
+        """Start the watcher thread (idempotent)."""
+        with self._lock:
+            if self._thread is not None:
+                return
+            self._mtime = self._current_mtime()
+            self._thread = threading.Thread(target=self._run, name="RuntimeConfigWatcher", daemon=True)
+            self._thread.start()
+        if self._mtime is not None:
+            self.reload()
+
+    def _run(self):
+        while True:
+            requested = self._reload_requested.wait(self.poll_interval)
+            self._reload_requested.clear()
+            mtime = self._current_mtime()
+            if not requested and mtime == self._mtime:
+                continue
+            self._mtime = mtime
+            try:
+                self.reload()
+            except Exception:
+                logging.error("Failed to reload runtime settings", exc_info=True)
+
+    def _apply(self, changes: Dict[str, object]):
+        with self._lock:
+            appliers = list(self._appliers)
+        for keys, applier in appliers:
+            relevant = {key: value for key, value in changes.items() if key in keys}
+            if not relevant:
+                continue
+            try:
+                applier(relevant)
+            except Exception:
+                logging.error("Failed to apply runtime setting", settings=sorted(relevant), exc_info=True)
+
+    def _current_mtime(self):
+        try:
+            return os.stat(self.path).st_mtime_ns
+        except (OSError, TypeError):
+            return None
+
+
+def _apply_log_level(changes):
+    std_logging.getLogger().setLevel(changes["LOG_LEVEL"].upper())
+
+
+def _apply_scoring(changes):
+    if "SCORE_CACHE_SIZE" in changes:
+        score_cache.resize(changes["SCORE_CACHE_SIZE"])
+    if "NORMALIZATION_CACHE_SIZE" in changes:
+        normalizer.resize(changes["NORMALIZATION_CACHE_SIZE"])
+    if "SCORING_POOL_SIZE" in changes:
+        resize_scoring_pool(changes["SCORING_POOL_SIZE"])
+    if "NEARDUP_INDEX_SIZE" in changes or "NEARDUP_MAX_DISTANCE" in changes:
+        near_duplicates.configure(max_size=changes.get("NEARDUP_INDEX_SIZE"),
+                                  max_distance=changes.get("NEARDUP_MAX_DISTANCE"))
+
+
+def _apply_scorer_version(changes):
+    if "SCORER_SHADOW_SAMPLE_RATE" in changes:
+        scorers.sample_rate = changes["SCORER_SHADOW_SAMPLE_RATE"]
+    # Loaded first, so that promoting the shadowed version takes its warm candidate before shadowing stops
+    if "SCORER_VERSION" in changes or set(changes) & set(SCORER_SETTINGS):
+        scorers.load(settings.SCORER_VERSION)
+    if "SCORER_SHADOW_VERSION" in changes or "SCORER_SHADOW_SETTINGS" in changes:
+        scorers.shadow(settings.SCORER_SHADOW_VERSION, scorer_settings(settings.SCORER_SHADOW_SETTINGS))
+
+
+def _apply_audit_log(changes):
+    if "AUDIT_LOG_BATCH_SIZE" in changes:
+        audit_log.batch_size = changes["AUDIT_LOG_BATCH_SIZE"]
+    if "AUDIT_LOG_FLUSH_INTERVAL" in changes:
+        audit_log.flush_interval = changes["AUDIT_LOG_FLUSH_INTERVAL"]
+
+
+runtime_config = RuntimeConfig()
+runtime_config.register(("LOG_LEVEL",), _apply_log_level)
+runtime_config.register(("SCORE_CACHE_SIZE", "NORMALIZATION_CACHE_SIZE", "SCORING_POOL_SIZE", "NEARDUP_INDEX_SIZE",
+                         "NEARDUP_MAX_DISTANCE"), _apply_scoring)
+runtime_config.register(("AUDIT_LOG_BATCH_SIZE", "AUDIT_LOG_FLUSH_INTERVAL"), _apply_audit_log)
+runtime_config.register(("SCORER_VERSION", "SCORER_SHADOW_VERSION", "SCORER_SHADOW_SETTINGS",
+                         "SCORER_SHADOW_SAMPLE_RATE") + SCORER_SETTINGS, _apply_scorer_version)
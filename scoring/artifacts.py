@@ -0,0 +1,87 @@
+"""
+Helpers for memory-mapped, read-only model artifacts.
+
+Artifacts mapped with ``open_mapping`` live in the page cache, so every consumer
+process on a host shares the same physical pages instead of holding a private copy.
+"""
+import mmap
+import os
+import resource
+import time
+from typing import Dict
+from configure_logging import get_logger
+
+logging = get_logger(__name__)
+
+_first_score_reported = False
+
+
+def open_mapping(path: str) -> mmap.mmap:
+    """
+    Map a file read-only.
+    :param path: str artifact path
+    :return: mmap.mmap read-only mapping of the whole file
+    """
+    with open(path, "rb") as fh:
+        mapping = mmap.mmap(fh.fileno(), 0, access=mmap.ACCESS_READ)
+    if hasattr(mapping, "madvise") and hasattr(mmap, "MADV_WILLNEED"):
+        mapping.madvise(mmap.MADV_WILLNEED)
+    return mapping
+
+
+def warm_up_pages(mapping: mmap.mmap) -> int:
+    """
+    Touch every page of a mapping so the first lookups do not take page faults.
+    :param mapping: mmap.mmap mapping to fault in
+    :return: int number of pages touched
+    """
+    pages = 0
+    for offset in range(0, len(mapping), mmap.PAGESIZE):
+        mapping[offset]
+        pages += 1
+    return pages
+
+
+def process_memory() -> Dict[str, int]:
+    """
+    Report the resident memory of the current process in KiB.
+    ``shared`` counts file-backed and shared pages (such as mapped artifacts), ``private`` anonymous ones.
+    :return: dict with rss, shared, private and max_rss
+    """
+    usage = {"max_rss": resource.getrusage(resource.RUSAGE_SELF).ru_maxrss}
+    fields = {"VmRSS": "rss", "RssAnon": "private", "RssFile": "shared", "RssShmem": "shared"}
+    try:
+        with open("/proc/self/status", encoding="ascii") as fh:
+            for line in fh:
+                key, _, value = line.partition(":")
+                if key in fields:
+                    name = fields[key]
+                    usage[name] = usage.get(name, 0) + int(value.split()[0])
+    except OSError:
+        pass
+    return usage
+
+
+def process_uptime() -> float:
+    """
+    Seconds since the current process started, read from /proc when available.
+    :return: float uptime in seconds
+    """
+    try:
+        with open("/proc/self/stat", encoding="ascii") as fh:
+            start_ticks = int(fh.read().rpartition(")")[2].split()[19])
+        with open("/proc/uptime", encoding="ascii") as fh:
+            system_uptime = float(fh.read().split()[0])
+        return system_uptime - start_ticks / os.sysconf("SC_CLK_TCK")
+    except (OSError, ValueError, IndexError):
+        return time.process_time()
+
+
+def report_first_score():
+    """Log time-to-first-score and memory once per process."""
+    global _first_score_reported
+    if _first_score_reported:
+        return
+    _first_score_reported = True
+    logging.info("First score produced", time_to_first_score=round(process_uptime(), 3), pid=os.getpid(),
+                 **process_memory())
@@ -0,0 +1,37 @@
+from typing import List
+
+
+class Scorer:
+    """
+    Base class for toxicity scorers.
+    Implementations score normalized text on the 0-100 scale and may override
+    ``score_batch`` when they can score several texts more cheaply than one by one.
+    """
+
+    name = "base"
+
+    def score(self, text: str) -> float:
+        """
+        Score a single normalized text.
+        :param text: str normalized text
+        :return: float score between 0 and 100
+        """
+        raise NotImplementedError
+
+    def score_batch(self, texts: List[str]) -> List[float]:
+        """
+        Score a batch of normalized texts.
+        :param texts: list of normalized texts
+        :return: list of float scores in input order
+        """
+        return [self.score(text) for text in texts]
+
+    def warm_up(self):
+        """Load lazily initialized state and fault in artifacts before the first real request."""
+
+    def memory_bytes(self) -> int:
+        """
+        Estimate the memory held by the scorer's loaded state.
+        :return: int bytes, 0 when the scorer cannot tell
+        """
+        return 0
@@ -0,0 +1,77 @@
+import hashlib
+import threading
+from collections import OrderedDict
+from typing import Union
+from config import settings
+
+
+class ScoreCache:
+    """
+    Thread-safe LRU cache of scores keyed by normalized text.
+    Keys are digests of the normalized form, so obfuscated variants of the same
+    text share one entry and long texts do not inflate the cache.
+    """
+
+    def __init__(self, max_size: int = None):
+        self.max_size = settings.SCORE_CACHE_SIZE if max_size is None else max_size
+        self._entries = OrderedDict()
+        self._lock = threading.Lock()
+        self.hits = 0
+        self.misses = 0
+
+    @staticmethod
+    def key_for(normalized_text: str) -> bytes:
+        return hashlib.blake2b(normalized_text.encode("utf-8"), digest_size=16).digest()
+
+    def get(self, normalized_text: str) -> Union[float, None]:
+        """
+        Look up the cached score of a normalized text.
+        :param normalized_text: str normalized text
+        :return: float score, or None on a miss
+        """
+        if self.max_size <= 0:
+            return None
+        key = self.key_for(normalized_text)
+        with self._lock:
+            score = self._entries.get(key)
+            if score is None:
+                self.misses += 1
+                return None
+            self._entries.move_to_end(key)
+            self.hits += 1
+            return score
+
+    def put(self, normalized_text: str, score: float):
+        """
+        Store the score of a normalized text, evicting the least recently used entry when full.
+        :param normalized_text: str normalized text
+        :param score: float score
+        """
+        if self.max_size <= 0:
+            return
+        key = self.key_for(normalized_text)
+        with self._lock:
+            self._entries[key] = score
+            self._entries.move_to_end(key)
+            while len(self._entries) > self.max_size:
+                self._entries.popitem(last=False)
+
+    def resize(self, max_size: int):
+        """
+        Change the capacity, evicting least recently used entries if it shrinks.
+        :param max_size: int new capacity, 0 disables the cache
+        """
+        with self._lock:
+            self.max_size = max_size
+            while len(self._entries) > max(max_size, 0):
+                self._entries.popitem(last=False)
+
+    def clear(self):
+        with self._lock:
+            self._entries.clear()
+
+    def __len__(self):
+        return len(self._entries)
+
+
+score_cache = ScoreCache()
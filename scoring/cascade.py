@@ -0,0 +1,73 @@
+import time
+from typing import List
+from config import settings
+from configure_logging import get_logger
+from metrics import metrics
+from scoring.base import Scorer
+
+logging = get_logger(__name__)
+
+
+class CascadeScorer(Scorer):
+    """
+    Two-stage scorer: a cheap first pass settles confidently benign or toxic texts,
+    and only texts whose first-pass score falls strictly inside the uncertainty band
+    ``(low, high)`` go on to the expensive scorer.
+
+    Per-stage decisions and latencies are recorded in the metrics registry under
+    ``scoring.cascade.*`` so the band can be tuned against observed hit rates.
+    """
+
+    name = "cascade"
+
+    def __init__(self, fast: Scorer, slow: Scorer, low: float = None, high: float = None):
+        self.fast = fast
+        self.slow = slow
+        self.low = settings.SCORING_CASCADE_LOW if low is None else low
+        self.high = settings.SCORING_CASCADE_HIGH if high is None else high
+
+    def is_confident(self, score: float) -> bool:
+        return score <= self.low or score >= self.high
+
+    def score(self, text: str) -> float:
+        return self.score_batch([text])[0]
+
+    def warm_up(self):
+        self.fast.warm_up()
+        self.slow.warm_up()
+
+    def score_batch(self, texts: List[str]) -> List[float]:
+        start = time.perf_counter()
+        scores = self.fast.score_batch(texts)
+        metrics.observe("scoring.cascade.fast.latency", time.perf_counter() - start)
+
+        ambiguous = [index for index, score in enumerate(scores) if not self.is_confident(score)]
+        decided = len(texts) - len(ambiguous)
+        metrics.increment("scoring.cascade.texts", len(texts))
+        metrics.increment("scoring.cascade.fast.decided", decided)
+        if ambiguous:
+            start = time.perf_counter()
+            slow_scores = self.slow.score_batch([texts[index] for index in ambiguous])
+            metrics.observe("scoring.cascade.slow.latency", time.perf_counter() - start)
+            metrics.increment("scoring.cascade.slow.scored", len(ambiguous))
+            for index, score in zip(ambiguous, slow_scores):
+                scores[index] = score
+        logging.debug("Cascade scored batch", texts=len(texts), fast_decided=decided, escalated=len(ambiguous))
+        return scores
+
+    @staticmethod
+    def stats() -> dict:
+        """
+        Summarize cascade hit rates and per-stage latencies.
+        :return: dict with fast hit rate, escalation rate and mean latency per stage
+        """
+        total = metrics.counter("scoring.cascade.texts")
+        fast = metrics.timing("scoring.cascade.fast.latency")
+        slow = metrics.timing("scoring.cascade.slow.latency")
+        return {
+            "texts": total,
+            "fast_hit_rate": metrics.counter("scoring.cascade.fast.decided") / total if total else 0.0,
+            "escalation_rate": metrics.counter("scoring.cascade.slow.scored") / total if total else 0.0,
+            "fast_mean_latency": fast["mean"],
+            "slow_mean_latency": slow["mean"],
+        }
@@ -0,0 +1,118 @@
+from concurrent.futures import Executor, Future, as_completed
+from statistics import fmean
+from typing import Callable, Dict, List
+from config import settings
+from configure_logging import get_logger
+from scoring.base import Scorer
+from scoring.pool import get_scoring_pool
+
+logging = get_logger(__name__)
+
+REDUCERS: Dict[str, Callable[[List[float]], float]] = {
+    "max": max,
+    "mean": fmean,
+}
+
+# With early exit, a batch is cut into this many slices per pool worker so that
+# slices not yet started can still be cancelled once every text is decided
+EARLY_EXIT_SLICES_PER_WORKER = 4
+
+
+def split_text(text: str, chunk_size: int, overlap: int) -> List[str]:
+    """
+    Split text into fixed-size windows that overlap by ``overlap`` characters.
+    :param text: str text to split
+    :param chunk_size: int maximum chunk length in characters
+    :param overlap: int number of characters shared by consecutive chunks
+    :return: list of chunks covering the whole text
+    """
+    if chunk_size <= 0 or len(text) <= chunk_size:
+        return [text]
+    step = chunk_size - overlap
+    chunks = []
+    for start in range(0, len(text), step):
+        chunks.append(text[start:start + chunk_size])
+        if start + chunk_size >= len(text):
+            break
+    return chunks
+
+
+class ChunkedScorer(Scorer):
+    """
+    Scores long texts as overlapping chunks in parallel on the scoring pool.
+
+    The chunks of a whole batch go through the inner scorer's ``score_batch``, split
+    into one slice per pool worker, and chunk scores are combined per text with the
+    configured reducer. With early exit enabled, the batch is cut into smaller slices;
+    once every text is decided (a chunk reached the toxicity threshold, or all its
+    chunks are scored) slices not yet started are cancelled, and a decided text gets
+    the highest score seen so far.
+    """
+
+    name = "chunked"
+
+    def __init__(self, scorer: Scorer, chunk_size: int = None, overlap: int = None, reducer: str = None,
+                 early_exit: bool = None, threshold: float = None, pool: Executor = None):
+        self.scorer = scorer
+        self.chunk_size = settings.SCORING_CHUNK_SIZE if chunk_size is None else chunk_size
+        self.overlap = settings.SCORING_CHUNK_OVERLAP if overlap is None else overlap
+        self.reducer = REDUCERS[reducer or settings.SCORING_CHUNK_REDUCER]
+        self.early_exit = settings.SCORING_EARLY_EXIT if early_exit is None else early_exit
+        self.threshold = settings.SCORING_TOXICITY_THRESHOLD if threshold is None else threshold
+        self.pool = pool
+
+    def score(self, text: str) -> float:
+        return self.score_batch([text])[0]
+
+    def warm_up(self):
+        self.scorer.warm_up()
+        get_scoring_pool()
+
+    def score_batch(self, texts: List[str]) -> List[float]:
+        pool = self.pool or get_scoring_pool()
+        chunks, owners = [], []
+        for index, text in enumerate(texts):
+            text_chunks = split_text(text, self.chunk_size, self.overlap)
+            if len(text_chunks) > 1:
+                logging.debug("Scoring long text in chunks", length=len(text), chunks=len(text_chunks))
+            chunks.extend(text_chunks)
+            owners.extend([index] * len(text_chunks))
+        if not chunks:
+            return []
+        slices = self._slice_count(pool, len(chunks))
+        size = -(-len(chunks) // slices)
+        futures = {pool.submit(self.scorer.score_batch, chunks[start:start + size]): start
+                   for start in range(0, len(chunks), size)}
+        return self._collect(futures, owners, len(texts))
+
+    def _slice_count(self, pool: Executor, chunk_count: int) -> int:
+        workers = getattr(pool, "_max_workers", None) or settings.SCORING_POOL_SIZE
+        if self.early_exit:
+            workers *= EARLY_EXIT_SLICES_PER_WORKER
+        return max(1, min(workers, chunk_count))
+
+    def _collect(self, futures: Dict[Future, int], owners: List[int], text_count: int) -> List[float]:
+        scores: List[List[float]] = [[] for _ in range(text_count)]
+        remaining = [0] * text_count
+        for owner in owners:
+            remaining[owner] += 1
+        tripped = [False] * text_count
+        undecided = text_count
+        for future in as_completed(futures):
+            start = futures[future]
+            for offset, score in enumerate(future.result()):
+                owner = owners[start + offset]
+                scores[owner].append(score)
+                remaining[owner] -= 1
+                if tripped[owner]:
+                    continue
+                tripped[owner] = self.early_exit and score >= self.threshold
+                if tripped[owner] or not remaining[owner]:
+                    undecided -= 1
+            if self.early_exit and not undecided:
+                cancelled = sum(other.cancel() for other in futures)
+                if cancelled:
+                    logging.debug("Early exit on toxic chunks", cancelled=cancelled)
+                break
+        return [max(text_scores) if hit else self.reducer(text_scores)
+                for text_scores, hit in zip(scores, tripped)]
@@ -0,0 +1,94 @@
+import os
+import threading
+import time
+from typing import Dict
+from config import parse_setting, settings, Settings
+from configure_logging import get_logger
+from scoring.artifacts import process_memory
+from scoring.base import Scorer
+from scoring.cascade import CascadeScorer
+from scoring.chunked import ChunkedScorer
+from scoring.lexicon import LexiconScorer
+from scoring.registry import ScorerRegistry
+from scoring.routing import LanguageRouter
+from scoring.simulated import SimulatedScorer
+
+logging = get_logger(__name__)
+
+_fallback_scorer = None
+_scorer_lock = threading.Lock()
+
+
+def build_scorer(config: Settings = None) -> Scorer:
+    """
+    Build the scorer pipeline described by the settings.
+    :param config: Settings to build from, defaults to the live settings
+    :return: Scorer instance
+    """
+    config = config or settings
+    scorer = SimulatedScorer()
+    if config.SCORING_CHUNK_SIZE > 0:
+        scorer = ChunkedScorer(scorer, chunk_size=config.SCORING_CHUNK_SIZE, overlap=config.SCORING_CHUNK_OVERLAP,
+                               reducer=config.SCORING_CHUNK_REDUCER, early_exit=config.SCORING_EARLY_EXIT)
+    if config.SCORING_CASCADE_ENABLED:
+        scorer = CascadeScorer(fast=LexiconScorer.from_file(config.SCORING_LEXICON_PATH), slow=scorer,
+                               low=config.SCORING_CASCADE_LOW, high=config.SCORING_CASCADE_HIGH)
+    if config.SCORING_LANGUAGE_ROUTING:
+        scorer = LanguageRouter(default=scorer, sources=config.SCORING_LANGUAGE_SCORERS,
+                                memory_budget=config.SCORING_LANGUAGE_MEMORY_BUDGET_MB)
+    logging.info("Scorer built", scorer=scorer.name)
+    return scorer
+
+
+def scorer_settings(overrides: Dict[str, str]) -> Settings:
+    """
+    Settings to build a candidate scorer from: the live settings with some scorer settings overridden.
+    :param overrides: dict of SCORER_SETTINGS names to values, as in the environment
+    :return: Settings
+    :raises pydantic.ValidationError: when an override is invalid
+    """
+    if not overrides:
+        return settings
+    return Settings(**{**settings.model_dump(), **{key: parse_setting(key, value) for key, value in overrides.items()}})
+
+
+scorers = ScorerRegistry(build_scorer)
+
+
+def get_scorer() -> Scorer:
+    """
+    Return the active process-wide scorer, building it on first use.
+    :return: Scorer instance
+    """
+    return scorers.current()[1]
+
+
+def get_fallback_scorer() -> Scorer:
+    """
+    Return the cheap lexicon scorer used for messages that must not wait for the
+    full scorer (users over their rate limit), loading it on first use.
+    :return: Scorer instance
+    """
+    global _fallback_scorer
+    if _fallback_scorer is None:
+        with _scorer_lock:
+            if _fallback_scorer is None:
+                _fallback_scorer = LexiconScorer.from_file()
+    return _fallback_scorer
+
+
+def warm_up_scorer() -> Scorer:
+    """
+    Build the scorer and warm it up so the first delivery does not pay for
+    loading artifacts or faulting in mapped pages.
+    :return: Scorer instance
+    """
+    before = process_memory()
+    start = time.perf_counter()
+    scorer = get_scorer()
+    scorer.warm_up()
+    logging.info("Scorer warmed up", scorer=scorer.name, version=scorers.version, pid=os.getpid(),
+                 seconds=round(time.perf_counter() - start, 3), rss_before=before.get("rss"), **process_memory())
+    if settings.SCORER_SHADOW_VERSION:
+        scorers.shadow(settings.SCORER_SHADOW_VERSION, scorer_settings(settings.SCORER_SHADOW_SETTINGS))
+    return scorer
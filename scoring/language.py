@@ -0,0 +1,89 @@
+"""
+Fast language identification of normalized text, to route it to a per-language scorer.
+
+No model is involved: the dominant Unicode script settles most languages, and
+Latin-script text is told apart by votes of common function words. Only the first
+``SAMPLE_CHARS`` characters are looked at, so the cost does not grow with the text.
+Texts are normalized first (case folded, accents stripped), so the word lists are
+written without accents.
+"""
+import re
+from typing import Dict, Set
+
+UNDETERMINED = "und"
+SAMPLE_CHARS = 400
+
+# Script → character ranges, for scripts used by (mostly) one language of interest
+_SCRIPT_RANGES = [
+    ("ru", "Ѐ-ӿ"),
+    ("el", "Ͱ-Ͽ"),
+    ("ar", "؀-ۿݐ-ݿ"),
+    ("he", "֐-׿"),
+    ("hi", "ऀ-ॿ"),
+    ("th", "฀-๿"),
+    # Syllables, and the jamo NFKD decomposes them into
+    ("ko", "가-힯ᄀ-ᇿ"),
+    ("ja", "぀-ヿ"),
+    ("zh", "一-鿿"),
+]
+# Per script: a pattern finding its characters, and one deleting every other character,
+# since measuring what is left is cheaper than collecting matches
+_SCRIPTS = [(language, re.compile(f"[{ranges}]"), re.compile(f"[^{ranges}]+")) for language, ranges in _SCRIPT_RANGES]
+# Letters only Ukrainian uses among Cyrillic languages
+_UKRAINIAN = re.compile("[іїєґ]")
+# Kana marks Japanese even when Han characters dominate
+_KANA = re.compile("[぀-ヿ]")
+_LATIN_WORD = re.compile(r"[a-z]+")
+
+_STOPWORDS: Dict[str, Set[str]] = {
+    "en": {"the", "and", "is", "are", "you", "of", "to", "this", "that", "it", "not", "with", "for", "was", "have",
+           "your", "what", "they", "be", "on"},
+    "fr": {"le", "la", "les", "et", "est", "une", "des", "du", "vous", "tu", "pas", "que", "qui", "ce", "je", "sur",
+           "avec", "pour", "mais", "dans"},
+    "es": {"el", "la", "los", "las", "y", "es", "una", "que", "de", "del", "no", "por", "para", "con", "eres", "pero",
+           "como", "muy", "esta", "tu"},
+    "de": {"der", "die", "das", "und", "ist", "nicht", "ein", "eine", "du", "ich", "sie", "mit", "auf", "fur", "zu",
+           "den", "dem", "bist", "sind", "aber"},
+    "it": {"il", "lo", "la", "gli", "e", "di", "che", "non", "sei", "una", "per", "con", "sono", "questo", "ma",
+           "come", "del", "della", "mi", "ti"},
+    "pt": {"o", "os", "as", "e", "um", "uma", "que", "nao", "voce", "do", "da", "dos", "para", "com", "por", "mas",
+           "muito", "isso", "esta", "sao"},
+    "nl": {"de", "het", "een", "en", "is", "niet", "ik", "jij", "je", "van", "dat", "die", "met", "voor", "op",
+           "zijn", "maar", "ook", "wat", "bent"},
+}
+# Word → languages using it, so each word is looked up once
+_VOTES: Dict[str, tuple] = {}
+for _language, _words in _STOPWORDS.items():
+    for _word in _words:
+        _VOTES[_word] = _VOTES.get(_word, ()) + (_language,)
+# Language → rank in _STOPWORDS, which breaks ties between votes
+_ORDER: Dict[str, int] = {language: rank for rank, language in enumerate(_STOPWORDS)}
+
+
+def identify_language(text: str) -> str:
+    """
+    Identify the language of a normalized text.
+    :param text: str normalized text
+    :return: str ISO 639-1 code, or ``und`` when it cannot be told
+    """
+    sample = text[:SAMPLE_CHARS]
+    if not sample.isascii():
+        # Most texts use one script: only scripts that occur at all are counted
+        counts = {language: len(others.sub("", sample)) for language, present, others in _SCRIPTS
+                  if present.search(sample)}
+        language, count = max(counts.items(), key=lambda item: item[1], default=(UNDETERMINED, 0))
+        # A few foreign characters (a quoted word, a symbol) do not decide the language
+        if count * 2 > len(sample) - sample.count(" "):
+            if language == "ru" and _UKRAINIAN.search(sample):
+                return "uk"
+            if language == "zh" and _KANA.search(sample):
+                return "ja"
+            return language
+    votes: Dict[str, int] = {}
+    for word in _LATIN_WORD.findall(sample):
+        for language in _VOTES.get(word, ()):
+            votes[language] = votes.get(language, 0) + 1
+    if not votes:
+        return UNDETERMINED
+    # Ties go to the language listed first in _STOPWORDS, English, whatever the word order
+    return max(votes, key=lambda language: (votes[language], -_ORDER[language]))
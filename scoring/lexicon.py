@@ -0,0 +1,351 @@
+import argparse
+import math
+import struct
+import sys
+from array import array
+from bisect import bisect_left
+from collections import deque
+from typing import Dict, List, NamedTuple, Tuple
+from config import settings
+from configure_logging import get_logger
+from constants import ScoringConfig
+from scoring.artifacts import open_mapping, warm_up_pages
+from scoring.base import Scorer
+from scoring.normalization import normalize_text
+
+logging = get_logger(__name__)
+
+AUTOMATON_MAGIC = b"TXAC"
+AUTOMATON_VERSION = 2
+# magic, version, byte order, word boundaries, terms, states, edges, outputs
+_HEADER = struct.Struct("<4sIIIIIII")
+_SECTION_ALIGNMENT = 8
+_WARM_UP_TEXT = "warm up the lexicon automaton"
+
+
+def load_lexicon(path: str, default_weight: float = None) -> Dict[str, float]:
+    """
+    Load a lexicon file with one ``term<TAB>weight`` entry per line.
+    Terms are normalized like incoming texts, lines starting with ``#`` are ignored
+    and a missing weight falls back to ``default_weight``.
+    :param path: str path to the lexicon file
+    :param default_weight: float weight of terms without an explicit weight
+    :return: dict mapping terms to weights (0-100)
+    """
+    default_weight = settings.SCORING_LEXICON_DEFAULT_WEIGHT if default_weight is None else default_weight
+    terms = {}
+    with open(path, encoding="utf-8") as fh:
+        for line in fh:
+            line = line.strip()
+            if not line or line.startswith("#"):
+                continue
+            term, _, weight = line.partition("\t")
+            terms[normalize_text(term)] = float(weight) if weight.strip() else default_weight
+    logging.info("Lexicon loaded", path=path, terms=len(terms))
+    return terms
+
+
+def _log_benign(weight: float) -> float:
+    """Log-probability that a match of this weight is benign, the noisy-OR building block."""
+    benign = 1 - min(max(weight, 0.0), ScoringConfig.MAX_SCORE) / ScoringConfig.MAX_SCORE
+    return math.log(benign) if benign > 0 else float("-inf")
+
+
+def _score_from_log_benign(log_benign: float) -> float:
+    return ScoringConfig.MAX_SCORE * (1 - math.exp(log_benign))
+
+
+def combine_weights(weights: List[float]) -> float:
+    """
+    Combine matched term weights with a noisy-OR, so the score stays within 0-100
+    and grows with each additional match.
+    :param weights: list of matched term weights (0-100), repeated per occurrence
+    :return: float score between 0 and 100
+    """
+    if not weights:
+        return ScoringConfig.MIN_SCORE
+    return _score_from_log_benign(sum(_log_benign(weight) for weight in weights))
+
+
+class LexiconMatch(NamedTuple):
+    """Lexicon matches found in one text."""
+    count: int
+    weighted_count: float
+    log_benign: float
+
+    @property
+    def score(self) -> float:
+        if not self.count:
+            return ScoringConfig.MIN_SCORE
+        return _score_from_log_benign(self.log_benign)
+
+
+class LexiconAutomaton:
+    """
+    Aho-Corasick automaton over a weighted term lexicon.
+
+    Every term is found in a single left-to-right pass over the text, whatever the
+    size of the lexicon. Each state carries the outputs of its whole failure chain,
+    so matching never walks output links. With ``word_boundaries`` a match only
+    counts when it is not glued to surrounding letters or digits.
+    """
+
+    def __init__(self, goto: List[Dict[str, int]], fail: List[int], outputs: List[Tuple], word_boundaries: bool,
+                 terms: int):
+        self.goto = goto
+        self.fail = fail
+        self.outputs = outputs
+        self.word_boundaries = word_boundaries
+        self.terms = terms
+
+    @classmethod
+    def compile(cls, terms: Dict[str, float], word_boundaries: bool = True) -> "LexiconAutomaton":
+        """
+        Compile a lexicon into an automaton.
+        :param terms: dict mapping normalized terms to weights (0-100)
+        :param word_boundaries: bool only count matches on word boundaries
+        :return: LexiconAutomaton
+        """
+        goto = [{}]
+        own_outputs = [[]]
+        for term, weight in terms.items():
+            if not term:
+                continue
+            state = 0
+            for char in term:
+                next_state = goto[state].get(char)
+                if next_state is None:
+                    next_state = len(goto)
+                    goto[state][char] = next_state
+                    goto.append({})
+                    own_outputs.append([])
+                state = next_state
+            own_outputs[state].append((len(term), weight, _log_benign(weight)))
+
+        fail = [0] * len(goto)
+        outputs = [tuple(own) for own in own_outputs]
+        queue = deque(goto[0].values())
+        while queue:
+            state = queue.popleft()
+            for char, next_state in goto[state].items():
+                queue.append(next_state)
+                fallback = fail[state]
+                while fallback and char not in goto[fallback]:
+                    fallback = fail[fallback]
+                fail[next_state] = goto[fallback].get(char, 0)
+                outputs[next_state] = outputs[next_state] + outputs[fail[next_state]]
+        logging.info("Lexicon automaton compiled", terms=len(terms), states=len(goto))
+        return cls(goto, fail, [output or None for output in outputs], word_boundaries, len(terms))
+
+    def match(self, text: str) -> LexiconMatch:
+        """
+        Find all lexicon terms in a normalized text in one pass.
+        :param text: str normalized text
+        :return: LexiconMatch with the number of matches, the sum of their weights and their noisy-OR term
+        """
+        goto, fail, outputs = self.goto, self.fail, self.outputs
+        check_boundaries = self.word_boundaries
+        last = len(text) - 1
+        state = count = 0
+        weighted = log_benign = 0.0
+        root = goto[0]
+        for position, char in enumerate(text):
+            if state:
+                while state and char not in goto[state]:
+                    state = fail[state]
+                state = goto[state].get(char, 0) if state else root.get(char, 0)
+            else:
+                state = root.get(char, 0)
+            if not state:
+                continue
+            found = outputs[state]
+            if found is None:
+                continue
+            for length, weight, term_log_benign in found:
+                if check_boundaries:
+                    start = position - length + 1
+                    if (start > 0 and text[start - 1].isalnum()) or (position < last and text[position + 1].isalnum()):
+                        continue
+                count += 1
+                weighted += weight
+                log_benign += term_log_benign
+        return LexiconMatch(count, weighted, log_benign)
+
+    def match_batch(self, texts: List[str]) -> List[LexiconMatch]:
+        return [self.match(text) for text in texts]
+
+    def warm_up(self):
+        self.match(_WARM_UP_TEXT)
+
+    def memory_bytes(self) -> int:
+        """Approximate size of the transition tables, failure links and outputs."""
+        return (sum(map(sys.getsizeof, self.goto)) + sys.getsizeof(self.goto) + sys.getsizeof(self.fail)
+                + sum(map(sys.getsizeof, filter(None, self.outputs))) + sys.getsizeof(self.outputs))
+
+    def save(self, path: str):
+        """
+        Write the automaton in the flat, memory-mappable format read by MappedLexiconAutomaton.
+        States are laid out as CSR arrays: per-state offsets into sorted edge and output arrays.
+        :param path: str output path
+        """
+        state_offsets, edge_chars, edge_targets = array("i", [0]), array("I"), array("i")
+        output_offsets, output_lengths = array("i", [0]), array("i")
+        output_weights, output_log_benign = array("d"), array("d")
+        for transitions, found in zip(self.goto, self.outputs):
+            for char, target in sorted(transitions.items()):
+                edge_chars.append(ord(char))
+                edge_targets.append(target)
+            state_offsets.append(len(edge_chars))
+            for length, weight, term_log_benign in found or ():
+                output_lengths.append(length)
+                output_weights.append(weight)
+                output_log_benign.append(term_log_benign)
+            output_offsets.append(len(output_lengths))
+        sections = [state_offsets, edge_chars, edge_targets, array("i", self.fail), output_offsets,
+                    output_lengths, output_weights, output_log_benign]
+        header = _HEADER.pack(AUTOMATON_MAGIC, AUTOMATON_VERSION, sys.byteorder == "little",
+                              self.word_boundaries, self.terms, len(self.goto), len(edge_chars),
+                              len(output_lengths))
+        with open(path, "wb") as fh:
+            fh.write(header)
+            for section in sections:
+                fh.write(b"\0" * (-fh.tell() % _SECTION_ALIGNMENT))
+                section.tofile(fh)
+        logging.info("Lexicon automaton saved", path=path, states=len(self.goto), edges=len(edge_chars))
+
+
+class MappedLexiconAutomaton:
+    """
+    Read-only automaton served straight from a memory-mapped file written by
+    ``LexiconAutomaton.save``. All processes that open the same file share its pages;
+    only the root transitions are copied into a small per-process dict.
+    """
+
+    def __init__(self, path: str):
+        self.path = path
+        self._mapping = open_mapping(path)
+        magic, version, little_endian, word_boundaries, terms, states, edges, outputs = \
+            _HEADER.unpack_from(self._mapping)
+        if magic != AUTOMATON_MAGIC or version != AUTOMATON_VERSION:
+            raise ValueError(f"Unsupported lexicon automaton file: {path}")
+        if bool(little_endian) != (sys.byteorder == "little"):
+            raise ValueError(f"Lexicon automaton {path} was written on a host with a different byte order")
+        self.word_boundaries = bool(word_boundaries)
+        self.terms = terms
+        self.states = states
+        view = memoryview(self._mapping)
+        offset = _HEADER.size
+        sections = []
+        for code, count in (("i", states + 1), ("I", edges), ("i", edges), ("i", states), ("i", states + 1),
+                            ("i", outputs), ("d", outputs), ("d", outputs)):
+            offset += -offset % _SECTION_ALIGNMENT
+            size = count * struct.calcsize(code)
+            sections.append(view[offset:offset + size].cast(code))
+            offset += size
+        (self.state_offsets, self.edge_chars, self.edge_targets, self.fail, self.output_offsets,
+         self.output_lengths, self.output_weights, self.output_log_benign) = sections
+        self._root = {chr(self.edge_chars[index]): self.edge_targets[index]
+                      for index in range(self.state_offsets[0], self.state_offsets[1])}
+        logging.info("Lexicon automaton mapped", path=path, states=states, size=len(self._mapping))
+
+    def _step(self, state: int, code: int) -> int:
+        low, high = self.state_offsets[state], self.state_offsets[state + 1]
+        index = bisect_left(self.edge_chars, code, low, high)
+        if index < high and self.edge_chars[index] == code:
+            return self.edge_targets[index]
+        return -1
+
+    def match(self, text: str) -> LexiconMatch:
+        """
+        Find all lexicon terms in a normalized text in one pass.
+        :param text: str normalized text
+        :return: LexiconMatch with the number of matches, the sum of their weights and their noisy-OR term
+        """
+        root, fail, step = self._root, self.fail, self._step
+        output_offsets, lengths = self.output_offsets, self.output_lengths
+        weights, log_benigns = self.output_weights, self.output_log_benign
+        check_boundaries = self.word_boundaries
+        last = len(text) - 1
+        state = count = 0
+        weighted = log_benign = 0.0
+        for position, char in enumerate(text):
+            if state:
+                code = ord(char)
+                next_state = step(state, code)
+                while next_state < 0 and state:
+                    state = fail[state]
+                    next_state = step(state, code) if state else -1
+                state = next_state if next_state >= 0 else root.get(char, 0)
+            else:
+                state = root.get(char, 0)
+            if not state:
+                continue
+            for index in range(output_offsets[state], output_offsets[state + 1]):
+                if check_boundaries:
+                    start = position - lengths[index] + 1
+                    if (start > 0 and text[start - 1].isalnum()) or (position < last and text[position + 1].isalnum()):
+                        continue
+                count += 1
+                weighted += weights[index]
+                log_benign += log_benigns[index]
+        return LexiconMatch(count, weighted, log_benign)
+
+    def match_batch(self, texts: List[str]) -> List[LexiconMatch]:
+        return [self.match(text) for text in texts]
+
+    def warm_up(self):
+        """Fault in every page of the mapping and run one match."""
+        pages = warm_up_pages(self._mapping)
+        self.match(_WARM_UP_TEXT)
+        logging.debug("Lexicon automaton warmed up", path=self.path, pages=pages)
+
+    def memory_bytes(self) -> int:
+        """Size of the mapping; its pages are shared with other processes mapping the same file."""
+        return len(self._mapping)
+
+
+class LexiconScorer(Scorer):
+    """Cheap scorer that matches the normalized text against a compiled term lexicon."""
+
+    name = "lexicon"
+
+    def __init__(self, terms: Dict[str, float] = None, automaton=None):
+        self.automaton = automaton or LexiconAutomaton.compile(terms or {})
+
+    @classmethod
+    def from_file(cls, path: str = None) -> "LexiconScorer":
+        """
+        Build a scorer from a compiled, memory-mapped automaton (``.ac``) or a plain lexicon file.
+        :param path: str path, defaults to SCORING_LEXICON_PATH
+        :return: LexiconScorer
+        """
+        path = path or settings.SCORING_LEXICON_PATH
+        if path.endswith(".ac"):
+            return cls(automaton=MappedLexiconAutomaton(path))
+        return cls(load_lexicon(path))
+
+    def score(self, text: str) -> float:
+        return self.automaton.match(text).score
+
+    def score_batch(self, texts: List[str]) -> List[float]:
+        return [match.score for match in self.automaton.match_batch(texts)]
+
+    def warm_up(self):
+        self.automaton.warm_up()
+
+    def memory_bytes(self) -> int:
+        return self.automaton.memory_bytes()
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Compile a term lexicon into a memory-mappable Aho-Corasick automaton.")
+    parser.add_argument("lexicon", help="lexicon file with one term<TAB>weight entry per line")
+    parser.add_argument("output", help="output path, conventionally ending in .ac")
+    parser.add_argument("--substrings", action="store_true", help="also count matches inside longer words")
+    args = parser.parse_args()
+    automaton = LexiconAutomaton.compile(load_lexicon(args.lexicon), word_boundaries=not args.substrings)
+    automaton.save(args.output)
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,219 @@
+"""
+Near-duplicate index reusing the scores of recently scored texts.
+
+Spam campaigns post slight variations of one text, which the exact score cache
+cannot match. Each scored text gets a 64-bit SimHash of its character shingles;
+texts whose fingerprints differ in at most ``NEARDUP_MAX_DISTANCE`` bits reuse
+the score of the earlier one instead of being scored again.
+
+Lookups do not scan the index. Fingerprints are split into ``max_distance + 1``
+bands: two fingerprints within the distance differ in at most ``max_distance``
+bands, so they are equal on at least one, and only fingerprints sharing a band
+value with the query are compared.
+"""
+import hashlib
+import threading
+from collections import OrderedDict
+from typing import Dict, List, Optional, Set, Tuple
+from config import settings
+from metrics import metrics
+
+FINGERPRINT_BITS = 64
+FINGERPRINT_MASK = (1 << FINGERPRINT_BITS) - 1
+
+
+def shingles(text: str, size: int) -> Set[str]:
+    """
+    Overlapping character n-grams of a text; the text itself when shorter than ``size``.
+    :param text: str normalized text
+    :param size: int characters per shingle
+    :return: set of shingles
+    """
+    if len(text) <= size:
+        return {text}
+    return {text[index:index + size] for index in range(len(text) - size + 1)}
+
+
+def majority_bits(hashes: List[int], count: int) -> int:
+    """
+    Bits set in more than half of ``hashes``.
+
+    The 64 bit positions are counted in parallel with bit-sliced counters:
+    ``counters[i]`` holds bit ``i`` of every position's count, and adding a hash
+    ripples a carry through them. The counts are then compared to the majority
+    with a bit-sliced subtraction, so no loop runs over individual bit positions.
+    :param hashes: list of 64-bit ints
+    :param count: int number of hashes
+    :return: int with the majority bits set
+    """
+    counters: List[int] = []
+    for carry in hashes:
+        index = 0
+        while carry:
+            if index == len(counters):
+                counters.append(carry)
+                break
+            current = counters[index]
+            counters[index] = current ^ carry
+            carry &= current
+            index += 1
+    # count - threshold borrows exactly for the positions whose count is below the threshold
+    threshold = count // 2 + 1
+    borrow = 0
+    for index in range(max(len(counters), threshold.bit_length())):
+        missing = ~(counters[index] if index < len(counters) else 0) & FINGERPRINT_MASK
+        subtrahend = FINGERPRINT_MASK if (threshold >> index) & 1 else 0
+        borrow = (missing & subtrahend) | (missing & borrow) | (subtrahend & borrow)
+    return ~borrow & FINGERPRINT_MASK
+
+
+def simhash(text: str, shingle_size: int = 4) -> int:
+    """
+    64-bit SimHash of a text: each bit is the majority vote of that bit over the
+    hashes of the text's shingles, so similar texts get fingerprints with a small
+    Hamming distance.
+    :param text: str normalized text
+    :param shingle_size: int characters per shingle
+    :return: int fingerprint
+    """
+    features = shingles(text, shingle_size)
+    # Not the built-in hash: it is salted per process, and fingerprints should be reproducible
+    hashes = [int.from_bytes(hashlib.blake2b(feature.encode("utf-8"), digest_size=8).digest(), "big")
+              for feature in features]
+    return majority_bits(hashes, len(features))
+
+
+def band_masks(max_distance: int) -> List[Tuple[int, int]]:
+    """
+    Split the fingerprint bits into ``max_distance + 1`` bands.
+    :return: list of (shift, mask) pairs, one per band
+    """
+    bands = max_distance + 1
+    width, extra = divmod(FINGERPRINT_BITS, bands)
+    masks = []
+    shift = 0
+    for band in range(bands):
+        bits = width + (1 if band < extra else 0)
+        masks.append((shift, (1 << bits) - 1))
+        shift += bits
+    return masks
+
+
+class NearDuplicateIndex:
+    """
+    Thread-safe, LRU-bounded SimHash index of recent texts and their scores.
+    Only texts that were actually scored are added, so scores never drift along
+    a chain of variants of variants.
+    """
+
+    def __init__(self, max_size: int = None, max_distance: int = None, min_length: int = None,
+                 shingle_size: int = None):
+        """
+        :param max_size: int fingerprints kept, 0 disables the index
+        :param max_distance: int largest Hamming distance treated as a near duplicate
+        :param min_length: int shortest normalized text looked up or indexed
+        :param shingle_size: int characters per shingle
+        """
+        self.max_size = settings.NEARDUP_INDEX_SIZE if max_size is None else max_size
+        self.min_length = settings.NEARDUP_MIN_LENGTH if min_length is None else min_length
+        self.shingle_size = shingle_size or settings.NEARDUP_SHINGLE_SIZE
+        self._lock = threading.Lock()
+        self._entries: "OrderedDict[int, float]" = OrderedDict()
+        self._configure_bands(settings.NEARDUP_MAX_DISTANCE if max_distance is None else max_distance)
+        self.hits = 0
+        self.misses = 0
+
+    def _configure_bands(self, max_distance: int):
+        self.max_distance = max_distance
+        self._masks = band_masks(max_distance)
+        self._bands: List[Dict[int, Set[int]]] = [{} for _ in self._masks]
+        for fingerprint in self._entries:
+            self._index(fingerprint)
+
+    def fingerprint(self, normalized_text: str) -> Optional[int]:
+        """
+        :return: int fingerprint, or None when the index is disabled or the text is too short
+            for a near match to be trusted (one changed word flips the meaning of a short text)
+        """
+        if self.max_size <= 0 or len(normalized_text) < self.min_length:
+            return None
+        return simhash(normalized_text, self.shingle_size)
+
+    def lookup(self, fingerprint: Optional[int]) -> Optional[float]:
+        """
+        Find the score of the closest indexed text within ``max_distance`` bits.
+        :param fingerprint: int fingerprint of the text, see ``fingerprint``
+        :return: float score, or None when there is no near duplicate
+        """
+        if fingerprint is None:
+            return None
+        with self._lock:
+            best, best_distance = None, self.max_distance + 1
+            for (shift, mask), table in zip(self._masks, self._bands):
+                for candidate in table.get((fingerprint >> shift) & mask, ()):
+                    distance = (candidate ^ fingerprint).bit_count()
+                    if distance < best_distance:
+                        best, best_distance = candidate, distance
+            if best is None:
+                self.misses += 1
+                metrics.increment("neardup.misses")
+                return None
+            self._entries.move_to_end(best)
+            self.hits += 1
+            score = self._entries[best]
+        metrics.increment("neardup.hits")
+        metrics.increment(f"neardup.distance.{best_distance}")
+        return score
+
+    def add(self, fingerprint: Optional[int], score: float):
+        """
+        Index a scored text, evicting the least recently used fingerprint when full.
+        :param fingerprint: int fingerprint of the text, see ``fingerprint``
+        :param score: float score
+        """
+        if fingerprint is None:
+            return
+        with self._lock:
+            if fingerprint not in self._entries:
+                self._index(fingerprint)
+            self._entries[fingerprint] = score
+            self._entries.move_to_end(fingerprint)
+            self._evict(self.max_size)
+
+    def configure(self, max_size: int = None, max_distance: int = None):
+        """
+        Change the capacity or the distance threshold of a live index.
+        :param max_size: int new capacity, 0 disables the index
+        :param max_distance: int new threshold; the band tables are rebuilt
+        """
+        with self._lock:
+            if max_size is not None:
+                self.max_size = max_size
+                self._evict(max(max_size, 0))
+            if max_distance is not None and max_distance != self.max_distance:
+                self._configure_bands(max_distance)
+
+    def _index(self, fingerprint: int):
+        for (shift, mask), table in zip(self._masks, self._bands):
+            table.setdefault((fingerprint >> shift) & mask, set()).add(fingerprint)
+
+    def _evict(self, max_size: int):
+        while len(self._entries) > max_size:
+            fingerprint, _ = self._entries.popitem(last=False)
+            for (shift, mask), table in zip(self._masks, self._bands):
+                key = (fingerprint >> shift) & mask
+                members = table[key]
+                members.discard(fingerprint)
+                if not members:
+                    del table[key]
+
+    def clear(self):
+        with self._lock:
+            self._entries.clear()
+            self._bands = [{} for _ in self._masks]
+
+    def __len__(self):
+        return len(self._entries)
+
+
+near_duplicates = NearDuplicateIndex()
@@ -0,0 +1,119 @@
+import re
+import unicodedata
+from functools import lru_cache
+from typing import Iterable, List
+from config import settings
+from configure_logging import get_logger
+
+logging = get_logger(__name__)
+
+# Translation tables and patterns are built once per process at import time.
+_ZERO_WIDTH = ("\u00ad\u034f\u061c\u115f\u1160\u17b4\u17b5\u180e\u200b\u200c\u200d\u200e\u200f"
+               "\u2060\u2061\u2062\u2063\u2064\ufeff")
+_COMBINING_RANGES = [(0x0300, 0x036F), (0x0489, 0x0489), (0x1AB0, 0x1AFF), (0x1DC0, 0x1DFF), (0x20D0, 0x20FF),
+                     (0xFE20, 0xFE2F)]
+
+_STRIP_CHARS = re.compile("[" + re.escape(_ZERO_WIDTH) + "".join(
+    f"\\u{start:04x}-\\u{end:04x}" for start, end in _COMBINING_RANGES) + "]+")
+
+# Cyrillic and Greek letters that render like Latin ones (lowercase, applied after casefold).
+_CONFUSABLES = {
+    # Cyrillic
+    "\u0430": "a", "\u0432": "b", "\u0435": "e", "\u0451": "e", "\u043a": "k", "\u043c": "m", "\u043d": "h",
+    "\u043e": "o", "\u0440": "p", "\u0441": "c", "\u0442": "t", "\u0443": "y", "\u0445": "x", "\u0455": "s",
+    "\u0456": "i", "\u0457": "i", "\u0458": "j", "\u04bb": "h", "\u0501": "d", "\u051b": "q", "\u051d": "w",
+    # Greek
+    "\u03b1": "a", "\u03b2": "b", "\u03b5": "e", "\u03b7": "n", "\u03b9": "i", "\u03ba": "k", "\u03bd": "v",
+    "\u03bf": "o", "\u03c1": "p", "\u03c4": "t", "\u03c5": "u", "\u03c7": "x", "\u03c9": "w", "\u03c2": "s",
+}
+_LEET = {"0": "o", "1": "i", "3": "e", "4": "a", "5": "s", "7": "t", "@": "a", "$": "s"}
+_LATIN_TOKEN_TABLE = str.maketrans({**_CONFUSABLES, **_LEET})
+
+# Only tokens that contain a foldable character are visited, and only those that also
+# contain a Latin letter are folded, so plain numbers and genuine Cyrillic or Greek
+# words survive untouched.
+_FOLDABLE_TOKEN = re.compile("\\S*[" + re.escape("".join(_CONFUSABLES) + "".join(_LEET)) + "]\\S*")
+_LATIN_LETTER = re.compile(r"[a-z]")
+# Letters only: runs of digits are numbers, not emphasis
+_REPEATED_CHARS = re.compile(r"([^\W\d_])\1{2,}")
+_WHITESPACE = re.compile(r"\s+")
+
+
+def _fold_token(match: re.Match) -> str:
+    token = match.group(0)
+    if _LATIN_LETTER.search(token) is None:
+        return token
+    return token.translate(_LATIN_TOKEN_TABLE)
+
+
+def normalize_text(text: str) -> str:
+    """
+    Normalize obfuscated text into a canonical form for scoring.
+    Applies compatibility decomposition, strips zero-width characters and combining marks,
+    folds case and Unicode confusables, undoes leetspeak and collapses character runs.
+    :param text: str raw text
+    :return: str normalized text
+    """
+    if not text:
+        return ""
+    text = _STRIP_CHARS.sub("", unicodedata.normalize("NFKD", text))
+    text = _FOLDABLE_TOKEN.sub(_fold_token, text.casefold())
+    text = _REPEATED_CHARS.sub(r"\1", text)
+    text = _WHITESPACE.sub(" ", text).strip()
+    return unicodedata.normalize("NFC", text)
+
+
+class TextNormalizer:
+    """
+    Normalizes texts ahead of scoring, caching results for repeated inputs.
+    Texts longer than ``max_cached_length`` characters are normalized without the cache,
+    so a few long texts cannot pin large raw strings in memory.
+    """
+
+    def __init__(self, cache_size: int = None, enabled: bool = None, max_cached_length: int = None):
+        self.cache_size = settings.NORMALIZATION_CACHE_SIZE if cache_size is None else cache_size
+        self.enabled = settings.NORMALIZATION_ENABLED if enabled is None else enabled
+        self.max_cached_length = (settings.NORMALIZATION_CACHE_MAX_LENGTH if max_cached_length is None
+                                  else max_cached_length)
+        self._cached = lru_cache(maxsize=self.cache_size)(normalize_text)
+
+    def _normalize(self, text: str) -> str:
+        if len(text) > self.max_cached_length:
+            return normalize_text(text)
+        return self._cached(text)
+
+    def normalize(self, text: str) -> str:
+        """
+        Normalize a single text.
+        :param text: str raw text
+        :return: str normalized text
+        """
+        if not self.enabled:
+            return text
+        return self._normalize(text)
+
+    def normalize_batch(self, texts: Iterable[str]) -> List[str]:
+        """
+        Normalize a batch of texts, normalizing each distinct text only once.
+        :param texts: iterable of raw texts
+        :return: list of normalized texts in input order
+        """
+        texts = list(texts)
+        if not self.enabled:
+            return texts
+        normalized = {text: self._normalize(text) for text in dict.fromkeys(texts)}
+        return [normalized[text] for text in texts]
+
+    def cache_info(self):
+        return self._cached.cache_info()
+
+    def resize(self, cache_size: int):
+        """
+        Change the normalization cache size. The cache starts empty again.
+        :param cache_size: int new cache size
+        """
+        self.cache_size = cache_size
+        self._cached = lru_cache(maxsize=cache_size)(normalize_text)
+
+
+normalizer = TextNormalizer()
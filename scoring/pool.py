@@ -0,0 +1,47 @@
+import threading
+from concurrent.futures import ThreadPoolExecutor
+from config import settings
+from configure_logging import get_logger
+
+logging = get_logger(__name__)
+
+_pool = None
+_pool_lock = threading.Lock()
+
+
+def get_scoring_pool() -> ThreadPoolExecutor:
+    """
+    Return the process-wide scoring pool, creating it on first use.
+    :return: ThreadPoolExecutor sized by SCORING_POOL_SIZE
+    """
+    global _pool
+    if _pool is None:
+        with _pool_lock:
+            if _pool is None:
+                _pool = ThreadPoolExecutor(max_workers=settings.SCORING_POOL_SIZE, thread_name_prefix="scoring")
+                logging.debug("Created scoring pool", workers=settings.SCORING_POOL_SIZE)
+    return _pool
+
+
+def shutdown_scoring_pool(wait: bool = True):
+    """Shut down the scoring pool; a new one is created on next use."""
+    global _pool
+    with _pool_lock:
+        if _pool is not None:
+            _pool.shutdown(wait=wait, cancel_futures=not wait)
+            _pool = None
+
+
+def resize_scoring_pool(size: int):
+    """
+    Replace the scoring pool with one of ``size`` workers. The old pool is not shut
+    down: work already submitted to it finishes, and its idle threads exit once the
+    last reference to it is dropped.
+    :param size: int new number of workers
+    """
+    global _pool
+    with _pool_lock:
+        if _pool is None:
+            return
+        _pool = ThreadPoolExecutor(max_workers=size, thread_name_prefix="scoring")
+    logging.info("Resized scoring pool", workers=size)
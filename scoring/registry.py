@@ -0,0 +1,238 @@
+"""
+Versioned scorer registry: zero-downtime scorer swaps and shadow scoring.
+
+The active scorer is held as a ``(version, scorer)`` pair. A new version is built
+and warmed up on a background thread while the current one keeps serving, then
+swapped in with a single reference assignment: batches already running finish
+on the scorer they started with, every later call gets the new one, and no
+worker ever waits for a load.
+
+A shadow candidate is built the same way but never answers: a sampled fraction
+of the texts the active scorer scores is scored again by the candidate on a
+background thread, and the score deltas and latencies of both are recorded
+under ``scoring.shadow.*``. Promoting the candidate's version reuses the warm
+candidate instead of building it again.
+"""
+import random
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+from typing import Callable, List, Optional, Tuple
+from config import settings, Settings
+from configure_logging import get_logger
+from metrics import metrics
+from scoring.base import Scorer
+from scoring.cache import score_cache
+from scoring.neardup import near_duplicates
+
+logging = get_logger(__name__)
+
+
+class ScorerRegistry:
+    """
+    Double-buffered holder of the active scorer version and an optional shadow candidate.
+    A version label names one scorer configuration: loading a version that is being
+    shadowed promotes the candidate as it is.
+    """
+
+    def __init__(self, builder: Callable[[Settings], Scorer], sample_rate: float = None, max_pending: int = None):
+        """
+        :param builder: callable building a scorer from settings
+        :param sample_rate: float fraction of freshly scored texts also scored by the candidate,
+            defaults to SCORER_SHADOW_SAMPLE_RATE
+        :param max_pending: int shadow batches queued at most; further samples are dropped,
+            defaults to SCORER_SHADOW_MAX_PENDING
+        """
+        self.builder = builder
+        self.sample_rate = settings.SCORER_SHADOW_SAMPLE_RATE if sample_rate is None else sample_rate
+        self.max_pending = settings.SCORER_SHADOW_MAX_PENDING if max_pending is None else max_pending
+        self._lock = threading.Lock()
+        self._active: Optional[Tuple[str, Scorer]] = None
+        self._candidate: Optional[Tuple[str, Scorer]] = None
+        # Bumped by every load or shadow request, so a slower, superseded build is discarded
+        self._generation = 0
+        self._shadow_generation = 0
+        self._pending = 0
+        self._executor = None
+        self._random = random.Random()
+
+    def current(self) -> Tuple[str, Scorer]:
+        """
+        Return the active version and scorer, building the configured one on first use.
+        :return: tuple of version and Scorer
+        """
+        active = self._active
+        if active is None:
+            with self._lock:
+                if self._active is None:
+                    self._active = (settings.SCORER_VERSION, self.builder(settings))
+                active = self._active
+        return active
+
+    @property
+    def version(self) -> str:
+        return self.current()[0]
+
+    @property
+    def candidate_version(self) -> Optional[str]:
+        candidate = self._candidate
+        return candidate[0] if candidate else None
+
+    def is_active(self, scorer: Scorer) -> bool:
+        """
+        :return: bool whether ``scorer`` is still the active scorer, i.e. no swap happened since it was fetched
+        """
+        active = self._active
+        return active is not None and active[1] is scorer
+
+    def load(self, version: str, config: Settings = None, background: bool = True) -> Optional[threading.Thread]:
+        """
+        Build, warm up and swap in a scorer version. The active scorer serves until the
+        swap; if the build fails it stays active.
+        :param version: str version label stamped on results
+        :param config: Settings to build from, defaults to the live settings
+        :param background: bool load on a background thread
+        :return: the loading thread, or None when loaded in the foreground
+        """
+        with self._lock:
+            self._generation += 1
+            generation = self._generation
+            candidate = self._candidate if self._candidate and self._candidate[0] == version else None
+        return self._run(self._load, version, config or settings, generation, candidate, background=background)
+
+    def shadow(self, version: str, config: Settings = None, background: bool = True) -> Optional[threading.Thread]:
+        """
+        Start shadow scoring with a candidate version, or stop it when ``version`` is empty.
+        :param version: str candidate version label
+        :param config: Settings to build the candidate from, defaults to the live settings
+        :param background: bool load on a background thread
+        :return: the loading thread, or None when loaded in the foreground or stopped
+        """
+        with self._lock:
+            self._shadow_generation += 1
+            generation = self._shadow_generation
+            if not version:
+                stopped, self._candidate = self._candidate, None
+        if not version:
+            if stopped:
+                logging.info("Shadow scoring stopped", version=stopped[0])
+            return None
+        return self._run(self._load_candidate, version, config or settings, generation, background=background)
+
+    @staticmethod
+    def _run(target, *args, background: bool) -> Optional[threading.Thread]:
+        if not background:
+            target(*args)
+            return None
+        thread = threading.Thread(target=target, args=args, name="ScorerLoader", daemon=True)
+        thread.start()
+        return thread
+
+    def _build(self, version: str, config: Settings) -> Scorer:
+        start = time.perf_counter()
+        scorer = self.builder(config)
+        scorer.warm_up()
+        elapsed = time.perf_counter() - start
+        metrics.observe("scoring.versions.load", elapsed)
+        logging.info("Scorer version loaded", version=version, scorer=scorer.name, seconds=round(elapsed, 3))
+        return scorer
+
+    def _load(self, version: str, config: Settings, generation: int, candidate: Optional[Tuple[str, Scorer]]):
+        if candidate is not None:
+            scorer = candidate[1]
+        else:
+            try:
+                scorer = self._build(version, config)
+            except Exception:
+                metrics.increment("scoring.versions.load_failures")
+                logging.error("Failed to load scorer version, keeping the active one", version=version, exc_info=True)
+                return
+        with self._lock:
+            if generation != self._generation:
+                logging.info("Discarding superseded scorer version", version=version)
+                return
+            previous = self._active
+            self._active = (version, scorer)
+            if candidate is not None and self._candidate is candidate:
+                self._candidate = None
+        # Cached scores belong to the replaced version
+        score_cache.clear()
+        near_duplicates.clear()
+        metrics.increment("scoring.versions.swaps")
+        logging.info("Scorer version swapped in", version=version, previous=previous[0] if previous else None,
+                     promoted=candidate is not None)
+
+    def _load_candidate(self, version: str, config: Settings, generation: int):
+        try:
+            scorer = self._build(version, config)
+        except Exception:
+            metrics.increment("scoring.versions.load_failures")
+            logging.error("Failed to load shadow scorer version", version=version, exc_info=True)
+            return
+        with self._lock:
+            if generation != self._shadow_generation:
+                return
+            self._candidate = (version, scorer)
+        logging.info("Shadow scoring started", version=version, sample_rate=self.sample_rate)
+
+    def observe(self, texts: List[str], scores: List[float], version: str, seconds: float):
+        """
+        Queue a sample of texts freshly scored by the active scorer for shadow scoring.
+        Never blocks or raises: when the candidate falls behind, samples are dropped.
+        :param texts: list of normalized texts
+        :param scores: list of their active scores
+        :param version: str version that scored them
+        :param seconds: float time the active scorer took for them
+        """
+        candidate = self._candidate
+        if candidate is None or candidate[0] == version or not self.sample_rate or not texts:
+            return
+        sample = [index for index in range(len(texts)) if self._random.random() < self.sample_rate]
+        if not sample:
+            return
+        with self._lock:
+            if self._pending >= self.max_pending:
+                metrics.increment("scoring.shadow.dropped", len(sample))
+                return
+            self._pending += 1
+            if self._executor is None:
+                self._executor = ThreadPoolExecutor(max_workers=1, thread_name_prefix="shadow")
+            executor = self._executor
+        executor.submit(self._compare, candidate, [texts[index] for index in sample],
+                        [scores[index] for index in sample], seconds / len(texts))
+
+    def _compare(self, candidate: Tuple[str, Scorer], texts: List[str], scores: List[float], active_seconds: float):
+        version, scorer = candidate
+        try:
+            start = time.perf_counter()
+            shadow_scores = scorer.score_batch(texts)
+            elapsed = time.perf_counter() - start
+        except Exception:
+            metrics.increment("scoring.shadow.errors")
+            logging.warning("Shadow scoring failed", version=version, exc_info=True)
+            return
+        finally:
+            with self._lock:
+                self._pending -= 1
+        threshold = settings.SCORING_TOXICITY_THRESHOLD
+        flips = 0
+        for score, shadow_score in zip(scores, shadow_scores):
+            # Recorded in score points, not seconds
+            metrics.observe("scoring.shadow.delta", abs(shadow_score - score))
+            flips += (score >= threshold) != (shadow_score >= threshold)
+        # Per text, so both sides compare whatever the batch sizes
+        metrics.observe("scoring.shadow.latency", elapsed / len(texts))
+        metrics.observe("scoring.shadow.active_latency", active_seconds)
+        metrics.increment("scoring.shadow.scored", len(texts))
+        metrics.increment("scoring.shadow.flips", flips)
+        logging.debug("Shadow scored sample", version=version, texts=len(texts), flips=flips)
+
+    def close(self, wait: bool = True):
+        """
+        Stop the shadow thread; it is started again by the next sample.
+        :param wait: bool finish the queued shadow batches first
+        """
+        with self._lock:
+            executor, self._executor = self._executor, None
+        if executor is not None:
+            executor.shutdown(wait=wait, cancel_futures=not wait)
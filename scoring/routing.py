@@ -0,0 +1,146 @@
+"""
+Language-aware routing of texts to per-language scorers.
+
+Each text is identified (``scoring.language``) and scored by the scorer of its
+language, or by the default scorer when its language has none. Per-language
+scorers are loaded on first use and kept in an LRU table whose estimated size
+stays within a memory budget, so a long tail of rare languages does not keep
+every model resident.
+"""
+import threading
+import time
+from collections import OrderedDict
+from typing import Callable, Dict, List, Optional
+from config import settings
+from configure_logging import get_logger
+from metrics import metrics
+from scoring.artifacts import process_memory
+from scoring.base import Scorer
+from scoring.language import identify_language
+from scoring.lexicon import LexiconScorer
+
+logging = get_logger(__name__)
+
+
+class LanguageRouter(Scorer):
+    """
+    Scorer routing each text to the scorer of its language.
+
+    ``score_batch`` groups the batch by language, so each scorer gets a single
+    ``score_batch`` call with all of its texts, and scatters the scores back in
+    input order. A scorer evicted while a batch is using it finishes that batch;
+    the next text in its language loads it again.
+    """
+
+    name = "language-router"
+
+    def __init__(self, default: Scorer, sources: Dict[str, str] = None, memory_budget: float = None,
+                 loader: Callable[[str], Scorer] = None):
+        """
+        :param default: Scorer for texts whose language has no scorer of its own
+        :param sources: dict mapping languages to scorer sources, defaults to SCORING_LANGUAGE_SCORERS
+        :param memory_budget: float megabytes loaded language scorers may use, defaults to
+            SCORING_LANGUAGE_MEMORY_BUDGET_MB
+        :param loader: callable building a scorer from a source, defaults to ``LexiconScorer.from_file``
+        """
+        self.default = default
+        self.sources = dict(settings.SCORING_LANGUAGE_SCORERS if sources is None else sources)
+        budget = settings.SCORING_LANGUAGE_MEMORY_BUDGET_MB if memory_budget is None else memory_budget
+        self.memory_budget = int(budget * 1024 * 1024)
+        self.loader = loader or LexiconScorer.from_file
+        self._lock = threading.Lock()
+        self._load_locks: Dict[str, threading.Lock] = {}
+        # language → (scorer, estimated bytes), least recently used first
+        self._loaded: "OrderedDict[str, tuple]" = OrderedDict()
+        self.memory_used = 0
+
+    def scorer_for(self, language: str) -> Scorer:
+        """
+        Return the scorer of a language, loading it on first use.
+        :param language: str language code
+        :return: Scorer instance
+        """
+        if language not in self.sources:
+            return self.default
+        with self._lock:
+            entry = self._loaded.get(language)
+            if entry is not None:
+                self._loaded.move_to_end(language)
+                return entry[0]
+            load_lock = self._load_locks.setdefault(language, threading.Lock())
+        # Only the first text of a language waits for the load, other languages go on scoring
+        with load_lock:
+            with self._lock:
+                entry = self._loaded.get(language)
+                if entry is not None:
+                    self._loaded.move_to_end(language)
+                    return entry[0]
+            scorer, size = self._load(language)
+            with self._lock:
+                self._loaded[language] = (scorer, size)
+                self.memory_used += size
+                self._evict()
+                metrics.set_gauge("scoring.language.loaded", len(self._loaded))
+                metrics.set_gauge("scoring.language.memory_bytes", self.memory_used)
+        return scorer
+
+    def _load(self, language: str):
+        source = self.sources[language]
+        before = process_memory().get("rss", 0)
+        start = time.perf_counter()
+        scorer = self.loader(source)
+        scorer.warm_up()
+        elapsed = time.perf_counter() - start
+        # Scorers that cannot size themselves are charged the resident memory they added
+        size = scorer.memory_bytes() or max(process_memory().get("rss", 0) - before, 0) * 1024
+        metrics.increment("scoring.language.loads")
+        metrics.observe("scoring.language.load", elapsed)
+        logging.info("Language scorer loaded", language=language, source=source, scorer=scorer.name,
+                     bytes=size, seconds=round(elapsed, 3))
+        return scorer, size
+
+    def _evict(self):
+        # The scorer just loaded is the most recently used: it stays even when it alone is over the budget
+        while self.memory_used > self.memory_budget and len(self._loaded) > 1:
+            language, (_, size) = self._loaded.popitem(last=False)
+            self.memory_used -= size
+            metrics.increment("scoring.language.evictions")
+            logging.info("Language scorer evicted", language=language, bytes=size, memory_used=self.memory_used)
+
+    def loaded_languages(self) -> List[str]:
+        """
+        :return: list of languages whose scorer is loaded, least recently used first
+        """
+        with self._lock:
+            return list(self._loaded)
+
+    def score(self, text: str) -> float:
+        return self.score_batch([text])[0]
+
+    def score_batch(self, texts: List[str]) -> List[float]:
+        # Grouped by destination, so all languages without a scorer share one call to the default
+        groups: Dict[Optional[str], List[int]] = {}
+        identified: Dict[str, int] = {}
+        for index, text in enumerate(texts):
+            language = identify_language(text)
+            identified[language] = identified.get(language, 0) + 1
+            groups.setdefault(language if language in self.sources else None, []).append(index)
+        for language, count in identified.items():
+            metrics.increment(f"scoring.language.texts.{language}", count)
+        scores = [0.0] * len(texts)
+        for language, indexes in groups.items():
+            scorer = self.default if language is None else self.scorer_for(language)
+            group_scores = scorer.score_batch([texts[index] for index in indexes])
+            for index, score in zip(indexes, group_scores):
+                scores[index] = score
+        logging.debug("Language router scored batch", texts=len(texts), languages=len(identified),
+                      scorers=len(groups))
+        return scores
+
+    def warm_up(self):
+        # Language scorers are loaded when their first text arrives, not up front
+        self.default.warm_up()
+
+    def memory_bytes(self) -> int:
+        return self.memory_used + self.default.memory_bytes()
+
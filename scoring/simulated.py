@@ -0,0 +1,44 @@
+import random
+import time
+from configure_logging import get_logger
+from constants import ScoringConfig
+from scoring.base import Scorer
+
+logging = get_logger(__name__)
+
+
+def simulate_scoring(min_duration: int=2, max_duration: int=15) -> dict:
+    """
+    Simulate a scoring process that takes a random duration between min_duration and max_duration seconds.
+    :param min_duration: minimum duration in seconds (int)
+    :param max_duration: maximum duration in seconds (int)
+    :return: dict with scoring result
+    """
+    duration = random.randint(min_duration, max_duration)
+    start_time = time.time()
+    logging.info(f"Scoring started, will take approximately {duration} seconds.")
+    time.sleep(duration)
+    end_time = time.time()
+    elapsed_time = end_time - start_time
+    logging.info(f"Scoring completed in {elapsed_time:.2f} seconds.")
+    result = {
+        "status": "completed",
+        "duration_seconds": elapsed_time,
+        "score": random.uniform(0, 100)  # Simulated score
+    }
+
+    return result
+
+
+class SimulatedScorer(Scorer):
+    """Scorer backed by simulate_scoring, used until a real model is plugged in."""
+
+    name = "simulated"
+
+    def __init__(self, min_duration: int = ScoringConfig.DEFAULT_MIN_DURATION,
+                 max_duration: int = ScoringConfig.DEFAULT_MAX_DURATION):
+        self.min_duration = min_duration
+        self.max_duration = max_duration
+
+    def score(self, text: str) -> float:
+        return simulate_scoring(self.min_duration, self.max_duration).get("score")
@@ -0,0 +1,309 @@
+"""
+Synchronous HTTP scoring endpoint for flows that need a score inline
+(pre-publication moderation) and cannot wait for the queue path.
+
+Concurrent requests are coalesced into micro-batches: a batch is closed when
+it holds ``SCORING_HTTP_MAX_BATCH_SIZE`` texts or ``SCORING_HTTP_MAX_WAIT_MS``
+after its first request arrived, and scored with one ``pipeline.score_many``
+call, so the service shares the scorer and score cache of the consumer it runs
+in. Every request carries a deadline; requests whose deadline has passed are
+dropped before scoring and answered with 504.
+
+- ``POST /score``: ``{"text": "...", "deadline_ms": 250}`` → ``{"score": 12.5}``
+
+Usage:
+    python scoring_server.py [--host HOST] [--port PORT]
+"""
+import argparse
+import json
+import os
+import queue
+import threading
+import time
+from http import HTTPStatus
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from typing import Callable, Dict, List, Optional, Tuple
+from config import settings
+from configure_logging import configure_logging, get_logger
+from metrics import metrics
+from pipeline import score_many
+from scoring.factory import warm_up_scorer
+
+logging = get_logger(__name__)
+
+
+class DeadlineExceeded(Exception):
+    """The request's deadline passed before it was scored."""
+
+
+class Overloaded(Exception):
+    """Too many requests are waiting to be batched."""
+
+
+class ScoreRequest:
+    """One text waiting in the batcher, completed by a batch worker."""
+
+    __slots__ = ("text", "deadline", "score", "error", "_done")
+
+    def __init__(self, text: str, deadline: float):
+        self.text = text
+        # time.monotonic() value after which the caller no longer wants the score
+        self.deadline = deadline
+        self.score: Optional[float] = None
+        self.error: Optional[Exception] = None
+        self._done = threading.Event()
+
+    def complete(self, score: float = None, error: Exception = None):
+        self.score = score
+        self.error = error
+        self._done.set()
+
+    def wait(self) -> float:
+        """
+        Block until the request is scored or its deadline passes.
+        :return: float score
+        :raises DeadlineExceeded: when the deadline passes first
+        """
+        if not self._done.wait(max(self.deadline - time.monotonic(), 0)):
+            raise DeadlineExceeded()
+        if self.error is not None:
+            raise self.error
+        return self.score
+
+
+class MicroBatcher:
+    """Coalesces concurrent score requests into batches bounded by size and wait time."""
+
+    def __init__(self, score_batch: Callable[[List[str]], List[float]] = None, max_batch_size: int = None,
+                 max_wait: float = None, max_pending: int = None, workers: int = None):
+        """
+        :param score_batch: callable scoring a list of texts, ``pipeline.score_many`` by default
+        :param max_batch_size: int maximum texts per batch
+        :param max_wait: float seconds a batch stays open after its first request
+        :param max_pending: int requests allowed to wait for a batch before new ones are rejected
+        :param workers: int batches scored concurrently
+        """
+        self.score_batch = score_batch or score_many
+        self.max_batch_size = max_batch_size or settings.SCORING_HTTP_MAX_BATCH_SIZE
+        self.max_wait = settings.SCORING_HTTP_MAX_WAIT_MS / 1000 if max_wait is None else max_wait
+        self.workers = workers or settings.SCORING_HTTP_WORKERS
+        self._queue: queue.Queue = queue.Queue(maxsize=max_pending or settings.SCORING_HTTP_MAX_PENDING)
+        self._stop = threading.Event()
+        self._threads: List[threading.Thread] = []
+
+    def start(self):
+        for index in range(self.workers):
+            thread = threading.Thread(target=self._run, name=f"MicroBatcher-{index}", daemon=True)
+            thread.start()
+            self._threads.append(thread)
+
+    def stop(self):
+        self._stop.set()
+        for thread in self._threads:
+            thread.join()
+        self._threads = []
+
+    def submit(self, text: str, deadline: float) -> ScoreRequest:
+        """
+        Queue a text for the next batch.
+        :param text: str raw text
+        :param deadline: float time.monotonic() value after which the score is no longer wanted
+        :return: ScoreRequest to wait on
+        :raises Overloaded: when the pending queue is full
+        """
+        request = ScoreRequest(text, deadline)
+        try:
+            self._queue.put_nowait(request)
+        except queue.Full:
+            metrics.increment("scoring_http.rejected")
+            raise Overloaded()
+        return request
+
+    def score(self, text: str, timeout: float) -> float:
+        """
+        Score a text within ``timeout`` seconds.
+        :raises DeadlineExceeded: when the score is not ready in time
+        :raises Overloaded: when the pending queue is full
+        """
+        return self.submit(text, time.monotonic() + timeout).wait()
+
+    def next_batch(self) -> List[ScoreRequest]:
+        """
+        Collect the next batch: wait for a first request, then for more until the
+        batch is full or ``max_wait`` has passed. Empty when stopping.
+        """
+        while not self._stop.is_set():
+            try:
+                batch = [self._queue.get(timeout=0.1)]
+                break
+            except queue.Empty:
+                continue
+        else:
+            return []
+        closes_at = time.monotonic() + self.max_wait
+        while len(batch) < self.max_batch_size:
+            remaining = closes_at - time.monotonic()
+            try:
+                batch.append(self._queue.get(timeout=remaining) if remaining > 0 else self._queue.get_nowait())
+            except queue.Empty:
+                break
+        return batch
+
+    def _run(self):
+        while not self._stop.is_set():
+            batch = self.next_batch()
+            if batch:
+                self.process(batch)
+
+    def process(self, batch: List[ScoreRequest]):
+        """Score the requests of a batch whose deadline has not passed yet."""
+        now = time.monotonic()
+        live = []
+        for request in batch:
+            if request.deadline <= now:
+                # The caller has already been answered with a timeout
+                request.complete(error=DeadlineExceeded())
+                metrics.increment("scoring_http.expired")
+            else:
+                live.append(request)
+        if not live:
+            return
+        metrics.set_gauge("scoring_http.last_batch_size", len(live))
+        metrics.increment("scoring_http.batches")
+        try:
+            with metrics.timer("scoring_http.batch"):
+                scores = self.score_batch([request.text for request in live])
+        except Exception as e:
+            logging.error("Failed to score HTTP batch", size=len(live), exc_info=True)
+            for request in live:
+                request.complete(error=e)
+            return
+        for request, value in zip(live, scores):
+            request.complete(score=value)
+
+
+class _HTTPServer(ThreadingHTTPServer):
+    # Bursts of concurrent callers would overflow the default listen backlog of 5
+    request_queue_size = 1024
+    daemon_threads = True
+
+
+class ScoringServer:
+    """Threaded HTTP server answering score requests through a MicroBatcher."""
+
+    def __init__(self, batcher: MicroBatcher = None, host: str = None, port: int = None):
+        self.batcher = batcher or MicroBatcher()
+        self.host = host if host is not None else settings.SCORING_HTTP_HOST
+        self.port = port if port is not None else settings.SCORING_HTTP_PORT
+        self._server = None
+        self._thread = None
+
+    def start(self):
+        """Start the batcher and serve in a daemon thread. Returns the bound port."""
+        self.batcher.start()
+        self._server = _HTTPServer((self.host, self.port), self._handler())
+        self._thread = threading.Thread(target=self._server.serve_forever, name="ScoringServer", daemon=True)
+        self._thread.start()
+        self.port = self._server.server_address[1]
+        logging.info("Scoring server listening", host=self.host, port=self.port,
+                     max_batch_size=self.batcher.max_batch_size, max_wait=self.batcher.max_wait)
+        return self.port
+
+    def stop(self):
+        if self._server:
+            self._server.shutdown()
+            self._server.server_close()
+            self._server = None
+        self.batcher.stop()
+
+    def handle(self, body: bytes) -> Tuple[HTTPStatus, Dict]:
+        """
+        Answer one ``/score`` request body.
+        :return: tuple of HTTP status and JSON payload
+        """
+        try:
+            request = json.loads(body)
+        except ValueError:
+            return HTTPStatus.BAD_REQUEST, {"error": "body is not valid JSON"}
+        text = request.get("text") if isinstance(request, dict) else None
+        if not isinstance(text, str):
+            return HTTPStatus.BAD_REQUEST, {"error": "'text' must be a string"}
+        deadline_ms = request.get("deadline_ms", settings.SCORING_HTTP_DEADLINE_MS)
+        if not isinstance(deadline_ms, (int, float)) or deadline_ms <= 0:
+            return HTTPStatus.BAD_REQUEST, {"error": "'deadline_ms' must be a positive number"}
+        started = time.perf_counter()
+        try:
+            value = self.batcher.score(text, min(deadline_ms, settings.SCORING_HTTP_DEADLINE_MS) / 1000)
+        except Overloaded:
+            return HTTPStatus.SERVICE_UNAVAILABLE, {"error": "overloaded"}
+        except DeadlineExceeded:
+            metrics.increment("scoring_http.deadline_exceeded")
+            return HTTPStatus.GATEWAY_TIMEOUT, {"error": "deadline exceeded"}
+        except Exception:
+            return HTTPStatus.INTERNAL_SERVER_ERROR, {"error": "scoring failed"}
+        metrics.observe("scoring_http.latency", time.perf_counter() - started)
+        metrics.increment("scoring_http.scored")
+        return HTTPStatus.OK, {"score": value}
+
+    def _handler(self):
+        server = self
+
+        class Handler(BaseHTTPRequestHandler):
+
+            def do_POST(self):
+                if self.path.split("?", 1)[0] != "/score":
+                    self._reply(HTTPStatus.NOT_FOUND, {"error": "not found"})
+                    return
+                try:
+                    length = int(self.headers.get("Content-Length") or 0)
+                except ValueError:
+                    length = -1
+                if length < 0:
+                    # rfile.read() with a negative size would block until the client closes
+                    self.close_connection = True
+                    self._reply(HTTPStatus.BAD_REQUEST, {"error": "invalid Content-Length"})
+                    return
+                if length > settings.SCORING_MAX_BODY_BYTES:
+                    # Refuse before reading, like oversized queue messages
+                    self.close_connection = True
+                    self._reply(HTTPStatus.REQUEST_ENTITY_TOO_LARGE, {"error": "body too large"})
+                    return
+                self._reply(*server.handle(self.rfile.read(length)))
+
+            def _reply(self, status: HTTPStatus, payload: Dict):
+                body = json.dumps(payload).encode("utf-8")
+                self.send_response(status)
+                self.send_header("Content-Type", "application/json")
+                self.send_header("Content-Length", str(len(body)))
+                self.end_headers()
+                self.wfile.write(body)
+
+            def log_message(self, format, *args):
+                # One line per request would drown the application log; see the scoring_http metrics
+                pass
+
+        return Handler
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--host", default=settings.SCORING_HTTP_HOST)
+    parser.add_argument("--port", type=int, default=settings.SCORING_HTTP_PORT)
+    args = parser.parse_args()
+
+    if settings.LOGGING_PATH:
+        os.makedirs(settings.LOGGING_PATH, exist_ok=True)
+    configure_logging(settings)
+    warm_up_scorer()
+    server = ScoringServer(host=args.host, port=args.port)
+    server.start()
+    try:
+        threading.Event().wait()
+    except KeyboardInterrupt:
+        pass
+    finally:
+        server.stop()
+
+
+if __name__ == '__main__':
+    main()
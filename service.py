@@ -3,6 +3,11 @@ from models import Comment
 from typing import Union
 from constants import CollectionName, OperationType, ValidationMessage, QueueName
 from database.connection import mongo_connection
+from database.audit import audit_log
+from database.schema import comment_filter, ensure_indexes, set_fields
+from database.score_history import score_history
+from database.spool import MONGO_UNAVAILABLE, CircuitBreaker, mongo_breaker, comment_spool, spool_replayer
+from config import settings
 logging = get_logger(__name__)
 
 
@@ -13,12 +18,16 @@ class CommentService:
 
     def __init__(self):
         self.collection = mongo_connection.get_collection(CollectionName.COMMENTS)
-        # Only create index once per application lifecycle
-        if not CommentService._index_created:
+        # Only create index once per application lifecycle, and only while MongoDB is not known to be
+        # down: writes must reach the spool without first waiting out a server selection timeout here
+        if not CommentService._index_created and mongo_breaker.state == CircuitBreaker.CLOSED:
             try:
-                self.collection.create_index("id", unique=True)
+                ensure_indexes(self.collection)
                 CommentService._index_created = True
-                logging.debug("Created unique index on 'id' field")
+                logging.debug("Created unique comment ID indexes")
+            except MONGO_UNAVAILABLE:
+                mongo_breaker.record_failure()
+                logging.warning("MongoDB unavailable, index creation postponed", exc_info=True)
             except Exception as e:
                 # Index might already exist, that's okay
                 logging.debug("Index creation skipped (may already exist)", exc_info=True)
@@ -31,36 +40,56 @@ class CommentService:
         :return: Updated Comment object
         """
         comment.score = score
+        entry = {"op": OperationType.UPDATE.value, "id": comment.id, "score": score}
+        if self._should_spool():
+            self._spool(entry, comment.user_id)
+            return comment
         try:
-            result = self.collection.update_one(
-                {"id": comment.id},
-                {"$set": {"score": score}}
-            )
+            result = self.collection.update_one(comment_filter(comment.id), set_fields({"score": score}))
+            mongo_breaker.record_success()
             if result.modified_count == 1:
                 logging.info(f"Comment {comment.id} score updated to {score}.")
+                audit_log.record(OperationType.UPDATE.value, comment.id, comment.user_id, score=score)
                 return comment
             else:
                 logging.warning(f"Comment {comment.id} score update failed or no change made.")
                 return None
+        except MONGO_UNAVAILABLE:
+            if not self._spool_on_failure(entry, comment.user_id):
+                raise
+            return comment
         except Exception as e:
+            mongo_breaker.release_probe()
             logging.error(f"Error updating comment {comment.id} score", exc_info=True)
             raise e
 
-    def delete(self, comment_id: str) -> bool:
+    def delete(self, comment_id: str, user_id: str = None) -> bool:
         """
         Delete a comment by its ID.
         :param comment_id: str Comment ID
+        :param user_id: str author of the comment, if known, for the audit log
         :return: bool indicating success or failure
         """
+        entry = {"op": OperationType.DELETE.value, "id": comment_id}
+        if self._should_spool():
+            self._spool(entry, user_id)
+            return True
         try:
-            result = self.collection.delete_one({"id": comment_id})
+            result = self.collection.delete_one(comment_filter(comment_id))
+            mongo_breaker.record_success()
             if result.deleted_count == 1:
                 logging.info(f"Comment {comment_id} deleted successfully.")
+                audit_log.record(OperationType.DELETE.value, comment_id, user_id)
                 return True
             else:
                 logging.warning(f"Comment {comment_id} deletion failed or not found.")
                 return False
+        except MONGO_UNAVAILABLE:
+            if not self._spool_on_failure(entry, user_id):
+                raise
+            return True
         except Exception as e:
+            mongo_breaker.release_probe()
             logging.error(f"Error deleting comment {comment_id}", exc_info=True)
             raise e
 
@@ -71,15 +100,60 @@ class CommentService:
         :param comment: Comment object
         :return: Added Comment object with ID
         """
+        if self._should_spool():
+            self._spool(self._create_entry(comment), comment.user_id)
+            return comment
         try:
-            result = self.collection.insert_one(comment.__dict__)
+            # The audit trail is keyed by the message's comment ID, like updates and deletes
+            comment_id = comment.id
+            result = self.collection.insert_one(comment.to_document())
+            mongo_breaker.record_success()
             comment.id = str(result.inserted_id)
             logging.info(f"Comment added with ID {comment.id}.")
+            audit_log.record(OperationType.CREATE.value, comment_id, comment.user_id, score=comment.score)
             return comment
+        except MONGO_UNAVAILABLE:
+            if self._spool_on_failure(self._create_entry(comment), comment.user_id):
+                return comment
+            logging.error("Error adding new comment", exc_info=True)
+            return None
         except Exception:
+            mongo_breaker.release_probe()
             logging.error("Error adding new comment", exc_info=True)
             return None
 
+    @staticmethod
+    def _create_entry(comment: Comment) -> dict:
+        return {"op": OperationType.CREATE.value, "id": comment.id, "document": comment.to_document()}
+
+    @staticmethod
+    def _should_spool() -> bool:
+        """
+        Spool instead of writing when the breaker is open, or when older writes are still
+        spooled, so a comment's operations reach MongoDB in the order they were processed.
+        """
+        return settings.SPOOL_ENABLED and (comment_spool.pending > 0 or not mongo_breaker.allow())
+
+    @staticmethod
+    def _spool(entry: dict, user_id: str = None):
+        comment_spool.append(entry)
+        spool_replayer.ensure_started()
+        logging.info("Comment operation spooled to disk", operation=entry["op"], comment_id=entry["id"])
+        audit_log.record(entry["op"], entry["id"], user_id, spooled=True)
+
+    def _spool_on_failure(self, entry: dict, user_id: str = None) -> bool:
+        """
+        Record a MongoDB availability failure and spool the operation if spooling is enabled.
+        :return: bool True if the operation was spooled
+        """
+        mongo_breaker.record_failure()
+        if not settings.SPOOL_ENABLED:
+            return False
+        logging.warning("MongoDB unavailable, spooling comment operation", operation=entry["op"],
+                        comment_id=entry["id"], exc_info=True)
+        self._spool(entry, user_id)
+        return True
+
     def process_ops(self, comment: Comment, ops: str, score: float=None) -> Union[Comment, bool, None]:
         """
         Process operations on a comment based on the ops parameter.
@@ -90,15 +164,26 @@ class CommentService:
         """
         ops = ops.lower()
         if ops == OperationType.CREATE:
-            return self.add(comment)
+            # add() replaces the id with MongoDB's inserted id; history is keyed by the comment's own id
+            comment_id = comment.id
+            if score is not None:
+                # Store the computed score, so the document and its score history agree
+                comment.score = score
+            result = self.add(comment)
+            if result:
+                score_history.record(comment_id, comment.user_id, comment.score, ops)
+            return result
         elif ops == OperationType.UPDATE:
             if score is not None:
-                return self.update(comment, score)
+                result = self.update(comment, score)
+                if result:
+                    score_history.record(comment.id, comment.user_id, score, ops)
+                return result
             else:
                 logging.error(ValidationMessage.SCORE_REQUIRED.format(operation="update"))
                 return None
         elif ops == OperationType.DELETE:
-            return self.delete(comment.id)
+            return self.delete(comment.id, comment.user_id)
         else:
             logging.error(ValidationMessage.INVALID_OPERATION.format(operation=ops))
             return None
@@ -0,0 +1,89 @@
+"""
+Unit tests for the buffered audit log writer.
+"""
+import json
+import os
+import tempfile
+import unittest
+from unittest.mock import Mock, MagicMock
+from database.audit import AuditLogWriter
+
+
+class TestAuditLogWriter(unittest.TestCase):
+    """Test cases for the AuditLogWriter class."""
+
+    def setUp(self):
+        """Set up a writer backed by a mocked collection."""
+        self.tmp_dir = tempfile.TemporaryDirectory()
+        self.addCleanup(self.tmp_dir.cleanup)
+        self.fallback_path = os.path.join(self.tmp_dir.name, "audit.ndjson")
+        self.mock_collection = Mock()
+        self.writer = AuditLogWriter(
+            connection=Mock(),
+            batch_size=10,
+            flush_interval=60,
+            max_buffer=20,
+            fallback_path=self.fallback_path,
+        )
+        self.writer.collection = self.mock_collection
+        # Keep the background flusher out of the way; tests flush explicitly.
+        self.writer._thread = MagicMock()
+
+    def _read_fallback(self):
+        with open(self.fallback_path, encoding="utf-8") as fh:
+            return [json.loads(line) for line in fh]
+
+    def test_record_buffers_without_writing(self):
+        """Test that recording an entry does not hit MongoDB."""
+        self.writer.record("create", "c1", "u1", score=10.0)
+
+        self.mock_collection.insert_many.assert_not_called()
+        self.assertEqual(len(self.writer._buffer), 1)
+
+    def test_flush_uses_unordered_insert_many(self):
+        """Test that flush writes the whole buffer in one unordered batch."""
+        for i in range(3):
+            self.writer.record("update", f"c{i}", "u1", score=float(i))
+
+        flushed = self.writer.flush()
+
+        self.assertEqual(flushed, 3)
+        args, kwargs = self.mock_collection.insert_many.call_args
+        self.assertEqual([entry["comment_id"] for entry in args[0]], ["c0", "c1", "c2"])
+        self.assertEqual(kwargs, {"ordered": False})
+        self.assertEqual(len(self.writer._buffer), 0)
+
+    def test_flush_failure_falls_back_to_file(self):
+        """Test that entries are appended to the fallback file when MongoDB is unavailable."""
+        self.mock_collection.insert_many.side_effect = Exception("Mongo down")
+        self.writer.record("delete", "c1")
+
+        self.writer.flush()
+
+        entries = self._read_fallback()
+        self.assertEqual(len(entries), 1)
+        self.assertEqual(entries[0]["operation"], "delete")
+        self.assertEqual(entries[0]["comment_id"], "c1")
+
+    def test_buffer_is_bounded(self):
+        """Test that overflowing entries are spilled to file instead of growing the buffer."""
+        for i in range(25):
+            self.writer.record("create", f"c{i}")
+
+        self.assertEqual(len(self.writer._buffer), 20)
+        spilled = self._read_fallback()
+        self.assertEqual([entry["comment_id"] for entry in spilled], [f"c{i}" for i in range(5)])
+
+    def test_close_flushes_remaining_entries(self):
+        """Test that close flushes buffered entries."""
+        self.writer._thread = None
+        self.writer._ensure_started = Mock()
+        self.writer.record("create", "c1")
+
+        self.writer.close()
+
+        self.mock_collection.insert_many.assert_called_once()
+
+
+if __name__ == '__main__':
+    unittest.main()
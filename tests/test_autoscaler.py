@@ -0,0 +1,112 @@
+"""
+Unit tests for the consumer worker autoscaler.
+"""
+import unittest
+from unittest.mock import Mock, patch
+from autoscaler import Autoscaler, LATENCY_METRIC
+from metrics import metrics
+
+
+class TestAutoscaler(unittest.TestCase):
+    """Test cases for the Autoscaler class."""
+
+    def setUp(self):
+        settings_patcher = patch('autoscaler.settings')
+        self.mock_settings = settings_patcher.start()
+        self.addCleanup(settings_patcher.stop)
+        self.mock_settings.AUTOSCALE_SCALE_UP_BACKLOG = 100
+        self.mock_settings.AUTOSCALE_SCALE_DOWN_BACKLOG = 10
+        self.mock_settings.AUTOSCALE_TARGET_LATENCY = 5.0
+        self.mock_settings.AUTOSCALE_MAX_CPU = 0.9
+        self.mock_settings.AUTOSCALE_STABLE_SAMPLES = 2
+        self.addCleanup(metrics.reset)
+        self.probe = Mock()
+        self.probe.is_fresh.return_value = True
+        self.started = 0
+        self.stop_worker = Mock()
+        self.autoscaler = Autoscaler(self._start_worker, self.stop_worker, probe=self.probe,
+                                     min_workers=1, max_workers=3, interval=1, cooldown=0)
+        self.autoscaler.workers = ["w0"]
+
+    def _start_worker(self):
+        self.started += 1
+        return f"w{self.started}"
+
+    def test_scales_up_on_backlog(self):
+        """Test that a backlog above the threshold per consumer adds a worker."""
+        self.assertEqual(self.autoscaler.decide(backlog=500, consumers=2, latency=None, cpu=0.1), 1)
+
+    def test_scales_up_on_latency(self):
+        """Test that slow processing with waiting messages adds a worker."""
+        self.assertEqual(self.autoscaler.decide(backlog=20, consumers=2, latency=9.0, cpu=0.1), 1)
+
+    def test_holds_when_cpu_saturated(self):
+        """Test that no worker is added once the process is CPU bound."""
+        self.assertEqual(self.autoscaler.decide(backlog=500, consumers=1, latency=None, cpu=0.95), 0)
+
+    def test_respects_max_workers(self):
+        """Test that the worker count never exceeds the upper bound."""
+        self.autoscaler.workers = ["w0", "w1", "w2"]
+
+        self.assertEqual(self.autoscaler.decide(backlog=5000, consumers=1, latency=None, cpu=0.1), 0)
+
+    def test_scale_down_needs_stable_quiet_samples(self):
+        """Test hysteresis: workers are only removed after consecutive quiet evaluations."""
+        self.autoscaler.workers = ["w0", "w1"]
+
+        self.assertEqual(self.autoscaler.decide(backlog=5, consumers=2, latency=None, cpu=0.1), 0)
+        self.assertEqual(self.autoscaler.decide(backlog=5, consumers=2, latency=None, cpu=0.1), -1)
+
+    def test_backlog_between_thresholds_resets_quiet_streak(self):
+        """Test that a backlog between the two thresholds neither scales nor counts as quiet."""
+        self.autoscaler.workers = ["w0", "w1"]
+
+        self.autoscaler.decide(backlog=5, consumers=2, latency=None, cpu=0.1)
+        self.assertEqual(self.autoscaler.decide(backlog=100, consumers=2, latency=None, cpu=0.1), 0)
+        self.assertEqual(self.autoscaler.decide(backlog=5, consumers=2, latency=None, cpu=0.1), 0)
+
+    def test_respects_min_workers(self):
+        """Test that the worker count never drops below the lower bound."""
+        for _ in range(5):
+            self.assertEqual(self.autoscaler.decide(backlog=0, consumers=1, latency=None, cpu=0.0), 0)
+
+    def test_cooldown_blocks_consecutive_changes(self):
+        """Test that no decision is taken within the cooldown after scaling."""
+        self.autoscaler.cooldown = 60
+        self.probe.last_sample = {"backlog": 1000, "consumers": 1}
+
+        self.assertEqual(self.autoscaler.step(), 1)
+        self.assertEqual(self.autoscaler.step(), 0)
+        self.assertEqual(self.autoscaler.workers, ["w0", "w1"])
+
+    def test_step_stops_most_recent_worker(self):
+        """Test that scaling down gracefully stops the newest worker."""
+        self.autoscaler.workers = ["w0", "w1"]
+        self.probe.last_sample = {"backlog": 0, "consumers": 2}
+
+        self.autoscaler.step()
+        self.autoscaler.step()
+
+        self.stop_worker.assert_called_once_with("w1")
+        self.assertEqual(metrics.gauge("autoscaler.workers"), 1)
+
+    def test_step_holds_without_fresh_sample(self):
+        """Test that a stale probe sample never triggers scaling."""
+        self.probe.is_fresh.return_value = False
+        self.probe.last_sample = {"backlog": 1000, "consumers": 1}
+
+        self.assertEqual(self.autoscaler.step(), 0)
+
+    def test_interval_latency_uses_new_observations_only(self):
+        """Test that latency is the mean of observations since the previous evaluation."""
+        metrics.observe(LATENCY_METRIC, 10.0)
+        self.autoscaler._interval_latency()
+        metrics.observe(LATENCY_METRIC, 2.0)
+        metrics.observe(LATENCY_METRIC, 4.0)
+
+        self.assertEqual(self.autoscaler._interval_latency(), 3.0)
+        self.assertIsNone(self.autoscaler._interval_latency())
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,150 @@
+"""
+Unit tests for the backfill CLI, the _id-range cursor helper and the token bucket.
+"""
+import os
+import tempfile
+import unittest
+from concurrent.futures import ThreadPoolExecutor
+from unittest.mock import Mock, patch
+from backfill import Backfill, Checkpoint
+from config import settings
+from database.cursor import iter_batches
+from ratelimit import TokenBucket
+
+
+class FakeCursor:
+
+    def __init__(self, docs):
+        self.docs = docs
+
+    def sort(self, key, direction):
+        self.docs = sorted(self.docs, key=lambda doc: doc[key])
+        return self
+
+    def limit(self, count):
+        self.docs = self.docs[:count]
+        return self
+
+    def __iter__(self):
+        return iter(self.docs)
+
+
+class FakeCollection:
+    """In-memory stand-in supporting the _id range queries used by iter_batches."""
+
+    def __init__(self, docs):
+        self.docs = docs
+        self.queries = []
+        self.bulk_writes = []
+
+    def _matches(self, doc, query):
+        id_range = query.get("_id", {})
+        return ("$gt" not in id_range or doc["_id"] > id_range["$gt"]) and \
+               ("$lte" not in id_range or doc["_id"] <= id_range["$lte"])
+
+    def find(self, query, projection=None):
+        self.queries.append(query)
+        return FakeCursor([dict(doc) for doc in self.docs if self._matches(doc, query)])
+
+    def count_documents(self, query):
+        return sum(1 for doc in self.docs if self._matches(doc, query))
+
+    def bulk_write(self, requests, ordered=True):
+        self.bulk_writes.append((requests, ordered))
+        return Mock(modified_count=len(requests))
+
+
+class TestIterBatches(unittest.TestCase):
+    """Test cases for iter_batches."""
+
+    def test_paginates_by_id_range(self):
+        """Test that batches follow _id order using $gt on the last _id, never skip."""
+        collection = FakeCollection([{"_id": i} for i in (5, 1, 4, 2, 3)])
+
+        batches = list(iter_batches(collection, batch_size=2))
+
+        self.assertEqual([[doc["_id"] for doc in batch] for batch in batches], [[1, 2], [3, 4], [5]])
+        self.assertEqual(collection.queries[1], {"_id": {"$gt": 2}})
+
+    def test_resumes_and_stops_within_range(self):
+        """Test start_after and end_at bounds."""
+        collection = FakeCollection([{"_id": i} for i in range(10)])
+
+        batches = list(iter_batches(collection, batch_size=3, start_after=2, end_at=6))
+
+        self.assertEqual([doc["_id"] for batch in batches for doc in batch], [3, 4, 5, 6])
+
+
+class TestTokenBucket(unittest.TestCase):
+    """Test cases for the TokenBucket class."""
+
+    def test_disabled_when_rate_is_zero(self):
+        """Test that a zero rate never waits."""
+        bucket = TokenBucket(rate=0)
+
+        self.assertEqual(bucket.acquire(10_000), 0.0)
+        self.assertTrue(bucket.try_acquire(10_000))
+
+    @patch('ratelimit.time.sleep')
+    @patch('ratelimit.time.monotonic', return_value=100.0)
+    def test_waits_for_refill(self, mock_monotonic, mock_sleep):
+        """Test that taking more tokens than available waits for the deficit to refill."""
+        bucket = TokenBucket(rate=10, capacity=10)
+
+        self.assertEqual(bucket.acquire(10), 0.0)
+        self.assertEqual(bucket.acquire(5), 0.5)
+        mock_sleep.assert_called_once_with(0.5)
+        self.assertFalse(bucket.try_acquire(1))
+
+
+class TestBackfill(unittest.TestCase):
+    """Test cases for the Backfill class."""
+
+    def setUp(self):
+        self.tmp_dir = tempfile.TemporaryDirectory()
+        self.addCleanup(self.tmp_dir.cleanup)
+        self.checkpoint_path = os.path.join(self.tmp_dir.name, "backfill.json")
+        self.executor = ThreadPoolExecutor(max_workers=2)
+        self.addCleanup(self.executor.shutdown)
+        self.collection = FakeCollection([{"_id": i, "id": f"c{i}", "user_id": "u1", "content": f"text {i}"}
+                                          for i in range(7)])
+        history_patcher = patch('backfill.score_history')
+        self.mock_score_history = history_patcher.start()
+        self.addCleanup(history_patcher.stop)
+
+    def _backfill(self, checkpoint):
+        return Backfill(self.collection, self.executor, checkpoint, batch_size=3, rate=0, max_in_flight=2,
+                        score_fn=lambda texts: [float(len(text)) for text in texts])
+
+    def test_rescores_with_unordered_bulk_writes(self):
+        """Test that every document is rescored in batches written with unordered bulk_write."""
+        with patch.object(settings, "COMMENT_LEGACY_READS", False):
+            checkpoint = self._backfill(Checkpoint(self.checkpoint_path)).run()
+
+        self.assertEqual(checkpoint.processed, 7)
+        self.assertEqual(checkpoint.last_id, 6)
+        self.assertEqual([len(requests) for requests, _ in self.collection.bulk_writes], [3, 3, 1])
+        self.assertTrue(all(not ordered for _, ordered in self.collection.bulk_writes))
+        update = self.collection.bulk_writes[0][0][0]._doc["$set"]
+        self.assertEqual(update["s"], 6.0)
+        events, source, _ = self.mock_score_history.record_many.call_args_list[0].args
+        self.assertEqual(list(events), [("c0", "u1", 6.0), ("c1", "u1", 6.0), ("c2", "u1", 6.0)])
+        self.assertEqual(source, "backfill")
+
+    def test_resumes_from_checkpoint(self):
+        """Test that a saved checkpoint skips documents already rescored."""
+        checkpoint = Checkpoint(self.checkpoint_path)
+        checkpoint.last_id = 3
+        checkpoint.processed = 4
+        checkpoint.save()
+
+        resumed = self._backfill(Checkpoint(self.checkpoint_path).load()).run()
+
+        written = [request._filter["_id"] for requests, _ in self.collection.bulk_writes for request in requests]
+        self.assertEqual(written, [4, 5, 6])
+        self.assertEqual(resumed.processed, 7)
+        self.assertEqual(Checkpoint(self.checkpoint_path).load().last_id, 6)
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,51 @@
+"""
+Unit tests for cascaded scoring.
+"""
+import unittest
+from unittest.mock import Mock
+from metrics import metrics
+from scoring.cascade import CascadeScorer
+from scoring.lexicon import LexiconScorer
+
+
+class TestCascadeScorer(unittest.TestCase):
+    """Test cases for the CascadeScorer class."""
+
+    def setUp(self):
+        """Set up a cascade with a mocked expensive scorer."""
+        metrics.reset()
+        self.addCleanup(metrics.reset)
+        self.fast = LexiconScorer({"idiot": 95.0, "dumb": 40.0})
+        self.slow = Mock()
+        self.slow.score_batch.side_effect = lambda texts: [55.0] * len(texts)
+        self.cascade = CascadeScorer(self.fast, self.slow, low=0.0, high=90.0)
+
+    def test_confident_texts_skip_expensive_scorer(self):
+        """Test that clearly benign and clearly toxic texts are decided by the fast scorer."""
+        scores = self.cascade.score_batch(["have a nice day", "you idiot"])
+
+        self.assertEqual(scores[0], 0.0)
+        self.assertEqual(scores[1], 95.0)
+        self.slow.score_batch.assert_not_called()
+
+    def test_ambiguous_texts_are_escalated(self):
+        """Test that only texts inside the uncertainty band reach the expensive scorer."""
+        scores = self.cascade.score_batch(["nice", "that is dumb", "idiot"])
+
+        self.assertEqual(scores, [0.0, 55.0, 95.0])
+        self.slow.score_batch.assert_called_once_with(["that is dumb"])
+
+    def test_stats_report_hit_rates(self):
+        """Test that per-stage hit rates are recorded."""
+        self.cascade.score_batch(["nice", "that is dumb", "idiot", "fine"])
+
+        stats = CascadeScorer.stats()
+
+        self.assertEqual(stats["texts"], 4)
+        self.assertEqual(stats["fast_hit_rate"], 0.75)
+        self.assertEqual(stats["escalation_rate"], 0.25)
+        self.assertEqual(metrics.timing("scoring.cascade.slow.latency")["count"], 1)
+
+
+if __name__ == '__main__':
+    unittest.main()
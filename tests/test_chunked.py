@@ -0,0 +1,129 @@
+"""
+Unit tests for chunked parallel scoring.
+"""
+import threading
+import unittest
+from concurrent.futures import ThreadPoolExecutor
+from scoring.base import Scorer
+from scoring.chunked import ChunkedScorer, split_text
+
+
+class KeywordCountScorer(Scorer):
+    """Test scorer: 100 if the chunk contains 'toxic', else 10."""
+
+    def __init__(self):
+        self.calls = []
+        self.batches = []
+        self.lock = threading.Lock()
+
+    def score(self, text):
+        with self.lock:
+            self.calls.append(text)
+        return 100.0 if "toxic" in text else 10.0
+
+    def score_batch(self, texts):
+        with self.lock:
+            self.batches.append(list(texts))
+        return super().score_batch(texts)
+
+
+class TestSplitText(unittest.TestCase):
+    """Test cases for the split_text function."""
+
+    def test_short_text_is_single_chunk(self):
+        """Test that texts within the chunk size are not split."""
+        self.assertEqual(split_text("hello", 10, 2), ["hello"])
+
+    def test_chunks_overlap_and_cover_text(self):
+        """Test that chunks overlap by the configured amount and cover the whole text."""
+        text = "abcdefghijklmnopqrstuvwxyz"
+
+        chunks = split_text(text, 10, 3)
+
+        self.assertEqual(chunks, ["abcdefghij", "hijklmnopq", "opqrstuvwx", "vwxyz"])
+        for previous, current in zip(chunks, chunks[1:]):
+            self.assertEqual(previous[-3:], current[:3])
+
+    def test_zero_chunk_size_disables_splitting(self):
+        """Test that a chunk size of 0 keeps the text whole."""
+        self.assertEqual(split_text("a" * 50, 0, 0), ["a" * 50])
+
+
+class TestChunkedScorer(unittest.TestCase):
+    """Test cases for the ChunkedScorer class."""
+
+    def setUp(self):
+        """Set up a dedicated pool for each test."""
+        self.pool = ThreadPoolExecutor(max_workers=2)
+        self.addCleanup(self.pool.shutdown)
+        self.inner = KeywordCountScorer()
+        self.text = "fine " * 20 + "toxic " + "fine " * 20
+
+    def test_short_text_scored_once(self):
+        """Test that a short text is scored as a single chunk."""
+        scorer = ChunkedScorer(self.inner, chunk_size=1000, overlap=10, reducer="max",
+                               early_exit=False, threshold=80, pool=self.pool)
+
+        self.assertEqual(scorer.score("toxic"), 100.0)
+        self.assertEqual(len(self.inner.calls), 1)
+
+    def test_max_reducer(self):
+        """Test that the max reducer returns the worst chunk score."""
+        scorer = ChunkedScorer(self.inner, chunk_size=40, overlap=8, reducer="max",
+                               early_exit=False, threshold=80, pool=self.pool)
+
+        self.assertEqual(scorer.score(self.text), 100.0)
+        self.assertGreater(len(self.inner.calls), 1)
+
+    def test_mean_reducer(self):
+        """Test that the mean reducer averages chunk scores."""
+        scorer = ChunkedScorer(self.inner, chunk_size=40, overlap=8, reducer="mean",
+                               early_exit=False, threshold=80, pool=self.pool)
+
+        score = scorer.score(self.text)
+
+        self.assertGreater(score, 10.0)
+        self.assertLess(score, 100.0)
+
+    def test_early_exit_cancels_remaining_chunks(self):
+        """Test that chunks not yet started are skipped once one crosses the threshold."""
+        text = "toxic " + "fine " * 200
+        single_pool = ThreadPoolExecutor(max_workers=1)
+        self.addCleanup(single_pool.shutdown)
+        scorer = ChunkedScorer(self.inner, chunk_size=40, overlap=8, reducer="mean",
+                               early_exit=True, threshold=80, pool=single_pool)
+
+        score = scorer.score(text)
+
+        self.assertEqual(score, 100.0)
+        self.assertLess(len(self.inner.calls), len(split_text(text, 40, 8)))
+
+    def test_score_batch_preserves_order(self):
+        """Test that batch scoring returns one score per text in input order."""
+        scorer = ChunkedScorer(self.inner, chunk_size=40, overlap=8, reducer="max",
+                               early_exit=False, threshold=80, pool=self.pool)
+
+        self.assertEqual(scorer.score_batch(["fine", self.text, "ok"]), [10.0, 100.0, 10.0])
+
+    def test_score_batch_scores_chunks_through_inner_score_batch(self):
+        """Test that the chunks of a whole batch reach the inner scorer's score_batch, one slice per worker."""
+        scorer = ChunkedScorer(self.inner, chunk_size=40, overlap=8, reducer="max",
+                               early_exit=False, threshold=80, pool=self.pool)
+        texts = ["fine", self.text, "ok"]
+
+        scorer.score_batch(texts)
+
+        expected = [chunk for text in texts for chunk in split_text(text, 40, 8)]
+        self.assertEqual(len(self.inner.batches), 2)
+        self.assertCountEqual([chunk for batch in self.inner.batches for chunk in batch], expected)
+
+    def test_early_exit_keeps_max_for_tripped_text(self):
+        """Test that a text whose chunk crossed the threshold gets its max score, not the mean."""
+        scorer = ChunkedScorer(self.inner, chunk_size=40, overlap=8, reducer="mean",
+                               early_exit=True, threshold=80, pool=self.pool)
+
+        self.assertEqual(scorer.score_batch([self.text, "fine"]), [100.0, 10.0])
+
+
+if __name__ == '__main__':
+    unittest.main()
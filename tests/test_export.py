@@ -0,0 +1,114 @@
+"""
+Unit tests for the streaming score export.
+"""
+import csv
+import json
+import os
+import tempfile
+import unittest
+from datetime import datetime, UTC
+from unittest.mock import Mock
+from export import build_query, export_range, partition_bounds, pyarrow
+from tests.test_backfill import FakeCollection
+
+
+class TestExport(unittest.TestCase):
+    """Test cases for the export helpers."""
+
+    def setUp(self):
+        self.tmp_dir = tempfile.TemporaryDirectory()
+        self.addCleanup(self.tmp_dir.cleanup)
+        created_at = datetime(2025, 11, 26, 10, 0, tzinfo=UTC)
+        self.collection = FakeCollection([
+            {"_id": i, "id": f"c{i}", "user_id": f"u{i % 2}", "score": float(i * 10), "created_at": created_at,
+             "content": "not exported"}
+            for i in range(5)
+        ])
+
+    def test_build_query(self):
+        """Test that filters become a server-side query."""
+        since = datetime(2025, 1, 1, tzinfo=UTC)
+
+        query = build_query(since=since, min_score=50.0, users=["u1", "u2"])
+
+        self.assertEqual(query, {
+            "created_at": {"$gte": since},
+            "score": {"$gte": 50.0},
+            "user_id": {"$in": ["u1", "u2"]},
+        })
+
+    def test_export_ndjson_in_batches(self):
+        """Test that NDJSON export writes every document with only the requested fields."""
+        path = os.path.join(self.tmp_dir.name, "out.ndjson")
+
+        exported = export_range(path, "ndjson", {}, ["id", "score", "created_at"], chunk_size=2,
+                                collection=self.collection)
+
+        with open(path, encoding="utf-8") as fh:
+            rows = [json.loads(line) for line in fh]
+        self.assertEqual(exported, 5)
+        self.assertEqual(len(self.collection.queries), 3)
+        self.assertEqual(rows[0], {"id": "c0", "score": 0.0, "created_at": "2025-11-26T10:00:00+00:00"})
+
+    def test_export_csv_range(self):
+        """Test that CSV export honours the _id range and writes a header."""
+        path = os.path.join(self.tmp_dir.name, "out.csv")
+
+        exported = export_range(path, "csv", {}, ["id", "user_id"], chunk_size=10, start_after=1, end_at=3,
+                                collection=self.collection)
+
+        with open(path, encoding="utf-8", newline="") as fh:
+            rows = list(csv.DictReader(fh))
+        self.assertEqual(exported, 2)
+        self.assertEqual(rows, [{"id": "c2", "user_id": "u0"}, {"id": "c3", "user_id": "u1"}])
+
+    @unittest.skipUnless(pyarrow, "pyarrow is not installed")
+    def test_export_parquet_row_groups(self):
+        """Test that Parquet export writes one row group per batch."""
+        path = os.path.join(self.tmp_dir.name, "out.parquet")
+
+        export_range(path, "parquet", {}, ["id", "score"], chunk_size=2, collection=self.collection)
+
+        metadata = pyarrow.parquet.ParquetFile(path).metadata
+        self.assertEqual(metadata.num_rows, 5)
+        self.assertEqual(metadata.num_row_groups, 3)
+
+    @unittest.skipUnless(pyarrow, "pyarrow is not installed")
+    def test_export_parquet_keeps_types_across_batches(self):
+        """Test that all-null first batches and string timestamps do not break later row groups."""
+        path = os.path.join(self.tmp_dir.name, "out.parquet")
+        updated_at = datetime(2025, 11, 27, 8, 0)
+        collection = FakeCollection([
+            {"_id": 0, "id": "c0", "score": 10, "timestamp": "2025-11-26T10:00:00", "updated_at": None},
+            {"_id": 1, "id": "c1", "score": 20.5, "timestamp": datetime(2025, 11, 26, 11, 0),
+             "updated_at": updated_at},
+        ])
+
+        export_range(path, "parquet", {}, ["id", "score", "timestamp", "updated_at"], chunk_size=1,
+                     collection=collection)
+
+        table = pyarrow.parquet.read_table(path)
+        self.assertEqual(table.schema.field("timestamp").type, pyarrow.timestamp("us", tz="UTC"))
+        self.assertEqual(table.column("score").to_pylist(), [10.0, 20.5])
+        self.assertEqual(table.column("updated_at").to_pylist(), [None, updated_at.replace(tzinfo=UTC)])
+        self.assertEqual(table.column("timestamp").to_pylist()[0], datetime(2025, 11, 26, 10, 0, tzinfo=UTC))
+
+    def test_partition_bounds_cover_whole_range(self):
+        """Test that sampled partition bounds form contiguous ranges."""
+        collection = Mock()
+        collection.aggregate.return_value = [{"_id": i} for i in range(100)]
+
+        bounds = partition_bounds(collection, {}, partitions=4)
+
+        self.assertEqual(bounds, [(None, 25), (25, 50), (50, 75), (75, None)])
+
+    def test_single_partition(self):
+        """Test that no sampling happens without partitioning."""
+        collection = Mock()
+
+        self.assertEqual(partition_bounds(collection, {}, partitions=1), [(None, None)])
+        collection.aggregate.assert_not_called()
+
+
+if __name__ == '__main__':
+    unittest.main()
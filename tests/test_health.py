@@ -0,0 +1,177 @@
+"""
+Unit tests for the queue probe and the health/readiness/lag HTTP server.
+"""
+import json
+import unittest
+import urllib.error
+import urllib.request
+from datetime import datetime, UTC
+from unittest.mock import Mock, patch
+from health import HealthServer
+from metrics import metrics
+from rabbitmq.probe import DeliveryAges, QueueProbe, message_age
+
+
+class TestMessageAge(unittest.TestCase):
+    """Test cases for message_age."""
+
+    def setUp(self):
+        self.now = datetime(2025, 11, 26, 10, 1, 0, tzinfo=UTC)
+
+    def test_age_from_body_timestamp(self):
+        """Test that the age is read from the body's timestamp field, naive values as UTC."""
+        body = json.dumps({"id": "c1", "timestamp": "2025-11-26T10:00:00"})
+
+        self.assertEqual(message_age(body, None, now=self.now), 60.0)
+
+    def test_age_falls_back_to_amqp_timestamp(self):
+        """Test that the AMQP timestamp property is used when the body has no timestamp."""
+        properties = Mock(timestamp=int(self.now.timestamp()) - 30)
+
+        self.assertEqual(message_age(b"not json", properties, now=self.now), 30.0)
+
+    def test_age_unknown(self):
+        """Test that a message without any timestamp has no age."""
+        self.assertIsNone(message_age(b"{}", Mock(timestamp=None), now=self.now))
+
+
+class TestQueueProbe(unittest.TestCase):
+    """Test cases for the QueueProbe class."""
+
+    def setUp(self):
+        init_patcher = patch('rabbitmq.probe.RabbitMQConnection.__init__', return_value=None)
+        init_patcher.start()
+        self.addCleanup(init_patcher.stop)
+        ensure_patcher = patch('rabbitmq.probe.RabbitMQConnection.ensure_connection')
+        ensure_patcher.start()
+        self.addCleanup(ensure_patcher.stop)
+        self.probe = QueueProbe()
+        self.probe.channel = Mock()
+        self.addCleanup(metrics.reset)
+
+    def _declare_ok(self, messages, consumers):
+        declared = Mock()
+        declared.method.message_count = messages
+        declared.method.consumer_count = consumers
+        return declared
+
+    def test_queue_stats_declares_passively_and_requeues_peeked_message(self):
+        """Test that stats come from a passive declare and the peeked head message is put back."""
+        self.probe.channel.queue_declare.return_value = self._declare_ok(5, 2)
+        method = Mock(delivery_tag=7)
+        body = json.dumps({"timestamp": "2000-01-01T00:00:00"})
+        self.probe.channel.basic_get.return_value = (method, Mock(), body)
+
+        stats = self.probe.queue_stats("q.incoming_texts", peek_oldest=True)
+
+        self.probe.channel.queue_declare.assert_called_once_with(queue="q.incoming_texts", passive=True)
+        self.probe.channel.basic_reject.assert_called_once_with(delivery_tag=7, requeue=True)
+        self.assertEqual(stats["messages"], 5)
+        self.assertEqual(stats["consumers"], 2)
+        self.assertGreater(stats["oldest_age_seconds"], 0)
+
+    def test_queue_stats_skips_peek_on_empty_queue(self):
+        """Test that an empty queue is not peeked."""
+        self.probe.channel.queue_declare.return_value = self._declare_ok(0, 1)
+
+        stats = self.probe.queue_stats("q.incoming_texts", peek_oldest=True)
+
+        self.probe.channel.basic_get.assert_not_called()
+        self.assertIsNone(stats["oldest_age_seconds"])
+
+    @patch('rabbitmq.probe.settings')
+    def test_sample_summarizes_backlog(self, mock_settings):
+        """Test that a sample sums the incoming backlog and publishes gauges."""
+        mock_settings.RABBITMQ_SHARD_COUNT = 0
+        mock_settings.PROBE_PEEK_OLDEST = False
+        mock_settings.PROBE_INTERVAL = 10
+        self.probe.channel.queue_declare.side_effect = [self._declare_ok(12, 3), self._declare_ok(4, 0)]
+
+        summary = self.probe.sample()
+
+        self.assertEqual(summary["backlog"], 12)
+        self.assertEqual(summary["consumers"], 3)
+        self.assertEqual(summary["queues"]["q.processed_texts"]["messages"], 4)
+        self.assertEqual(metrics.gauge("queue.backlog"), 12)
+        self.assertTrue(self.probe.is_fresh())
+
+
+    @patch('rabbitmq.probe.delivery_ages')
+    @patch('rabbitmq.probe.settings')
+    def test_sample_takes_oldest_age_from_deliveries(self, mock_settings, mock_delivery_ages):
+        """Test that without peeking the oldest age comes from consumed deliveries and the queue is not touched."""
+        mock_settings.RABBITMQ_SHARD_COUNT = 0
+        mock_settings.PROBE_PEEK_OLDEST = False
+        self.probe.channel.queue_declare.side_effect = [self._declare_ok(12, 3), self._declare_ok(0, 0)]
+        mock_delivery_ages.oldest.return_value = 42.0
+
+        summary = self.probe.sample()
+
+        mock_delivery_ages.oldest.assert_called_once_with("q.incoming_texts")
+        self.assertEqual(summary["oldest_age_seconds"], 42.0)
+        self.probe.channel.basic_get.assert_not_called()
+        self.probe.channel.basic_reject.assert_not_called()
+
+
+class TestDeliveryAges(unittest.TestCase):
+    """Test cases for the DeliveryAges class."""
+
+    @patch('rabbitmq.probe.time.monotonic')
+    def test_oldest_ages_with_time_since_delivery(self, mock_monotonic):
+        """Test that the last delivered age grows with the time elapsed since the delivery."""
+        ages = DeliveryAges()
+        mock_monotonic.return_value = 100.0
+        ages.record("q.incoming_texts", 5.0)
+
+        mock_monotonic.return_value = 103.0
+
+        self.assertEqual(ages.oldest("q.incoming_texts"), 8.0)
+        self.assertIsNone(ages.oldest("q.other"))
+
+
+class TestHealthServer(unittest.TestCase):
+    """Test cases for the HealthServer class."""
+
+    def setUp(self):
+        self.probe = Mock()
+        self.probe.last_sample = {"backlog": 3, "oldest_age_seconds": 1.5}
+        self.probe.is_fresh.return_value = True
+        self.server = HealthServer(probe=self.probe, host="127.0.0.1", port=0)
+        self.server.start()
+        self.addCleanup(self.server.stop)
+
+    def _get(self, path):
+        try:
+            with urllib.request.urlopen(f"http://127.0.0.1:{self.server.port}{path}", timeout=5) as response:
+                return response.status, json.loads(response.read())
+        except urllib.error.HTTPError as e:
+            return e.code, json.loads(e.read())
+
+    def test_healthz(self):
+        """Test that the liveness endpoint answers OK."""
+        self.assertEqual(self._get("/healthz"), (200, {"status": "ok"}))
+
+    def test_readyz_reports_failing_checks(self):
+        """Test that readiness is 503 while any check fails."""
+        self.server.add_check("mongodb", lambda: False)
+
+        status, payload = self._get("/readyz")
+
+        self.assertEqual(status, 503)
+        self.assertEqual(payload["checks"], {"queue_probe": True, "mongodb": False})
+
+    def test_lag_returns_last_sample(self):
+        """Test that the lag endpoint returns the probe's last sample."""
+        status, payload = self._get("/lag")
+
+        self.assertEqual(status, 200)
+        self.assertEqual(payload["backlog"], 3)
+        self.assertTrue(payload["fresh"])
+
+    def test_unknown_path(self):
+        """Test that unknown paths are 404."""
+        self.assertEqual(self._get("/nope")[0], 404)
+
+
+if __name__ == '__main__':
+    unittest.main()
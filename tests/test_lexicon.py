@@ -0,0 +1,115 @@
+"""
+Unit tests for the Aho-Corasick lexicon matcher and scorer.
+"""
+import os
+import tempfile
+import unittest
+from scoring.lexicon import LexiconAutomaton, LexiconScorer, MappedLexiconAutomaton, combine_weights, load_lexicon
+
+
+class TestLoadLexicon(unittest.TestCase):
+    """Test cases for lexicon file parsing and weight combination."""
+
+    def test_load_lexicon(self):
+        """Test parsing weights, defaults, comments and term normalization."""
+        with tempfile.NamedTemporaryFile("w", suffix=".tsv", delete=False, encoding="utf-8") as fh:
+            fh.write("# comment\nIdiot\t60\nmoron\n\n")
+        self.addCleanup(os.remove, fh.name)
+
+        terms = load_lexicon(fh.name, default_weight=40)
+
+        self.assertEqual(terms, {"idiot": 60.0, "moron": 40.0})
+
+    def test_combine_weights_is_bounded(self):
+        """Test that combined scores stay within 0-100 and grow with matches."""
+        self.assertEqual(combine_weights([]), 0.0)
+        self.assertAlmostEqual(combine_weights([50]), 50.0)
+        self.assertAlmostEqual(combine_weights([50, 50]), 75.0)
+        self.assertEqual(combine_weights([100, 100]), 100.0)
+
+
+class TestLexiconAutomaton(unittest.TestCase):
+    """Test cases for the LexiconAutomaton class."""
+
+    def setUp(self):
+        """Compile a small lexicon with overlapping terms and phrases."""
+        self.terms = {"idiot": 60.0, "stupid idiot": 80.0, "he": 10.0, "hers": 20.0, "she": 30.0}
+        self.automaton = LexiconAutomaton.compile(self.terms)
+
+    def test_matches_overlapping_terms_and_phrases(self):
+        """Test that phrases and the terms they contain are all counted."""
+        match = self.automaton.match("you stupid idiot")
+
+        self.assertEqual(match.count, 2)
+        self.assertEqual(match.weighted_count, 140.0)
+
+    def test_word_boundaries(self):
+        """Test that terms glued to other letters are ignored with word boundaries."""
+        self.assertEqual(self.automaton.match("the idiots").count, 0)
+        self.assertEqual(self.automaton.match("idiot! he said").count, 2)
+
+    def test_substring_matching(self):
+        """Test that every occurrence is found when word boundaries are disabled."""
+        automaton = LexiconAutomaton.compile(self.terms, word_boundaries=False)
+
+        match = automaton.match("ushers")
+
+        # "she", "he" and "hers" all occur inside "ushers"
+        self.assertEqual(match.count, 3)
+        self.assertEqual(match.weighted_count, 60.0)
+
+    def test_score_matches_noisy_or(self):
+        """Test that the match score agrees with combine_weights."""
+        match = self.automaton.match("idiot he idiot")
+
+        self.assertAlmostEqual(match.score, combine_weights([60.0, 10.0, 60.0]))
+        self.assertEqual(self.automaton.match("nothing here").score, 0.0)
+
+    def test_save_and_map_round_trip(self):
+        """Test that a memory-mapped automaton matches like the original."""
+        texts = ["you stupid idiot", "she said hers", "ushers", "idiot! he said", "clean text"]
+        for word_boundaries in (True, False):
+            automaton = LexiconAutomaton.compile(self.terms, word_boundaries=word_boundaries)
+            with tempfile.TemporaryDirectory() as tmp_dir:
+                path = os.path.join(tmp_dir, "lexicon.ac")
+                automaton.save(path)
+
+                mapped = MappedLexiconAutomaton(path)
+                mapped.warm_up()
+
+                self.assertEqual(mapped.match_batch(texts), automaton.match_batch(texts))
+
+    def test_map_rejects_unknown_file(self):
+        """Test that files in another format are refused."""
+        with tempfile.NamedTemporaryFile("wb", suffix=".ac", delete=False) as fh:
+            fh.write(b"not an automaton" * 4)
+        self.addCleanup(os.remove, fh.name)
+
+        with self.assertRaises(ValueError):
+            MappedLexiconAutomaton(fh.name)
+
+
+class TestLexiconScorer(unittest.TestCase):
+    """Test cases for the LexiconScorer class."""
+
+    def test_score_counts_each_occurrence(self):
+        """Test that each matching occurrence contributes to the score."""
+        scorer = LexiconScorer({"idiot": 50.0})
+
+        self.assertEqual(scorer.score("hello there"), 0.0)
+        self.assertAlmostEqual(scorer.score("idiot idiot"), 75.0)
+
+    def test_from_compiled_file(self):
+        """Test loading the scorer from a compiled automaton file."""
+        with tempfile.TemporaryDirectory() as tmp_dir:
+            path = os.path.join(tmp_dir, "lexicon.ac")
+            LexiconAutomaton.compile({"idiot": 50.0}).save(path)
+
+            scorer = LexiconScorer.from_file(path)
+
+            self.assertIsInstance(scorer.automaton, MappedLexiconAutomaton)
+            self.assertEqual(scorer.score_batch(["idiot", "fine"]), [50.0, 0.0])
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,52 @@
+"""
+Unit tests for the in-process metrics registry.
+"""
+import unittest
+from metrics import MetricsRegistry
+
+
+class TestMetricsRegistry(unittest.TestCase):
+    """Test cases for the MetricsRegistry class."""
+
+    def setUp(self):
+        """Set up an empty registry."""
+        self.registry = MetricsRegistry()
+
+    def test_counters_and_gauges(self):
+        """Test incrementing counters and setting gauges."""
+        self.registry.increment("messages")
+        self.registry.increment("messages", 2)
+        self.registry.set_gauge("queue.depth", 7)
+
+        self.assertEqual(self.registry.counter("messages"), 3)
+        self.assertEqual(self.registry.gauge("queue.depth"), 7)
+        self.assertEqual(self.registry.counter("unknown"), 0)
+
+    def test_timings(self):
+        """Test that timing summaries track count, total, max and mean."""
+        self.registry.observe("latency", 1.0)
+        self.registry.observe("latency", 3.0)
+        with self.registry.timer("latency"):
+            pass
+
+        timing = self.registry.timing("latency")
+
+        self.assertEqual(timing["count"], 3)
+        self.assertEqual(timing["max"], 3.0)
+        self.assertAlmostEqual(timing["mean"], timing["total"] / 3)
+
+    def test_snapshot_and_reset(self):
+        """Test that the snapshot contains every metric kind and reset clears them."""
+        self.registry.increment("a")
+        self.registry.observe("b", 0.5)
+
+        snapshot = self.registry.snapshot()
+
+        self.assertEqual(snapshot["counters"], {"a": 1})
+        self.assertEqual(snapshot["timings"]["b"]["mean"], 0.5)
+        self.registry.reset()
+        self.assertEqual(self.registry.snapshot(), {"counters": {}, "gauges": {}, "timings": {}})
+
+
+if __name__ == '__main__':
+    unittest.main()
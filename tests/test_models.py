@@ -2,8 +2,8 @@
 Unit tests for Pydantic models (Comment and Message).
 """
 import unittest
-from datetime import datetime
-from models import Comment, Message
+from datetime import datetime, UTC
+from models import Comment, Message, SCHEMA_VERSION
 from pydantic import ValidationError
 
 
@@ -87,6 +87,30 @@ class TestCommentModel(unittest.TestCase):
         self.assertGreaterEqual(comment.created_at, before)
         self.assertLessEqual(comment.created_at, after)
 
+    def test_to_document_is_compact(self):
+        """Test that stored documents use short names, native dates and omit nulls."""
+        document = Comment(**self.valid_comment_data).to_document()
+
+        self.assertEqual(document["i"], "test_001")
+        self.assertEqual(document["s"], 75.5)
+        self.assertEqual(document["t"], datetime(2025, 11, 25, 10, 0, tzinfo=UTC))
+        self.assertEqual(document["v"], SCHEMA_VERSION)
+        self.assertNotIn("da", document)
+        self.assertNotIn("ua", document)
+
+    def test_from_document_reads_both_schemas(self):
+        """Test that compact and legacy documents load into the same comment."""
+        legacy = {**self.valid_comment_data, "_id": "oid", "deleted_at": None, "updated_at": None}
+        compact = Comment(**self.valid_comment_data).to_document()
+
+        from_legacy = Comment.from_document(legacy)
+        from_compact = Comment.from_document(compact)
+
+        self.assertEqual(from_legacy.user_id, from_compact.user_id)
+        self.assertEqual(from_legacy.score, from_compact.score)
+        self.assertEqual(datetime.fromisoformat(from_compact.timestamp),
+                         datetime(2025, 11, 25, 10, 0, tzinfo=UTC))
+
 
 class TestMessageModel(unittest.TestCase):
     """Test cases for the Message model."""
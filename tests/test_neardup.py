@@ -0,0 +1,91 @@
+"""
+Unit tests for SimHash fingerprints and the near-duplicate score index.
+"""
+import random
+import unittest
+from metrics import metrics
+from scoring.neardup import NearDuplicateIndex, band_masks, majority_bits, simhash
+from scoring.normalization import normalize_text
+
+CAMPAIGN = "you are the most pathetic worthless idiot i have ever seen on this forum, go away now"
+
+
+class TestSimHash(unittest.TestCase):
+    """Test cases for the fingerprint functions."""
+
+    def test_majority_bits_matches_per_bit_vote(self):
+        """Test that the bit-sliced majority agrees with counting each bit position."""
+        rng = random.Random(7)
+        for count in (1, 2, 3, 8, 81, 300):
+            hashes = [rng.getrandbits(64) for _ in range(count)]
+            expected = sum(1 << bit for bit in range(64)
+                           if sum((value >> bit) & 1 for value in hashes) * 2 > count)
+
+            self.assertEqual(majority_bits(hashes, count), expected)
+
+    def test_similar_texts_have_close_fingerprints(self):
+        """Test that a slight variation stays within a few bits and an unrelated text does not."""
+        variant = normalize_text(CAMPAIGN.upper() + "!!")
+        unrelated = normalize_text("thanks for the thoughtful write-up, i learned a lot about caching from it today")
+
+        self.assertLessEqual((simhash(CAMPAIGN) ^ simhash(variant)).bit_count(), 3)
+        self.assertGreater((simhash(CAMPAIGN) ^ simhash(unrelated)).bit_count(), 16)
+
+    def test_bands_cover_every_bit(self):
+        """Test that the bands split all 64 bits between max_distance + 1 disjoint masks."""
+        masks = band_masks(4)
+        combined = 0
+        for shift, mask in masks:
+            self.assertEqual(combined & (mask << shift), 0)
+            combined |= mask << shift
+
+        self.assertEqual(len(masks), 5)
+        self.assertEqual(combined, (1 << 64) - 1)
+
+
+class TestNearDuplicateIndex(unittest.TestCase):
+    """Test cases for the NearDuplicateIndex class."""
+
+    def setUp(self):
+        self.index = NearDuplicateIndex(max_size=3, max_distance=3, min_length=20, shingle_size=4)
+        self.addCleanup(metrics.reset)
+
+    def test_finds_fingerprints_within_the_distance(self):
+        """Test that any fingerprint within max_distance bits is found, and nothing further away."""
+        fingerprint = 0x0123456789ABCDEF
+        self.index.add(fingerprint, 88.0)
+
+        self.assertEqual(self.index.lookup(fingerprint ^ (1 << 3) ^ (1 << 20) ^ (1 << 63)), 88.0)
+        self.assertIsNone(self.index.lookup(fingerprint ^ 0b1111))
+        self.assertEqual(metrics.counter("neardup.hits"), 1)
+        self.assertEqual(metrics.counter("neardup.distance.3"), 1)
+
+    def test_short_texts_are_not_matched(self):
+        """Test that texts below min_length get no fingerprint, so they are never reused."""
+        self.assertIsNone(self.index.fingerprint("you are nice"))
+        self.assertIsNotNone(self.index.fingerprint(CAMPAIGN))
+
+    def test_evicts_least_recently_used(self):
+        """Test that the index is bounded and eviction also clears the band tables."""
+        oldest, evicted, recent = 0, 0xFFFF0000FFFF0000, 0x0000FFFF0000FFFF
+        for fingerprint in (oldest, evicted, recent):
+            self.index.add(fingerprint, 1.0)
+        self.index.lookup(oldest)
+        self.index.add((1 << 64) - 1, 2.0)
+
+        self.assertEqual(len(self.index), 3)
+        self.assertIsNone(self.index.lookup(evicted))
+        self.assertEqual(self.index.lookup(oldest), 1.0)
+
+    def test_configure_rebuilds_bands(self):
+        """Test that a new threshold applies to fingerprints indexed before the change."""
+        self.index.add(0, 5.0)
+        self.assertIsNone(self.index.lookup(0b11111))
+
+        self.index.configure(max_distance=5)
+
+        self.assertEqual(self.index.lookup(0b11111), 5.0)
+
+
+if __name__ == '__main__':
+    unittest.main()
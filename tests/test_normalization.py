@@ -0,0 +1,118 @@
+"""
+Unit tests for the text normalization stage and the score cache.
+"""
+import unittest
+from scoring.normalization import TextNormalizer, normalize_text
+from scoring.cache import ScoreCache
+
+
+class TestNormalizeText(unittest.TestCase):
+    """Test cases for the normalize_text function."""
+
+    def test_strips_zero_width_and_folds_width(self):
+        """Test that zero-width characters and fullwidth forms are removed."""
+        self.assertEqual(normalize_text("\uff28\uff45\uff4c\uff4c\uff4f  W\u200bORLD"), "hello world")
+
+    def test_folds_confusables(self):
+        """Test that Cyrillic lookalikes inside Latin words are folded."""
+        self.assertEqual(normalize_text("\u0455tu\u0440id"), "stupid")
+
+    def test_keeps_genuine_cyrillic(self):
+        """Test that words written entirely in Cyrillic are not transliterated."""
+        self.assertEqual(normalize_text("нет"), "нет")
+
+    def test_undoes_leetspeak_but_keeps_numbers(self):
+        """Test that leetspeak is undone only inside words."""
+        self.assertEqual(normalize_text("1d10t $h1t"), "idiot shit")
+        self.assertEqual(normalize_text("I have 2025 apples"), "i have 2025 apples")
+
+    def test_collapses_repeated_characters(self):
+        """Test that long character runs are collapsed."""
+        self.assertEqual(normalize_text("stuuuuupid"), "stupid")
+        self.assertEqual(normalize_text("good"), "good")
+
+    def test_keeps_repeated_digits(self):
+        """Test that runs of digits are not collapsed."""
+        self.assertEqual(normalize_text("1000 downvotes, 999 reports"), "1000 downvotes, 999 reports")
+
+    def test_strips_combining_marks(self):
+        """Test that stacked combining marks are removed."""
+        self.assertEqual(normalize_text("z\u0337a\u0337l\u0337g\u0337o\u0337"), "zalgo")
+
+    def test_empty_text(self):
+        """Test that empty input normalizes to an empty string."""
+        self.assertEqual(normalize_text(""), "")
+
+
+class TestTextNormalizer(unittest.TestCase):
+    """Test cases for the TextNormalizer class."""
+
+    def test_normalize_batch_preserves_order_and_dedups(self):
+        """Test that batches are returned in order and distinct texts are normalized once."""
+        normalizer = TextNormalizer(cache_size=16, enabled=True)
+
+        result = normalizer.normalize_batch(["F00L", "nice", "F00L"])
+
+        self.assertEqual(result, ["fool", "nice", "fool"])
+        self.assertEqual(normalizer.cache_info().misses, 2)
+
+    def test_repeated_inputs_are_cached(self):
+        """Test that repeated inputs are served from the cache."""
+        normalizer = TextNormalizer(cache_size=16, enabled=True)
+
+        normalizer.normalize("1d10t")
+        normalizer.normalize("1d10t")
+
+        self.assertEqual(normalizer.cache_info().hits, 1)
+
+    def test_long_inputs_bypass_cache(self):
+        """Test that texts above the cache length limit are normalized but not cached."""
+        normalizer = TextNormalizer(cache_size=16, enabled=True, max_cached_length=8)
+
+        self.assertEqual(normalizer.normalize_batch(["1d10t", "Y0U ARE AN 1D10T"]), ["idiot", "you are an idiot"])
+
+        self.assertEqual(normalizer.cache_info().currsize, 1)
+
+    def test_disabled_normalizer_passes_through(self):
+        """Test that a disabled normalizer returns the input unchanged."""
+        normalizer = TextNormalizer(cache_size=16, enabled=False)
+
+        self.assertEqual(normalizer.normalize("1d10t"), "1d10t")
+        self.assertEqual(normalizer.normalize_batch(["1d10t"]), ["1d10t"])
+
+
+class TestScoreCache(unittest.TestCase):
+    """Test cases for the ScoreCache class."""
+
+    def test_get_and_put(self):
+        """Test storing and retrieving a score."""
+        cache = ScoreCache(max_size=4)
+
+        self.assertIsNone(cache.get("idiot"))
+        cache.put("idiot", 87.0)
+
+        self.assertEqual(cache.get("idiot"), 87.0)
+        self.assertEqual((cache.hits, cache.misses), (1, 1))
+
+    def test_least_recently_used_entry_is_evicted(self):
+        """Test that the cache stays within its size bound."""
+        cache = ScoreCache(max_size=2)
+        cache.put("a", 1.0)
+        cache.put("b", 2.0)
+        cache.get("a")
+        cache.put("c", 3.0)
+
+        self.assertEqual(len(cache), 2)
+        self.assertIsNone(cache.get("b"))
+        self.assertEqual(cache.get("a"), 1.0)
+
+    def test_zero_size_disables_cache(self):
+        """Test that a zero-sized cache never stores scores."""
+        cache = ScoreCache(max_size=0)
+        cache.put("a", 1.0)
+
+        self.assertIsNone(cache.get("a"))
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,116 @@
+"""
+Unit tests for the transport-independent pipeline and the offline NDJSON runner.
+"""
+import json
+import os
+import tempfile
+import unittest
+from unittest.mock import Mock, patch
+from offline import OfflineRunner, ResultWriter, read_lines
+from pipeline import process_batch
+from rabbitmq.sharding import shard_for
+from scoring.cache import ScoreCache
+from scoring.neardup import NearDuplicateIndex
+
+
+def body(comment_id, text, ops="create"):
+    return json.dumps({"id": comment_id, "user_id": "u1", "text": text,
+                       "timestamp": "2025-11-25T10:00:00", "type": ops})
+
+
+class TestPipeline(unittest.TestCase):
+    """Test cases for batch processing through the pipeline stages."""
+
+    def setUp(self):
+        scorers_patcher = patch('pipeline.scorers')
+        self.mock_scorers = scorers_patcher.start()
+        self.addCleanup(scorers_patcher.stop)
+        self.mock_scorer = Mock()
+        self.mock_scorers.current.return_value = ("1", self.mock_scorer)
+        self.mock_scorer.score_batch.side_effect = lambda texts: [float(len(text)) for text in texts]
+        cache_patcher = patch('pipeline.score_cache', ScoreCache(max_size=100))
+        cache_patcher.start()
+        self.addCleanup(cache_patcher.stop)
+        neardup_patcher = patch('pipeline.near_duplicates', NearDuplicateIndex(max_size=100, min_length=30))
+        neardup_patcher.start()
+        self.addCleanup(neardup_patcher.stop)
+        service_patcher = patch('pipeline.CommentService')
+        self.mock_service = service_patcher.start().return_value
+        self.addCleanup(service_patcher.stop)
+
+    def test_scores_batch_with_one_call_per_distinct_text(self):
+        """Test that a batch is scored with a single score_batch call over distinct normalized texts."""
+        outcomes = process_batch([body("c1", "hello"), body("c2", "HELLO"), body("c3", "bye")])
+
+        self.mock_scorer.score_batch.assert_called_once_with(["bye", "hello"])
+        self.assertEqual([outcome.score for outcome in outcomes], [5.0, 5.0, 3.0])
+        self.assertTrue(all(outcome.processed for outcome in outcomes))
+        self.assertEqual({outcome.message.scorer_version for outcome in outcomes}, {"1"})
+
+    def test_near_duplicates_reuse_the_earlier_score(self):
+        """Test that a slight variation of a scored text is not scored again."""
+        campaign = "you are the most pathetic worthless idiot i have ever seen on this forum"
+        process_batch([body("c1", campaign)])
+
+        outcomes = process_batch([body("c2", campaign + "!!"), body("c3", "something else entirely")])
+
+        self.assertEqual(self.mock_scorer.score_batch.call_args_list[1].args[0], ["something else entirely"])
+        self.assertEqual(outcomes[0].score, float(len(campaign)))
+
+    def test_invalid_lines_fail_without_stopping_the_batch(self):
+        """Test that undecodable and incomplete messages fail individually."""
+        outcomes = process_batch(["{ not json", json.dumps({"id": "c1"}), body("c2", "ok")])
+
+        self.assertEqual([outcome.processed for outcome in outcomes], [False, False, True])
+        self.assertEqual(outcomes[0].message.status, "failed")
+        self.assertFalse(outcomes[0].requeue)
+        self.assertIsNone(outcomes[1].message)
+
+    def test_persists_in_input_order(self):
+        """Test that operations on the same comment are persisted in input order."""
+        process_batch([body("c1", "first"), body("c1", "second", ops="update")])
+
+        operations = [call.args[1] for call in self.mock_service.process_ops.call_args_list]
+        self.assertEqual(operations, ["create", "update"])
+
+    def test_dry_run_does_not_persist(self):
+        """Test that a dry run scores without touching MongoDB."""
+        outcomes = process_batch([body("c1", "hello")], dry_run=True)
+
+        self.assertTrue(outcomes[0].processed)
+        self.mock_service.process_ops.assert_not_called()
+
+
+class TestOfflineRunner(unittest.TestCase):
+    """Test cases for the offline NDJSON runner."""
+
+    def setUp(self):
+        self.tmp_dir = tempfile.TemporaryDirectory()
+        self.addCleanup(self.tmp_dir.cleanup)
+        self.input_path = os.path.join(self.tmp_dir.name, "input.ndjson")
+        self.output_path = os.path.join(self.tmp_dir.name, "results.ndjson")
+
+    @patch('offline.process_batch')
+    def test_writes_one_result_per_line(self, mock_process_batch):
+        """Test that every input line gets a result row, batches routed by comment ID."""
+        mock_process_batch.side_effect = lambda bodies, dry_run: [
+            Mock(processed=True, score=1.0, message=Mock(message_id="x", type="create")) for _ in bodies]
+        with open(self.input_path, "w", encoding="utf-8") as fh:
+            fh.write("\n".join(body(f"c{i % 3}", f"text {i}") for i in range(10)) + "\n\n")
+        writer = ResultWriter(self.output_path)
+
+        counts = OfflineRunner(writer, workers=2, batch_size=2, dry_run=True).run(read_lines([self.input_path]))
+        writer.close()
+
+        self.assertEqual(counts, {"processed": 10, "failed": 0})
+        with open(self.output_path, encoding="utf-8") as fh:
+            rows = [json.loads(line) for line in fh]
+        self.assertEqual(sorted(row["line"] for row in rows), list(range(1, 11)))
+        for bodies in (call.args[0] for call in mock_process_batch.call_args_list):
+            # A batch only holds comments of one lane, so a comment's lines stay on that lane
+            lanes = {shard_for(json.loads(text)["id"], 2) for text in bodies}
+            self.assertEqual(len(lanes), 1)
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -3,12 +3,19 @@ Integration tests for RabbitMQ message publisher and consumer.
 These tests use mocks to avoid requiring actual RabbitMQ connection.
 """
 import unittest
-from unittest.mock import Mock, patch, MagicMock, call
+from unittest.mock import Mock, patch, MagicMock, PropertyMock, call
 import json
+import threading
+from rabbitmq.connection import RabbitMQConnection
 from rabbitmq.publishers.message_publisher import BasicMessagePublisher
-from rabbitmq.consumers.message_consumer import BasicMessageConsumer
+from rabbitmq.consumers.message_consumer import (BasicMessageConsumer, DeferredKeys, ThreadSafeChannel,
+                                               DEFERRED_GROUP, deferred_queue_name)
 from models import Comment, Message
+from scoring.cache import ScoreCache
 import pika
+import pipeline
+from metrics import metrics
+from ratelimit import UserRateLimiter
 
 
 class TestBasicMessagePublisher(unittest.TestCase):
@@ -49,6 +56,61 @@ class TestBasicMessagePublisher(unittest.TestCase):
         self.assertEqual(call_args[1]['routing_key'], "test.key")
         self.assertEqual(json.loads(call_args[1]['body']), test_body)
 
+    @patch('rabbitmq.publishers.message_publisher.RabbitMQConnection.ensure_connection')
+    @patch('rabbitmq.publishers.message_publisher.RabbitMQConnection.__init__', return_value=None)
+    def test_publish_reports_nacked_message(self, mock_init, mock_ensure_connection):
+        """Test that a publish the broker nacks is reported as failed."""
+        publisher = BasicMessagePublisher()
+        publisher.channel = Mock()
+        publisher.channel.basic_publish.side_effect = pika.exceptions.NackError([])
+
+        self.assertFalse(publisher.publish(exchange_name="test_exchange", routing_key="test.key", body={}))
+
+    @patch('profiles.settings')
+    @patch('rabbitmq.publishers.message_publisher.RabbitMQConnection.ensure_connection')
+    @patch('rabbitmq.publishers.message_publisher.RabbitMQConnection.__init__', return_value=None)
+    def test_publish_uses_profile_delivery_mode(self, mock_init, mock_ensure_connection, mock_settings):
+        """Test that messages are persistent or transient according to the throughput profile."""
+        publisher = BasicMessagePublisher()
+        publisher.channel = Mock()
+        for profile, delivery_mode in (("durable", 2), ("max-throughput", 1)):
+            mock_settings.THROUGHPUT_PROFILE = profile
+
+            publisher.publish(exchange_name="ex", routing_key="key", body={})
+
+            properties = publisher.channel.basic_publish.call_args.kwargs["properties"]
+            self.assertEqual(properties.delivery_mode, delivery_mode)
+
+    @patch('profiles.settings')
+    @patch('rabbitmq.publishers.message_publisher.RabbitMQConnection.ensure_connection')
+    @patch('rabbitmq.publishers.message_publisher.RabbitMQConnection.__init__', return_value=None)
+    def test_publish_keeps_explicit_delivery_mode(self, mock_init, mock_ensure_connection, mock_settings):
+        """Test that a delivery mode set by the caller is not overridden by the profile."""
+        mock_settings.THROUGHPUT_PROFILE = "durable"
+        publisher = BasicMessagePublisher()
+        publisher.channel = Mock()
+
+        publisher.publish(exchange_name="ex", routing_key="key", body={},
+                          properties=pika.BasicProperties(delivery_mode=1))
+
+        properties = publisher.channel.basic_publish.call_args.kwargs["properties"]
+        self.assertEqual(properties.delivery_mode, 1)
+
+    @patch('profiles.settings')
+    @patch('rabbitmq.connection.RabbitMQConnection.__init__', return_value=None)
+    def test_queue_type_and_confirms_follow_profile(self, mock_init, mock_settings):
+        """Test that the durable profile declares quorum queues on a confirm-mode channel."""
+        mock_settings.THROUGHPUT_PROFILE = "durable"
+        connection = RabbitMQConnection()
+        connection.connection = Mock(is_open=True)
+        connection.channel = None
+
+        connection.bind_queue("q.test", "ex.test", "key")
+
+        connection.channel.confirm_delivery.assert_called_once()
+        connection.channel.queue_declare.assert_called_once_with(
+            queue="q.test", durable=True, arguments={"x-queue-type": "quorum"})
+
 
 class TestBasicMessageConsumer(unittest.TestCase):
     """Test cases for the BasicMessageConsumer class."""
@@ -62,13 +124,13 @@ class TestBasicMessageConsumer(unittest.TestCase):
 
         self.assertIsNotNone(consumer)
 
-    @patch('rabbitmq.consumers.message_consumer.CommentService')
-    @patch('rabbitmq.consumers.message_consumer.simulate_scoring')
+    @patch('pipeline.CommentService')
+    @patch('pipeline.scorers')
     @patch('rabbitmq.consumers.message_consumer.publish_result')
     def test_on_message_create_operation(self, mock_publish, mock_scoring, mock_service_class):
         """Test processing a create message."""
         # Setup mocks
-        mock_scoring.return_value = {'score': 75.5, 'status': 'completed', 'duration_seconds': 3.2}
+        mock_scoring.current.return_value = ("1", Mock(**{"score.return_value": 75.5}))
         mock_service = Mock()
         mock_service.process_ops.return_value = Mock()  # Successful result
         mock_service_class.return_value = mock_service
@@ -101,12 +163,30 @@ class TestBasicMessageConsumer(unittest.TestCase):
         # Verify result was published
         mock_publish.assert_called_once()
 
-    @patch('rabbitmq.consumers.message_consumer.CommentService')
-    @patch('rabbitmq.consumers.message_consumer.simulate_scoring')
+    @patch('pipeline.CommentService')
+    @patch('pipeline.scorers')
+    @patch('rabbitmq.consumers.message_consumer.publish_result', return_value=False)
+    def test_on_message_requeues_when_result_not_published(self, mock_publish, mock_scoring, mock_service_class):
+        """Test that a delivery whose result was not published is requeued instead of acked."""
+        mock_scoring.current.return_value = ("1", Mock(**{"score.return_value": 75.5}))
+        mock_service_class.return_value.process_ops.return_value = Mock()
+        mock_channel = Mock()
+        mock_method = Mock(delivery_tag='test_tag', routing_key='test.key')
+        body = json.dumps({"id": "msg_001", "user_id": "user_123", "text": "Test comment",
+                           "timestamp": "2025-11-25T10:00:00", "type": "create"})
+
+        BasicMessageConsumer.on_message(mock_channel, mock_method, Mock(), body)
+
+        mock_publish.assert_called_once()
+        mock_channel.basic_ack.assert_not_called()
+        mock_channel.basic_nack.assert_called_once_with(delivery_tag='test_tag', requeue=True)
+
+    @patch('pipeline.CommentService')
+    @patch('pipeline.scorers')
     @patch('rabbitmq.consumers.message_consumer.publish_result')
     def test_on_message_update_operation(self, mock_publish, mock_scoring, mock_service_class):
         """Test processing an update message."""
-        mock_scoring.return_value = {'score': 82.3, 'status': 'completed', 'duration_seconds': 4.1}
+        mock_scoring.current.return_value = ("1", Mock(**{"score.return_value": 82.3}))
         mock_service = Mock()
         mock_service.process_ops.return_value = Mock()
         mock_service_class.return_value = mock_service
@@ -129,12 +209,12 @@ class TestBasicMessageConsumer(unittest.TestCase):
 
         mock_channel.basic_ack.assert_called_once_with(delivery_tag='test_tag')
 
-    @patch('rabbitmq.consumers.message_consumer.CommentService')
-    @patch('rabbitmq.consumers.message_consumer.simulate_scoring')
+    @patch('pipeline.CommentService')
+    @patch('pipeline.scorers')
     @patch('rabbitmq.consumers.message_consumer.publish_result')
     def test_on_message_delete_operation(self, mock_publish, mock_scoring, mock_service_class):
         """Test processing a delete message."""
-        mock_scoring.return_value = {'score': 0, 'status': 'completed', 'duration_seconds': 2.5}
+        mock_scoring.current.return_value = ("1", Mock(**{"score.return_value": 0}))
         mock_service = Mock()
         mock_service.process_ops.return_value = True  # Successful deletion
         mock_service_class.return_value = mock_service
@@ -157,14 +237,15 @@ class TestBasicMessageConsumer(unittest.TestCase):
 
         mock_channel.basic_ack.assert_called_once_with(delivery_tag='test_tag')
 
-    @patch('rabbitmq.consumers.message_consumer.CommentService')
-    @patch('rabbitmq.consumers.message_consumer.simulate_scoring')
+    @patch('pipeline.CommentService')
+    @patch('pipeline.scorers')
     @patch('rabbitmq.consumers.message_consumer.publish_result')
-    @patch('rabbitmq.consumers.message_consumer.settings')
+    @patch('pipeline.settings')
     def test_on_message_processing_failure(self, mock_settings, mock_publish, mock_scoring, mock_service_class):
         """Test handling message processing failure."""
         mock_settings.RABBITMQ_REQUEUE_ON_FAIL = True
-        mock_scoring.return_value = {'score': 75.5, 'status': 'completed', 'duration_seconds': 3.2}
+        mock_settings.SCORING_MAX_BODY_BYTES = 1024 * 1024
+        mock_scoring.current.return_value = ("1", Mock(**{"score.return_value": 75.5}))
         mock_service = Mock()
         mock_service.process_ops.return_value = None  # Failed result
         mock_service_class.return_value = mock_service
@@ -189,13 +270,14 @@ class TestBasicMessageConsumer(unittest.TestCase):
         mock_channel.basic_ack.assert_not_called()
         mock_channel.basic_nack.assert_called_once_with(delivery_tag='test_tag', requeue=True)
 
-    @patch('rabbitmq.consumers.message_consumer.CommentService')
-    @patch('rabbitmq.consumers.message_consumer.simulate_scoring')
+    @patch('pipeline.CommentService')
+    @patch('pipeline.scorers')
     @patch('rabbitmq.consumers.message_consumer.publish_result')
-    @patch('rabbitmq.consumers.message_consumer.settings')
+    @patch('pipeline.settings')
     def test_on_message_invalid_json(self, mock_settings, mock_publish, mock_scoring, mock_service_class):
         """Test handling invalid JSON in message body."""
         mock_settings.RABBITMQ_REQUEUE_ON_FAIL = False
+        mock_settings.SCORING_MAX_BODY_BYTES = 1024 * 1024
 
         mock_channel = Mock()
         mock_method = Mock()
@@ -211,6 +293,356 @@ class TestBasicMessageConsumer(unittest.TestCase):
         # Verify message was nacked
         mock_channel.basic_nack.assert_called_once_with(delivery_tag='test_tag', requeue=False)
 
+    @patch('pipeline.score_cache', new_callable=lambda: ScoreCache(max_size=10))
+    @patch('pipeline.CommentService')
+    @patch('pipeline.scorers')
+    @patch('rabbitmq.consumers.message_consumer.publish_result')
+    def test_on_message_reuses_score_for_obfuscated_duplicate(self, mock_publish, mock_scoring,
+                                                               mock_service_class, mock_cache):
+        """Test that texts normalizing to the same form are scored once."""
+        mock_scorer = Mock(**{"score.return_value": 91.0})
+        mock_scoring.current.return_value = ("1", mock_scorer)
+        mock_service = Mock()
+        mock_service.process_ops.return_value = Mock()
+        mock_service_class.return_value = mock_service
+
+        mock_method = Mock()
+        mock_method.delivery_tag = 'test_tag'
+        mock_method.routing_key = 'test.key'
+
+        for i, text in enumerate(["You IDIOT", "y0u 1d10t"]):
+            body = json.dumps({
+                "id": f"msg_00{i}",
+                "user_id": "user_123",
+                "text": text,
+                "timestamp": "2025-11-25T10:00:00",
+                "type": "update"
+            })
+            BasicMessageConsumer.on_message(Mock(), mock_method, Mock(), body)
+
+        mock_scorer.score.assert_called_once()
+        scores = [call_args[0][2] for call_args in mock_service.process_ops.call_args_list]
+        self.assertEqual(scores, [91.0, 91.0])
+
+    @patch('pipeline.CommentService')
+    @patch('pipeline.scorers')
+    @patch('rabbitmq.consumers.message_consumer.publish_result')
+    @patch('pipeline.settings')
+    def test_on_message_rejects_oversized_body(self, mock_settings, mock_publish, mock_scoring,
+                                               mock_service_class):
+        """Test that bodies above the size cap are rejected without decoding or scoring."""
+        mock_settings.SCORING_MAX_BODY_BYTES = 64
+
+        mock_channel = Mock()
+        mock_method = Mock()
+        mock_method.delivery_tag = 'test_tag'
+        mock_method.routing_key = 'test.key'
+
+        body = json.dumps({"id": "msg_big", "text": "x" * 100, "type": "create"})
+
+        BasicMessageConsumer.on_message(mock_channel, mock_method, Mock(), body)
+
+        mock_channel.basic_nack.assert_called_once_with(delivery_tag='test_tag', requeue=False)
+        mock_scoring.current.assert_not_called()
+        mock_service_class.assert_not_called()
+        self.assertEqual(mock_publish.call_args[0][0].status, "failed")
+
+
+    @patch('rabbitmq.consumers.message_consumer.RabbitMQConnection.__init__')
+    def test_dispatch_schedules_by_comment_id(self, mock_init):
+        """Test that deliveries are scheduled under their comment ID with a thread-safe channel."""
+        mock_init.return_value = None
+        consumer = BasicMessageConsumer()
+        consumer.scheduler = Mock()
+        consumer.scheduler.submit.return_value = True
+        mock_channel = Mock()
+        mock_method = Mock()
+        mock_method.delivery_tag = 'test_tag'
+        body = json.dumps({"id": "msg_001", "type": "update"})
+
+        consumer.dispatch(mock_channel, mock_method, Mock(), body)
+
+        args = consumer.scheduler.submit.call_args[0]
+        self.assertEqual(args[0], "msg_001")
+        self.assertIsInstance(args[2], ThreadSafeChannel)
+        mock_channel.basic_nack.assert_not_called()
+
+    @patch('rabbitmq.consumers.message_consumer.delivery_ages')
+    @patch('rabbitmq.consumers.message_consumer.RabbitMQConnection.__init__')
+    def test_dispatch_records_delivery_age(self, mock_init, mock_delivery_ages):
+        """Test that a delivery records its age for the queue it came from."""
+        mock_init.return_value = None
+        consumer = BasicMessageConsumer()
+        consumer.scheduler = Mock()
+        body = json.dumps({"id": "msg_001", "timestamp": "2000-01-01T00:00:00"})
+
+        consumer.dispatch(Mock(), Mock(delivery_tag='test_tag'), Mock(), body, queue_name="q.incoming_texts")
+
+        queue_name, age = mock_delivery_ages.record.call_args[0]
+        self.assertEqual(queue_name, "q.incoming_texts")
+        self.assertGreater(age, 0)
+
+    @patch('rabbitmq.consumers.message_consumer.RabbitMQConnection.__init__')
+    def test_dispatch_requeues_when_key_queue_full(self, mock_init):
+        """Test that a delivery refused by the scheduler is requeued."""
+        mock_init.return_value = None
+        consumer = BasicMessageConsumer()
+        consumer.scheduler = Mock()
+        consumer.scheduler.submit.return_value = False
+        mock_channel = Mock()
+        mock_method = Mock()
+        mock_method.delivery_tag = 'test_tag'
+
+        consumer.dispatch(mock_channel, mock_method, Mock(), "{ invalid json }")
+
+        self.assertEqual(consumer.scheduler.submit.call_args[0][0], "delivery:test_tag")
+        mock_channel.basic_nack.assert_called_once_with(delivery_tag='test_tag', requeue=True)
+
+    def test_thread_safe_channel_marshals_acks(self):
+        """Test that acks from worker threads go through add_callback_threadsafe."""
+        mock_channel = Mock()
+        channel = ThreadSafeChannel(mock_channel)
+
+        channel.basic_ack(delivery_tag='test_tag')
+
+        mock_channel.basic_ack.assert_not_called()
+        callback = mock_channel.connection.add_callback_threadsafe.call_args[0][0]
+        callback()
+        mock_channel.basic_ack.assert_called_once_with(delivery_tag='test_tag', multiple=False)
+
+    @patch('rabbitmq.consumers.message_consumer.audit_log')
+    @patch('rabbitmq.consumers.message_consumer.RabbitMQConnection.__init__')
+    def test_drain_waits_for_in_flight_work_then_closes(self, mock_init, mock_audit):
+        """Test that drain flushes buffered writes, sends pending acks and closes the connection."""
+        mock_init.return_value = None
+        consumer = BasicMessageConsumer()
+        consumer.connection = Mock()
+        consumer.channel = Mock()
+        consumer.connection.is_closed = False
+        consumer.scheduler = Mock()
+        type(consumer.scheduler).pending = PropertyMock(side_effect=[1, 0, 0])
+
+        report = consumer.drain(timeout=5)
+
+        self.assertEqual(report["abandoned"], 0)
+        mock_audit.flush.assert_called_once()
+        consumer.connection.process_data_events.assert_called()
+        consumer.connection.close.assert_called_once()
+
+    @patch('rabbitmq.consumers.message_consumer.audit_log')
+    @patch('rabbitmq.consumers.message_consumer.RabbitMQConnection.__init__')
+    def test_drain_reports_abandoned_deliveries_after_deadline(self, mock_init, mock_audit):
+        """Test that deliveries still running at the deadline are reported as abandoned."""
+        mock_init.return_value = None
+        consumer = BasicMessageConsumer()
+        consumer.connection = Mock()
+        consumer.channel = Mock()
+        consumer.connection.is_closed = False
+        consumer.scheduler = Mock()
+        consumer.scheduler.pending = 3
+
+        report = consumer.drain(timeout=0)
+
+        self.assertEqual(report["abandoned"], 3)
+        consumer.scheduler.shutdown.assert_called_once_with(wait=False)
+        consumer.connection.close.assert_called_once()
+
+    @patch('rabbitmq.consumers.message_consumer.RabbitMQConnection.__init__')
+    def test_stop_event_requests_stop(self, mock_init):
+        """Test that setting the shared stop event stops the consumer."""
+        mock_init.return_value = None
+        consumer = BasicMessageConsumer()
+        stop_event = threading.Event()
+        watcher = threading.Thread(target=consumer._watch_stop_event, args=(stop_event,))
+        watcher.start()
+
+        stop_event.set()
+        watcher.join(timeout=1)
+
+        self.assertTrue(consumer._stopping.is_set())
+
+    def _rate_limited_consumer(self, action):
+        consumer = BasicMessageConsumer()
+        consumer.rate_limiter = UserRateLimiter(rate=0.001, burst=1, max_users=10)
+        consumer.scheduler = Mock()
+        consumer.scheduler.submit.return_value = True
+        settings_patcher = patch('rabbitmq.consumers.message_consumer.settings.USER_RATE_LIMIT_ACTION', action)
+        settings_patcher.start()
+        self.addCleanup(settings_patcher.stop)
+        keys_patcher = patch('rabbitmq.consumers.message_consumer.deferred_keys', DeferredKeys(max_keys=10))
+        keys_patcher.start()
+        self.addCleanup(keys_patcher.stop)
+        self.addCleanup(metrics.reset)
+        return consumer
+
+    def _delivery(self, tag):
+        method = Mock()
+        method.delivery_tag = tag
+        return method
+
+    @patch('rabbitmq.consumers.message_consumer.RabbitMQConnection.__init__', return_value=None)
+    def test_dispatch_defers_users_over_their_rate_limit(self, mock_init):
+        """Test that a user's deliveries past their burst are republished to the deferred queue and acked."""
+        consumer = self._rate_limited_consumer("defer")
+        mock_channel = Mock()
+        body = json.dumps({"id": "msg_001", "user_id": "spammer"})
+
+        consumer.dispatch(mock_channel, self._delivery("tag_1"), Mock(headers=None), body)
+        consumer.dispatch(mock_channel, self._delivery("tag_2"), Mock(headers=None), body)
+
+        self.assertEqual(consumer.scheduler.submit.call_count, 1)
+        self.assertEqual(consumer.scheduler.submit.call_args[1], {"group": "spammer"})
+        publish = mock_channel.basic_publish.call_args[1]
+        self.assertEqual(publish["routing_key"], "q.incoming_texts.deferred")
+        self.assertIn("x-deferred-at", publish["properties"].headers)
+        mock_channel.basic_ack.assert_called_once_with(delivery_tag="tag_2")
+        self.assertEqual(metrics.counter("fairness.deferred"), 1)
+        self.assertEqual(metrics.gauge("fairness.throttled_users"), 1)
+
+    @patch('rabbitmq.consumers.message_consumer.RabbitMQConnection.__init__', return_value=None)
+    def test_deferred_deliveries_are_not_limited_again(self, mock_init):
+        """Test that deliveries from the deferred queue are scheduled in the deferred group with their delay recorded."""
+        consumer = self._rate_limited_consumer("defer")
+        consumer.rate_limiter.try_acquire("spammer")
+        properties = Mock(headers={"x-deferred-at": 1.0})
+
+        consumer.dispatch(Mock(), self._delivery("tag_1"), properties, json.dumps({"id": "m", "user_id": "spammer"}),
+                          deferred=True)
+
+        self.assertEqual(consumer.scheduler.submit.call_args[1], {"group": DEFERRED_GROUP})
+        self.assertEqual(metrics.timing("fairness.deferral_delay")["count"], 1)
+
+    @patch('rabbitmq.consumers.message_consumer.RabbitMQConnection.__init__', return_value=None)
+    def test_shard_deferrals_go_to_the_shard_deferred_queue(self, mock_init):
+        """Test that a shard consumer defers to its own shard's deferred queue."""
+        consumer = self._rate_limited_consumer("defer")
+        consumer.rate_limiter.try_acquire("spammer")
+        consumer.deferred_queue = deferred_queue_name("q.incoming_texts.shard.2")
+        mock_channel = Mock()
+
+        consumer.dispatch(mock_channel, self._delivery("tag_1"), Mock(headers=None),
+                          json.dumps({"id": "c1", "user_id": "spammer"}))
+
+        self.assertEqual(mock_channel.basic_publish.call_args[1]["routing_key"], "q.incoming_texts.shard.2.deferred")
+
+    @patch('rabbitmq.consumers.message_consumer.RabbitMQConnection.__init__', return_value=None)
+    def test_deliveries_behind_a_deferred_one_are_deferred(self, mock_init):
+        """Test that an update admitted while its comment's create is deferred is deferred behind it."""
+        consumer = self._rate_limited_consumer("defer")
+        consumer.rate_limiter.try_acquire("spammer")
+        mock_channel = Mock()
+        create = json.dumps({"id": "c1", "user_id": "spammer", "type": "create"})
+        update = json.dumps({"id": "c1", "user_id": "spammer", "type": "update"})
+
+        consumer.dispatch(mock_channel, self._delivery("tag_1"), Mock(headers=None), create)
+        consumer.rate_limiter = UserRateLimiter(rate=0.001, burst=10, max_users=10)
+        consumer.dispatch(mock_channel, self._delivery("tag_2"), Mock(headers=None), update)
+
+        consumer.scheduler.submit.assert_not_called()
+        self.assertEqual([c[1]["body"] for c in mock_channel.basic_publish.call_args_list], [create, update])
+
+        consumer.dispatch(mock_channel, self._delivery("tag_3"), Mock(headers={}), create, deferred=True)
+        consumer.dispatch(mock_channel, self._delivery("tag_4"), Mock(headers={}), update, deferred=True)
+        consumer.dispatch(mock_channel, self._delivery("tag_5"), Mock(headers=None),
+                          json.dumps({"id": "c1", "user_id": "spammer", "type": "delete"}))
+
+        self.assertEqual(consumer.scheduler.submit.call_count, 3)
+        self.assertEqual(mock_channel.basic_publish.call_count, 2)
+
+    @patch('rabbitmq.consumers.message_consumer.get_fallback_scorer')
+    @patch('rabbitmq.consumers.message_consumer.publish_result')
+    @patch('rabbitmq.consumers.message_consumer.pipeline.process')
+    @patch('rabbitmq.consumers.message_consumer.RabbitMQConnection.__init__', return_value=None)
+    def test_over_limit_deliveries_use_cheap_path(self, mock_init, mock_process, mock_publish, mock_fallback):
+        """Test that with the cheap action, over-limit deliveries are scored with the fallback scorer."""
+        consumer = self._rate_limited_consumer("cheap")
+        consumer.scheduler = None
+        mock_process.return_value = pipeline.Outcome(None, processed=True)
+        body = json.dumps({"id": "msg_001", "user_id": "spammer"})
+
+        consumer.dispatch(Mock(), self._delivery("tag_1"), Mock(), body)
+        consumer.dispatch(Mock(), self._delivery("tag_2"), Mock(), body)
+
+        self.assertEqual(mock_process.call_args_list, [call(body, scorer=None),
+                                                       call(body, scorer=mock_fallback.return_value)])
+        self.assertEqual(metrics.counter("fairness.cheap_scored"), 1)
+
+class TestRabbitMQConnectionRecovery(unittest.TestCase):
+    """Test cases for reconnect backoff and channel recovery."""
+
+    def setUp(self):
+        init_patcher = patch('rabbitmq.connection.RabbitMQConnection.__init__', return_value=None)
+        init_patcher.start()
+        self.addCleanup(init_patcher.stop)
+        sleep_patcher = patch('rabbitmq.connection.RabbitMQConnection._sleep')
+        self.mock_sleep = sleep_patcher.start()
+        self.addCleanup(sleep_patcher.stop)
+        self.connection = RabbitMQConnection()
+        self.connection.connection = Mock()
+        self.connection.channel = Mock()
+
+    def test_closed_channel_is_reopened_without_reconnecting(self):
+        """Test that a closed channel on a healthy connection only reopens the channel."""
+        self.connection.connection.is_open = True
+        self.connection.channel.is_closed = True
+
+        with patch.object(RabbitMQConnection, '_connect') as mock_connect:
+            self.connection.ensure_connection()
+
+        mock_connect.assert_not_called()
+        self.assertIs(self.connection.channel, self.connection.connection.channel.return_value)
+        self.mock_sleep.assert_not_called()
+
+    @patch('rabbitmq.connection.backoff_delay', side_effect=lambda attempt: float(attempt + 1))
+    def test_reconnect_backs_off_and_redeclares_topology(self, mock_backoff):
+        """Test that reconnects back off between attempts and re-declare recorded topology."""
+        self.connection.connection.is_open = True
+        self.connection.channel.is_closed = False
+        self.connection.declare_exchange("ex.test", exchange_type="topic")
+        self.connection.bind_queue("q.test", "ex.test", "test.#")
+        self.connection.connection.is_open = False
+        new_channel = Mock()
+
+        def connect():
+            if mock_connect.call_count < 3:
+                return False
+            self.connection.channel = new_channel
+            return True
+
+        with patch.object(RabbitMQConnection, '_connect', side_effect=connect) as mock_connect:
+            self.connection.ensure_connection()
+
+        self.assertEqual([c.args[0] for c in self.mock_sleep.call_args_list], [1.0, 2.0, 3.0])
+        new_channel.exchange_declare.assert_called_once_with(exchange="ex.test", exchange_type="topic", durable=True)
+        new_channel.queue_bind.assert_called_once_with(queue="q.test", exchange="ex.test", routing_key="test.#")
+
+    @patch('rabbitmq.connection.settings')
+    def test_reconnect_gives_up_after_max_retries(self, mock_settings):
+        """Test that reconnecting raises once every attempt has failed."""
+        mock_settings.RABBITMQ_MAX_RETRIES = 2
+        self.connection.connection.is_open = False
+
+        with patch.object(RabbitMQConnection, '_connect', return_value=False) as mock_connect:
+            with self.assertRaises(pika.exceptions.AMQPConnectionError):
+                self.connection.ensure_connection()
+
+        self.assertEqual(mock_connect.call_count, 2)
+        self.assertEqual(self.mock_sleep.call_count, 2)
+
+    @patch('rabbitmq.connection.backoff_delay', side_effect=lambda attempt: float(attempt + 1))
+    @patch('rabbitmq.connection.settings')
+    def test_backoff_keeps_growing_across_rounds(self, mock_settings, mock_backoff):
+        """Test that a new round of reconnect attempts continues the backoff until a reconnect succeeds."""
+        mock_settings.RABBITMQ_MAX_RETRIES = 2
+        self.connection.connection.is_open = False
+
+        with patch.object(RabbitMQConnection, '_connect', side_effect=[False, False, False, True]):
+            with self.assertRaises(pika.exceptions.AMQPConnectionError):
+                self.connection.ensure_connection()
+            self.connection.ensure_connection()
+
+        self.assertEqual([c.args[0] for c in self.mock_sleep.call_args_list], [1.0, 2.0, 3.0, 4.0])
+        self.assertEqual(self.connection._reconnect_attempts, 0)
 
 
 if __name__ == '__main__':
@@ -0,0 +1,38 @@
+"""
+Unit tests for the per-user rate limiter.
+"""
+import unittest
+from metrics import metrics
+from ratelimit import UserRateLimiter
+
+
+class TestUserRateLimiter(unittest.TestCase):
+    """Test cases for the UserRateLimiter class."""
+
+    def setUp(self):
+        self.addCleanup(metrics.reset)
+
+    def test_limits_each_user_independently(self):
+        """Test that one user exhausting their burst does not limit another."""
+        limiter = UserRateLimiter(rate=0.001, burst=2, max_users=10)
+
+        self.assertEqual([limiter.try_acquire("spammer") for _ in range(3)], [True, True, False])
+        self.assertTrue(limiter.try_acquire("quiet"))
+        self.assertEqual(limiter.throttled_users, 1)
+        self.assertEqual(metrics.counter("fairness.throttled"), 1)
+
+    def test_table_is_bounded_by_lru(self):
+        """Test that the least recently seen user is evicted and starts over with a full bucket."""
+        limiter = UserRateLimiter(rate=0.001, burst=1, max_users=2)
+        limiter.try_acquire("a")
+        self.assertFalse(limiter.try_acquire("a"))
+        limiter.try_acquire("b")
+        limiter.try_acquire("c")
+
+        self.assertEqual(metrics.gauge("fairness.tracked_users"), 2)
+        self.assertEqual(limiter.throttled_users, 0)
+        self.assertTrue(limiter.try_acquire("a"))
+
+
+if __name__ == '__main__':
+    unittest.main()
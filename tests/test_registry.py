@@ -0,0 +1,139 @@
+"""
+Unit tests for scorer version swaps and shadow scoring.
+"""
+import threading
+import unittest
+from unittest.mock import patch
+from metrics import metrics
+from scoring.base import Scorer
+from scoring.registry import ScorerRegistry
+
+
+class ConstantScorer(Scorer):
+    """Scorer returning one score for every text."""
+
+    def __init__(self, value: float):
+        self.value = value
+
+    def score(self, text):
+        return self.value
+
+
+class TestScorerRegistry(unittest.TestCase):
+    """Test cases for the ScorerRegistry class."""
+
+    def setUp(self):
+        self.built = []
+        self.release = threading.Event()
+        cache_patcher = patch('scoring.registry.score_cache')
+        self.mock_cache = cache_patcher.start()
+        self.addCleanup(cache_patcher.stop)
+        neardup_patcher = patch('scoring.registry.near_duplicates')
+        neardup_patcher.start()
+        self.addCleanup(neardup_patcher.stop)
+        self.addCleanup(metrics.reset)
+
+    def _builder(self, config):
+        if getattr(config, "block", False):
+            self.release.wait(5)
+        if getattr(config, "fail", False):
+            raise RuntimeError("artifact missing")
+        scorer = ConstantScorer(getattr(config, "value", 10.0))
+        self.built.append(scorer)
+        return scorer
+
+    def _config(self, **values):
+        return type("Config", (), values)()
+
+    def test_builds_configured_version_on_first_use(self):
+        """Test that the active scorer is built once, lazily, with SCORER_VERSION."""
+        registry = ScorerRegistry(self._builder)
+        self.assertEqual(self.built, [])
+
+        version, scorer = registry.current()
+
+        self.assertEqual(version, "1")
+        self.assertIs(registry.current()[1], scorer)
+        self.assertEqual(len(self.built), 1)
+
+    def test_swap_keeps_serving_the_old_version_until_loaded(self):
+        """Test that a background load does not block scoring and swaps in atomically."""
+        registry = ScorerRegistry(self._builder)
+        old = registry.current()[1]
+
+        thread = registry.load("2", self._config(value=20.0, block=True))
+
+        self.assertEqual(registry.current(), ("1", old))
+        self.release.set()
+        thread.join(5)
+        version, scorer = registry.current()
+        self.assertEqual((version, scorer.value), ("2", 20.0))
+        self.assertFalse(registry.is_active(old))
+        self.mock_cache.clear.assert_called_once()
+        self.assertEqual(metrics.counter("scoring.versions.swaps"), 1)
+
+    def test_failed_load_keeps_active_version(self):
+        """Test that a version that fails to build is not swapped in."""
+        registry = ScorerRegistry(self._builder)
+        active = registry.current()
+
+        registry.load("2", self._config(fail=True), background=False)
+
+        self.assertEqual(registry.current(), active)
+        self.assertEqual(metrics.counter("scoring.versions.load_failures"), 1)
+
+    def test_superseded_load_is_discarded(self):
+        """Test that a slow load finishing after a newer one does not overwrite it."""
+        registry = ScorerRegistry(self._builder)
+        registry.current()
+        slow = registry.load("2", self._config(value=20.0, block=True))
+
+        registry.load("3", self._config(value=30.0), background=False)
+        self.release.set()
+        slow.join(5)
+
+        self.assertEqual(registry.version, "3")
+        self.assertEqual(metrics.counter("scoring.versions.swaps"), 1)
+
+    def test_shadow_records_deltas_without_changing_scores(self):
+        """Test that sampled texts are scored by the candidate and compared, off the request path."""
+        registry = ScorerRegistry(self._builder, sample_rate=1.0, max_pending=10)
+        version, _ = registry.current()
+        registry.shadow("2", self._config(value=95.0), background=False)
+        scores = [10.0, 10.0]
+
+        registry.observe(["a", "b"], scores, version, seconds=0.002)
+        registry.close()
+
+        self.assertEqual(scores, [10.0, 10.0])
+        self.assertEqual(metrics.counter("scoring.shadow.scored"), 2)
+        self.assertEqual(metrics.counter("scoring.shadow.flips"), 2)
+        self.assertEqual(metrics.timing("scoring.shadow.delta")["mean"], 85.0)
+        self.assertEqual(metrics.timing("scoring.shadow.active_latency")["mean"], 0.001)
+
+    def test_promoting_the_shadowed_version_reuses_the_candidate(self):
+        """Test that loading the candidate's version swaps in the warm candidate and stops shadowing."""
+        registry = ScorerRegistry(self._builder, sample_rate=1.0)
+        registry.current()
+        registry.shadow("2", self._config(value=95.0), background=False)
+        candidate = self.built[-1]
+
+        registry.load("2", background=False)
+
+        self.assertEqual(registry.current(), ("2", candidate))
+        self.assertIsNone(registry.candidate_version)
+        self.assertEqual(len(self.built), 2)
+
+    def test_drops_samples_when_shadow_falls_behind(self):
+        """Test that samples beyond max_pending are dropped instead of queued."""
+        registry = ScorerRegistry(self._builder, sample_rate=1.0, max_pending=0)
+        registry.current()
+        registry.shadow("2", self._config(value=95.0), background=False)
+
+        registry.observe(["a"], [10.0], "1", seconds=0.001)
+
+        self.assertEqual(metrics.counter("scoring.shadow.dropped"), 1)
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,37 @@
+"""
+Unit tests for retry backoff helpers.
+"""
+import unittest
+from unittest.mock import patch
+from retry import backoff_delay
+
+
+class TestBackoffDelay(unittest.TestCase):
+    """Test cases for backoff_delay."""
+
+    @patch('retry.random.uniform')
+    def test_ceiling_grows_exponentially(self, mock_uniform):
+        """Test that the jitter range doubles with every attempt."""
+        mock_uniform.side_effect = lambda low, high: high
+
+        delays = [backoff_delay(attempt, initial=1, maximum=60, base=2) for attempt in range(4)]
+
+        self.assertEqual(delays, [1, 2, 4, 8])
+
+    @patch('retry.random.uniform')
+    def test_ceiling_is_capped(self, mock_uniform):
+        """Test that the delay never exceeds the maximum, even for large attempts."""
+        mock_uniform.side_effect = lambda low, high: high
+
+        self.assertEqual(backoff_delay(10_000, initial=1, maximum=60, base=2), 60)
+
+    def test_delay_is_jittered_within_range(self):
+        """Test that delays are spread between zero and the ceiling."""
+        delays = [backoff_delay(3, initial=1, maximum=60, base=2) for _ in range(200)]
+
+        self.assertTrue(all(0 <= delay <= 8 for delay in delays))
+        self.assertGreater(len(set(delays)), 1)
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,140 @@
+"""
+Unit tests for language identification and the language-aware scorer router.
+"""
+import threading
+import unittest
+from concurrent.futures import ThreadPoolExecutor
+from metrics import metrics
+from scoring.base import Scorer
+from scoring.language import identify_language
+from scoring.normalization import normalize_text
+from scoring.routing import LanguageRouter
+
+
+class FakeScorer(Scorer):
+    """Scorer returning a fixed score and recording its batches."""
+
+    def __init__(self, value: float, size: int = 0):
+        self.value = value
+        self.size = size
+        self.batches = []
+
+    def score_batch(self, texts):
+        self.batches.append(list(texts))
+        return [self.value] * len(texts)
+
+    def score(self, text):
+        return self.score_batch([text])[0]
+
+    def memory_bytes(self):
+        return self.size
+
+
+class TestIdentifyLanguage(unittest.TestCase):
+    """Test cases for identify_language."""
+
+    def test_identifies_languages(self):
+        """Test that scripts and Latin-script function words settle the language."""
+        samples = {
+            "you are the worst person on this forum": "en",
+            "tu es vraiment le pire de tous, je ne comprends pas": "fr",
+            "eres la peor persona de este foro y no lo sabes": "es",
+            "du bist der schlimmste mensch und ich mag dich nicht": "de",
+            "ты худший человек на этом форуме": "ru",
+            "ти найгірша людина на цьому форумі": "uk",
+            "είσαι ο χειρότερος άνθρωπος": "el",
+            "أنت أسوأ شخص في هذا المنتدى": "ar",
+            "あなたは最悪の人です": "ja",
+            "你是这个论坛上最坏的人": "zh",
+            "너는 이 포럼에서 최악이야": "ko",
+        }
+        for text, language in samples.items():
+            with self.subTest(text=text):
+                self.assertEqual(identify_language(normalize_text(text)), language)
+
+    def test_undetermined(self):
+        """Test that texts without any clue are undetermined."""
+        self.assertEqual(identify_language(""), "und")
+        self.assertEqual(identify_language("qwxz brrt 1234"), "und")
+
+    def test_ties_go_to_the_language_listed_first(self):
+        """Test that a tie between function word votes is broken by language order, not word order."""
+        self.assertEqual(identify_language("le the"), "en")
+        self.assertEqual(identify_language("the le"), "en")
+        self.assertEqual(identify_language("het le"), "fr")
+
+    def test_stray_foreign_characters_do_not_decide(self):
+        """Test that a few characters of another script in a Latin text keep its language."""
+        self.assertEqual(identify_language(normalize_text("you are the worst, this is not ok ты")), "en")
+
+
+class TestLanguageRouter(unittest.TestCase):
+    """Test cases for the LanguageRouter class."""
+
+    def setUp(self):
+        self.default = FakeScorer(1.0)
+        self.loaded = []
+        self.addCleanup(metrics.reset)
+
+    def _loader(self, source):
+        self.loaded.append(source)
+        return FakeScorer(float(len(self.loaded) + 1), size=400 * 1024)
+
+    def _router(self, budget_mb=1.0):
+        return LanguageRouter(self.default, sources={"ru": "ru.tsv", "fr": "fr.tsv", "de": "de.tsv"},
+                              memory_budget=budget_mb, loader=self._loader)
+
+    def test_groups_batch_by_language(self):
+        """Test that each scorer gets one call with all of its texts and scores keep input order."""
+        router = self._router()
+        texts = [normalize_text(text) for text in ("ты худший", "you are the worst", "ты ужасен", "qwxz")]
+
+        scores = router.score_batch(texts)
+
+        self.assertEqual(scores, [2.0, 1.0, 2.0, 1.0])
+        self.assertEqual(self.loaded, ["ru.tsv"])
+        self.assertEqual(self.default.batches, [[texts[1], texts[3]]])
+        self.assertEqual(metrics.counter("scoring.language.texts.ru"), 2)
+
+    def test_loads_lazily_once(self):
+        """Test that a language scorer is loaded on first use only, even under concurrency."""
+        router = self._router()
+        self.assertEqual(self.loaded, [])
+        barrier = threading.Barrier(8)
+
+        def load(_):
+            barrier.wait()
+            return router.scorer_for("fr")
+
+        with ThreadPoolExecutor(max_workers=8) as executor:
+            scorers = set(executor.map(load, range(8)))
+
+        self.assertEqual(len(scorers), 1)
+        self.assertEqual(self.loaded, ["fr.tsv"])
+
+    def test_evicts_least_recently_used_over_budget(self):
+        """Test that loading past the memory budget evicts the least recently used scorer."""
+        router = self._router(budget_mb=1.0)
+        router.scorer_for("ru")
+        router.scorer_for("fr")
+        router.scorer_for("ru")
+
+        router.scorer_for("de")
+
+        self.assertEqual(router.loaded_languages(), ["ru", "de"])
+        self.assertEqual(router.memory_used, 800 * 1024)
+        self.assertEqual(metrics.counter("scoring.language.evictions"), 1)
+        router.scorer_for("fr")
+        self.assertEqual(self.loaded, ["ru.tsv", "fr.tsv", "de.tsv", "fr.tsv"])
+
+    def test_keeps_scorer_larger_than_budget(self):
+        """Test that a scorer over the whole budget is still kept while it is the only one."""
+        router = self._router(budget_mb=0.1)
+
+        router.scorer_for("ru")
+
+        self.assertEqual(router.loaded_languages(), ["ru"])
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,126 @@
+"""
+Unit tests for hot-reloadable runtime settings.
+"""
+import os
+import tempfile
+import unittest
+from unittest.mock import Mock, patch
+from config import settings
+from rabbitmq.consumers.message_consumer import BasicMessageConsumer
+from runtime_config import RuntimeConfig, RUNTIME_TUNABLE
+from scoring.cache import ScoreCache
+
+
+class TestRuntimeConfig(unittest.TestCase):
+    """Test cases for the RuntimeConfig class."""
+
+    def setUp(self):
+        self.tmp_dir = tempfile.TemporaryDirectory()
+        self.addCleanup(self.tmp_dir.cleanup)
+        self.path = os.path.join(self.tmp_dir.name, "runtime.env")
+        self.config = RuntimeConfig(path=self.path, poll_interval=60)
+        original = {key: getattr(settings, key) for key in RUNTIME_TUNABLE}
+        self.addCleanup(lambda: [setattr(settings, key, value) for key, value in original.items()])
+
+    def _write(self, content):
+        with open(self.path, "w", encoding="utf-8") as fh:
+            fh.write(content)
+
+    def test_reload_applies_changed_settings(self):
+        """Test that changed tunable settings are written to the live settings and passed to appliers."""
+        applier = Mock()
+        self.config.register(("RABBITMQ_PREFETCH_COUNT",), applier)
+        self._write(f"RABBITMQ_PREFETCH_COUNT={settings.RABBITMQ_PREFETCH_COUNT + 7}\n")
+
+        changes = self.config.reload()
+
+        self.assertEqual(changes, {"RABBITMQ_PREFETCH_COUNT": settings.RABBITMQ_PREFETCH_COUNT})
+        applier.assert_called_once_with(changes)
+
+    def test_unchanged_values_are_not_applied(self):
+        """Test that a reload without differences calls no applier."""
+        applier = Mock()
+        self.config.register(("SCORE_CACHE_SIZE",), applier)
+        self._write(f"SCORE_CACHE_SIZE={settings.SCORE_CACHE_SIZE}\n")
+
+        self.assertEqual(self.config.reload(), {})
+        applier.assert_not_called()
+
+    def test_invalid_values_are_rejected(self):
+        """Test that a file failing validation leaves every setting untouched."""
+        before = settings.AUDIT_LOG_BATCH_SIZE
+        self._write("AUDIT_LOG_BATCH_SIZE=0\nSCORE_CACHE_SIZE=not-a-number\n")
+
+        self.assertEqual(self.config.reload(), {})
+        self.assertEqual(settings.AUDIT_LOG_BATCH_SIZE, before)
+
+    def test_dict_settings_are_decoded_from_json(self):
+        """Test that dict settings are given as JSON, like in the environment."""
+        applier = Mock()
+        self.config.register(("SCORER_SHADOW_SETTINGS",), applier)
+        self._write('SCORER_SHADOW_SETTINGS={"SCORING_CASCADE_HIGH": "85"}\n')
+
+        self.config.reload()
+
+        applier.assert_called_once_with({"SCORER_SHADOW_SETTINGS": {"SCORING_CASCADE_HIGH": "85"}})
+
+    def test_restart_only_settings_are_ignored(self):
+        """Test that settings outside the tunable subset are not changed at runtime."""
+        before = settings.MONGODB_HOST
+        self._write("MONGODB_HOST=elsewhere\n")
+
+        self.assertEqual(self.config.reload(), {})
+        self.assertEqual(settings.MONGODB_HOST, before)
+
+    def test_register_rejects_non_tunable_settings(self):
+        """Test that appliers can only subscribe to runtime-tunable settings."""
+        with self.assertRaises(ValueError):
+            self.config.register(("MONGODB_HOST",), Mock())
+
+    def test_unregister(self):
+        """Test that an unregistered applier is no longer called."""
+        applier = Mock()
+        self.config.register(("LOG_LEVEL",), applier)
+        self.config.unregister(applier)
+        self._write("LOG_LEVEL=WARNING\n")
+
+        self.config.reload()
+
+        applier.assert_not_called()
+
+
+class TestRuntimeAppliers(unittest.TestCase):
+    """Test cases for live resizing of runtime-tunable components."""
+
+    def test_score_cache_resize_evicts_oldest(self):
+        """Test that shrinking the score cache evicts least recently used entries."""
+        cache = ScoreCache(max_size=3)
+        for text in ("a", "b", "c"):
+            cache.put(text, 1.0)
+
+        cache.resize(1)
+
+        self.assertEqual(len(cache), 1)
+        self.assertEqual(cache.get("c"), 1.0)
+
+    @patch('rabbitmq.consumers.message_consumer.RabbitMQConnection.__init__', return_value=None)
+    def test_consumer_applies_prefetch_on_connection_thread(self, mock_init):
+        """Test that a new prefetch count is issued through add_callback_threadsafe."""
+        consumer = BasicMessageConsumer()
+        consumer.connection = Mock()
+        consumer.channel = Mock()
+        consumer.scheduler = Mock()
+
+        with patch('rabbitmq.consumers.message_consumer.settings') as mock_settings:
+            mock_settings.RABBITMQ_PREFETCH_COUNT = 20
+            mock_settings.CONSUMER_CONCURRENCY = 4
+            consumer.apply_runtime_settings({"RABBITMQ_PREFETCH_COUNT": 20, "CONSUMER_MAX_PENDING_PER_KEY": 2})
+
+        self.assertEqual(consumer.scheduler.max_pending_per_key, 2)
+        consumer.channel.basic_qos.assert_not_called()
+        consumer.connection.add_callback_threadsafe.call_args[0][0]()
+        consumer.channel.basic_qos.assert_called_once_with(prefetch_count=20)
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,154 @@
+"""
+Unit tests for the per-key ordered scheduler.
+"""
+import threading
+import time
+import unittest
+from metrics import metrics
+from rabbitmq.consumers.scheduler import KeyedScheduler, WeightedFairQueue
+
+
+class TestKeyedScheduler(unittest.TestCase):
+    """Test cases for the KeyedScheduler class."""
+
+    def setUp(self):
+        """Set up a scheduler with a few workers."""
+        metrics.reset()
+        self.addCleanup(metrics.reset)
+        self.scheduler = KeyedScheduler(workers=4, max_pending_per_key=100)
+        self.addCleanup(self.scheduler.shutdown)
+
+    def test_same_key_runs_in_arrival_order(self):
+        """Test that tasks sharing a key never overlap and keep their order."""
+        results = []
+        running = set()
+        overlaps = []
+
+        def task(key, index):
+            if key in running:
+                overlaps.append(key)
+            running.add(key)
+            time.sleep(0.001)
+            results.append((key, index))
+            running.discard(key)
+
+        for index in range(20):
+            for key in ("a", "b", "c"):
+                self.scheduler.submit(key, task, key, index)
+
+        self.assertTrue(self.scheduler.wait_idle(timeout=5))
+        self.assertEqual(overlaps, [])
+        for key in ("a", "b", "c"):
+            self.assertEqual([i for k, i in results if k == key], list(range(20)))
+
+    def test_different_keys_run_in_parallel(self):
+        """Test that tasks with different keys run concurrently."""
+        barrier = threading.Barrier(3, timeout=2)
+
+        for key in ("a", "b", "c"):
+            self.scheduler.submit(key, barrier.wait)
+
+        self.assertTrue(self.scheduler.wait_idle(timeout=5))
+        self.assertFalse(barrier.broken)
+
+    def test_per_key_queue_is_bounded(self):
+        """Test that submissions beyond the per-key bound are refused."""
+        scheduler = KeyedScheduler(workers=2, max_pending_per_key=2)
+        self.addCleanup(scheduler.shutdown)
+        release = threading.Event()
+
+        accepted = [scheduler.submit("a", release.wait) for _ in range(4)]
+        other = scheduler.submit("b", lambda: None)
+        release.set()
+
+        self.assertEqual(accepted, [True, True, True, False])
+        self.assertTrue(other)
+        self.assertTrue(scheduler.wait_idle(timeout=5))
+        self.assertEqual(metrics.counter("consumer.scheduler.rejected"), 1)
+
+    def test_contention_metrics(self):
+        """Test that tasks queued behind the same key are counted."""
+        release = threading.Event()
+        self.scheduler.submit("a", release.wait)
+        self.scheduler.submit("a", lambda: None)
+        self.scheduler.submit("a", lambda: None)
+        release.set()
+
+        self.assertTrue(self.scheduler.wait_idle(timeout=5))
+        self.assertEqual(metrics.counter("consumer.scheduler.contended"), 2)
+        self.assertEqual(metrics.gauge("consumer.scheduler.max_key_depth"), 2)
+        self.assertEqual(metrics.timing("consumer.scheduler.queue_wait")["count"], 3)
+
+    def test_failing_task_does_not_block_key(self):
+        """Test that an exception in one task lets the next task of the key run."""
+        results = []
+
+        def fail():
+            raise RuntimeError("boom")
+
+        self.scheduler.submit("a", fail)
+        self.scheduler.submit("a", results.append, "next")
+
+        self.assertTrue(self.scheduler.wait_idle(timeout=5))
+        self.assertEqual(results, ["next"])
+        self.assertEqual(self.scheduler.pending, 0)
+
+    def test_workers_are_shared_fairly_between_groups(self):
+        """Test that a group with a large backlog does not delay another group's tasks until it drains."""
+        scheduler = KeyedScheduler(workers=1, max_pending_per_key=100)
+        self.addCleanup(scheduler.shutdown)
+        release = threading.Event()
+        order = []
+        scheduler.submit("blocker", release.wait, group="spammer")
+        for index in range(10):
+            scheduler.submit(f"s{index}", order.append, "spammer", group="spammer")
+        for index in range(2):
+            scheduler.submit(f"q{index}", order.append, "quiet", group="quiet")
+        release.set()
+
+        self.assertTrue(scheduler.wait_idle(timeout=5))
+        self.assertEqual(order[:4], ["quiet", "spammer", "quiet", "spammer"])
+
+
+class TestWeightedFairQueue(unittest.TestCase):
+    """Test cases for the WeightedFairQueue class."""
+
+    def test_pops_in_proportion_to_weights(self):
+        """Test that a group with twice the weight gets twice the turns while both are backlogged."""
+        queue = WeightedFairQueue({"heavy": 2.0, "light": 1.0}.get)
+        for index in range(12):
+            queue.push("heavy", ("heavy", index))
+            queue.push("light", ("light", index))
+
+        popped = [queue.pop()[0] for _ in range(12)]
+
+        self.assertEqual(popped.count("heavy"), 8)
+        self.assertEqual(len(queue), 12)
+
+    def test_items_keep_their_order_within_a_group(self):
+        """Test that each group is FIFO and emptied groups are forgotten."""
+        queue = WeightedFairQueue()
+        queue.push("a", 1)
+        queue.push("a", 2)
+        queue.push("b", 3)
+
+        self.assertEqual([queue.pop() for _ in range(3)], [1, 3, 2])
+        self.assertEqual(queue.groups, 0)
+        with self.assertRaises(IndexError):
+            queue.pop()
+
+    def test_returning_group_does_not_bank_idle_time(self):
+        """Test that a group joining late alternates with the others instead of catching up on its idle time."""
+        queue = WeightedFairQueue()
+        for index in range(8):
+            queue.push("busy", index)
+        for _ in range(4):
+            queue.pop()
+        for item in ("x", "y", "z"):
+            queue.push("late", item)
+
+        self.assertEqual([queue.pop() for _ in range(6)], ["x", 4, "y", 5, "z", 6])
+
+
+if __name__ == '__main__':
+    unittest.main()
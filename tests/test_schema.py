@@ -0,0 +1,91 @@
+"""
+Unit tests for the compact comment schema helpers and the online migrator.
+"""
+import unittest
+from datetime import datetime, UTC
+from unittest.mock import Mock, patch
+from config import settings
+from database.schema import SchemaMigrator, ensure_indexes, set_fields, storage_projection, storage_query
+from tests.test_backfill import FakeCursor
+
+
+class TestStorageSchema(unittest.TestCase):
+    """Test cases for query and update translation."""
+
+    def test_storage_query_matches_both_schemas_with_legacy_reads(self):
+        """Test that filters on model names match compact and not-yet-migrated documents."""
+        with patch.object(settings, "COMMENT_LEGACY_READS", True):
+            query = storage_query({"user_id": "u1", "score": {"$gte": 80}})
+
+        self.assertEqual(query, {"$or": [
+            {"u": "u1", "s": {"$gte": 80}},
+            {"user_id": "u1", "score": {"$gte": 80}, "v": {"$exists": False}},
+        ]})
+
+    def test_storage_query_compact_only(self):
+        """Test that only short names are queried once legacy reads are off."""
+        with patch.object(settings, "COMMENT_LEGACY_READS", False):
+            self.assertEqual(storage_query({"id": "c1"}), {"i": "c1"})
+            self.assertEqual(storage_projection(["id", "score"]), {"v": 1, "i": 1, "s": 1})
+        self.assertEqual(storage_query({}), {})
+
+    def test_set_fields_pipeline_targets_the_stored_schema(self):
+        """Test that legacy-compatible updates set short names on compact documents only."""
+        with patch.object(settings, "COMMENT_LEGACY_READS", True):
+            pipeline = set_fields({"score": 42.0})
+
+        stage = pipeline[0]["$set"]
+        is_current = {"$ifNull": ["$v", False]}
+        self.assertEqual(stage["s"], {"$cond": [is_current, {"$literal": 42.0}, "$$REMOVE"]})
+        self.assertEqual(stage["score"], {"$cond": [is_current, "$$REMOVE", {"$literal": 42.0}]})
+
+    def test_ensure_indexes_replaces_non_partial_legacy_index(self):
+        """Test that the legacy unique index becomes partial so compact documents can be inserted."""
+        collection = Mock()
+        collection.index_information.return_value = {"_id_": {}, "id_1": {"key": [("id", 1)], "unique": True}}
+
+        ensure_indexes(collection)
+
+        collection.drop_index.assert_called_once_with("id_1")
+        collection.create_index.assert_any_call("i", unique=True, name="i_1",
+                                                partialFilterExpression={"i": {"$exists": True}})
+        collection.create_index.assert_any_call("id", unique=True, name="id_1",
+                                                partialFilterExpression={"id": {"$exists": True}})
+
+
+class TestSchemaMigrator(unittest.TestCase):
+    """Test cases for the SchemaMigrator class."""
+
+    def setUp(self):
+        self.docs = [{"_id": i, "id": f"c{i}", "user_id": "u1", "content": "text", "timestamp": "2025-11-01T10:00:00",
+                      "score": float(i), "created_at": datetime(2025, 11, 1, tzinfo=UTC), "deleted_at": None}
+                     for i in range(5)]
+        self.collection = Mock()
+        self.collection.index_information.return_value = {}
+        self.collection.find.side_effect = lambda query, projection=None: FakeCursor(
+            [doc for doc in self.docs if doc["_id"] > query.get("_id", {}).get("$gt", -1)])
+        self.requests = []
+
+        def bulk_write(requests, ordered=True):
+            self.requests.extend(requests)
+            # The document with _id 1 was updated concurrently: its replacement does not match
+            matched = sum(1 for request in requests if request._filter["_id"] != 1)
+            return Mock(matched_count=matched, modified_count=matched)
+
+        self.collection.bulk_write.side_effect = bulk_write
+
+    def test_migrates_in_batches_without_overwriting_concurrent_updates(self):
+        """Test that documents are replaced conditionally on the score that was read."""
+        report = SchemaMigrator(self.collection, batch_size=2, rate=0).run()
+
+        self.assertEqual(report, {"migrated": 4, "skipped": 1})
+        self.assertEqual(self.collection.bulk_write.call_count, 3)
+        first = self.requests[0]
+        self.assertEqual(first._filter, {"_id": 0, "v": {"$exists": False}, "score": 0.0})
+        self.assertEqual(first._doc, {"_id": 0, "i": "c0", "u": "u1", "c": "text",
+                                      "t": datetime(2025, 11, 1, 10, 0, tzinfo=UTC), "s": 0.0,
+                                      "ca": datetime(2025, 11, 1, tzinfo=UTC), "v": 2})
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,86 @@
+"""
+Unit tests for the time-series score history.
+"""
+import unittest
+from datetime import datetime, UTC
+from unittest.mock import MagicMock
+from pymongo.errors import CollectionInvalid
+from database.score_history import ScoreHistory
+from metrics import metrics
+
+
+class TestScoreHistory(unittest.TestCase):
+    """Test cases for the ScoreHistory class."""
+
+    def setUp(self):
+        self.connection = MagicMock()
+        self.history = ScoreHistory(connection=self.connection, batch_size=10, flush_interval=60, max_buffer=5)
+        self.history.collection = MagicMock()
+        # Keep the background flusher out of the way; tests flush explicitly.
+        self.history._thread = MagicMock()
+        self.addCleanup(metrics.reset)
+
+    def test_flush_writes_batch_with_unordered_insert_many(self):
+        """Test that buffered events are written in one unordered batch."""
+        scored_at = datetime(2025, 11, 1, tzinfo=UTC)
+        self.history.record("c1", "u1", 12.5, "create", scored_at)
+        self.history.record_many([("c2", "u1", 50.0), ("c3", "u2", 70.0)], "backfill", scored_at)
+
+        self.assertEqual(self.history.flush(), 3)
+
+        args, kwargs = self.history.collection.insert_many.call_args
+        self.assertEqual(kwargs, {"ordered": False})
+        self.assertEqual(args[0][0], {"scored_at": scored_at, "user_id": "u1", "comment_id": "c1",
+                                      "score": 12.5, "source": "create"})
+        self.assertEqual([event["source"] for event in args[0]], ["create", "backfill", "backfill"])
+
+    def test_full_buffer_drops_oldest_events(self):
+        """Test that the buffer is bounded and overflow is counted, not spilled."""
+        self.history.record_many([(f"c{i}", "u1", float(i)) for i in range(8)], "update")
+
+        self.assertEqual(len(self.history._buffer), 5)
+        self.assertEqual(self.history._buffer[0]["comment_id"], "c3")
+        self.assertEqual(metrics.counter("score_history.dropped"), 3)
+
+    def test_failed_flush_drops_batch(self):
+        """Test that a failed write does not raise and is counted as dropped."""
+        self.history.collection.insert_many.side_effect = Exception("Mongo down")
+        self.history.record("c1", "u1", 1.0, "create")
+
+        self.assertEqual(self.history.flush(), 0)
+        self.assertEqual(metrics.counter("score_history.dropped"), 1)
+        self.assertEqual(len(self.history._buffer), 0)
+
+    def test_creates_time_series_collection(self):
+        """Test that the collection is created as time-series keyed by user_id."""
+        self.history.collection = None
+        db = self.connection.db
+        db.create_collection.side_effect = CollectionInvalid("exists")
+
+        self.history._get_collection()
+
+        options = db.create_collection.call_args.kwargs["timeseries"]
+        self.assertEqual((options["timeField"], options["metaField"]), ("scored_at", "user_id"))
+        db.__getitem__.return_value.create_index.assert_called_once_with([("comment_id", 1), ("scored_at", 1)])
+
+    def test_trend_queries_comment_in_time_order(self):
+        """Test that a comment's trend is filtered by time range and sorted by scoring time."""
+        since = datetime(2025, 11, 1, tzinfo=UTC)
+
+        self.history.trend("c1", since=since)
+
+        query = self.history.collection.find.call_args.args[0]
+        self.assertEqual(query, {"comment_id": "c1", "scored_at": {"$gte": since}})
+        self.history.collection.find.return_value.sort.assert_called_once_with("scored_at", 1)
+
+    def test_hourly_averages_groups_by_hour(self):
+        """Test that hourly averages match on the meta field and group on the truncated hour."""
+        self.history.hourly_averages("u1")
+
+        pipeline = self.history.collection.aggregate.call_args.args[0]
+        self.assertEqual(pipeline[0], {"$match": {"user_id": "u1"}})
+        self.assertEqual(pipeline[1]["$group"]["_id"], {"$dateTrunc": {"date": "$scored_at", "unit": "hour"}})
+
+
+if __name__ == '__main__':
+    unittest.main()
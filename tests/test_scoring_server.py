@@ -0,0 +1,139 @@
+"""
+Unit tests for the micro-batched HTTP scoring endpoint.
+"""
+import http.client
+import json
+import threading
+import time
+import unittest
+import urllib.error
+import urllib.request
+from concurrent.futures import ThreadPoolExecutor
+from metrics import metrics
+from scoring_server import DeadlineExceeded, MicroBatcher, Overloaded, ScoringServer
+
+
+class TestMicroBatcher(unittest.TestCase):
+    """Test cases for the MicroBatcher class."""
+
+    def setUp(self):
+        self.batches = []
+        self.addCleanup(metrics.reset)
+
+    def _score_batch(self, texts):
+        self.batches.append(list(texts))
+        return [float(len(text)) for text in texts]
+
+    def test_coalesces_concurrent_requests_up_to_max_batch_size(self):
+        """Test that concurrent requests are scored together, in batches of at most max_batch_size."""
+        batcher = MicroBatcher(self._score_batch, max_batch_size=4, max_wait=0.2, max_pending=100, workers=1)
+        batcher.start()
+        self.addCleanup(batcher.stop)
+
+        with ThreadPoolExecutor(max_workers=10) as executor:
+            scores = list(executor.map(lambda text: batcher.score(text, timeout=5), ["a" * n for n in range(1, 11)]))
+
+        self.assertEqual(scores, [float(n) for n in range(1, 11)])
+        self.assertEqual(sum(len(batch) for batch in self.batches), 10)
+        self.assertTrue(all(len(batch) <= 4 for batch in self.batches))
+        self.assertLess(len(self.batches), 10)
+
+    def test_batch_closes_after_max_wait(self):
+        """Test that a lone request is not held longer than max_wait waiting for company."""
+        batcher = MicroBatcher(self._score_batch, max_batch_size=32, max_wait=0.01, max_pending=10, workers=1)
+        batcher.start()
+        self.addCleanup(batcher.stop)
+
+        started = time.monotonic()
+        self.assertEqual(batcher.score("abc", timeout=5), 3.0)
+        self.assertLess(time.monotonic() - started, 1.0)
+
+    def test_expired_requests_are_not_scored(self):
+        """Test that requests past their deadline are dropped from the batch before scoring."""
+        batcher = MicroBatcher(self._score_batch, max_batch_size=8, max_wait=0, max_pending=10, workers=1)
+        expired = batcher.submit("late", deadline=time.monotonic() - 1)
+        live = batcher.submit("ok", deadline=time.monotonic() + 5)
+
+        batcher.process(batcher.next_batch())
+
+        self.assertEqual(self.batches, [["ok"]])
+        self.assertEqual(live.wait(), 2.0)
+        with self.assertRaises(DeadlineExceeded):
+            expired.wait()
+        self.assertEqual(metrics.counter("scoring_http.expired"), 1)
+
+    def test_deadline_exceeded_while_scoring(self):
+        """Test that the caller gets DeadlineExceeded when the batch is not scored in time."""
+        release = threading.Event()
+        batcher = MicroBatcher(lambda texts: release.wait() and [1.0] * len(texts), max_batch_size=1,
+                               max_wait=0, max_pending=10, workers=1)
+        batcher.start()
+        self.addCleanup(batcher.stop)
+        self.addCleanup(release.set)
+
+        with self.assertRaises(DeadlineExceeded):
+            batcher.score("slow", timeout=0.05)
+
+    def test_rejects_when_pending_queue_is_full(self):
+        """Test that submissions beyond max_pending are rejected instead of queued."""
+        batcher = MicroBatcher(self._score_batch, max_batch_size=1, max_wait=0, max_pending=1, workers=1)
+        batcher.submit("one", deadline=time.monotonic() + 5)
+
+        with self.assertRaises(Overloaded):
+            batcher.submit("two", deadline=time.monotonic() + 5)
+        self.assertEqual(metrics.counter("scoring_http.rejected"), 1)
+
+
+class TestScoringServer(unittest.TestCase):
+    """Test cases for the ScoringServer class."""
+
+    def setUp(self):
+        self.batcher = MicroBatcher(lambda texts: [42.0] * len(texts), max_batch_size=8, max_wait=0.005,
+                                    max_pending=10, workers=1)
+        self.server = ScoringServer(self.batcher, host="127.0.0.1", port=0)
+        self.server.start()
+        self.addCleanup(self.server.stop)
+        self.addCleanup(metrics.reset)
+
+    def _post(self, path, payload):
+        data = payload if isinstance(payload, bytes) else json.dumps(payload).encode("utf-8")
+        request = urllib.request.Request(f"http://127.0.0.1:{self.server.port}{path}", data=data, method="POST")
+        try:
+            with urllib.request.urlopen(request, timeout=5) as response:
+                return response.status, json.loads(response.read())
+        except urllib.error.HTTPError as e:
+            return e.code, json.loads(e.read())
+
+    def test_score(self):
+        """Test that a valid request is answered with its score."""
+        self.assertEqual(self._post("/score", {"text": "hello", "deadline_ms": 500}), (200, {"score": 42.0}))
+        self.assertEqual(metrics.counter("scoring_http.scored"), 1)
+
+    def test_invalid_requests(self):
+        """Test that malformed bodies and parameters are 400."""
+        self.assertEqual(self._post("/score", b"not json")[0], 400)
+        self.assertEqual(self._post("/score", {"text": 12})[0], 400)
+        self.assertEqual(self._post("/score", {"text": "x", "deadline_ms": 0})[0], 400)
+
+    def test_invalid_content_length(self):
+        """Test that a negative or non-integer Content-Length is 400 without reading the body."""
+        for length in ("-5", "abc"):
+            with self.subTest(length=length):
+                connection = http.client.HTTPConnection("127.0.0.1", self.server.port, timeout=5)
+                self.addCleanup(connection.close)
+                connection.putrequest("POST", "/score")
+                connection.putheader("Content-Length", length)
+                connection.endheaders()
+
+                response = connection.getresponse()
+
+                self.assertEqual(response.status, 400)
+                self.assertEqual(json.loads(response.read()), {"error": "invalid Content-Length"})
+
+    def test_unknown_path(self):
+        """Test that unknown paths are 404."""
+        self.assertEqual(self._post("/nope", {"text": "x"})[0], 404)
+
+
+if __name__ == '__main__':
+    unittest.main()
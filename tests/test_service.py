@@ -3,8 +3,11 @@ Unit tests for service.py - CommentService class.
 """
 import unittest
 from unittest.mock import Mock, patch
+from pymongo.errors import AutoReconnect, DuplicateKeyError
 from models import Comment
 from service import CommentService
+from config import settings
+from database.spool import CircuitBreaker
 from constants import OperationType
 
 
@@ -20,6 +23,12 @@ class TestCommentService(unittest.TestCase):
             timestamp="2025-11-26T10:00:00",
             score=0
         )
+        audit_patcher = patch('service.audit_log')
+        self.mock_audit_log = audit_patcher.start()
+        self.addCleanup(audit_patcher.stop)
+        history_patcher = patch('service.score_history')
+        self.mock_score_history = history_patcher.start()
+        self.addCleanup(history_patcher.stop)
 
     @patch('service.mongo_connection')
     def test_comment_service_initialization(self, mock_connection):
@@ -45,6 +54,8 @@ class TestCommentService(unittest.TestCase):
         self.assertIsNotNone(result)
         self.assertEqual(result.id, "new_id_123")
         mock_collection.insert_one.assert_called_once()
+        self.mock_audit_log.record.assert_called_once_with(OperationType.CREATE.value, "test_001", "user_123",
+                                                           score=0)
 
     @patch('service.mongo_connection')
     def test_add_comment_failure(self, mock_connection):
@@ -68,13 +79,14 @@ class TestCommentService(unittest.TestCase):
         mock_connection.get_collection.return_value = mock_collection
 
         service = CommentService()
-        result = service.update(self.test_comment, 85.5)
+        with patch.object(settings, "COMMENT_LEGACY_READS", False):
+            result = service.update(self.test_comment, 85.5)
 
         self.assertIsNotNone(result)
         self.assertEqual(result.score, 85.5)
         mock_collection.update_one.assert_called_once_with(
-            {"id": "test_001"},
-            {"$set": {"score": 85.5}}
+            {"i": "test_001"},
+            {"$set": {"s": 85.5}}
         )
 
     @patch('service.mongo_connection')
@@ -101,7 +113,10 @@ class TestCommentService(unittest.TestCase):
         result = service.delete("test_001")
 
         self.assertTrue(result)
-        mock_collection.delete_one.assert_called_once_with({"id": "test_001"})
+        # Legacy reads are on by default: documents of either schema match
+        mock_collection.delete_one.assert_called_once_with(
+            {"$or": [{"i": "test_001"}, {"id": "test_001", "v": {"$exists": False}}]})
+        self.mock_audit_log.record.assert_called_once_with(OperationType.DELETE.value, "test_001", None)
 
     @patch('service.mongo_connection')
     def test_delete_comment_not_found(self, mock_connection):
@@ -116,6 +131,7 @@ class TestCommentService(unittest.TestCase):
         result = service.delete("non_existent_id")
 
         self.assertFalse(result)
+        self.mock_audit_log.record.assert_not_called()
 
     @patch('service.mongo_connection')
     def test_delete_comment_failure(self, mock_connection):
@@ -129,6 +145,101 @@ class TestCommentService(unittest.TestCase):
         with self.assertRaises(Exception):
             service.delete("test_001")
 
+    @patch('service.spool_replayer')
+    @patch('service.comment_spool')
+    @patch('service.mongo_breaker')
+    @patch('service.mongo_connection')
+    def test_update_spools_when_mongo_unavailable(self, mock_connection, mock_breaker, mock_spool,
+                                                  mock_replayer):
+        """Test that a connection failure spools the update instead of raising."""
+        mock_collection = Mock()
+        mock_collection.update_one.side_effect = AutoReconnect("connection reset")
+        mock_connection.get_collection.return_value = mock_collection
+        mock_breaker.allow.return_value = True
+        mock_spool.pending = 0
+
+        service = CommentService()
+        result = service.update(self.test_comment, 85.5)
+
+        self.assertEqual(result.score, 85.5)
+        mock_breaker.record_failure.assert_called_once()
+        mock_spool.append.assert_called_once_with({"op": "update", "id": "test_001", "score": 85.5})
+        mock_replayer.ensure_started.assert_called_once()
+
+    @patch('service.spool_replayer')
+    @patch('service.comment_spool')
+    @patch('service.mongo_breaker')
+    @patch('service.mongo_connection')
+    def test_add_spools_while_breaker_open(self, mock_connection, mock_breaker, mock_spool, mock_replayer):
+        """Test that writes skip MongoDB entirely while the breaker is open."""
+        mock_collection = Mock()
+        mock_connection.get_collection.return_value = mock_collection
+        mock_breaker.allow.return_value = False
+        mock_spool.pending = 0
+
+        service = CommentService()
+        result = service.add(self.test_comment)
+
+        self.assertIs(result, self.test_comment)
+        mock_collection.insert_one.assert_not_called()
+        entry = mock_spool.append.call_args[0][0]
+        self.assertEqual(entry["op"], "create")
+        self.assertEqual(entry["document"]["i"], "test_001")
+
+    @patch('service.spool_replayer')
+    @patch('service.comment_spool')
+    @patch('service.mongo_breaker')
+    @patch('service.mongo_connection')
+    def test_delete_spools_behind_pending_entries(self, mock_connection, mock_breaker, mock_spool,
+                                                  mock_replayer):
+        """Test that writes queue behind spooled entries so per-comment order is preserved."""
+        mock_collection = Mock()
+        mock_connection.get_collection.return_value = mock_collection
+        mock_breaker.allow.return_value = True
+        mock_spool.pending = 3
+
+        service = CommentService()
+
+        self.assertTrue(service.delete("test_001"))
+        mock_collection.delete_one.assert_not_called()
+        mock_spool.append.assert_called_once_with({"op": "delete", "id": "test_001"})
+
+    @patch('service.ensure_indexes')
+    @patch('service.mongo_breaker')
+    @patch('service.mongo_connection')
+    def test_index_creation_waits_for_closed_breaker(self, mock_connection, mock_breaker, mock_ensure_indexes):
+        """Test that indexes are not created while the breaker is open, and are once it closes."""
+        patcher = patch.object(CommentService, '_index_created', False)
+        patcher.start()
+        self.addCleanup(patcher.stop)
+        mock_breaker.state = CircuitBreaker.OPEN
+
+        CommentService()
+        mock_ensure_indexes.assert_not_called()
+
+        mock_breaker.state = CircuitBreaker.CLOSED
+        CommentService()
+        mock_ensure_indexes.assert_called_once()
+        self.assertTrue(CommentService._index_created)
+
+    @patch('service.comment_spool')
+    @patch('service.mongo_connection')
+    def test_rejected_probe_write_releases_half_open_breaker(self, mock_connection, mock_spool):
+        """Test that a probe failing with a non-availability error lets the next call probe again."""
+        mock_collection = Mock()
+        mock_collection.insert_one.side_effect = DuplicateKeyError("duplicate key")
+        mock_connection.get_collection.return_value = mock_collection
+        mock_spool.pending = 0
+        breaker = CircuitBreaker(failure_threshold=1, reset_timeout=30)
+        with patch('database.spool.time.monotonic', return_value=100.0):
+            breaker.record_failure()
+
+        with patch('service.mongo_breaker', breaker), patch('database.spool.time.monotonic', return_value=131.0):
+            self.assertIsNone(CommentService().add(self.test_comment))
+
+            self.assertEqual(breaker.state, CircuitBreaker.HALF_OPEN)
+            self.assertTrue(breaker.allow())
+
     @patch('service.mongo_connection')
     def test_process_ops_create(self, mock_connection):
         """Test process_ops with create operation."""
@@ -141,6 +252,8 @@ class TestCommentService(unittest.TestCase):
 
         self.assertIsNotNone(result)
         mock_collection.insert_one.assert_called_once()
+        self.assertEqual(mock_collection.insert_one.call_args[0][0]["s"], 75.0)
+        self.mock_score_history.record.assert_called_once_with("test_001", "user_123", 75.0, "create")
 
 
     @patch('service.mongo_connection')
@@ -157,6 +270,7 @@ class TestCommentService(unittest.TestCase):
 
         self.assertIsNotNone(result)
         self.assertEqual(result.score, 90.0)
+        self.mock_score_history.record.assert_called_once_with("test_001", "user_123", 90.0, "update")
 
     @patch('service.mongo_connection')
     def test_process_ops_update_without_score(self, mock_connection):
@@ -182,6 +296,7 @@ class TestCommentService(unittest.TestCase):
         result = service.process_ops(self.test_comment, "delete")
 
         self.assertTrue(result)
+        self.mock_audit_log.record.assert_called_once_with(OperationType.DELETE.value, "test_001", "user_123")
 
 
     @patch('service.mongo_connection')
@@ -0,0 +1,96 @@
+"""
+Unit tests for consistent-hash sharding by user_id.
+"""
+import unittest
+from collections import Counter
+from unittest.mock import Mock, patch
+from rabbitmq.connection import RabbitMQConnection
+from rabbitmq.publishers.message_publisher import BasicMessagePublisher
+from rabbitmq.sharding import jump_consistent_hash, shard_for, shard_queue_name
+
+
+class TestShardFor(unittest.TestCase):
+    """Test cases for the shard assignment functions."""
+
+    def setUp(self):
+        """Set up a population of user IDs."""
+        self.users = [f"u_{i}" for i in range(20000)]
+
+    def test_assignment_is_stable_and_in_range(self):
+        """Test that a user always maps to the same shard within range."""
+        for user in self.users[:100]:
+            shard = shard_for(user, 8)
+            self.assertEqual(shard, shard_for(user, 8))
+            self.assertTrue(0 <= shard < 8)
+
+    def test_assignment_is_balanced(self):
+        """Test that users spread evenly across shards."""
+        counts = Counter(shard_for(user, 4) for user in self.users)
+
+        for count in counts.values():
+            self.assertAlmostEqual(count / len(self.users), 0.25, delta=0.02)
+
+    def test_growing_shards_moves_minimal_keys_to_new_shard(self):
+        """Test that going from N to N+1 shards only moves ~1/(N+1) of users, all to the new shard."""
+        before = {user: shard_for(user, 4) for user in self.users}
+        after = {user: shard_for(user, 5) for user in self.users}
+
+        moved = [user for user in self.users if before[user] != after[user]]
+
+        self.assertAlmostEqual(len(moved) / len(self.users), 1 / 5, delta=0.02)
+        self.assertTrue(all(after[user] == 4 for user in moved))
+
+    def test_shrinking_shards_only_moves_keys_of_removed_shard(self):
+        """Test that removing the last shard only reassigns its own users."""
+        before = {user: shard_for(user, 5) for user in self.users}
+        after = {user: shard_for(user, 4) for user in self.users}
+
+        for user in self.users:
+            if before[user] != 4:
+                self.assertEqual(before[user], after[user])
+
+    def test_invalid_bucket_count(self):
+        """Test that zero buckets is rejected."""
+        with self.assertRaises(ValueError):
+            jump_consistent_hash(1, 0)
+
+
+class TestShardedTopology(unittest.TestCase):
+    """Test cases for declaring and publishing to shard queues."""
+
+    @patch('rabbitmq.connection.RabbitMQConnection.ensure_connection')
+    @patch('rabbitmq.connection.RabbitMQConnection.__init__')
+    def test_bind_shard_queues(self, mock_init, mock_ensure_connection):
+        """Test that one queue per shard is declared and bound by shard index."""
+        mock_init.return_value = None
+        connection = RabbitMQConnection()
+        connection.channel = Mock()
+
+        queues = connection.bind_shard_queues("ex.shards", 3)
+
+        self.assertEqual(queues, [shard_queue_name(i) for i in range(3)])
+        connection.channel.exchange_declare.assert_called_once_with(exchange="ex.shards", exchange_type="direct",
+                                                                    durable=True)
+        bindings = [call.kwargs for call in connection.channel.queue_bind.call_args_list]
+        self.assertEqual([(b["queue"], b["routing_key"]) for b in bindings],
+                         [(shard_queue_name(i), str(i)) for i in range(3)])
+
+    @patch('rabbitmq.publishers.message_publisher.RabbitMQConnection.ensure_connection')
+    @patch('rabbitmq.publishers.message_publisher.RabbitMQConnection.__init__')
+    def test_publish_sharded_routes_by_user(self, mock_init, mock_ensure_connection):
+        """Test that messages are routed to the shard of their user_id."""
+        mock_init.return_value = None
+        publisher = BasicMessagePublisher()
+        publisher.channel = Mock()
+        body = {"id": "msg_1", "user_id": "u_42", "text": "hello"}
+
+        shard = publisher.publish_sharded("ex.shards", body, 4)
+
+        self.assertEqual(shard, shard_for("u_42", 4))
+        call_kwargs = publisher.channel.basic_publish.call_args.kwargs
+        self.assertEqual(call_kwargs["routing_key"], str(shard))
+        self.assertEqual(call_kwargs["exchange"], "ex.shards")
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,235 @@
+"""
+Unit tests for the MongoDB circuit breaker, disk spool and spool replayer.
+"""
+import fcntl
+import os
+import tempfile
+import unittest
+from datetime import datetime, UTC
+from unittest.mock import Mock, patch
+from pymongo import DeleteOne, UpdateOne
+from pymongo.errors import AutoReconnect, BulkWriteError
+from config import settings
+from database.spool import CircuitBreaker, DiskSpool, SpoolReplayer, to_write_model
+
+
+class TestCircuitBreaker(unittest.TestCase):
+    """Test cases for the CircuitBreaker class."""
+
+    def test_opens_after_consecutive_failures(self):
+        """Test that the breaker refuses calls once the failure threshold is reached."""
+        breaker = CircuitBreaker(failure_threshold=2, reset_timeout=60)
+
+        breaker.record_failure()
+        self.assertTrue(breaker.allow())
+        breaker.record_failure()
+
+        self.assertEqual(breaker.state, CircuitBreaker.OPEN)
+        self.assertFalse(breaker.allow())
+
+    def test_success_resets_failure_count(self):
+        """Test that a success between failures keeps the breaker closed."""
+        breaker = CircuitBreaker(failure_threshold=2, reset_timeout=60)
+
+        breaker.record_failure()
+        breaker.record_success()
+        breaker.record_failure()
+
+        self.assertEqual(breaker.state, CircuitBreaker.CLOSED)
+
+    @patch('database.spool.time.monotonic')
+    def test_half_open_allows_single_probe(self, mock_monotonic):
+        """Test that after the reset timeout one probe is let through and its outcome decides."""
+        mock_monotonic.return_value = 100.0
+        breaker = CircuitBreaker(failure_threshold=1, reset_timeout=30)
+        breaker.record_failure()
+
+        mock_monotonic.return_value = 131.0
+        self.assertTrue(breaker.allow())
+        self.assertFalse(breaker.allow())
+        self.assertEqual(breaker.state, CircuitBreaker.HALF_OPEN)
+
+        breaker.record_success()
+        self.assertEqual(breaker.state, CircuitBreaker.CLOSED)
+
+    @patch('database.spool.time.monotonic')
+    def test_failed_probe_reopens(self, mock_monotonic):
+        """Test that a failed probe re-opens the breaker for another timeout."""
+        mock_monotonic.return_value = 100.0
+        breaker = CircuitBreaker(failure_threshold=3, reset_timeout=30)
+        for _ in range(3):
+            breaker.record_failure()
+
+        mock_monotonic.return_value = 131.0
+        self.assertTrue(breaker.allow())
+        breaker.record_failure()
+
+        self.assertEqual(breaker.state, CircuitBreaker.OPEN)
+        self.assertFalse(breaker.allow())
+
+
+class TestDiskSpool(unittest.TestCase):
+    """Test cases for the DiskSpool class."""
+
+    def setUp(self):
+        self.tmp_dir = tempfile.TemporaryDirectory()
+        self.addCleanup(self.tmp_dir.cleanup)
+        self.path = os.path.join(self.tmp_dir.name, "comments.ndjson")
+        self.spool = DiskSpool(self.path)
+        self.addCleanup(self.spool.close)
+
+    def test_append_and_replay_in_order(self):
+        """Test that entries are replayed oldest first, in batches, and then removed."""
+        for i in range(5):
+            self.spool.append({"op": "update", "id": f"c{i}", "score": float(i)})
+        batches = []
+
+        replayed = self.spool.replay(batches.append, batch_size=2)
+
+        self.assertEqual(replayed, 5)
+        self.assertEqual([len(batch) for batch in batches], [2, 2, 1])
+        self.assertEqual([entry["id"] for batch in batches for entry in batch], [f"c{i}" for i in range(5)])
+        self.assertEqual(self.spool.pending, 0)
+        self.assertFalse(os.path.exists(self.spool.replay_path))
+
+    def test_dates_survive_round_trip(self):
+        """Test that datetime fields are restored as datetimes on replay."""
+        created_at = datetime(2025, 11, 26, 10, 0, tzinfo=UTC)
+        self.spool.append({"op": "create", "id": "c1", "document": {"id": "c1", "created_at": created_at}})
+        batches = []
+
+        self.spool.replay(batches.append)
+
+        restored = batches[0][0]["document"]["created_at"]
+        self.assertIsInstance(restored, datetime)
+        self.assertEqual(restored.timestamp(), created_at.timestamp())
+
+    def test_failed_replay_keeps_remaining_entries(self):
+        """Test that entries not accepted by a failing replay are kept for the next attempt."""
+        for i in range(4):
+            self.spool.append({"op": "delete", "id": f"c{i}"})
+        apply = Mock(side_effect=[None, AutoReconnect("down")])
+
+        with self.assertRaises(AutoReconnect):
+            self.spool.replay(apply, batch_size=2)
+
+        self.assertEqual(self.spool.pending, 2)
+        batches = []
+        self.spool.replay(batches.append)
+        self.assertEqual([entry["id"] for entry in batches[0]], ["c2", "c3"])
+
+    def test_pending_counts_existing_files(self):
+        """Test that a spool left behind by a previous run is picked up on start."""
+        self.spool.append({"op": "delete", "id": "c1"})
+        self.spool.append({"op": "delete", "id": "c2"})
+        self.spool.close()
+
+        self.assertEqual(DiskSpool(self.path).pending, 2)
+
+    def test_each_process_spools_to_its_own_file(self):
+        """Test that the spool file is suffixed with the pid of the process using it."""
+        self.spool.append({"op": "delete", "id": "c1"})
+
+        self.assertEqual(self.spool.path, f"{self.path}.{os.getpid()}")
+        self.assertTrue(os.path.exists(self.spool.path))
+        self.assertFalse(os.path.exists(self.path))
+
+    def test_adopts_files_of_stopped_processes(self):
+        """Test that the spool files of a process that is gone are replayed first, oldest first."""
+        orphan = f"{self.path}.99999"
+        with open(orphan + ".replay", "w") as fh:
+            fh.write('{"op": "delete", "id": "c1"}\n')
+        with open(orphan, "w") as fh:
+            fh.write('{"op": "delete", "id": "c2"}\n')
+        open(orphan + ".lock", "w").close()
+
+        self.spool.append({"op": "delete", "id": "c3"})
+        batches = []
+        self.spool.replay(batches.append)
+
+        self.assertEqual([entry["id"] for entry in batches[0]], ["c1", "c2", "c3"])
+        self.assertEqual(self.spool.pending, 0)
+        for suffix in ("", ".replay", ".lock"):
+            self.assertFalse(os.path.exists(orphan + suffix))
+
+    def test_leaves_files_of_running_processes(self):
+        """Test that a spool file whose process still holds its lock is not adopted."""
+        other = f"{self.path}.99999"
+        with open(other, "w") as fh:
+            fh.write('{"op": "delete", "id": "c1"}\n')
+        lock_fh = open(other + ".lock", "w")
+        self.addCleanup(lock_fh.close)
+        fcntl.flock(lock_fh, fcntl.LOCK_EX)
+
+        self.assertEqual(self.spool.pending, 0)
+        self.assertTrue(os.path.exists(other))
+
+
+class TestSpoolReplayer(unittest.TestCase):
+    """Test cases for the SpoolReplayer class."""
+
+    def setUp(self):
+        self.tmp_dir = tempfile.TemporaryDirectory()
+        self.addCleanup(self.tmp_dir.cleanup)
+        self.spool = DiskSpool(os.path.join(self.tmp_dir.name, "comments.ndjson"))
+        self.addCleanup(self.spool.close)
+        self.breaker = CircuitBreaker(failure_threshold=1, reset_timeout=60)
+        self.collection = Mock()
+        connection = Mock()
+        connection.get_collection.return_value = self.collection
+        self.replayer = SpoolReplayer(self.spool, self.breaker, connection=connection, interval=60)
+
+    def test_to_write_model(self):
+        """Test that spooled entries become idempotent bulk write operations."""
+        with patch.object(settings, "COMMENT_LEGACY_READS", False):
+            create = to_write_model({"op": "create", "id": "c1", "document": {"i": "c1", "v": 2}})
+            update = to_write_model({"op": "update", "id": "c1", "score": 42.0})
+            delete = to_write_model({"op": "delete", "id": "c1"})
+
+        self.assertEqual(create, UpdateOne({"i": "c1"}, {"$setOnInsert": {"i": "c1", "v": 2}}, upsert=True))
+        self.assertEqual(update, UpdateOne({"i": "c1"}, {"$set": {"s": 42.0}}))
+        self.assertEqual(delete, DeleteOne({"i": "c1"}))
+
+    def test_replays_with_ordered_bulk_write(self):
+        """Test that the spool is drained with ordered bulk writes when the breaker is closed."""
+        self.spool.append({"op": "create", "id": "c1", "document": {"id": "c1"}})
+        self.spool.append({"op": "update", "id": "c1", "score": 42.0})
+
+        replayed = self.replayer.replay_once()
+
+        self.assertEqual(replayed, 2)
+        requests = self.collection.bulk_write.call_args[0][0]
+        self.assertEqual(len(requests), 2)
+        self.assertTrue(self.collection.bulk_write.call_args[1]["ordered"])
+
+    def test_skips_replay_while_breaker_open(self):
+        """Test that nothing is replayed while the breaker refuses calls."""
+        self.spool.append({"op": "delete", "id": "c1"})
+        self.breaker.record_failure()
+
+        self.assertEqual(self.replayer.replay_once(), 0)
+        self.collection.bulk_write.assert_not_called()
+        self.assertEqual(self.spool.pending, 1)
+
+    def test_failed_replay_opens_breaker(self):
+        """Test that a connection failure during replay keeps the entries and opens the breaker."""
+        self.spool.append({"op": "delete", "id": "c1"})
+        self.collection.bulk_write.side_effect = AutoReconnect("down")
+
+        self.assertEqual(self.replayer.replay_once(), 0)
+        self.assertEqual(self.breaker.state, CircuitBreaker.OPEN)
+        self.assertEqual(self.spool.pending, 1)
+
+    def test_rejected_write_is_skipped(self):
+        """Test that a write rejected by MongoDB is dropped and the rest of the batch resumes."""
+        for i in range(3):
+            self.spool.append({"op": "update", "id": f"c{i}", "score": 1.0})
+        error = BulkWriteError({"writeErrors": [{"index": 1, "errmsg": "bad"}]})
+        self.collection.bulk_write.side_effect = [error, None]
+
+        self.assertEqual(self.replayer.replay_once(), 3)
+        self.assertEqual(len(self.collection.bulk_write.call_args_list[1][0][0]), 1)
+
+
+if __name__ == '__main__':
+    unittest.main()
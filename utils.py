@@ -1,42 +1,21 @@
 from configure_logging import get_logger
-import random
-import time, json
+import json
 from rabbitmq.publishers.message_publisher import BasicMessagePublisher
 from models import Message
 from config import settings
 from constants import QueueName, ExchangeType
+from scoring.simulated import simulate_scoring
 
 
 
 logging = get_logger(__name__)
 
 
-def simulate_scoring(min_duration: int=2, max_duration: int=15) -> dict:
-    """
-    Simulate a scoring process that takes a random duration between min_duration and max_duration seconds.
-    :param min_duration: minimum duration in seconds (int)
-    :param max_duration: maximum duration in seconds (int)
-    :return: dict with scoring result
-    """
-    duration = random.randint(min_duration, max_duration)
-    start_time = time.time()
-    logging.info(f"Scoring started, will take approximately {duration} seconds.")
-    time.sleep(duration)
-    end_time = time.time()
-    elapsed_time = end_time - start_time
-    logging.info(f"Scoring completed in {elapsed_time:.2f} seconds.")
-    result = {
-        "status": "completed",
-        "duration_seconds": elapsed_time,
-        "score": random.uniform(0, 100)  # Simulated score
-    }
-
-    return result
-
-def publish_result(message: Message):
+def publish_result(message: Message) -> bool:
     """
     Publish the result message to RabbitMQ.
     :param message: Message object
+    :return: bool whether the result was published (confirmed by the broker in confirm mode)
     """
     try:
         logging.info("Publishing result message", message_id=message.message_id, status=message.status)
@@ -49,15 +28,18 @@ def publish_result(message: Message):
             routing_key=settings.RABBITMQ_PUBLISHER_ROUTING_KEY,
         )
         # Publish message
-        publisher.publish(
+        if not publisher.publish(
             exchange_name=settings.RABBITMQ_PUBLISHER_EXCHANGE,
             routing_key=settings.RABBITMQ_PUBLISHER_ROUTING_KEY,
             body=message.__dict__
-        )
+        ):
+            return False
 
         logging.info("Message published successfully", body=message)
+        return True
     except Exception as e:
         logging.error("Error publishing message", body=message, exc_info=True)
+        return False
 
 
 def to_dict(body) -> dict: